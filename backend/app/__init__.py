@@ -30,6 +30,21 @@ def create_app():
             response.headers['Access-Control-Allow-Headers'] = 'Content-Type, Authorization'
         return response
     
+    # MongoDB settings; each worker process connects lazily on first use
+    from app.utils.database import init_db, DatabaseUnavailable
+    init_db(app)
+    
+    @app.errorhandler(DatabaseUnavailable)
+    def database_unavailable(error):
+        return jsonify({
+            'success': False,
+            'message': 'Database is temporarily unavailable'
+        }), 503
+    
+    # Profile MongoDB commands per request (Server-Timing header + admin aggregates)
+    from app.utils.query_profiler import init_query_profiler
+    init_query_profiler(app)
+    
     # Register auth blueprint (replaces Flask-RESTful)
     from app.routes.auth_blueprint import auth_bp
     app.register_blueprint(auth_bp, url_prefix='/api/auth')
@@ -44,9 +59,10 @@ def create_app():
     
     # Tạm thời thêm registration route trực tiếp
     from flask_cors import cross_origin
-    from werkzeug.security import generate_password_hash
+    from app.utils.password_hashing import hashing_admission
+    from app.utils.rate_limit import rate_limited
     from app.utils.database import get_db
-    from app.utils.jwt_auth import generate_token
+    from app.utils.jwt_auth import issue_tokens
     from datetime import datetime
     import re
     
@@ -216,8 +232,10 @@ def create_app():
     # Add simple-login route (proxy to registration/login)
     @app.route('/api/auth/simple-login', methods=['POST', 'OPTIONS'])
     @cross_origin(origins=['http://localhost', 'http://localhost:3000', 'http://localhost:80'])
+    @rate_limited('login')
+    @hashing_admission
     def auth_simple_login():
-        from werkzeug.security import check_password_hash
+        from app.models.user import User
         try:
             data = request.get_json()
             
@@ -231,16 +249,8 @@ def create_app():
             password = data['password']
             remember_me = data.get('remember_me', False)
             
-            # Get database
-            db = get_db()
-            
-            # Find user by email or username
-            user_data = db.users.find_one({
-                '$or': [
-                    {'email': login_identifier},
-                    {'username': login_identifier}
-                ]
-            })
+            # Find user by email or username (shared indexed lookup)
+            user_data = User.find_login_document(login_identifier)
             
             if not user_data:
                 return jsonify({
@@ -248,9 +258,8 @@ def create_app():
                     'message': 'Email hoặc mật khẩu không đúng'
                 }), 401
             
-            # Check password
-            password_hash = user_data.get('password_hash')
-            if not password_hash or not check_password_hash(password_hash, password):
+            # Check password (legacy hashes are upgraded on success)
+            if not User.verify_login_password(user_data, password):
                 return jsonify({
                     'success': False,
                     'message': 'Email hoặc mật khẩu không đúng'
@@ -258,7 +267,7 @@ def create_app():
             
             # Generate JWT token
             user_id = str(user_data['_id'])
-            token = generate_token(user_id, remember_me)
+            tokens = issue_tokens(user_data, remember_me)
             
             # Prepare user data to return
             user_response = {
@@ -283,7 +292,7 @@ def create_app():
                 'success': True,
                 'message': 'Đăng nhập thành công',
                 'data': {
-                    'token': token,
+                    **tokens,
                     'user': user_response,
                     'remember_me': remember_me
                 }
@@ -1,8 +1,14 @@
 from datetime import datetime
 from bson import ObjectId
+from pymongo import ASCENDING, IndexModel
 from app.utils.database import get_db
 
 class Activity:
+    COLLECTION = 'activities'
+    INDEXES = [
+        IndexModel([('trip_id', ASCENDING), ('date', ASCENDING)], name='trip_activities_by_date')
+    ]
+
     def __init__(self, trip_id, title, description, location, date, cost=None):
         self.trip_id = trip_id
         self.title = title
@@ -1,8 +1,30 @@
 from datetime import datetime
 from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from app.models.daily_rollup import DailyRollup
 from app.utils.database import get_db
 
 class Booking:
+    COLLECTION = 'bookings'
+    INDEXES = [
+        IndexModel([('user_id', ASCENDING), ('created_at', DESCENDING)], name='user_bookings_by_date'),
+        IndexModel([('booking_reference', ASCENDING)], name='booking_reference_unique', unique=True,
+                   partialFilterExpression={'booking_reference': {'$type': 'string'}}),
+        IndexModel([('user_id', ASCENDING), ('status', ASCENDING), ('created_at', DESCENDING)], name='user_status_date'),
+        IndexModel([('created_at', DESCENDING)], name='created_at_desc'),
+        IndexModel([('service_id', ASCENDING), ('created_at', DESCENDING)], name='service_bookings'),
+        # /api/admin/transactions?provider_id=: service_id $in the provider's services, newest booking_date first
+        IndexModel([('service_id', ASCENDING), ('booking_date', DESCENDING)], name='service_bookings_by_date'),
+        IndexModel([('guest_info.email', ASCENDING)], name='guest_email', sparse=True),
+        IndexModel([('user_id', ASCENDING), ('created_at', DESCENDING), ('_id', ASCENDING)], name='user_pagination'),
+        IndexModel([('booking_date', DESCENDING), ('_id', DESCENDING)], name='booking_date_id_desc'),
+        IndexModel([('provider_id', ASCENDING), ('booking_date', DESCENDING)], name='provider_bookings_by_date'),
+        IndexModel([('trip_id', ASCENDING), ('created_at', DESCENDING)], name='trip_bookings')
+    ]
+    # top_accounts ranks providers/users before joining their user documents;
+    # this many candidates are joined so deleted accounts can be skipped and still leave 10
+    TOP_CANDIDATES = 50
+
     def __init__(self, user_id, trip_id, service_id=None, booking_type="trip"):
         self.user_id = ObjectId(user_id) if isinstance(user_id, str) else user_id
         self.trip_id = ObjectId(trip_id) if isinstance(trip_id, str) else trip_id
@@ -94,16 +116,22 @@ class Booking:
         self.updated_at = datetime.utcnow()
         
         if hasattr(self, '_id'):
-            # Update existing booking
-            result = collection.update_one(
+            # Update existing booking; the previous status moves its daily rollup count
+            previous = collection.find_one_and_update(
                 {'_id': self._id},
-                {'$set': self.to_dict()}
+                {'$set': self.to_dict()},
+                projection={'status': 1, 'booking_date': 1}
             )
-            return result.modified_count > 0
+            if previous is None:
+                return False
+            DailyRollup.record_status_change(previous.get('booking_date'), previous.get('status'), self.status)
+            return True
         else:
             # Create new booking
-            result = collection.insert_one(self.to_dict())
+            booking_data = self.to_dict()
+            result = collection.insert_one(booking_data)
             self._id = result.inserted_id
+            DailyRollup.record_booking(booking_data)
             return True
 
     @classmethod
@@ -194,4 +222,86 @@ class Booking:
             
             return bookings
         except Exception:
-            return []
\ No newline at end of file
+            return []
+
+    @staticmethod
+    def _as_object_id(field):
+        """Aggregation expression: field as an ObjectId when it is a valid id string, else unchanged"""
+        return {'$convert': {'input': field, 'to': 'objectId', 'onError': field, 'onNull': None}}
+
+    @staticmethod
+    def _rank_accounts(count_field, amount_field, fields):
+        """
+        Stages ranking {_id: user id, count, amount} groups and joining their
+        user documents; fields maps output names to user fields (or '_id'), top 10
+        """
+        return [
+            {'$sort': {'count': -1, '_id': 1}},
+            {'$limit': Booking.TOP_CANDIDATES},
+            {'$lookup': {
+                'from': 'users',
+                'localField': '_id',
+                'foreignField': '_id',
+                'pipeline': [{'$project': {field: 1 for field in fields.values()}}],
+                'as': 'account'
+            }},
+            {'$unwind': '$account'},
+            {'$limit': 10},
+            {'$project': {
+                '_id': 0,
+                count_field: '$count',
+                amount_field: '$amount',
+                **{name: {'$ifNull': [f"$account.{field}", 'Unknown' if field == 'fullName' else '']}
+                   for name, field in fields.items()}
+            }}
+        ]
+
+    @staticmethod
+    def _top_account_facets():
+        """$facet branches ranking the top 10 providers and users by bookings"""
+        amount = {'$ifNull': ['$total_amount', 0]}
+        return {
+            # Group by service first, so each service is looked up once for its provider
+            'topProviders': [
+                {'$match': {'service_id': {'$nin': [None, '']}}},
+                {'$group': {'_id': '$service_id', 'count': {'$sum': 1}, 'amount': {'$sum': amount}}},
+                {'$lookup': {
+                    'from': 'services',
+                    'localField': '_id',
+                    'foreignField': '_id',
+                    'pipeline': [{'$project': {'provider_id': 1}}],
+                    'as': 'service'
+                }},
+                {'$unwind': '$service'},
+                {'$group': {
+                    '_id': Booking._as_object_id('$service.provider_id'),
+                    'count': {'$sum': '$count'},
+                    'amount': {'$sum': '$amount'}
+                }},
+                *Booking._rank_accounts('transaction_count', 'total_revenue',
+                                       {'provider_id': '_id', 'provider_name': 'fullName', 'company_name': 'companyName'})
+            ],
+            'topUsers': [
+                {'$group': {'_id': Booking._as_object_id('$user_id'), 'count': {'$sum': 1}, 'amount': {'$sum': amount}}},
+                *Booking._rank_accounts('transaction_count', 'total_spent',
+                                       {'user_id': '_id', 'user_name': 'fullName', 'email': 'email'})
+            ]
+        }
+
+    @staticmethod
+    def _stringify_account_ids(result):
+        for account in result['topProviders']:
+            account['provider_id'] = str(account['provider_id'])
+        for account in result['topUsers']:
+            account['user_id'] = str(account['user_id'])
+
+    @staticmethod
+    def top_accounts(start_date, end_date):
+        """Top 10 providers and users by bookings with start_date <= booking_date < end_date"""
+        pipeline = [
+            {'$match': {'booking_date': {'$gte': start_date, '$lt': end_date}}},
+            {'$facet': Booking._top_account_facets()}
+        ]
+        result = next(get_db().bookings.aggregate(pipeline, allowDiskUse=True))
+        Booking._stringify_account_ids(result)
+        return result
@@ -0,0 +1,292 @@
+"""
+Daily Rollup Model - per-day business counters for the admin dashboards
+
+One document per UTC day, keyed by the day itself so a date range is an
+_id range:
+
+    {'_id': '2026-10-17', 'day': datetime,
+     'registrations': {'user': int, 'provider': int, ...},   # users by role, on createdAt
+     'bookings': {'pending': int, 'confirmed': int, ...},     # bookings by current status, on booking_date
+     'revenue': {'VND': float, 'USD': float, ...},            # total_amount by currency, on booking_date
+     'logins': int}
+
+Counters are maintained at write time with one $inc upsert per event:
+record_registration() when a user is inserted, record_role_change() when
+a user's role changes (moving one count between roles of the day the user
+registered), record_booking() when a booking is inserted and
+record_status_change() when its status changes (moving one count between
+statuses of the booking's day), record_logins() with every batch
+LoginActivityBuffer writes. A failed update never fails the write it
+describes; it is counted (stats()) and rebuild() recomputes the days from
+users, bookings and login_rollups (python rebuild_daily_rollups.py).
+
+While the collection has no day documents yet (first deployment), the first
+process to connect backfills every day in the background
+(DAILY_ROLLUP_BACKFILL=true); a marker document keeps other processes from
+doing it again.
+"""
+import os
+import threading
+from datetime import datetime, timedelta
+from collections import Counter
+from pymongo import ASCENDING, ReplaceOne
+from pymongo.errors import DuplicateKeyError
+from app.models.login_rollup import LoginRollup, day_start
+from app.utils.database import get_db
+
+DAY_FORMAT = '%Y-%m-%d'
+# Outside every day range: letters sort after digits
+BACKFILL_ID = 'backfill'
+_lock = threading.Lock()
+_counters = {'updates': 0, 'errors': 0}
+
+
+def day_key(moment):
+    return moment.strftime(DAY_FORMAT)
+
+
+def _field(value):
+    """A role, status or currency as a field name, without '.' or '$'"""
+    return str(value or 'unknown').replace('.', '_').replace('$', '_')
+
+
+class DailyRollup:
+    """Per-day registration, booking, revenue and login counters"""
+
+    COLLECTION = 'daily_rollups'
+    # Range reads use the _id index
+    INDEXES = []
+
+    @staticmethod
+    def _increment(moment, counters, event):
+        counters = {path: amount for path, amount in counters.items() if amount}
+        if not counters or moment is None:
+            return
+        try:
+            get_db()[DailyRollup.COLLECTION].update_one(
+                {'_id': day_key(moment)},
+                {'$inc': counters, '$setOnInsert': {'day': day_start(moment)}},
+                upsert=True
+            )
+            with _lock:
+                _counters['updates'] += 1
+        except Exception as e:
+            with _lock:
+                _counters['errors'] += 1
+            print(f"⚠️  Daily rollup not updated for {event}: {e}")
+
+    @staticmethod
+    def record_registration(user_doc):
+        DailyRollup._increment(user_doc.get('createdAt'), {f"registrations.{_field(user_doc.get('role'))}": 1}, 'registration')
+
+    @staticmethod
+    def record_role_change(created_at, old_role, new_role):
+        if old_role == new_role:
+            return
+        DailyRollup._increment(created_at, {
+            f"registrations.{_field(old_role)}": -1,
+            f"registrations.{_field(new_role)}": 1
+        }, 'role change')
+
+    @staticmethod
+    def record_booking(booking_doc):
+        DailyRollup._increment(booking_doc.get('booking_date'), {
+            f"bookings.{_field(booking_doc.get('status'))}": 1,
+            f"revenue.{_field(booking_doc.get('currency', 'USD'))}": booking_doc.get('total_amount') or 0
+        }, 'booking')
+
+    @staticmethod
+    def record_status_change(booking_date, old_status, new_status):
+        if old_status == new_status:
+            return
+        DailyRollup._increment(booking_date, {
+            f"bookings.{_field(old_status)}": -1,
+            f"bookings.{_field(new_status)}": 1
+        }, 'booking status change')
+
+    @staticmethod
+    def record_logins(documents):
+        for day, logins in Counter(day_key(document['login_timestamp']) for document in documents).items():
+            DailyRollup._increment(datetime.strptime(day, DAY_FORMAT), {'logins': logins}, 'logins')
+
+    @staticmethod
+    def stats():
+        with _lock:
+            return dict(_counters)
+
+    @staticmethod
+    def load(since, until):
+        """Rollup documents of the days with since <= day < until, oldest first"""
+        return list(get_db()[DailyRollup.COLLECTION].find(
+            {'_id': {'$gte': day_key(since), '$lt': day_key(until)}}
+        ).sort('_id', 1))
+
+    @staticmethod
+    def rebuild(since, until):
+        """
+        Recompute the whole UTC days of [since, until) from users, bookings and
+        the day login_rollups (raw logins expire); returns the number of days written
+        """
+        db = get_db()
+        since, until = day_start(since), day_start(until)
+        days = {}
+
+        def day(moment):
+            return days.setdefault(day_key(moment), {
+                'day': day_start(moment), 'registrations': {}, 'bookings': {}, 'revenue': {}, 'logins': 0
+            })
+
+        def add(counters, name, amount):
+            counters[name] = counters.get(name, 0) + amount
+
+        registrations = db.users.aggregate([
+            {'$match': {'createdAt': {'$gte': since, '$lt': until}}},
+            {'$group': {
+                '_id': {'day': {'$dateTrunc': {'date': '$createdAt', 'unit': 'day'}}, 'role': '$role'},
+                'count': {'$sum': 1}
+            }}
+        ], allowDiskUse=True)
+        for row in registrations:
+            add(day(row['_id']['day'])['registrations'], _field(row['_id'].get('role')), row['count'])
+
+        bookings = db.bookings.aggregate([
+            {'$match': {'booking_date': {'$gte': since, '$lt': until}}},
+            {'$group': {
+                '_id': {
+                    'day': {'$dateTrunc': {'date': '$booking_date', 'unit': 'day'}},
+                    'status': '$status',
+                    'currency': {'$ifNull': ['$currency', 'USD']}
+                },
+                'count': {'$sum': 1},
+                'revenue': {'$sum': {'$ifNull': ['$total_amount', 0]}}
+            }}
+        ], allowDiskUse=True)
+        for row in bookings:
+            document = day(row['_id']['day'])
+            add(document['bookings'], _field(row['_id'].get('status')), row['count'])
+            add(document['revenue'], _field(row['_id'].get('currency')), row['revenue'])
+
+        for start, rollup in LoginRollup.load('day', since, until).items():
+            day(start)['logins'] = rollup['logins']
+
+        collection = db[DailyRollup.COLLECTION]
+        if days:
+            collection.bulk_write([ReplaceOne({'_id': key}, document, upsert=True) for key, document in days.items()], ordered=False)
+        # Days in the range that no longer have any events
+        collection.delete_many({'_id': {'$gte': day_key(since), '$lt': day_key(until), '$nin': list(days)}})
+        return len(days)
+
+    @staticmethod
+    def first_event():
+        """Earliest createdAt, booking_date or day login rollup, or None"""
+        db = get_db()
+        firsts = [
+            db.users.find_one({'createdAt': {'$type': 'date'}}, {'createdAt': 1}, sort=[('createdAt', ASCENDING)]),
+            db.bookings.find_one({'booking_date': {'$type': 'date'}}, {'booking_date': 1}, sort=[('booking_date', ASCENDING)]),
+            db[LoginRollup.COLLECTION].find_one({'period': 'day'}, {'start': 1}, sort=[('period', ASCENDING), ('start', ASCENDING)])
+        ]
+        moments = [document.get(field) for document, field in zip(firsts, ('createdAt', 'booking_date', 'start')) if document]
+        return min(moments) if moments else None
+
+    @staticmethod
+    def rebuild_all(since=None, until=None, chunk_days=31):
+        """rebuild() from since (default: the first event) to until (default: tomorrow) in chunks; returns days written"""
+        since = since or DailyRollup.first_event()
+        until = until or day_start(datetime.utcnow()) + timedelta(days=1)
+        if since is None:
+            return 0
+        written = 0
+        start = day_start(since)
+        while start < until:
+            end = min(start + timedelta(days=chunk_days), until)
+            written += DailyRollup.rebuild(start, end)
+            start = end
+        return written
+
+    @staticmethod
+    def backfill_if_empty():
+        """
+        rebuild_all() when there are no day documents and no other process has
+        started it; returns the number of days written, or None when skipped
+        """
+        collection = get_db()[DailyRollup.COLLECTION]
+        if collection.find_one({'_id': {'$ne': BACKFILL_ID}}, {'_id': 1}) is not None:
+            return None
+        try:
+            collection.insert_one({'_id': BACKFILL_ID, 'startedAt': datetime.utcnow()})
+        except DuplicateKeyError:
+            return None
+        print("🔧 Backfilling daily rollups")
+        written = DailyRollup.rebuild_all()
+        collection.update_one({'_id': BACKFILL_ID}, {'$set': {'completedAt': datetime.utcnow(), 'days': written}})
+        print(f"✅ Backfilled {written} daily rollups")
+        return written
+
+    @staticmethod
+    def backfill_in_background():
+        """Run backfill_if_empty() in a daemon thread so startup is not blocked"""
+        if os.getenv('DAILY_ROLLUP_BACKFILL', 'true').lower() != 'true':
+            return None
+
+        def run():
+            try:
+                DailyRollup.backfill_if_empty()
+            except Exception as e:
+                print(f"❌ Daily rollup backfill failed, run rebuild_daily_rollups.py: {e}")
+
+        thread = threading.Thread(target=run, name='daily-rollup-backfill', daemon=True)
+        thread.start()
+        return thread
+
+    @staticmethod
+    def registration_stats(since, until, label_length, role='all'):
+        """
+        Registrations per day (label_length 10), month (7) or year (4) of the
+        days since <= day < until, buckets without registrations omitted; role
+        'user' or 'provider' counts only that role. Returns (buckets, totals)
+        """
+        buckets = {}
+        totals = {'users': 0, 'providers': 0}
+        for document in DailyRollup.load(since, until):
+            registrations = document.get('registrations', {})
+            users, providers = registrations.get('user', 0), registrations.get('provider', 0)
+            totals['users'] += users
+            totals['providers'] += providers
+            if role != 'all':
+                count = registrations.get(role, 0)
+                users, providers = (users if role == 'user' else 0), (providers if role == 'provider' else 0)
+            else:
+                count = sum(registrations.values())
+            if count:
+                bucket = buckets.setdefault(document['_id'][:label_length], {'count': 0, 'users': 0, 'providers': 0})
+                bucket['count'] += count
+                bucket['users'] += users
+                bucket['providers'] += providers
+        totals['total'] = totals['users'] + totals['providers']
+        return [{'_id': label, **bucket} for label, bucket in sorted(buckets.items())], totals
+
+    @staticmethod
+    def transaction_summary(since, until):
+        """Booking totals, status distribution and daily timeline of the days since <= day < until"""
+        statuses, revenue_by_currency, timeline = {}, {}, []
+        for document in DailyRollup.load(since, until):
+            count = sum(document.get('bookings', {}).values())
+            revenue = sum(document.get('revenue', {}).values())
+            for status, amount in document.get('bookings', {}).items():
+                statuses[status] = statuses.get(status, 0) + amount
+            for currency, amount in document.get('revenue', {}).items():
+                revenue_by_currency[currency] = revenue_by_currency.get(currency, 0) + amount
+            if count:
+                timeline.append({'date': document['_id'], 'count': count, 'revenue': revenue})
+
+        count = sum(statuses.values())
+        revenue = sum(revenue_by_currency.values())
+        return {
+            'totalTransactions': count,
+            'totalRevenue': revenue,
+            'revenueByCurrency': revenue_by_currency,
+            'averageTransactionValue': revenue / count if count else 0,
+            'successRate': statuses.get('confirmed', 0) / count * 100 if count else 0,
+            'statusDistribution': {status: statuses.get(status, 0) for status in ('pending', 'confirmed', 'cancelled', 'completed')},
+            'timeline': timeline
+        }
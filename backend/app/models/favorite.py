@@ -1,8 +1,16 @@
 from datetime import datetime
 from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, IndexModel
 from app.utils.database import get_db
 
 class Favorite:
+    COLLECTION = 'favorites'
+    INDEXES = [
+        IndexModel([('user_id', ASCENDING), ('item_id', ASCENDING), ('item_type', ASCENDING)], name='user_item_unique', unique=True),
+        IndexModel([('user_id', ASCENDING), ('created_at', DESCENDING)], name='user_favorites_by_date'),
+        IndexModel([('item_id', ASCENDING), ('item_type', ASCENDING)], name='item_favorites')
+    ]
+
     def __init__(self, user_id, item_id, item_type="trip"):
         self.user_id = ObjectId(user_id) if isinstance(user_id, str) else user_id
         self.item_id = ObjectId(item_id) if isinstance(item_id, str) else item_id
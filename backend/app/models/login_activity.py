@@ -1,14 +1,30 @@
 """
 Login Activity Model - Track user login sessions
 """
+import os
 from datetime import datetime, timedelta
 from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, IndexModel
 from app.utils.database import get_db
 
+# Raw login events are kept this many days (0: forever); their counts live on in login_rollups
+RETENTION_DAYS = int(os.getenv('LOGIN_ACTIVITY_RETENTION_DAYS', 90))
+# archive_login_activities.py folds and deletes (exporting them first with an archive
+# directory) the days past the retention; the TTL index trails it by GRACE_DAYS
+ARCHIVE_DIR = os.getenv('LOGIN_ACTIVITY_ARCHIVE_DIR') or None
+GRACE_DAYS = int(os.getenv('LOGIN_ACTIVITY_RETENTION_GRACE_DAYS', 7))
+
 
 class LoginActivity:
     """Model to track user login activities for analytics"""
     
+    COLLECTION = 'login_activities'
+    INDEXES = [
+        # expireAfterSeconds is set by login_retention.apply_ttl() once every older day is folded
+        IndexModel([('login_timestamp', ASCENDING)], name='login_timestamp'),
+        IndexModel([('user_id', ASCENDING), ('login_timestamp', DESCENDING)], name='user_logins_by_date')
+    ]
+    
     def __init__(self, user_id, ip_address=None, user_agent=None):
         self.user_id = user_id
         self.login_timestamp = datetime.utcnow()
@@ -16,18 +32,19 @@ class LoginActivity:
         self.user_agent = user_agent
     
     def record_login(self):
-        """Save login activity to database"""
-        db = get_db()
+        """Queue login activity for a batched write (see app/services/login_activity_buffer.py)"""
+        from app.services.login_activity_buffer import login_activity_buffer
         # Store user_id as ObjectId (not string) to enable joins with users collection
         user_id = self.user_id if isinstance(self.user_id, ObjectId) else ObjectId(self.user_id)
         activity_data = {
+            '_id': ObjectId(),
             'user_id': user_id,
             'login_timestamp': self.login_timestamp,
             'ip_address': self.ip_address,
             'user_agent': self.user_agent
         }
-        result = db.login_activities.insert_one(activity_data)
-        return str(result.inserted_id)
+        login_activity_buffer.add(activity_data)
+        return str(activity_data['_id'])
     
     @staticmethod
     def get_login_stats(start_date=None, end_date=None):
@@ -92,65 +109,57 @@ class LoginActivity:
         
         return result
     
+    # Periods of the admin login statistics: bucket size, number of buckets, date label format
+    PERIODS = {
+        'day': ('day', 30, '%Y-%m-%d'),
+        'month': ('month', 12, '%Y-%m'),
+        'year': ('year', 5, '%Y')
+    }
+
     @staticmethod
-    def get_activity_stats(days=30):
+    def get_period_stats(period='day'):
         """
-        Get login activity statistics for specified number of days
-        Returns data grouped by date with login counts
+        Login count and distinct users per day (last 30 days), month (last 12
+        months) or year (last 5 years), read from the login_rollups documents
+        Distinct users are HyperLogLog estimates (about 1.6% error); a year is
+        the merge of its month sketches
         """
-        db = get_db()
-        since = datetime.utcnow() - timedelta(days=days)
-        
-        pipeline = [
-            {
-                '$match': {
-                    'login_timestamp': {'$gte': since}
-                }
-            },
-            {
-                '$group': {
-                    '_id': {
-                        '$dateToString': {
-                            'format': '%Y-%m-%d',
-                            'date': '$login_timestamp'
-                        }
-                    },
-                    'count': {'$sum': 1},
-                    'unique_users': {'$addToSet': '$user_id'}
-                }
-            },
-            {
-                '$project': {
-                    'date': '$_id',
-                    'count': 1,
-                    'unique_users': {'$size': '$unique_users'},
-                    '_id': 0
-                }
-            },
-            {
-                '$sort': {'date': 1}
-            }
-        ]
-        
-        results = list(db.login_activities.aggregate(pipeline))
-        
-        # Fill in missing dates with zero counts
-        result_dict = {item['date']: item for item in results}
-        
-        filled_results = []
-        current_date = since.replace(hour=0, minute=0, second=0, microsecond=0)
-        end_date = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
-        
-        while current_date <= end_date:
-            date_str = current_date.strftime('%Y-%m-%d')
-            if date_str in result_dict:
-                filled_results.append(result_dict[date_str])
+        from app.models.login_rollup import LoginRollup, day_start, month_start, next_month
+        from app.utils.hyperloglog import HyperLogLog
+
+        bucket, buckets, label = LoginActivity.PERIODS[period]
+        now = datetime.utcnow()
+        if bucket == 'day':
+            starts = [day_start(now) - timedelta(days=offset) for offset in range(buckets - 1, -1, -1)]
+            rollups = LoginRollup.load('day', starts[0], starts[-1] + timedelta(days=1))
+            groups = [(start, [rollups[start]] if start in rollups else []) for start in starts]
+        else:
+            if bucket == 'month':
+                first = month_start(now)
+                for _ in range(buckets - 1):
+                    first = month_start(first - timedelta(days=1))
             else:
-                filled_results.append({
-                    'date': date_str,
-                    'count': 0,
-                    'unique_users': 0
-                })
-            current_date += timedelta(days=1)
-        
-        return filled_results
+                first = datetime(now.year - buckets + 1, 1, 1)
+            rollups = LoginRollup.load('month', first, next_month(now))
+            if bucket == 'month':
+                starts = [first]
+                while len(starts) < buckets:
+                    starts.append(next_month(starts[-1]))
+                groups = [(start, [rollups[start]] if start in rollups else []) for start in starts]
+            else:
+                groups = [
+                    (datetime(year, 1, 1), [rollup for start, rollup in rollups.items() if start.year == year])
+                    for year in range(now.year - buckets + 1, now.year + 1)
+                ]
+
+        results = []
+        for start, documents in groups:
+            sketch = HyperLogLog()
+            for document in documents:
+                sketch.merge(HyperLogLog.from_bytes(document['sketch']))
+            results.append({
+                'date': start.strftime(label),
+                'count': sum(document['logins'] for document in documents),
+                'unique_users': sketch.count() if documents else 0
+            })
+        return results
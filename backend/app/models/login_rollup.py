@@ -0,0 +1,169 @@
+"""
+Login Rollup Model - daily and monthly login counts with distinct-user sketches
+
+One document per UTC day ('day:2026-10-17') and per month ('month:2026-10'):
+
+    {'_id': 'day:2026-10-17', 'period': 'day', 'start': datetime,
+     'logins': int, 'sketch': Binary (HyperLogLog of user ids), 'version': int}
+
+LoginActivityBuffer calls record() with every batch of login activities it
+writes, so the rollups are kept up to date at ingestion time. Login counts
+are $inc'ed; sketches are merged in Python and written back only if the
+stored version is still the one that was read (retrying otherwise), so
+concurrent workers never lose each other's users. Sketches that the batch
+did not change are not rewritten.
+
+The admin login statistics read at most a few dozen of these documents
+instead of scanning login_activities; rebuild() recomputes them from the raw
+events (python rebuild_login_rollups.py) for history recorded before the
+rollups existed. Raw events older than the retention are deleted once
+folded, so rebuild() never replaces a month that starts before the fold
+watermark (the 'retention' document).
+"""
+from datetime import datetime, timedelta
+from bson import Binary
+from pymongo import ASCENDING, IndexModel
+from pymongo.errors import DuplicateKeyError
+from app.utils.database import get_db
+from app.utils.hyperloglog import HyperLogLog
+
+# Attempts at a version-checked sketch merge before giving up on one rollup
+MAX_MERGE_ATTEMPTS = 5
+# Document holding the fold watermark of login_retention.archive()
+WATERMARK_ID = 'retention'
+
+
+def day_start(moment):
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def month_start(moment):
+    return day_start(moment).replace(day=1)
+
+
+def next_month(moment):
+    return (month_start(moment) + timedelta(days=32)).replace(day=1)
+
+
+class LoginRollup:
+    """Pre-aggregated login counts and distinct-user sketches per day and month"""
+
+    COLLECTION = 'login_rollups'
+    INDEXES = [
+        IndexModel([('period', ASCENDING), ('start', ASCENDING)], name='period_start')
+    ]
+
+    @staticmethod
+    def key(period, start):
+        return f"{period}:{start.strftime('%Y-%m-%d' if period == 'day' else '%Y-%m')}"
+
+    @staticmethod
+    def summarize(activities):
+        """{(period, start): [logins, sketch]} for login activity documents"""
+        rollups = {}
+        for activity in activities:
+            moment = activity['login_timestamp']
+            for period, start in (('day', day_start(moment)), ('month', month_start(moment))):
+                rollup = rollups.setdefault((period, start), [0, HyperLogLog()])
+                rollup[0] += 1
+                rollup[1].add(activity['user_id'])
+        return rollups
+
+    @staticmethod
+    def record(activities):
+        """Add written login activity documents to their day and month rollups"""
+        collection = get_db()[LoginRollup.COLLECTION]
+        for (period, start), (logins, sketch) in LoginRollup.summarize(activities).items():
+            LoginRollup._merge(collection, period, start, logins, sketch)
+
+    @staticmethod
+    def _merge(collection, period, start, logins, sketch, replace=False):
+        key = LoginRollup.key(period, start)
+        for _ in range(MAX_MERGE_ATTEMPTS):
+            current = collection.find_one({'_id': key}, {'sketch': 1, 'version': 1})
+            if current is None:
+                try:
+                    collection.insert_one({
+                        '_id': key, 'period': period, 'start': start,
+                        'logins': logins, 'sketch': Binary(sketch.to_bytes()), 'version': 1
+                    })
+                    return
+                except DuplicateKeyError:
+                    continue
+
+            if replace:
+                update = {'$set': {'logins': logins, 'sketch': Binary(sketch.to_bytes())}, '$inc': {'version': 1}}
+            else:
+                merged = HyperLogLog.from_bytes(current['sketch'])
+                if not merged.merge(sketch):
+                    # Only returning users: the count is the whole update
+                    collection.update_one({'_id': key}, {'$inc': {'logins': logins}})
+                    return
+                update = {'$set': {'sketch': Binary(merged.to_bytes())}, '$inc': {'logins': logins, 'version': 1}}
+            if collection.update_one({'_id': key, 'version': current['version']}, update).modified_count:
+                return
+        raise RuntimeError(f"Login rollup {key} kept changing; {logins} logins not recorded")
+
+    @staticmethod
+    def folded_until():
+        """Day before which login_retention.archive() folded and deleted the raw events, None before its first run"""
+        document = get_db()[LoginRollup.COLLECTION].find_one({'_id': WATERMARK_ID}, {'foldedUntil': 1})
+        return document.get('foldedUntil') if document else None
+
+    @staticmethod
+    def rebuild_start(since=None):
+        """
+        First month rebuild() may replace: the month of since, but never one
+        starting before the fold watermark, whose raw events are (partly) gone
+        """
+        since = month_start(since) if since else None
+        folded = LoginRollup.folded_until()
+        if folded is not None:
+            earliest = folded if folded == month_start(folded) else next_month(folded)
+            since = max(since, earliest) if since else earliest
+        return since
+
+    @staticmethod
+    def rebuild(since=None, until=None):
+        """
+        Recompute the rollups of whole months from rebuild_start(since) to
+        until from login_activities; returns the number written
+        """
+        db = get_db()
+        until = until or datetime.utcnow()
+        query = {'login_timestamp': {'$lt': until}}
+        since = LoginRollup.rebuild_start(since)
+        if since:
+            # Whole months, so month rollups are not replaced by a partial count
+            query['login_timestamp']['$gte'] = since
+
+        written = 0
+        batch = []
+        current_month = None
+        cursor = db.login_activities.find(query, {'_id': 0, 'user_id': 1, 'login_timestamp': 1}, batch_size=5000)
+        for activity in cursor.sort('login_timestamp', ASCENDING):
+            month = month_start(activity['login_timestamp'])
+            if current_month is not None and month != current_month:
+                written += LoginRollup._replace(batch)
+                batch = []
+            current_month = month
+            batch.append(activity)
+        written += LoginRollup._replace(batch)
+        return written
+
+    @staticmethod
+    def _replace(activities):
+        collection = get_db()[LoginRollup.COLLECTION]
+        rollups = LoginRollup.summarize(activities)
+        for (period, start), (logins, sketch) in rollups.items():
+            LoginRollup._merge(collection, period, start, logins, sketch, replace=True)
+        return len(rollups)
+
+    @staticmethod
+    def load(period, since, until):
+        """Rollup documents of period with since <= start < until, keyed by start"""
+        documents = get_db()[LoginRollup.COLLECTION].find(
+            {'period': period, 'start': {'$gte': since, '$lt': until}},
+            {'start': 1, 'logins': 1, 'sketch': 1}
+        )
+        return {document['start']: document for document in documents}
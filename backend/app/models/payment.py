@@ -1,8 +1,16 @@
 from datetime import datetime
 from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, IndexModel
 from app.utils.database import get_db
 
 class Payment:
+    COLLECTION = 'payments'
+    INDEXES = [
+        IndexModel([('booking_id', ASCENDING), ('created_at', DESCENDING)], name='booking_payments'),
+        IndexModel([('user_id', ASCENDING), ('created_at', DESCENDING)], name='user_payments_by_date'),
+        IndexModel([('status', ASCENDING), ('created_at', DESCENDING)], name='status_date')
+    ]
+
     def __init__(self, booking_id, user_id, amount, currency="USD"):
         self.booking_id = ObjectId(booking_id) if isinstance(booking_id, str) else booking_id
         self.user_id = ObjectId(user_id) if isinstance(user_id, str) else user_id
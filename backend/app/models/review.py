@@ -1,8 +1,15 @@
 from datetime import datetime
 from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, IndexModel
 from app.utils.database import get_db
 
 class Review:
+    COLLECTION = 'reviews'
+    INDEXES = [
+        IndexModel([('item_id', ASCENDING), ('item_type', ASCENDING), ('status', ASCENDING), ('created_at', DESCENDING)], name='item_reviews_by_date'),
+        IndexModel([('user_id', ASCENDING), ('status', ASCENDING), ('created_at', DESCENDING)], name='user_reviews_by_date')
+    ]
+
     def __init__(self, user_id, item_id, item_type="trip", rating=5):
         self.user_id = ObjectId(user_id) if isinstance(user_id, str) else user_id
         self.item_id = ObjectId(item_id) if isinstance(item_id, str) else item_id
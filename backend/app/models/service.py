@@ -1,8 +1,17 @@
 from datetime import datetime
 from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, IndexModel
 from app.utils.database import get_db
 
 class Service:
+    COLLECTION = 'services'
+    INDEXES = [
+        IndexModel([('provider_id', ASCENDING), ('created_at', DESCENDING)], name='provider_services_by_date'),
+        IndexModel([('service_type', ASCENDING), ('status', ASCENDING), ('created_at', DESCENDING)], name='type_status_date'),
+        IndexModel([('status', ASCENDING), ('average_rating', DESCENDING)], name='status_rating'),
+        IndexModel([('created_at', DESCENDING), ('_id', DESCENDING)], name='created_at_id_desc')
+    ]
+
     def __init__(self, data=None, name=None, service_type=None, provider_id=None):
         # Support both dictionary initialization and legacy parameters
         if data and isinstance(data, dict):
@@ -425,4 +434,11 @@ class Service:
             
             return services
         except Exception:
-            return []
\ No newline at end of file
+            return []
+    @staticmethod
+    def ids_by_provider(provider_id):
+        """_ids of every service of a provider, whether provider_id is stored as an ObjectId or a string"""
+        values = [provider_id]
+        if ObjectId.is_valid(provider_id):
+            values.append(ObjectId(provider_id))
+        return [service['_id'] for service in get_db().services.find({'provider_id': {'$in': values}}, {'_id': 1})]
@@ -1,8 +1,16 @@
 from datetime import datetime
 from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, IndexModel
 from app.utils.database import get_db
 
 class Trip:
+    COLLECTION = 'trips'
+    INDEXES = [
+        IndexModel([('user_id', ASCENDING), ('created_at', DESCENDING)], name='user_trips_by_date'),
+        IndexModel([('visibility', ASCENDING), ('status', ASCENDING), ('average_rating', DESCENDING)], name='visibility_status_rating'),
+        IndexModel([('created_at', DESCENDING), ('_id', DESCENDING)], name='created_at_id_desc')
+    ]
+
     def __init__(self, title, description, destination, start_date, end_date, user_id, budget=None):
         self.title = title
         self.description = description
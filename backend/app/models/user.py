@@ -1,11 +1,27 @@
 from datetime import datetime
 from bson import ObjectId
-import bcrypt
+from pymongo import ASCENDING, DESCENDING, IndexModel
 import secrets
 import re
 from app.utils.database import get_db
+from app.utils.password_hashing import hash_password, verify_password
 
 class User:
+    COLLECTION = 'users'
+    INDEXES = [
+        IndexModel([('email', ASCENDING)], name='email_unique', unique=True),
+        IndexModel([('username', ASCENDING)], name='username'),
+        IndexModel([('email_normalized', ASCENDING)], name='email_normalized_unique', unique=True,
+                   partialFilterExpression={'email_normalized': {'$type': 'string'}}),
+        IndexModel([('username_normalized', ASCENDING)], name='username_normalized',
+                   partialFilterExpression={'username_normalized': {'$type': 'string'}}),
+        IndexModel([('createdAt', DESCENDING), ('_id', DESCENDING)], name='created_at_id_desc'),
+        IndexModel([('role', ASCENDING), ('accountStatus', ASCENDING), ('createdAt', ASCENDING)], name='role_account_status_created'),
+        IndexModel([('emailChangedAt', ASCENDING)], name='email_changed_at', sparse=True),
+        IndexModel([('verification_token', ASCENDING)], name='verification_token', sparse=True),
+        IndexModel([('reset_token', ASCENDING)], name='reset_token', sparse=True)
+    ]
+
     def __init__(self, email, name, password=None, username=None, picture=None, phone=None, date_of_birth=None, gender=None, address=None):
         self.email = email
         self.name = name
@@ -21,8 +37,6 @@ class User:
         self.is_verified = False  # Require email verification
         self.verification_token = None
         self.verification_token_expires = None
-        self.verification_sent_count = 0  # Track rate limiting
-        self.last_verification_sent = None  # Timestamp of last email sent
         self.reset_token = None
         self.reset_token_expires = None
         self.role = "user"  # 'user', 'provider', 'admin'
@@ -44,23 +58,40 @@ class User:
         self.updated_at = datetime.utcnow()
 
     def set_password(self, password):
-        """Hash and set password using Werkzeug (consistent with registration)"""
-        from werkzeug.security import generate_password_hash
-        self.password_hash = generate_password_hash(password)
+        """Hash and set password (hashed in the password hashing pool)"""
+        self.password_hash = hash_password(password)
 
     def check_password(self, password):
-        """Check if provided password matches hash"""
-        if not self.password_hash:
+        """Check if provided password matches hash; legacy hashes are upgraded on success"""
+        user_data = {'_id': getattr(self, '_id', None), 'password_hash': self.password_hash}
+        valid = User.verify_login_password(user_data, password)
+        self.password_hash = user_data['password_hash']
+        return valid
+
+    @staticmethod
+    def verify_login_password(user_data, password):
+        """
+        Check a password against a user document
+
+        bcrypt hashes and werkzeug hashes with old parameters are replaced by a
+        hash with the current scheme after a successful check.
+        """
+        password_hash = user_data.get('password_hash')
+        if not password_hash:
             return False
-        from werkzeug.security import check_password_hash
-        try:
-            return check_password_hash(self.password_hash, password)
-        except Exception:
-            # Fallback: try bcrypt for old passwords
+        valid, needs_rehash = verify_password(password_hash, password)
+        if valid and needs_rehash and user_data.get('_id'):
             try:
-                return bcrypt.checkpw(password.encode('utf-8'), self.password_hash.encode('utf-8'))
-            except Exception:
-                return False
+                new_hash = hash_password(password)
+                get_db().users.update_one(
+                    {'_id': user_data['_id'], 'password_hash': password_hash},
+                    {'$set': {'password_hash': new_hash}}
+                )
+                user_data['password_hash'] = new_hash
+            except Exception as e:
+                # Keep the old hash; it is upgraded on a later login
+                print(f"Password rehash skipped: {e}")
+        return valid
 
     def generate_verification_token(self, expires_in=86400):
         """Generate email verification token (expires in 24 hours by default)"""
@@ -76,43 +107,6 @@ class User:
             return False
         return True
     
-    def can_send_verification_email(self):
-        """Check if user can send verification email (rate limiting: 3 emails per hour)"""
-        # Already verified
-        if self.is_verified:
-            return False, "Email đã được xác thực"
-        
-        # Check rate limiting
-        if self.last_verification_sent:
-            time_since_last = datetime.utcnow().timestamp() - self.last_verification_sent
-            
-            # Reset count after 1 hour
-            if time_since_last >= 3600:
-                self.verification_sent_count = 0
-            
-            # Check if exceeded limit (3 emails per hour)
-            if self.verification_sent_count >= 3 and time_since_last < 3600:
-                remaining_time = int((3600 - time_since_last) / 60)
-                return False, f"Bạn đã gửi quá nhiều yêu cầu. Vui lòng thử lại sau {remaining_time} phút"
-            
-            # Check cooldown (60 seconds between emails)
-            if time_since_last < 60:
-                remaining_time = int(60 - time_since_last)
-                return False, f"Vui lòng đợi {remaining_time} giây trước khi gửi lại"
-        
-        return True, "OK"
-    
-    def mark_verification_sent(self):
-        """Mark that verification email was sent (for rate limiting)"""
-        now = datetime.utcnow().timestamp()
-        
-        # Reset count if more than 1 hour has passed
-        if self.last_verification_sent and (now - self.last_verification_sent) >= 3600:
-            self.verification_sent_count = 0
-        
-        self.verification_sent_count += 1
-        self.last_verification_sent = now
-
     def generate_reset_token(self, expires_in=3600):
         """Generate password reset token (expires in 1 hour by default)"""
         self.reset_token = secrets.token_urlsafe(32)
@@ -215,8 +209,6 @@ class User:
                 'password_hash': self.password_hash,
                 'verification_token': self.verification_token,
                 'verification_token_expires': self.verification_token_expires,
-                'verification_sent_count': self.verification_sent_count,
-                'last_verification_sent': self.last_verification_sent,
                 'reset_token': self.reset_token,
                 'reset_token_expires': self.reset_token_expires
             })
@@ -243,8 +235,6 @@ class User:
         user.is_verified = data.get('is_verified', False)
         user.verification_token = data.get('verification_token')
         user.verification_token_expires = data.get('verification_token_expires')
-        user.verification_sent_count = data.get('verification_sent_count', 0)
-        user.last_verification_sent = data.get('last_verification_sent')
         user.reset_token = data.get('reset_token')
         user.reset_token_expires = data.get('reset_token_expires')
         user.role = data.get('role', 'user')
@@ -255,6 +245,9 @@ class User:
             "notifications": {"email": True, "push": True, "sms": False}
         })
         user.provider_info = data.get('provider_info')
+        # Read-only here: maintained by admin/auth routes, never written back by save()
+        user.account_status = data.get('accountStatus', 'active')
+        user.token_version = data.get('tokenVersion', 0)
         user.created_at = data.get('created_at', datetime.utcnow())
         user.updated_at = data.get('updated_at', datetime.utcnow())
         return user
@@ -267,17 +260,30 @@ class User:
             
             self.updated_at = datetime.utcnow()
             user_data = self.to_dict(include_sensitive=True)
+            user_data.update(User.normalized_fields(self.email, self.username))
             
             if hasattr(self, '_id') and self._id:
                 # Update existing user
-                collection.update_one(
+                previous = collection.find_one_and_update(
                     {'_id': self._id},
-                    {'$set': user_data}
+                    {'$set': user_data},
+                    projection={'email_normalized': 1, 'role': 1, 'createdAt': 1}
                 )
+                if previous is not None and previous.get('email_normalized') != user_data['email_normalized']:
+                    # Other workers add the new email to their registered email filter from this marker
+                    collection.update_one({'_id': self._id}, {'$set': {'emailChangedAt': datetime.utcnow()}})
+                if previous is not None:
+                    # e.g. upgrade_to_provider()
+                    from app.models.daily_rollup import DailyRollup
+                    DailyRollup.record_role_change(previous.get('createdAt'), previous.get('role'), user_data['role'])
+                from app.utils.principal_cache import principal_cache
+                principal_cache.invalidate(self._id)
             else:
                 # Create new user
                 result = collection.insert_one(user_data)
                 self._id = result.inserted_id
+            from app.utils.email_bloom import registered_emails
+            registered_emails.add(self.email)
             
             return self
             
@@ -373,34 +379,50 @@ class User:
             return User.from_dict(user_data)
         return None
     
+    @staticmethod
+    def normalize_identifier(value):
+        """Trimmed, lowercased email or username as stored in *_normalized fields"""
+        return (value or '').strip().lower()
+    
+    @staticmethod
+    def normalized_fields(email, username):
+        """email_normalized / username_normalized fields for a user document"""
+        return {
+            'email_normalized': User.normalize_identifier(email),
+            'username_normalized': User.normalize_identifier(username) or None
+        }
+    
+    @staticmethod
+    def find_login_document(login_identifier, projection=None):
+        """
+        Raw user document for a login identifier (email or username, any case)
+        
+        Shared by every login endpoint. Uses equality on the indexed
+        *_normalized fields; documents not yet backfilled by
+        migrate_normalized_identifiers.py are still found by an exact match
+        on the indexed email/username fields.
+        """
+        identifier = User.normalize_identifier(login_identifier)
+        if not identifier:
+            return None
+        
+        collection = get_db().users
+        if '@' in identifier:
+            user_data = collection.find_one({'email_normalized': identifier}, projection)
+            if user_data is None:
+                user_data = collection.find_one({'email': identifier, 'email_normalized': {'$exists': False}}, projection)
+        else:
+            user_data = collection.find_one({'username_normalized': identifier}, projection)
+            if user_data is None:
+                user_data = collection.find_one({'username': identifier, 'username_normalized': {'$exists': False}}, projection)
+        return user_data
+    
     @staticmethod
     def find_by_login(login_identifier):
         """Find user by email or username"""
-        db = get_db()
-        collection = db.users
-        
-        # Try exact match first
-        user_data = collection.find_one({
-            '$or': [
-                {'email': login_identifier},
-                {'username': login_identifier}
-            ]
-        })
-        
+        user_data = User.find_login_document(login_identifier)
         if user_data:
             return User.from_dict(user_data)
-        
-        # Try case-insensitive search as fallback
-        user_data = collection.find_one({
-            '$or': [
-                {'email': {'$regex': f'^{re.escape(login_identifier)}$', '$options': 'i'}},
-                {'username': {'$regex': f'^{re.escape(login_identifier)}$', '$options': 'i'}}
-            ]
-        })
-        
-        if user_data:
-            return User.from_dict(user_data)
-        
         return None
     
     @staticmethod
@@ -3,7 +3,6 @@ from flask_restful import Resource
 from app.utils.jwt_auth import token_required
 from app.models.activity import Activity
 from app.models.trip import Trip
-from app.models.user import User
 
 class ActivitiesResource(Resource):
     @token_required
@@ -14,14 +13,6 @@ class ActivitiesResource(Resource):
             user_id = request.current_user_id
             # Get user_id from JWT token
             
-            # Find user in database
-            user = User.find_by_id(user_id)
-            if not user:
-                return {
-                    'success': False,
-                    'message': 'User not found'
-                }, 404
-            
             # Find trip and verify ownership
             trip = Trip.find_by_id(trip_id)
             if not trip:
@@ -30,7 +21,7 @@ class ActivitiesResource(Resource):
                     'message': 'Trip not found'
                 }, 404
             
-            if trip.user_id != str(user._id):
+            if trip.user_id != user_id:
                 return {
                     'success': False,
                     'message': 'Unauthorized'
@@ -69,14 +60,6 @@ class ActivitiesResource(Resource):
             user_id = request.current_user_id
             # Get user_id from JWT token
             
-            # Find user in database
-            user = User.find_by_id(user_id)
-            if not user:
-                return {
-                    'success': False,
-                    'message': 'User not found'
-                }, 404
-            
             # Find trip and verify ownership
             trip = Trip.find_by_id(trip_id)
             if not trip:
@@ -85,7 +68,7 @@ class ActivitiesResource(Resource):
                     'message': 'Trip not found'
                 }, 404
             
-            if trip.user_id != str(user._id):
+            if trip.user_id != user_id:
                 return {
                     'success': False,
                     'message': 'Unauthorized'
@@ -144,14 +127,6 @@ class ActivityResource(Resource):
             user_id = request.current_user_id
             # Get user_id from JWT token
             
-            # Find user in database
-            user = User.find_by_id(user_id)
-            if not user:
-                return {
-                    'success': False,
-                    'message': 'User not found'
-                }, 404
-            
             # Find trip and verify ownership
             trip = Trip.find_by_id(trip_id)
             if not trip:
@@ -160,7 +135,7 @@ class ActivityResource(Resource):
                     'message': 'Trip not found'
                 }, 404
             
-            if trip.user_id != str(user._id):
+            if trip.user_id != user_id:
                 return {
                     'success': False,
                     'message': 'Unauthorized'
@@ -201,14 +176,6 @@ class ActivityResource(Resource):
             user_id = request.current_user_id
             # Get user_id from JWT token
             
-            # Find user in database
-            user = User.find_by_id(user_id)
-            if not user:
-                return {
-                    'success': False,
-                    'message': 'User not found'
-                }, 404
-            
             # Find trip and verify ownership
             trip = Trip.find_by_id(trip_id)
             if not trip:
@@ -217,7 +184,7 @@ class ActivityResource(Resource):
                     'message': 'Trip not found'
                 }, 404
             
-            if trip.user_id != str(user._id):
+            if trip.user_id != user_id:
                 return {
                     'success': False,
                     'message': 'Unauthorized'
@@ -276,14 +243,6 @@ class ActivityResource(Resource):
             user_id = request.current_user_id
             # Get user_id from JWT token
             
-            # Find user in database
-            user = User.find_by_id(user_id)
-            if not user:
-                return {
-                    'success': False,
-                    'message': 'User not found'
-                }, 404
-            
             # Find trip and verify ownership
             trip = Trip.find_by_id(trip_id)
             if not trip:
@@ -292,7 +251,7 @@ class ActivityResource(Resource):
                     'message': 'Trip not found'
                 }, 404
             
-            if trip.user_id != str(user._id):
+            if trip.user_id != user_id:
                 return {
                     'success': False,
                     'message': 'Unauthorized'
@@ -1,12 +1,27 @@
 from flask import Blueprint, request, jsonify
 from werkzeug.security import check_password_hash
-from app.utils.database import get_db
-from app.utils.jwt_auth import decode_token
-from app.services.email_service import send_provider_approval_email, send_provider_rejection_email
+from app.utils.database import get_db, client_manager
+from app.utils.jwt_auth import decode_claims, principal_from_claims, revoke_user_tokens
+from app.services.email_service import email_service, send_provider_approval_email, send_provider_rejection_email
+from app.services.email_outbox import email_outbox
 from datetime import datetime, timedelta
 from bson import ObjectId
 import functools
+from app.models.booking import Booking
+from app.models.daily_rollup import DailyRollup
+from app.models.login_rollup import day_start
+from app.models.service import Service
 from app.models.login_activity import LoginActivity
+from app.models.user import User
+from app.utils.query_profiler import profile_aggregates
+from app.utils.principal_cache import principal_cache
+from app.utils.rate_limit import rate_limiter
+from app.utils.response_cache import cached_response, response_cache
+from app.utils.pagination import InvalidCursor, paginate
+from app.utils.email_bloom import registered_emails
+from app.services.login_activity_buffer import login_activity_buffer
+
+INVALID_CURSOR_MESSAGE = 'Con trỏ phân trang không hợp lệ, vui lòng tải lại danh sách'
 
 admin_bp = Blueprint('admin', __name__, url_prefix='/api/admin')
 
@@ -30,16 +45,15 @@ def admin_required(f):
         
         try:
             # Verify token and get user_id
-            user_id = decode_token(token)
-            if not user_id:
+            payload = decode_claims(token)
+            if not payload:
                 return jsonify({
                     'success': False,
                     'message': 'Token không hợp lệ'
                 }), 401
 
-            # Get user from database
-            db = get_db()
-            user = db.users.find_one({'_id': ObjectId(user_id)})
+            # Role from a short-lived access token, else the cached role/status projection
+            user = principal_from_claims(payload) or principal_cache.get(payload['user_id'])
             
             if not user:
                 return jsonify({
@@ -191,6 +205,7 @@ def approve_provider():
             {'_id': ObjectId(provider_id)},
             {'$set': update_data}
         )
+        principal_cache.invalidate(provider_id)
         
         if result.modified_count == 0:
             return jsonify({
@@ -204,14 +219,16 @@ def approve_provider():
                 send_provider_approval_email(
                     provider['email'], 
                     provider['fullName'],
-                    provider.get('companyName', '')
+                    provider.get('companyName', ''),
+                    idempotency_key=f"provider_approval:{provider_id}"
                 )
             else:
                 send_provider_rejection_email(
                     provider['email'], 
                     provider['fullName'],
                     provider.get('companyName', ''),
-                    reason
+                    reason,
+                    idempotency_key=f"provider_rejection:{provider_id}"
                 )
         except Exception as email_error:
             print(f"Failed to send notification email: {email_error}")
@@ -233,6 +250,7 @@ def approve_provider():
 
 @admin_bp.route('/provider-stats', methods=['GET'])
 @admin_required
+@cached_response('provider_stats')
 def get_provider_stats():
     """Get provider statistics for admin dashboard"""
     try:
@@ -265,16 +283,12 @@ def get_provider_stats():
             if status in stats:
                 stats[status] = count
         
-        # Get recent registrations (last 30 days)
-        from datetime import timedelta
-        thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-        
-        recent_registrations = db.users.count_documents({
-            'role': 'provider',
-            'createdAt': {'$gte': thirty_days_ago}
-        })
-        
-        stats['recentRegistrations'] = recent_registrations
+        # Recent registrations (last 30 days) from daily_rollups
+        until = day_start(datetime.utcnow()) + timedelta(days=1)
+        stats['recentRegistrations'] = sum(
+            document.get('registrations', {}).get('provider', 0)
+            for document in DailyRollup.load(until - timedelta(days=30), until)
+        )
         
         return jsonify({
             'success': True,
@@ -360,6 +374,7 @@ def get_provider_details(provider_id):
 # ==================== LOGIN STATISTICS ====================
 @admin_bp.route('/login-stats', methods=['GET', 'OPTIONS'])
 @admin_required
+@cached_response('login_stats', defaults={'period': 'day'})
 def get_login_stats():
     """
     Get login statistics for different time periods
@@ -372,21 +387,15 @@ def get_login_stats():
     try:
         period = request.args.get('period', 'day')
         
-        if period == 'day':
-            # Last 30 days
-            stats = LoginActivity.get_activity_stats(days=30)
-        elif period == 'month':
-            # Last 12 months
-            stats = LoginActivity.get_activity_stats(days=365)
-        elif period == 'year':
-            # Last 5 years
-            stats = LoginActivity.get_activity_stats(days=1825)
-        else:
+        if period not in LoginActivity.PERIODS:
             return jsonify({
                 'success': False,
                 'message': 'Invalid period. Use: day, month, or year'
             }), 400
         
+        # Day, month or year buckets read from the pre-aggregated login_rollups
+        stats = LoginActivity.get_period_stats(period)
+        
         return jsonify({
             'success': True,
             'period': period,
@@ -404,6 +413,7 @@ def get_login_stats():
 # ==================== REGISTRATION STATISTICS ====================
 @admin_bp.route('/registration-stats', methods=['GET', 'OPTIONS'])
 @admin_required
+@cached_response('registration_stats', defaults={'period': 'day', 'role': 'all'})
 def get_registration_stats():
     """
     Get registration statistics with role filtering
@@ -415,77 +425,35 @@ def get_registration_stats():
         return '', 200
     
     try:
-        db = get_db()
         period = request.args.get('period', 'day')
         role = request.args.get('role', 'all')
         
         # Calculate date range
         if period == 'day':
             days = 30
-            group_format = '%Y-%m-%d'
+            label_length = 10
         elif period == 'month':
             days = 365
-            group_format = '%Y-%m'
+            label_length = 7
         elif period == 'year':
             days = 1825
-            group_format = '%Y'
+            label_length = 4
         else:
             return jsonify({
                 'success': False,
                 'message': 'Invalid period. Use: day, month, or year'
             }), 400
         
-        since = datetime.utcnow() - timedelta(days=days)
-        
-        # Build query
-        query = {'createdAt': {'$gte': since}}
-        if role != 'all':
-            query['role'] = role
-        
-        # Aggregate registrations by date
-        pipeline = [
-            {'$match': query},
-            {
-                '$group': {
-                    '_id': {
-                        '$dateToString': {
-                            'format': group_format,
-                            'date': '$createdAt'
-                        }
-                    },
-                    'count': {'$sum': 1},
-                    'users': {
-                        '$sum': {
-                            '$cond': [{'$eq': ['$role', 'user']}, 1, 0]
-                        }
-                    },
-                    'providers': {
-                        '$sum': {
-                            '$cond': [{'$eq': ['$role', 'provider']}, 1, 0]
-                        }
-                    }
-                }
-            },
-            {'$sort': {'_id': 1}}
-        ]
-        
-        results = list(db.users.aggregate(pipeline))
-        
-        # Get total counts
-        total_query = {'createdAt': {'$gte': since}}
-        total_users = db.users.count_documents({**total_query, 'role': 'user'})
-        total_providers = db.users.count_documents({**total_query, 'role': 'provider'})
+        # Whole UTC days read from daily_rollups
+        until = day_start(datetime.utcnow()) + timedelta(days=1)
+        results, totals = DailyRollup.registration_stats(until - timedelta(days=days), until, label_length, role)
         
         return jsonify({
             'success': True,
             'period': period,
             'role': role,
             'stats': results,
-            'totals': {
-                'users': total_users,
-                'providers': total_providers,
-                'total': total_users + total_providers
-            }
+            'totals': totals
         }), 200
         
     except Exception as e:
@@ -505,6 +473,8 @@ def get_users():
     Query params:
     - page: page number (default: 1)
     - limit: items per page (default: 20)
+    - cursor: keyset pagination instead of page; empty for the first page, then pagination.nextCursor
+    - total: with cursor, 'exact' or 'none' (default: estimated or cached count)
     - role: filter by role (user, provider, admin)
     - status: filter by status (active, blocked, pending)
     - search: search in name or email
@@ -516,8 +486,6 @@ def get_users():
         db = get_db()
         
         # Get query params
-        page = int(request.args.get('page', 1))
-        limit = int(request.args.get('limit', 20))
         role = request.args.get('role', '')
         status = request.args.get('status', '')
         search = request.args.get('search', '')
@@ -537,12 +505,8 @@ def get_users():
                 {'email': {'$regex': search, '$options': 'i'}}
             ]
         
-        # Get total count
-        total = db.users.count_documents(query)
-        
-        # Get paginated users
-        skip = (page - 1) * limit
-        users = list(db.users.find(query).skip(skip).limit(limit).sort('createdAt', -1))
+        # Page-number or cursor page on (createdAt, _id)
+        users, pagination = paginate(db.users, query, 'createdAt')
         
         # Format users
         users_data = []
@@ -562,14 +526,14 @@ def get_users():
         return jsonify({
             'success': True,
             'users': users_data,
-            'pagination': {
-                'page': page,
-                'limit': limit,
-                'total': total,
-                'pages': (total + limit - 1) // limit
-            }
+            'pagination': pagination
         }), 200
         
+    except InvalidCursor:
+        return jsonify({
+            'success': False,
+            'message': INVALID_CURSOR_MESSAGE
+        }), 400
     except Exception as e:
         print(f"Error getting users: {e}")
         return jsonify({
@@ -694,11 +658,16 @@ def update_user(user_id):
         
         # Update user
         update_data['updatedAt'] = datetime.utcnow()
+        if 'email' in update_data:
+            update_data['email_normalized'] = User.normalize_identifier(update_data['email'])
+            if update_data['email_normalized'] != user.get('email_normalized'):
+                update_data['emailChangedAt'] = update_data['updatedAt']
         
         result = db.users.update_one(
             {'_id': ObjectId(user_id)},
             {'$set': update_data}
         )
+        principal_cache.invalidate(user_id)
         
         if result.modified_count == 0:
             return jsonify({
@@ -706,6 +675,16 @@ def update_user(user_id):
                 'message': 'Không có thay đổi nào được thực hiện'
             }), 400
         
+        if 'email' in update_data:
+            registered_emails.add(update_data['email'])
+        
+        if 'role' in update_data:
+            DailyRollup.record_role_change(user.get('createdAt'), user.get('role'), update_data['role'])
+        
+        # Role/status changes end existing sessions at their next refresh
+        if update_data.get('role', user.get('role')) != user.get('role') or update_data.get('status', user.get('status')) != user.get('status'):
+            revoke_user_tokens(user_id)
+        
         return jsonify({
             'success': True,
             'message': 'Cập nhật thông tin người dùng thành công'
@@ -755,6 +734,7 @@ def delete_user(user_id):
                 }
             }
         )
+        principal_cache.invalidate(user_id)
         
         if result.modified_count == 0:
             return jsonify({
@@ -762,6 +742,8 @@ def delete_user(user_id):
                 'message': 'Không thể xóa người dùng'
             }), 400
         
+        revoke_user_tokens(user_id)
+        
         return jsonify({
             'success': True,
             'message': 'Xóa người dùng thành công'
@@ -822,6 +804,7 @@ def block_user(user_id):
             {'_id': ObjectId(user_id)},
             {'$set': update_data}
         )
+        principal_cache.invalidate(user_id)
         
         if result.modified_count == 0:
             return jsonify({
@@ -829,6 +812,9 @@ def block_user(user_id):
                 'message': 'Không thể thay đổi trạng thái người dùng'
             }), 400
         
+        if block:
+            revoke_user_tokens(user_id)
+        
         message = 'Chặn người dùng thành công' if block else 'Bỏ chặn người dùng thành công'
         
         return jsonify({
@@ -848,25 +834,20 @@ def block_user(user_id):
 @admin_bp.route('/services', methods=['GET', 'OPTIONS'])
 @admin_required
 def get_services():
-    """Get paginated list of services"""
+    """Get paginated list of services (page/limit, or cursor/limit/total as for /users)"""
     if request.method == 'OPTIONS':
         return '', 200
     
     try:
         db = get_db()
         
-        page = int(request.args.get('page', 1))
-        limit = int(request.args.get('limit', 20))
         provider_id = request.args.get('providerId', '')
         
         query = {}
         if provider_id:
             query['providerId'] = provider_id
         
-        total = db.services.count_documents(query)
-        skip = (page - 1) * limit
-        
-        services = list(db.services.find(query).skip(skip).limit(limit).sort('createdAt', -1))
+        services, pagination = paginate(db.services, query, 'created_at')
         
         services_data = []
         for service in services:
@@ -877,20 +858,20 @@ def get_services():
                 'category': service.get('category', ''),
                 'price': service.get('price', 0),
                 'status': service.get('status', 'active'),
-                'createdAt': service.get('createdAt').isoformat() if service.get('createdAt') else None
+                'createdAt': service.get('created_at').isoformat() if service.get('created_at') else None
             })
         
         return jsonify({
             'success': True,
             'services': services_data,
-            'pagination': {
-                'page': page,
-                'limit': limit,
-                'total': total,
-                'pages': (total + limit - 1) // limit
-            }
+            'pagination': pagination
         }), 200
         
+    except InvalidCursor:
+        return jsonify({
+            'success': False,
+            'message': INVALID_CURSOR_MESSAGE
+        }), 400
     except Exception as e:
         print(f"Error getting services: {e}")
         return jsonify({
@@ -902,25 +883,20 @@ def get_services():
 @admin_bp.route('/trips', methods=['GET', 'OPTIONS'])
 @admin_required
 def get_trips():
-    """Get paginated list of trips"""
+    """Get paginated list of trips (page/limit, or cursor/limit/total as for /users)"""
     if request.method == 'OPTIONS':
         return '', 200
     
     try:
         db = get_db()
         
-        page = int(request.args.get('page', 1))
-        limit = int(request.args.get('limit', 20))
         user_id = request.args.get('userId', '')
         
         query = {}
         if user_id:
             query['userId'] = user_id
         
-        total = db.trips.count_documents(query)
-        skip = (page - 1) * limit
-        
-        trips = list(db.trips.find(query).skip(skip).limit(limit).sort('createdAt', -1))
+        trips, pagination = paginate(db.trips, query, 'created_at')
         
         trips_data = []
         for trip in trips:
@@ -932,20 +908,20 @@ def get_trips():
                 'startDate': trip.get('startDate').isoformat() if trip.get('startDate') else None,
                 'endDate': trip.get('endDate').isoformat() if trip.get('endDate') else None,
                 'status': trip.get('status', 'planning'),
-                'createdAt': trip.get('createdAt').isoformat() if trip.get('createdAt') else None
+                'createdAt': trip.get('created_at').isoformat() if trip.get('created_at') else None
             })
         
         return jsonify({
             'success': True,
             'trips': trips_data,
-            'pagination': {
-                'page': page,
-                'limit': limit,
-                'total': total,
-                'pages': (total + limit - 1) // limit
-            }
+            'pagination': pagination
         }), 200
         
+    except InvalidCursor:
+        return jsonify({
+            'success': False,
+            'message': INVALID_CURSOR_MESSAGE
+        }), 400
     except Exception as e:
         print(f"Error getting trips: {e}")
         return jsonify({
@@ -957,6 +933,7 @@ def get_trips():
 # ==================== TRANSACTION ANALYTICS ====================
 @admin_bp.route('/transaction-stats', methods=['GET', 'OPTIONS'])
 @admin_required
+@cached_response('transaction_stats', defaults={'period': 'month'})
 def get_transaction_stats():
     """
     Get transaction statistics
@@ -969,7 +946,6 @@ def get_transaction_stats():
         return '', 200
     
     try:
-        db = get_db()
         period = request.args.get('period', 'month')
         start_date_str = request.args.get('startDate')
         end_date_str = request.args.get('endDate')
@@ -989,85 +965,11 @@ def get_transaction_stats():
             else:
                 start_date = end_date - timedelta(days=30)
         
-        # Query bookings in date range
-        bookings = list(db.bookings.find({
-            'booking_date': {
-                '$gte': start_date,
-                '$lte': end_date
-            }
-        }))
-        
-        # Calculate basic stats
-        total_transactions = len(bookings)
-        total_revenue = sum(b.get('total_amount', 0) for b in bookings)
-        avg_transaction_value = total_revenue / total_transactions if total_transactions > 0 else 0
-        
-        # Calculate success rate
-        completed_count = sum(1 for b in bookings if b.get('status') == 'confirmed')
-        success_rate = (completed_count / total_transactions * 100) if total_transactions > 0 else 0
-        
-        # Get top providers (via services)
-        provider_stats = {}
-        for booking in bookings:
-            service_id = booking.get('service_id')
-            if service_id:
-                service = db.services.find_one({'_id': service_id})
-                if service:
-                    provider_id = str(service.get('provider_id'))
-                    if provider_id not in provider_stats:
-                        provider = db.users.find_one({'_id': ObjectId(provider_id)})
-                        if provider:
-                            provider_stats[provider_id] = {
-                                'provider_id': provider_id,
-                                'provider_name': provider.get('fullName', 'Unknown'),
-                                'company_name': provider.get('companyName', ''),
-                                'transaction_count': 0,
-                                'total_revenue': 0
-                            }
-                    if provider_id in provider_stats:
-                        provider_stats[provider_id]['transaction_count'] += 1
-                        provider_stats[provider_id]['total_revenue'] += booking.get('total_amount', 0)
-        
-        top_providers = sorted(provider_stats.values(), key=lambda x: x['transaction_count'], reverse=True)[:10]
-        
-        # Get top users
-        user_stats = {}
-        for booking in bookings:
-            user_id = str(booking.get('user_id'))
-            if user_id not in user_stats:
-                user = db.users.find_one({'_id': ObjectId(user_id)})
-                if user:
-                    user_stats[user_id] = {
-                        'user_id': user_id,
-                        'user_name': user.get('fullName', 'Unknown'),
-                        'email': user.get('email', ''),
-                        'transaction_count': 0,
-                        'total_spent': 0
-                    }
-            if user_id in user_stats:
-                user_stats[user_id]['transaction_count'] += 1
-                user_stats[user_id]['total_spent'] += booking.get('total_amount', 0)
-        
-        top_users = sorted(user_stats.values(), key=lambda x: x['transaction_count'], reverse=True)[:10]
-        
-        # Transaction timeline (group by date)
-        timeline = {}
-        for booking in bookings:
-            date_str = booking.get('booking_date').strftime('%Y-%m-%d')
-            if date_str not in timeline:
-                timeline[date_str] = {'date': date_str, 'count': 0, 'revenue': 0}
-            timeline[date_str]['count'] += 1
-            timeline[date_str]['revenue'] += booking.get('total_amount', 0)
-        
-        timeline_data = sorted(timeline.values(), key=lambda x: x['date'])
-        
-        # Status distribution
-        status_stats = {
-            'pending': sum(1 for b in bookings if b.get('status') == 'pending'),
-            'confirmed': sum(1 for b in bookings if b.get('status') == 'confirmed'),
-            'cancelled': sum(1 for b in bookings if b.get('status') == 'cancelled'),
-            'completed': sum(1 for b in bookings if b.get('status') == 'completed'),
-        }
+        # Whole UTC days: totals, statuses and timeline from daily_rollups, top accounts from one aggregation
+        start_date = day_start(start_date)
+        until = day_start(end_date) + timedelta(days=1)
+        stats = DailyRollup.transaction_summary(start_date, until)
+        top_accounts = Booking.top_accounts(start_date, until)
         
         return jsonify({
             'success': True,
@@ -1077,15 +979,16 @@ def get_transaction_stats():
                 'end': end_date.isoformat()
             },
             'stats': {
-                'totalTransactions': total_transactions,
-                'totalRevenue': round(total_revenue, 2),
-                'averageTransactionValue': round(avg_transaction_value, 2),
-                'successRate': round(success_rate, 2),
-                'statusDistribution': status_stats
+                'totalTransactions': stats['totalTransactions'],
+                'totalRevenue': round(stats['totalRevenue'], 2),
+                'averageTransactionValue': round(stats['averageTransactionValue'], 2),
+                'successRate': round(stats['successRate'], 2),
+                'statusDistribution': stats['statusDistribution'],
+                'revenueByCurrency': stats['revenueByCurrency']
             },
-            'topProviders': top_providers,
-            'topUsers': top_users,
-            'timeline': timeline_data
+            'topProviders': top_accounts['topProviders'],
+            'topUsers': top_accounts['topUsers'],
+            'timeline': stats['timeline']
         }), 200
         
     except Exception as e:
@@ -1098,6 +1001,26 @@ def get_transaction_stats():
         }), 500
 
 
+def _transaction_parties(db, bookings):
+    """
+    Users, services and providers of a page of bookings, fetched with one
+    projected $in query each; returns dicts keyed by user_id, service_id and
+    str(provider_id)
+    """
+    user_ids = {booking['user_id'] for booking in bookings if booking.get('user_id')}
+    service_ids = {booking['service_id'] for booking in bookings if booking.get('service_id')}
+    users = {user['_id']: user for user in db.users.find(
+        {'_id': {'$in': list(user_ids)}}, {'fullName': 1, 'email': 1})} if user_ids else {}
+    services = {service['_id']: service for service in db.services.find(
+        {'_id': {'$in': list(service_ids)}}, {'name': 1, 'type': 1, 'provider_id': 1})} if service_ids else {}
+
+    provider_ids = {ObjectId(str(service['provider_id'])) for service in services.values()
+                    if service.get('provider_id') and ObjectId.is_valid(str(service['provider_id']))}
+    providers = {str(provider['_id']): provider for provider in db.users.find(
+        {'_id': {'$in': list(provider_ids)}}, {'fullName': 1, 'companyName': 1})} if provider_ids else {}
+    return users, services, providers
+
+
 @admin_bp.route('/transactions', methods=['GET', 'OPTIONS'])
 @admin_required
 def get_transactions():
@@ -1106,6 +1029,8 @@ def get_transactions():
     Query params:
     - page: page number (default: 1)
     - limit: items per page (default: 20)
+    - cursor: keyset pagination instead of page; empty for the first page, then pagination.nextCursor
+    - total: with cursor, 'exact' or 'none' (default: estimated or cached count)
     - status: filter by status
     - provider_id: filter by provider
     - user_id: filter by user
@@ -1117,8 +1042,6 @@ def get_transactions():
     
     try:
         db = get_db()
-        page = int(request.args.get('page', 1))
-        limit = int(request.args.get('limit', 20))
         status = request.args.get('status')
         provider_id = request.args.get('provider_id')
         user_id = request.args.get('user_id')
@@ -1139,53 +1062,41 @@ def get_transactions():
             end_date = datetime.strptime(end_date_str, '%Y-%m-%d').replace(hour=23, minute=59, second=59)
             query['booking_date'] = {'$gte': start_date, '$lte': end_date}
         
-        # Get total count
-        total = db.bookings.count_documents(query)
+        # Provider filter in the query, so pages are full and total is right
+        if provider_id:
+            query['service_id'] = {'$in': Service.ids_by_provider(provider_id)}
         
-        # Get bookings with pagination
-        bookings = list(db.bookings.find(query)
-                       .sort('booking_date', -1)
-                       .skip((page - 1) * limit)
-                       .limit(limit))
+        # Page-number or cursor page on (booking_date, _id)
+        bookings, pagination = paginate(db.bookings, query, 'booking_date', pages_key='totalPages')
         
-        # Enrich booking data with user, provider, service info
+        # Enrich booking data with user, provider, service info: one $in query per collection
+        users, services, providers = _transaction_parties(db, bookings)
         transactions = []
         for booking in bookings:
-            # Get user info
-            user = db.users.find_one({'_id': booking.get('user_id')})
+            user = users.get(booking.get('user_id'))
             user_data = {
                 'user_id': str(booking.get('user_id')),
                 'name': user.get('fullName', 'Unknown') if user else 'Unknown',
                 'email': user.get('email', '') if user else ''
             }
             
-            # Get service and provider info
-            service_id = booking.get('service_id')
             provider_data = {'provider_id': '', 'name': '', 'company_name': ''}
             service_data = {'service_id': '', 'name': '', 'type': ''}
             
-            if service_id:
-                service = db.services.find_one({'_id': service_id})
-                if service:
-                    service_data = {
-                        'service_id': str(service_id),
-                        'name': service.get('name', 'Unknown'),
-                        'type': service.get('type', '')
+            service = services.get(booking.get('service_id'))
+            if service:
+                service_data = {
+                    'service_id': str(service['_id']),
+                    'name': service.get('name', 'Unknown'),
+                    'type': service.get('type', '')
+                }
+                provider = providers.get(str(service.get('provider_id')))
+                if provider:
+                    provider_data = {
+                        'provider_id': str(service['provider_id']),
+                        'name': provider.get('fullName', 'Unknown'),
+                        'company_name': provider.get('companyName', '')
                     }
-                    
-                    provider_id = service.get('provider_id')
-                    if provider_id:
-                        provider = db.users.find_one({'_id': ObjectId(provider_id)})
-                        if provider:
-                            provider_data = {
-                                'provider_id': str(provider_id),
-                                'name': provider.get('fullName', 'Unknown'),
-                                'company_name': provider.get('companyName', '')
-                            }
-            
-            # Filter by provider if specified
-            if provider_id and provider_data.get('provider_id') != provider_id:
-                continue
             
             transaction = {
                 'transaction_id': f"TXN-{str(booking['_id'])[-8:]}",
@@ -1208,14 +1119,14 @@ def get_transactions():
         return jsonify({
             'success': True,
             'transactions': transactions,
-            'pagination': {
-                'page': page,
-                'limit': limit,
-                'total': total,
-                'totalPages': (total + limit - 1) // limit
-            }
+            'pagination': pagination
         }), 200
         
+    except InvalidCursor:
+        return jsonify({
+            'success': False,
+            'message': INVALID_CURSOR_MESSAGE
+        }), 400
     except Exception as e:
         print(f"Error getting transactions: {e}")
         import traceback
@@ -1345,4 +1256,194 @@ def get_transaction_detail(booking_id):
         return jsonify({
             'success': False,
             'message': 'Có lỗi xảy ra khi tải thông tin giao dịch'
-        }), 500
\ No newline at end of file
+        }), 500
+
+
+# ==================== QUERY PROFILING ====================
+@admin_bp.route('/query-profile', methods=['GET', 'DELETE', 'OPTIONS'])
+@admin_required
+def get_query_profile():
+    """
+    Get per-endpoint MongoDB command aggregates for this worker process
+    DELETE resets the aggregates
+    """
+    if request.method == 'OPTIONS':
+        return '', 200
+    
+    if request.method == 'DELETE':
+        profile_aggregates.reset()
+        return jsonify({
+            'success': True,
+            'message': 'Query profile reset'
+        }), 200
+    
+    return jsonify({
+        'success': True,
+        'endpoints': profile_aggregates.snapshot(),
+        'principalCache': principal_cache.stats(),
+        'rateLimits': rate_limiter.stats(),
+        'registeredEmails': registered_emails.stats(),
+        'loginActivityBuffer': login_activity_buffer.stats(),
+        'dailyRollups': DailyRollup.stats(),
+        'responseCache': response_cache.stats()
+    }), 200
+
+
+@admin_bp.route('/response-cache', methods=['DELETE', 'OPTIONS'])
+@admin_required
+def clear_response_cache():
+    """
+    Drop cached statistics responses, e.g. after rebuilding rollups
+    With RESPONSE_CACHE_STORAGE=memory the other workers drop theirs within
+    RESPONSE_CACHE_SYNC_SECONDS; allWorkers is false when only this worker was
+    cleared (generation counter unreachable)
+    Query params:
+    - name: one route cache (provider_stats, login_stats, registration_stats, transaction_stats); all by default
+    """
+    if request.method == 'OPTIONS':
+        return '', 200
+    
+    try:
+        all_workers = response_cache.clear(request.args.get('name'))
+        return jsonify({
+            'success': True,
+            'message': 'Response cache cleared' if all_workers else 'Response cache cleared on this worker only',
+            'allWorkers': all_workers,
+            'syncSeconds': response_cache.sync_seconds if response_cache.storage != 'mongo' else 0
+        }), 200
+    except Exception as e:
+        print(f"Error clearing response cache: {e}")
+        return jsonify({
+            'success': False,
+            'message': 'Có lỗi xảy ra khi xóa bộ nhớ đệm'
+        }), 500
+
+
+@admin_bp.route('/db-pool', methods=['GET', 'OPTIONS'])
+@admin_required
+def get_db_pool_metrics():
+    """Get connection pool checkout wait times, saturation and circuit breaker state for this worker"""
+    if request.method == 'OPTIONS':
+        return '', 200
+    
+    return jsonify({
+        'success': True,
+        'metrics': client_manager.metrics()
+    }), 200
+
+
+@admin_bp.route('/slow-queries', methods=['GET', 'OPTIONS'])
+@admin_required
+def get_slow_queries():
+    """
+    Get recent slow queries with their winning plan
+    Query params:
+    - route: filter by route (e.g. 'GET /api/admin/users')
+    - flagged: 'true' to only return COLLSCAN / in-memory SORT plans
+    - limit: max entries (default: 50)
+    """
+    if request.method == 'OPTIONS':
+        return '', 200
+    
+    try:
+        db = get_db()
+        route = request.args.get('route')
+        flagged = request.args.get('flagged', 'false').lower() == 'true'
+        limit = min(int(request.args.get('limit', 50)), 500)
+        
+        query = {}
+        if route:
+            query['route'] = route
+        if flagged:
+            query['$or'] = [{'collscan': True}, {'in_memory_sort': True}]
+        
+        # Capped collection: natural order is insertion order
+        entries = list(db.slow_queries.find(query, {'winning_plan': 0}).sort('$natural', -1).limit(limit))
+        for entry in entries:
+            entry['_id'] = str(entry['_id'])
+            entry['created_at'] = entry['created_at'].isoformat() if entry.get('created_at') else None
+        
+        return jsonify({
+            'success': True,
+            'slowQueries': entries
+        }), 200
+        
+    except Exception as e:
+        print(f"Error getting slow queries: {e}")
+        return jsonify({
+            'success': False,
+            'message': 'Có lỗi xảy ra khi tải danh sách truy vấn chậm'
+        }), 500
+
+
+@admin_bp.route('/email-outbox', methods=['GET', 'OPTIONS'])
+@admin_required
+def get_email_outbox():
+    """
+    Get email outbox counts by status and the most recent dead letters
+    Query params:
+    - limit: max dead letters (default: 20)
+    """
+    if request.method == 'OPTIONS':
+        return '', 200
+    
+    try:
+        db = get_db()
+        limit = min(int(request.args.get('limit', 20)), 200)
+        
+        dead = list(db.email_outbox.find(
+            {'status': 'dead'},
+            {'kind': 1, 'to': 1, 'attempts': 1, 'lastError': 1, 'createdAt': 1, 'deadAt': 1}
+        ).sort('deadAt', -1).limit(limit))
+        for message in dead:
+            message['_id'] = str(message['_id'])
+            message['createdAt'] = message['createdAt'].isoformat() if message.get('createdAt') else None
+            message['deadAt'] = message['deadAt'].isoformat() if message.get('deadAt') else None
+        
+        return jsonify({
+            'success': True,
+            'outbox': email_outbox.stats(),
+            'templates': email_service.templates.stats(),
+            'smtpPool': email_service.smtp_pool.stats() if email_service.smtp_pool is not None else None,
+            'deadLetters': dead
+        }), 200
+        
+    except Exception as e:
+        print(f"Error getting email outbox: {e}")
+        return jsonify({
+            'success': False,
+            'message': 'Có lỗi xảy ra khi tải hàng đợi email'
+        }), 500
+
+
+@admin_bp.route('/email-outbox/<message_id>/retry', methods=['POST', 'OPTIONS'])
+@admin_required
+def retry_email(message_id):
+    """Requeue a dead-lettered email"""
+    if request.method == 'OPTIONS':
+        return '', 200
+    
+    try:
+        if not ObjectId.is_valid(message_id):
+            return jsonify({
+                'success': False,
+                'message': 'ID email không hợp lệ'
+            }), 400
+        
+        if not email_outbox.requeue(message_id):
+            return jsonify({
+                'success': False,
+                'message': 'Không tìm thấy email bị lỗi với ID này'
+            }), 404
+        
+        return jsonify({
+            'success': True,
+            'message': 'Email đã được đưa lại vào hàng đợi'
+        }), 200
+        
+    except Exception as e:
+        print(f"Error retrying email: {e}")
+        return jsonify({
+            'success': False,
+            'message': 'Có lỗi xảy ra khi gửi lại email'
+        }), 500
@@ -1,9 +1,9 @@
 from flask import request, jsonify
 from flask_restful import Resource
 from flask_cors import cross_origin
-from app.utils.jwt_auth import generate_token, token_required
+from app.utils.jwt_auth import issue_tokens, token_required, get_current_user
 from app.models.user import User
-from app.services.email_service import email_service
+from app.services.email_service import send_verification_link_email
 from app.utils.recaptcha import RecaptchaVerifier
 from email_validator import validate_email, EmailNotValidError
 import secrets
@@ -59,12 +59,12 @@ class LoginResource(Resource):
             #     }, 401
             
             # Generate JWT token with remember_me setting
-            token = generate_token(user._id, remember_me)
+            tokens = issue_tokens(user, remember_me)
             
             return {
                 'success': True,
                 'data': {
-                    'token': token,
+                    **tokens,
                     'user': {
                         'id': str(user._id),
                         'email': user.email,
@@ -212,7 +212,7 @@ class RegisterResource(Resource):
             user.save()
             
             # Send verification email
-            email_sent = email_service.send_verification_email(
+            email_sent = send_verification_link_email(
                 user.email, 
                 verification_token, 
                 user.name
@@ -358,7 +358,7 @@ class AuthResource(Resource):
     def get(self):
         """Get current user profile"""
         try:
-            user = request.current_user
+            user = get_current_user()
             
             return {
                 'success': True,
@@ -530,21 +530,18 @@ class ResendVerificationResource(Resource):
                     'message': 'User not found'
                 }, 404
             
-            # Check rate limiting
-            can_send, message = user.can_send_verification_email()
-            if not can_send:
+            if user.is_verified:
                 return {
                     'success': False,
-                    'message': message
-                }, 429
+                    'message': 'Email đã được xác thực'
+                }, 400
             
             # Generate new verification token
             verification_token = user.generate_verification_token()
-            user.mark_verification_sent()
             user.save()
             
             # Send verification email
-            email_sent = email_service.send_verification_email(
+            email_sent = send_verification_link_email(
                 user.email, 
                 verification_token, 
                 user.name
@@ -561,7 +558,6 @@ class ResendVerificationResource(Resource):
                 'message': f'Email xác thực đã được gửi đến {user.email}',
                 'data': {
                     'email': user.email,
-                    'sent_count': user.verification_sent_count,
                     'can_resend_in': 60  # seconds
                 }
             }, 200
@@ -1,8 +1,12 @@
 from flask import Blueprint, request, jsonify
 from flask_cors import cross_origin
-from app.utils.jwt_auth import generate_token, decode_token
+from app.utils.jwt_auth import issue_tokens, decode_token, decode_claims, revoke_user_tokens
+from app.utils.database import get_db
+from bson import ObjectId
 from app.models.user import User
-from app.services.email_service import email_service
+from app.utils.password_hashing import hashing_admission
+from app.utils.rate_limit import rate_limited
+from app.services.email_service import send_verification_link_email, send_password_reset_email
 from app.utils.recaptcha import RecaptchaVerifier
 from email_validator import validate_email, EmailNotValidError
 import secrets
@@ -14,6 +18,8 @@ ALLOWED_ORIGINS = ['http://localhost', 'http://localhost:3000', 'http://localhos
 
 @auth_bp.route('/login', methods=['POST', 'OPTIONS'])
 @cross_origin(origins=ALLOWED_ORIGINS, supports_credentials=True)
+@rate_limited('login')
+@hashing_admission
 def login():
     """User login with email/username and password"""
     if request.method == 'OPTIONS':
@@ -54,7 +60,7 @@ def login():
             }), 401
         
         # Generate token
-        token = generate_token(user._id, remember_me)
+        tokens = issue_tokens(user, remember_me)
         
         # Track login activity for analytics
         from app.models.login_activity import LoginActivity
@@ -66,7 +72,7 @@ def login():
         return jsonify({
             'success': True,
             'data': {
-                'token': token,
+                **tokens,
                 'user': {
                     'id': str(user._id),
                     'email': user.email,
@@ -90,14 +96,14 @@ def login():
 
 @auth_bp.route('/simple-login', methods=['POST', 'OPTIONS'])
 @cross_origin(origins=ALLOWED_ORIGINS, supports_credentials=True)
+@rate_limited('login')
+@hashing_admission
 def simple_login():
     """Simplified login without reCAPTCHA verification"""
     if request.method == 'OPTIONS':
         return jsonify({}), 200
         
     try:
-        from werkzeug.security import check_password_hash
-        
         data = request.get_json()
         
         if not data or not data.get('login') or not data.get('password'):
@@ -127,7 +133,7 @@ def simple_login():
             }), 401
         
         # Generate token
-        token = generate_token(user._id, remember_me)
+        tokens = issue_tokens(user, remember_me)
         
         # Track login activity
         from app.models.login_activity import LoginActivity
@@ -149,7 +155,7 @@ def simple_login():
             'success': True,
             'message': 'Đăng nhập thành công!',
             'data': {
-                'token': token,
+                **tokens,
                 'user': user_data,
                 'remember_me': remember_me
             }
@@ -162,8 +168,51 @@ def simple_login():
         }), 500
 
 
+@auth_bp.route('/refresh', methods=['POST', 'OPTIONS'])
+@cross_origin(origins=ALLOWED_ORIGINS, supports_credentials=True)
+def refresh_token():
+    """Exchange a refresh token for a new access token (JWT_REFRESH_TOKENS mode)"""
+    if request.method == 'OPTIONS':
+        return jsonify({}), 200
+    
+    try:
+        data = request.get_json() or {}
+        payload = decode_claims(data.get('refresh_token', ''), token_type='refresh')
+        if not payload:
+            return jsonify({
+                'success': False,
+                'message': 'Refresh token không hợp lệ hoặc đã hết hạn'
+            }), 401
+        
+        # The only place a token is checked against the database: current role/status and token version
+        db = get_db()
+        user = db.users.find_one(
+            {'_id': ObjectId(payload['user_id'])},
+            {'email': 1, 'role': 1, 'status': 1, 'accountStatus': 1, 'tokenVersion': 1}
+        )
+        if not user or user.get('tokenVersion', 0) != payload.get('tv', 0) or user.get('status') in ('blocked', 'deleted'):
+            return jsonify({
+                'success': False,
+                'message': 'Phiên đăng nhập đã bị thu hồi, vui lòng đăng nhập lại'
+            }), 401
+        
+        return jsonify({
+            'success': True,
+            'data': issue_tokens(user, payload.get('remember_me', False))
+        }), 200
+        
+    except Exception as e:
+        print(f"Refresh token error: {e}")
+        return jsonify({
+            'success': False,
+            'message': 'Có lỗi xảy ra khi làm mới phiên đăng nhập'
+        }), 500
+
+
 @auth_bp.route('/register', methods=['POST', 'OPTIONS'])
 @cross_origin(origins=ALLOWED_ORIGINS, supports_credentials=True)
+@rate_limited('register')
+@hashing_admission
 def register():
     """User registration"""
     if request.method == 'OPTIONS':
@@ -231,9 +280,8 @@ def register():
         user.verification_token_expiry = datetime.utcnow() + timedelta(hours=24)
         user.save()
         
-        # Send verification email
-        verification_link = f"{request.host_url}api/auth/verify-email?token={verification_token}"
-        email_service.send_verification_email(email, name, verification_link)
+        # Queue verification email
+        send_verification_link_email(email, verification_token, name)
         
         return jsonify({
             'success': True,
@@ -308,6 +356,7 @@ def get_profile():
 
 @auth_bp.route('/forgot-password', methods=['POST', 'OPTIONS'])
 @cross_origin(origins=ALLOWED_ORIGINS, supports_credentials=True)
+@rate_limited('password_reset')
 def forgot_password():
     """Request password reset"""
     if request.method == 'OPTIONS':
@@ -337,8 +386,8 @@ def forgot_password():
         user.reset_token_expiry = datetime.utcnow() + timedelta(hours=1)
         user.save()
         
-        # Send reset email
-        email_service.send_password_reset_email(user.email, reset_token)
+        # Queue reset email
+        send_password_reset_email(user.email, reset_token, user.name)
         
         return jsonify({
             'success': True,
@@ -354,6 +403,7 @@ def forgot_password():
 
 @auth_bp.route('/reset-password', methods=['POST', 'OPTIONS'])
 @cross_origin(origins=ALLOWED_ORIGINS, supports_credentials=True)
+@hashing_admission
 def reset_password():
     """Reset password with token"""
     if request.method == 'OPTIONS':
@@ -385,6 +435,9 @@ def reset_password():
         user.reset_token_expiry = None
         user.save()
         
+        # Sign out every existing session
+        revoke_user_tokens(user._id)
+        
         return jsonify({
             'success': True,
             'message': 'Password has been reset successfully'
@@ -423,6 +476,7 @@ def get_recaptcha_config():
 
 @auth_bp.route('/send-verification', methods=['POST', 'OPTIONS'])
 @cross_origin(origins=ALLOWED_ORIGINS, supports_credentials=True)
+@rate_limited('send_verification')
 def send_verification():
     """Send verification email to user"""
     if request.method == 'OPTIONS':
@@ -460,22 +514,12 @@ def send_verification():
                 'message': 'Email đã được xác thực'
             }), 400
         
-        # Check rate limiting
-        can_send, message = user.can_send_verification_email()
-        if not can_send:
-            return jsonify({
-                'success': False,
-                'message': message
-            }), 429
-        
-        # Generate new verification token
+        # Generate new verification token (sending is rate limited by @rate_limited)
         verification_token = user.generate_verification_token()
-        user.mark_verification_sent()
         
         # Debug logging
         print(f"🔑 Generated token: {verification_token[:40]}...")
         print(f"⏰ Token expires (timestamp): {user.verification_token_expires}")
-        print(f"📊 Sent count: {user.verification_sent_count}")
         print(f"🆔 User ID: {user._id if hasattr(user, '_id') else 'NO _id!'}")
         print(f"📧 User email: {user.email}")
         
@@ -491,8 +535,8 @@ def send_verification():
         else:
             print(f"❌ ERROR: User not found in DB after save!")
         
-        # Send verification email
-        email_sent = email_service.send_verification_email(
+        # Queue verification email
+        email_sent = send_verification_link_email(
             user.email, 
             verification_token, 
             user.name
@@ -509,7 +553,6 @@ def send_verification():
             'message': f'Email xác thực đã được gửi đến {user.email}',
             'data': {
                 'email': user.email,
-                'sent_count': user.verification_sent_count,
                 'can_resend_in': 60
             }
         }), 200
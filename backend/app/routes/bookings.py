@@ -3,6 +3,7 @@ from datetime import datetime
 from bson import ObjectId
 import re
 from app.utils.database import get_db
+from app.models.daily_rollup import DailyRollup
 from app.utils.jwt_auth import token_required
 
 bookings_bp = Blueprint('bookings', __name__)
@@ -169,6 +170,7 @@ def create_booking():
         
         # Insert into database
         result = db.bookings.insert_one(booking)
+        DailyRollup.record_booking(booking)
         
         # Return booking confirmation
         booking['_id'] = str(result.inserted_id)
@@ -7,6 +7,7 @@ from bson import ObjectId
 from datetime import datetime
 
 from app.utils.jwt_auth import token_required, decode_token
+from app.utils.principal_cache import principal_cache
 from app.utils.database import get_db
 
 profile_bp = Blueprint('profile', __name__)
@@ -142,6 +143,7 @@ def update_profile():
             {'_id': ObjectId(user_id)},
             {'$set': update_data}
         )
+        principal_cache.invalidate(user_id)
         
         if result.matched_count == 0:
             return jsonify({
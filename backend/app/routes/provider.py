@@ -2,11 +2,7 @@ from flask import Blueprint, request, jsonify, current_app
 from app.models.user import User
 from app.models.service import Service
 from app.models.booking import Booking
-from app.utils.jwt_auth import token_required
-
-def get_current_user():
-    """Get current user from request context"""
-    return getattr(request, 'current_user', None)
+from app.utils.jwt_auth import token_required, get_current_user
 from bson import ObjectId
 from datetime import datetime, timedelta
 import re
@@ -289,15 +285,13 @@ def create_service():
 def get_provider_services():
     """Get all services for the current provider"""
     try:
-        current_user = get_current_user()
-        if not current_user:
-            return jsonify({'error': 'User not found'}), 404
-            
-        if not current_user.is_provider():
+        # Role comes from the token/principal; the full user document is not needed here
+        if request.principal.get('role') != 'provider':
             return jsonify({'error': 'User is not a provider'}), 403
+        provider_id = request.principal['_id']
         
         # Get services for this provider
-        services = Service.find_by_provider(current_user._id)
+        services = Service.find_by_provider(provider_id)
         
         return jsonify({
             'services': [service.to_dict() for service in services]
@@ -312,15 +306,13 @@ def get_provider_services():
 def get_provider_bookings():
     """Get all bookings for provider's services"""
     try:
-        current_user = get_current_user()
-        if not current_user:
-            return jsonify({'error': 'User not found'}), 404
-            
-        if not current_user.is_provider():
+        # Role comes from the token/principal; the full user document is not needed here
+        if request.principal.get('role') != 'provider':
             return jsonify({'error': 'User is not a provider'}), 403
+        provider_id = request.principal['_id']
         
         # Get bookings for this provider's services
-        bookings = Booking.find_by_provider(current_user._id)
+        bookings = Booking.find_by_provider(provider_id)
         
         return jsonify({
             'bookings': [booking.to_dict() for booking in bookings]
@@ -335,12 +327,10 @@ def get_provider_bookings():
 def update_booking_status(booking_id):
     """Update booking status"""
     try:
-        current_user = get_current_user()
-        if not current_user:
-            return jsonify({'error': 'User not found'}), 404
-            
-        if not current_user.is_provider():
+        # Role comes from the token/principal; the full user document is not needed here
+        if request.principal.get('role') != 'provider':
             return jsonify({'error': 'User is not a provider'}), 403
+        provider_id = request.principal['_id']
         
         data = request.get_json()
         new_status = data.get('status')
@@ -360,7 +350,7 @@ def update_booking_status(booking_id):
         
         # Verify the service belongs to this provider
         service = Service.find_by_id(booking.service_id)
-        if not service or service.provider_id != current_user._id:
+        if not service or service.provider_id != provider_id:
             return jsonify({'error': 'Unauthorized'}), 403
         
         # Update booking status
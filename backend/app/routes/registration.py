@@ -1,13 +1,18 @@
 from flask import Blueprint, request, jsonify
 from flask_cors import cross_origin
-from werkzeug.security import generate_password_hash, check_password_hash
 from app.utils.database import get_db
-from app.utils.jwt_auth import generate_token
-from app.services.email_service import send_verification_email
+from app.utils.jwt_auth import issue_tokens
+from app.models.user import User
+from app.models.daily_rollup import DailyRollup
+from app.utils.password_hashing import hash_password, hashing_admission
+from app.utils.rate_limit import rate_limited
+from app.utils.email_bloom import registered_emails
+from app.services.email_service import send_verification_email, send_verification_link_email
 import random
 import string
 from datetime import datetime, timedelta
 from bson import ObjectId
+from pymongo import ReturnDocument
 import re
 
 registration_bp = Blueprint('registration', __name__, url_prefix='/api/registration')
@@ -37,6 +42,8 @@ def validate_phone(phone):
 
 @registration_bp.route('/register', methods=['POST', 'OPTIONS'])
 @cross_origin(origins=ALLOWED_ORIGINS)
+@rate_limited('register')
+@hashing_admission
 def register_user():
     try:
         data = request.get_json()
@@ -109,7 +116,7 @@ def register_user():
             'name': data['fullName'],
             'fullName': data['fullName'],  # Add fullName field for consistency
             'username': data['fullName'].replace(' ', '').lower(),
-            'password_hash': generate_password_hash(data['password']),
+            'password_hash': hash_password(data['password']),
             'phone': data['phone'],
             'picture': '',
             'address': '',
@@ -141,29 +148,31 @@ def register_user():
             # accountStatus: 'pending' -> waiting for admin approval
             # status: 'active' -> account is not blocked
 
+        user_doc.update(User.normalized_fields(user_doc['email'], user_doc['username']))
+        
         # Insert user
         result = db.users.insert_one(user_doc)
         user_id = str(result.inserted_id)
+        registered_emails.add(user_doc['email'])
+        DailyRollup.record_registration(user_doc)
 
         # Send verification email for provider
         if user_type == 'provider':
-            from app.models.user import User
             user_obj = User.find_by_id(user_id)
             if user_obj:
                 verification_token = user_obj.generate_verification_token()
                 user_obj.save()
                 
-                # Send verification email
-                from app.services.email_service import email_service
-                email_service.send_verification_email(
+                # Queue verification email
+                send_verification_link_email(
                     email,
                     verification_token,
                     data['fullName']
                 )
-                print(f"✅ Verification email sent to provider: {email}")
+                print(f"✅ Verification email queued for provider: {email}")
 
         # Generate JWT token cho user mới
-        token = generate_token(user_id)
+        tokens = issue_tokens(user_doc)
         
         # Tạo user object để trả về
         user_data = {
@@ -177,7 +186,7 @@ def register_user():
         return jsonify({
             'success': True,
             'message': 'Đăng ký thành công!' + (' Email xác thực đã được gửi.' if user_type == 'provider' else ''),
-            'token': token,
+            **tokens,
             'user': user_data
         }), 201
 
@@ -190,6 +199,8 @@ def register_user():
 
 @registration_bp.route('/login', methods=['POST', 'OPTIONS'])
 @cross_origin(origins=ALLOWED_ORIGINS)
+@rate_limited('login')
+@hashing_admission
 def simple_login():
     """Simple login without reCAPTCHA for development"""
     try:
@@ -205,16 +216,8 @@ def simple_login():
         password = data['password']
         remember_me = data.get('remember_me', False)
         
-        # Get database
-        db = get_db()
-        
-        # Find user by email or username
-        user_data = db.users.find_one({
-            '$or': [
-                {'email': login_identifier},
-                {'username': login_identifier}
-            ]
-        })
+        # Find user by email or username (shared indexed lookup)
+        user_data = User.find_login_document(login_identifier)
         
         if not user_data:
             return jsonify({
@@ -222,9 +225,8 @@ def simple_login():
                 'message': 'Email hoặc mật khẩu không đúng'
             }), 401
         
-        # Check password
-        password_hash = user_data.get('password_hash')
-        if not password_hash or not check_password_hash(password_hash, password):
+        # Check password (legacy hashes are upgraded on success)
+        if not User.verify_login_password(user_data, password):
             return jsonify({
                 'success': False,
                 'message': 'Email hoặc mật khẩu không đúng'
@@ -232,7 +234,7 @@ def simple_login():
         
         # Generate JWT token
         user_id = str(user_data['_id'])
-        token = generate_token(user_id, remember_me)
+        tokens = issue_tokens(user_data, remember_me)
         
         # Prepare user data to return
         user_response = {
@@ -252,7 +254,7 @@ def simple_login():
             'success': True,
             'message': 'Đăng nhập thành công',
             'data': {
-                'token': token,
+                **tokens,
                 'user': user_response,
                 'remember_me': remember_me
             }
@@ -281,14 +283,19 @@ def verify_email():
         code = data['code'].strip()
 
         db = get_db()
+        now = datetime.utcnow()
         
-        # Find verification record
-        verification = db.email_verifications.find_one({
-            'email': email,
-            'code': code,
-            'isUsed': False,
-            'expiresAt': {'$gt': datetime.utcnow()}
-        })
+        # Consume the code atomically: of two concurrent requests with the same code only one gets it
+        verification = db.email_verifications.find_one_and_update(
+            {
+                'email': email,
+                'code': code,
+                'isUsed': False,
+                'expiresAt': {'$gt': now}
+            },
+            {'$set': {'isUsed': True, 'usedAt': now}, '$inc': {'attempts': 1}},
+            projection={'_id': 1}
+        )
 
         if not verification:
             # Check if code is expired or invalid
@@ -296,7 +303,7 @@ def verify_email():
                 'email': email,
                 'code': code,
                 'isUsed': False
-            })
+            }, projection={'_id': 1})
             
             if expired_verification:
                 return jsonify({
@@ -309,38 +316,25 @@ def verify_email():
                     'message': 'Mã xác thực không đúng'
                 }), 400
 
-        # Update attempts
-        db.email_verifications.update_one(
-            {'_id': verification['_id']},
-            {'$inc': {'attempts': 1}}
+        # Mark email as verified
+        user = db.users.find_one_and_update(
+            {'email': email},
+            {
+                '$set': {
+                    'is_verified': True,
+                    'updatedAt': now
+                }
+            },
+            return_document=ReturnDocument.AFTER
         )
-
-        # Find user
-        user = db.users.find_one({'email': email})
         if not user:
             return jsonify({
                 'success': False,
                 'message': 'Không tìm thấy người dùng'
             }), 404
 
-        # Mark email as verified and verification as used
-        db.users.update_one(
-            {'_id': user['_id']},
-            {
-                '$set': {
-                    'is_verified': True,
-                    'updatedAt': datetime.utcnow()
-                }
-            }
-        )
-        
-        db.email_verifications.update_one(
-            {'_id': verification['_id']},
-            {'$set': {'isUsed': True}}
-        )
-
         # Generate JWT token
-        token = generate_token(str(user['_id']))
+        tokens = issue_tokens(user)
 
         # Prepare user data for response
         user_data = {
@@ -354,7 +348,7 @@ def verify_email():
         return jsonify({
             'success': True,
             'message': 'Xác thực email thành công!',
-            'token': token,
+            **tokens,
             'user': user_data
         }), 200
 
@@ -367,6 +361,7 @@ def verify_email():
 
 @registration_bp.route('/resend-verification', methods=['POST', 'OPTIONS'])
 @cross_origin(origins=ALLOWED_ORIGINS)
+@rate_limited('verification')
 def resend_verification():
     try:
         data = request.get_json()
@@ -395,18 +390,6 @@ def resend_verification():
                 'message': 'Email đã được xác thực'
             }), 400
 
-        # Check rate limiting (max 3 attempts in 10 minutes)
-        recent_attempts = db.email_verifications.count_documents({
-            'email': email,
-            'createdAt': {'$gt': datetime.utcnow() - timedelta(minutes=10)}
-        })
-        
-        if recent_attempts >= 3:
-            return jsonify({
-                'success': False,
-                'message': 'Bạn đã yêu cầu quá nhiều lần. Vui lòng thử lại sau 10 phút.'
-            }), 429
-
         # Generate new verification code
         verification_code = generate_verification_code()
         verification_doc = {
@@ -443,10 +426,10 @@ def resend_verification():
 
 @registration_bp.route('/check-email', methods=['GET', 'OPTIONS'])
 @cross_origin(origins=ALLOWED_ORIGINS)
+@rate_limited('check_email')
 def check_email_availability():
     try:
         email = request.args.get('email')
-        print(f"Checking email availability for: {email}")  # Debug log
         
         if not email:
             return jsonify({
@@ -463,16 +446,9 @@ def check_email_availability():
                 'message': 'Email không hợp lệ'
             }), 200
 
-        db = get_db()
-        
-        # Check if email exists
-        existing_user = db.users.find_one({'email': email})
-        is_available = existing_user is None
-        
-        print(f"Email {email} availability: {is_available}")  # Debug log
-        
+        # Most free emails are answered by the Bloom filter without a query
         return jsonify({
-            'available': is_available
+            'available': not registered_emails.is_registered(email)
         }), 200
 
     except Exception as e:
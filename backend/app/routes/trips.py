@@ -3,7 +3,6 @@ from flask_restful import Resource
 from datetime import datetime
 from app.utils.jwt_auth import token_required
 from app.models.trip import Trip
-from app.models.user import User
 
 class TripsResource(Resource):
     @token_required
@@ -13,16 +12,8 @@ class TripsResource(Resource):
             # Get user ID from JWT token
             user_id = request.current_user_id
             
-            # Find user in database
-            user = User.find_by_id(user_id)
-            if not user:
-                return {
-                    'success': False,
-                    'message': 'User not found'
-                }, 404
-            
             # Get user's trips
-            trips = Trip.find_by_user(str(user._id))
+            trips = Trip.find_by_user(user_id)
             
             # Convert trips to dict format
             trips_data = []
@@ -53,14 +44,6 @@ class TripsResource(Resource):
             # Get user ID from JWT token
             user_id = request.current_user_id
             
-            # Find user in database
-            user = User.find_by_id(user_id)
-            if not user:
-                return {
-                    'success': False,
-                    'message': 'User not found'
-                }, 404
-            
             # Get trip data from request
             data = request.get_json()
             
@@ -80,7 +63,7 @@ class TripsResource(Resource):
                 destination=data['destination'],
                 start_date=data['start_date'],
                 end_date=data['end_date'],
-                user_id=str(user._id),
+                user_id=user_id,
                 budget=data.get('budget')
             )
             
@@ -114,14 +97,6 @@ class TripResource(Resource):
             # Get user ID from JWT token
             user_id = request.current_user_id
             
-            # Find user in database
-            user = User.find_by_id(user_id)
-            if not user:
-                return {
-                    'success': False,
-                    'message': 'User not found'
-                }, 404
-            
             # Find trip
             trip = Trip.find_by_id(trip_id)
             if not trip:
@@ -131,7 +106,7 @@ class TripResource(Resource):
                 }, 404
             
             # Check if trip belongs to user
-            if trip.user_id != str(user._id):
+            if trip.user_id != user_id:
                 return {
                     'success': False,
                     'message': 'Unauthorized'
@@ -163,14 +138,6 @@ class TripResource(Resource):
             # Get user ID from JWT token
             user_id = request.current_user_id
             
-            # Find user in database
-            user = User.find_by_id(user_id)
-            if not user:
-                return {
-                    'success': False,
-                    'message': 'User not found'
-                }, 404
-            
             # Find trip
             trip = Trip.find_by_id(trip_id)
             if not trip:
@@ -180,7 +147,7 @@ class TripResource(Resource):
                 }, 404
             
             # Check if trip belongs to user
-            if trip.user_id != str(user._id):
+            if trip.user_id != user_id:
                 return {
                     'success': False,
                     'message': 'Unauthorized'
@@ -232,14 +199,6 @@ class TripResource(Resource):
             # Get user ID from JWT token
             user_id = request.current_user_id
             
-            # Find user in database
-            user = User.find_by_id(user_id)
-            if not user:
-                return {
-                    'success': False,
-                    'message': 'User not found'
-                }, 404
-            
             # Find trip
             trip = Trip.find_by_id(trip_id)
             if not trip:
@@ -249,7 +208,7 @@ class TripResource(Resource):
                 }, 404
             
             # Check if trip belongs to user
-            if trip.user_id != str(user._id):
+            if trip.user_id != user_id:
                 return {
                     'success': False,
                     'message': 'Unauthorized'
@@ -1,6 +1,6 @@
 from flask import request, jsonify
 from flask_restful import Resource
-from app.utils.jwt_auth import token_required
+from app.utils.jwt_auth import token_required, get_current_user
 from app.models.user import User
 
 class UserResource(Resource):
@@ -12,7 +12,7 @@ class UserResource(Resource):
             user_id = request.current_user_id
             
             # Find user in database
-            user = User.find_by_id(user_id)
+            user = get_current_user()
             
             if not user:
                 return {
@@ -47,7 +47,7 @@ class UserResource(Resource):
             user_id = request.current_user_id
             
             # Find user in database
-            user = User.find_by_id(user_id)
+            user = get_current_user()
             
             if not user:
                 return {
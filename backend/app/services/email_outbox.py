@@ -0,0 +1,293 @@
+"""
+Email Outbox - queue emails in MongoDB and deliver them from background workers
+
+Request handlers call enqueue(), which is a single insert into the
+email_outbox collection, so a slow or failing email provider never holds up
+a request. Delivery threads lease due messages with one update_many per
+batch, send them through EmailService.deliver() and then:
+
+    sent     delivered; removed by a TTL index after EMAIL_OUTBOX_RETENTION_DAYS
+    pending  failed with a temporary error; retried with exponential backoff
+    dead     permanent error or EMAIL_OUTBOX_MAX_ATTEMPTS reached (also when
+             the lease of the last attempt ran out); kept for inspection and
+             requeued from POST /api/admin/email-outbox/<id>/retry
+
+A delivery thread leases the next due message together with up to
+EMAIL_OUTBOX_BATCH_SIZE - 1 more due messages of the same kind and locale and
+sends them together with EmailService.deliver_many() (one Brevo request for
+many recipients); each message still gets its own outcome.
+
+A claimed message carries a lease. If the process dies while sending, the
+message is claimed again once the lease runs out; its idempotency key is
+passed to Brevo so the repeated send is dropped there (for a batch, when it
+is claimed again with the same messages). Enqueuing the same
+idempotency key twice queues the email once.
+
+Delivery threads start in the process that first enqueues (EMAIL_OUTBOX_WORKERS
+per process, 0 to only enqueue) or in a dedicated process: python email_worker.py
+"""
+import os
+import random
+import socket
+import threading
+from datetime import datetime, timedelta
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError, PyMongoError
+from app.utils.database import get_db, DatabaseUnavailable
+
+# Indexes are declared in app/utils/indexes.py
+COLLECTION = 'email_outbox'
+
+
+class EmailOutbox:
+    """MongoDB-backed queue of emails with a pool of delivery threads"""
+
+    def __init__(self):
+        self.enabled = os.getenv('EMAIL_OUTBOX_ENABLED', 'true').lower() == 'true'
+        self.workers = int(os.getenv('EMAIL_OUTBOX_WORKERS', 2))
+        self.max_attempts = int(os.getenv('EMAIL_OUTBOX_MAX_ATTEMPTS', 8))
+        self.base_delay = float(os.getenv('EMAIL_OUTBOX_BACKOFF_SECONDS', 5))
+        self.max_delay = float(os.getenv('EMAIL_OUTBOX_MAX_BACKOFF_SECONDS', 3600))
+        self.lease = float(os.getenv('EMAIL_OUTBOX_LEASE_SECONDS', 60))
+        self.batch_size = int(os.getenv('EMAIL_OUTBOX_BATCH_SIZE', 50))
+        self.poll_interval = float(os.getenv('EMAIL_OUTBOX_POLL_SECONDS', 2))
+        self.retention = timedelta(days=float(os.getenv('EMAIL_OUTBOX_RETENTION_DAYS', 7)))
+        self._reset()
+
+    def _reset(self):
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._threads = []
+        self.counters = {'enqueued': 0, 'duplicates': 0, 'sent': 0, 'retried': 0, 'dead': 0}
+
+    def _count(self, counter):
+        with self._lock:
+            self.counters[counter] += 1
+
+    def enqueue(self, kind, to_email, params, idempotency_key=None, locale=None):
+        """Queue one email; True once it is stored (or was already queued under the same key)"""
+        if not self.enabled:
+            from app.services.email_service import email_service
+            return email_service._send_now(kind, to_email, params, locale)
+
+        now = datetime.utcnow()
+        message_id = ObjectId()
+        try:
+            get_db()[COLLECTION].insert_one({
+                '_id': message_id,
+                'kind': kind,
+                'to': to_email,
+                'params': params,
+                'locale': locale,
+                'idempotencyKey': idempotency_key or str(message_id),
+                'status': 'pending',
+                'attempts': 0,
+                'nextAttemptAt': now,
+                'createdAt': now
+            })
+        except DuplicateKeyError:
+            self._count('duplicates')
+            return True
+
+        self._count('enqueued')
+        self.start()
+        self._wake.set()
+        return True
+
+    # Delivery
+
+    def start(self, workers=None):
+        """Start the delivery threads of this process once"""
+        workers = self.workers if workers is None else workers
+        if self._threads or workers <= 0:
+            return
+        with self._lock:
+            if self._threads:
+                return
+            prefix = f"{socket.gethostname()}:{os.getpid()}"
+            for number in range(workers):
+                thread = threading.Thread(target=self._run, args=(f"{prefix}:{number}",), name=f'email-outbox-{number}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _run(self, worker_name):
+        while not self._stopping.is_set():
+            try:
+                messages = self.claim_batch(worker_name)
+            except (PyMongoError, DatabaseUnavailable) as e:
+                print(f"⚠️  Email outbox unavailable: {e}")
+                self._stopping.wait(self.poll_interval)
+                continue
+
+            if not messages:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+                continue
+
+            try:
+                self.deliver_batch(messages)
+            except Exception as e:
+                # Leave the messages to be claimed again when their lease runs out
+                print(f"❌ Email outbox worker {worker_name} failed on {messages[0]['_id']} (+{len(messages) - 1}): {e}")
+
+    def _due(self, now):
+        # A 'sending' message whose lease ran out belongs to a worker that died
+        return {'status': {'$in': ['pending', 'sending']}, 'nextAttemptAt': {'$lte': now}, 'attempts': {'$lt': self.max_attempts}}
+
+    def _leased(self, worker_name, now):
+        return {'status': 'sending', 'worker': worker_name, 'lease': ObjectId(), 'nextAttemptAt': now + timedelta(seconds=self.lease)}
+
+    def claim(self, worker_name, **match):
+        """Lease the next due message (matching match, e.g. kind=...) to this worker; None when nothing is due"""
+        now = datetime.utcnow()
+        return get_db()[COLLECTION].find_one_and_update(
+            {**self._due(now), **match},
+            {'$set': self._leased(worker_name, now), '$inc': {'attempts': 1}},
+            sort=[('nextAttemptAt', 1)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    def claim_batch(self, worker_name):
+        """
+        Lease the next due message and up to batch_size - 1 more of the same
+        kind and locale in one update_many, under a lease token the batch is
+        then read back by; messages another worker leased in between are left out
+        """
+        self.dead_letter_abandoned()
+        collection = get_db()[COLLECTION]
+        while True:
+            now = datetime.utcnow()
+            due = self._due(now)
+            first = collection.find_one(due, {'kind': 1, 'locale': 1}, sort=[('nextAttemptAt', 1)])
+            if first is None:
+                return []
+            due.update(kind=first['kind'], locale=first.get('locale'))
+            ids = [message['_id'] for message in collection.find(due, {'_id': 1}).sort('nextAttemptAt', 1).limit(self.batch_size)]
+            leased = self._leased(worker_name, now)
+            collection.update_many({**due, '_id': {'$in': ids}}, {'$set': leased, '$inc': {'attempts': 1}})
+            messages = list(collection.find({'_id': {'$in': ids}, 'lease': leased['lease']}))
+            if messages:
+                return messages
+
+    def dead_letter_abandoned(self):
+        """Dead-letter messages whose last attempt was leased by a worker that died before recording it"""
+        now = datetime.utcnow()
+        result = get_db()[COLLECTION].update_many(
+            {'status': 'sending', 'nextAttemptAt': {'$lte': now}, 'attempts': {'$gte': self.max_attempts}},
+            {'$set': {'status': 'dead', 'lastError': 'Lease expired on the last attempt', 'deadAt': now}}
+        )
+        if result.modified_count:
+            with self._lock:
+                self.counters['dead'] += result.modified_count
+            print(f"☠️  {result.modified_count} email(s) dead-lettered: lease of attempt {self.max_attempts} ran out")
+        return result.modified_count
+
+    def deliver(self, message):
+        """Send one claimed message and record the outcome"""
+        return self.deliver_batch([message])[0]
+
+    def deliver_batch(self, messages):
+        """Send claimed messages of one kind and locale together; returns per message whether it was sent"""
+        from app.services.email_service import email_service, EmailDeliveryError
+
+        first = messages[0]
+        if len(messages) == 1:
+            try:
+                results = [email_service.deliver(first['kind'], first['to'], first['params'], first['idempotencyKey'], first.get('locale'))]
+            except EmailDeliveryError as e:
+                results = [e]
+        else:
+            results = email_service.deliver_many(first['kind'], [
+                {'email': message['to'], 'params': message['params'], 'idempotency_key': message['idempotencyKey']}
+                for message in messages
+            ], first.get('locale'))
+        return [self._record(message, result) for message, result in zip(messages, results)]
+
+    def _record(self, message, result):
+        """Store the outcome of one delivery: a provider message id or the EmailDeliveryError"""
+        from app.services.email_service import EmailDeliveryError
+
+        collection = get_db()[COLLECTION]
+        owned = {'_id': message['_id'], 'lease': message['lease']}
+        if isinstance(result, EmailDeliveryError):
+            e = result
+            now = datetime.utcnow()
+            if e.permanent or message['attempts'] >= self.max_attempts:
+                collection.update_one(owned, {'$set': {'status': 'dead', 'lastError': str(e), 'deadAt': now}})
+                self._count('dead')
+                print(f"☠️  Email {message['kind']} to {message['to']} dead-lettered after {message['attempts']} attempt(s): {e}")
+            else:
+                collection.update_one(owned, {'$set': {
+                    'status': 'pending',
+                    'lastError': str(e),
+                    'nextAttemptAt': now + timedelta(seconds=self.backoff(message['attempts']))
+                }})
+                self._count('retried')
+            return False
+
+        now = datetime.utcnow()
+        collection.update_one(owned, {
+            '$set': {'status': 'sent', 'sentAt': now, 'providerMessageId': result, 'expiresAt': now + self.retention},
+            '$unset': {'lastError': ''}
+        })
+        self._count('sent')
+        return True
+
+    def backoff(self, attempts):
+        """Seconds before the next attempt: exponential, capped at max_delay, with jitter so retries spread out"""
+        return random.uniform(0.5, 1.0) * min(self.max_delay, self.base_delay * 2 ** (attempts - 1))
+
+    def drain(self, worker_name='drain'):
+        """Deliver every due message on the calling thread; returns the number handled"""
+        handled = 0
+        while True:
+            messages = self.claim_batch(worker_name)
+            if not messages:
+                return handled
+            self.deliver_batch(messages)
+            handled += len(messages)
+
+    def forget_workers(self):
+        """Drop the threads inherited from a parent process (called in the child after fork)"""
+        self._reset()
+
+    def shutdown(self, timeout=5.0):
+        """Stop the delivery threads, letting each finish the message it is sending"""
+        self._stopping.set()
+        self._wake.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    # Administration
+
+    def requeue(self, message_id):
+        """Send a dead-lettered message again; False if it is not dead"""
+        result = get_db()[COLLECTION].update_one(
+            {'_id': ObjectId(message_id), 'status': 'dead'},
+            {'$set': {'status': 'pending', 'attempts': 0, 'nextAttemptAt': datetime.utcnow()}, '$unset': {'deadAt': ''}}
+        )
+        if result.modified_count:
+            self.start()
+            self._wake.set()
+        return bool(result.modified_count)
+
+    def stats(self):
+        by_status = {item['_id']: item['count'] for item in get_db()[COLLECTION].aggregate([
+            {'$group': {'_id': '$status', 'count': {'$sum': 1}}}
+        ])}
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'workers': len(self._threads),
+                'byStatus': by_status,
+                'counters': dict(self.counters)
+            }
+
+
+email_outbox = EmailOutbox()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=email_outbox.forget_workers)
@@ -0,0 +1,185 @@
+"""
+Email Templates - compiled Jinja2 templates for every email kind and locale
+
+Templates live in app/templates/email/<locale>/<kind>.html with the subjects
+of a locale in subjects.json next to them. Each template is compiled once per
+process; a render then only evaluates the variable parts. Indentation is
+stripped from the HTML when it is loaded, so it is not sent with every
+email. The plain-text
+alternative is derived from the HTML template source when it is compiled
+(not from every rendered email), so it costs one more small render per send.
+
+A kind missing in the requested locale falls back to EMAIL_DEFAULT_LOCALE.
+Render count, time and output size per kind are kept for stats().
+
+render_placeholders() renders a template with its parameters left as Brevo
+placeholders ({{ params.html.user_name }}, {{ params.text.user_name }}) for
+bulk sends where Brevo fills in each recipient's values; fill_placeholders()
+does the same substitution locally.
+"""
+import html
+import json
+import os
+import re
+import threading
+import time
+from jinja2 import Environment, FileSystemLoader, FunctionLoader, StrictUndefined, TemplateNotFound
+from markupsafe import Markup, escape
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'templates', 'email')
+
+_DROPPED = re.compile(r'<(head|style|script)\b.*?</\1>|<!--.*?-->', re.IGNORECASE | re.DOTALL)
+_LINK = re.compile(r'<a\b[^>]*?href="([^"]*)"[^>]*>(.*?)</a>', re.IGNORECASE | re.DOTALL)
+_LINE_BREAK = re.compile(r'<br\s*/?>|</(p|div|h[1-6]|tr|li|ul|table)>', re.IGNORECASE)
+_LIST_ITEM = re.compile(r'<li\b[^>]*>', re.IGNORECASE)
+_TAG = re.compile(r'<[^>]+>')
+_PLACEHOLDER = re.compile(r'\{\{ params\.(html|text)\.(\w+) \}\}')
+
+
+def html_to_text(source):
+    """Plain-text version of an HTML template source; Jinja tags and expressions are kept"""
+    text = _DROPPED.sub('', source)
+
+    def link(match):
+        href, label = match.group(1), _TAG.sub('', match.group(2)).strip()
+        if href.startswith('mailto:') or label == href:
+            return label
+        return f"{label}: {href}"
+
+    text = _LINK.sub(link, text)
+    text = _LIST_ITEM.sub('\n- ', text)
+    text = _LINE_BREAK.sub('\n', text)
+    text = html.unescape(_TAG.sub('', text))
+
+    lines = [' '.join(line.split()) for line in text.splitlines()]
+    return re.sub(r'\n{3,}', '\n\n', '\n'.join(lines)).strip() + '\n'
+
+
+def placeholder_values(params):
+    """Brevo params for one recipient of render_placeholders() output: HTML-escaped and plain values"""
+    return {
+        'html': {name: str(escape(value)) for name, value in params.items()},
+        'text': {name: str(value) for name, value in params.items()}
+    }
+
+
+def fill_placeholders(content, values):
+    """Substitute placeholder_values() into render_placeholders() output, as Brevo does"""
+    return _PLACEHOLDER.sub(lambda match: values[match.group(1)][match.group(2)], content)
+
+
+class CompiledEmail:
+    """Compiled subject, HTML and plain-text templates of one kind in one locale"""
+
+    def __init__(self, subject, html_template, text_template):
+        self.subject = subject
+        self.html = html_template
+        self.text = text_template
+
+
+class EmailTemplates:
+    """Loads, compiles and caches email templates; render() returns (subject, html, text)"""
+
+    def __init__(self, directory=TEMPLATE_DIR, default_locale=None, template_globals=None):
+        self.directory = directory
+        self.default_locale = default_locale or os.getenv('EMAIL_DEFAULT_LOCALE', 'vi')
+        options = {'undefined': StrictUndefined, 'auto_reload': False, 'cache_size': -1}
+        self._files = FileSystemLoader(directory)
+        self.html_env = Environment(loader=FunctionLoader(self._html_source), autoescape=True, **options)
+        self.text_env = Environment(loader=FunctionLoader(self._text_source), autoescape=False,
+                                    trim_blocks=True, lstrip_blocks=True, **options)
+        for env in (self.html_env, self.text_env):
+            env.globals.update(template_globals or {})
+
+        self._lock = threading.RLock()
+        self._compiled = {}
+        self._subjects = {}
+        self._stats = {}
+
+    def _html_source(self, name):
+        source, _, _ = self._files.get_source(self.html_env, name)
+        return '\n'.join(line.strip() for line in source.splitlines() if line.strip()) + '\n', None, lambda: True
+
+    def _text_source(self, name):
+        source, _, _ = self._files.get_source(self.html_env, name)
+        return html_to_text(source), None, lambda: True
+
+    def _subjects_of(self, locale):
+        if locale not in self._subjects:
+            path = os.path.join(self.directory, locale, 'subjects.json')
+            try:
+                with open(path, encoding='utf-8') as f:
+                    subjects = json.load(f)
+            except FileNotFoundError:
+                subjects = {}
+            self._subjects[locale] = {kind: self.text_env.from_string(subject) for kind, subject in subjects.items()}
+        return self._subjects[locale]
+
+    def get(self, kind, locale=None):
+        """Compiled templates for kind, compiled on first use"""
+        locale = locale or self.default_locale
+        compiled = self._compiled.get((locale, kind))
+        if compiled is not None:
+            return compiled
+
+        with self._lock:
+            compiled = self._compiled.get((locale, kind))
+            if compiled is None:
+                name = f"{locale}/{kind}.html"
+                subject = self._subjects_of(locale).get(kind)
+                if subject is None or not os.path.exists(os.path.join(self.directory, name)):
+                    if locale == self.default_locale:
+                        raise TemplateNotFound(name)
+                    compiled = self.get(kind, self.default_locale)
+                else:
+                    compiled = CompiledEmail(subject, self.html_env.get_template(name), self.text_env.get_template(name))
+                self._compiled[(locale, kind)] = compiled
+        return compiled
+
+    def preload(self):
+        """Compile every template of every locale up front; returns how many were compiled"""
+        for locale in sorted(os.listdir(self.directory)):
+            for kind in self._subjects_of(locale):
+                self.get(kind, locale)
+        return len(self._compiled)
+
+    def render(self, kind, params, locale=None):
+        """(subject, html, text) for one email"""
+        compiled = self.get(kind, locale)
+        started = time.perf_counter()
+        rendered = compiled.subject.render(params), compiled.html.render(params), compiled.text.render(params)
+        elapsed = time.perf_counter() - started
+
+        with self._lock:
+            stats = self._stats.setdefault(kind, {'renders': 0, 'seconds': 0.0, 'htmlBytes': 0, 'textBytes': 0})
+            stats['renders'] += 1
+            stats['seconds'] += elapsed
+            stats['htmlBytes'] += len(rendered[1].encode('utf-8'))
+            stats['textBytes'] += len(rendered[2].encode('utf-8'))
+        return rendered
+
+    def render_placeholders(self, kind, params, locale=None):
+        """(html, text) with every truthy parameter replaced by its Brevo placeholder
+
+        Falsy parameters keep their value so {% if %} blocks render as they would
+        for params; recipients that share those are served by the same content.
+        """
+        compiled = self.get(kind, locale)
+        html_params = {name: value if not value else Markup(f"{{{{ params.html.{name} }}}}") for name, value in params.items()}
+        text_params = {name: value if not value else f"{{{{ params.text.{name} }}}}" for name, value in params.items()}
+        return compiled.html.render(html_params), compiled.text.render(text_params)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'compiled': sorted(f"{locale}/{kind}" for locale, kind in self._compiled),
+                'kinds': {
+                    kind: {
+                        'renders': stats['renders'],
+                        'meanRenderUs': round(stats['seconds'] / stats['renders'] * 1e6, 1),
+                        'meanHtmlBytes': stats['htmlBytes'] // stats['renders'],
+                        'meanTextBytes': stats['textBytes'] // stats['renders']
+                    }
+                    for kind, stats in self._stats.items()
+                }
+            }
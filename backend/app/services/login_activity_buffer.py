@@ -0,0 +1,158 @@
+"""
+Login Activity Buffer - batch login_activities inserts off the login path
+
+LoginActivity.record_login() used to insert its document before the login
+response was sent. It now hands the document to this buffer, and a
+background thread writes the buffered documents with one unordered
+insert_many when LOGIN_ACTIVITY_BATCH_SIZE of them are waiting or every
+LOGIN_ACTIVITY_FLUSH_SECONDS, whichever comes first.
+
+Documents get their _id when they are buffered, so a batch that is written
+again after an error does not insert duplicates. A batch that fails is put
+back in front of the buffer for the next flush. When LOGIN_ACTIVITY_BUFFER_MAX
+documents are already waiting (MongoDB down or too slow), record_login()
+writes directly, as before. The buffer is flushed on worker exit and when the
+interpreter exits.
+
+Every written batch is also added to the daily and monthly login rollups
+(app/models/login_rollup.py) that back the admin login statistics, and to
+the logins counter of the daily business rollups (app/models/daily_rollup.py).
+"""
+import atexit
+import os
+import threading
+from pymongo.errors import BulkWriteError, PyMongoError
+from app.utils.database import get_db, DatabaseUnavailable
+
+COLLECTION = 'login_activities'
+
+
+class LoginActivityBuffer:
+    """In-memory queue of login activity documents flushed in batches by one thread"""
+
+    def __init__(self):
+        self.enabled = os.getenv('LOGIN_ACTIVITY_BUFFER_ENABLED', 'true').lower() == 'true'
+        self.batch_size = int(os.getenv('LOGIN_ACTIVITY_BATCH_SIZE', 500))
+        self.flush_interval = float(os.getenv('LOGIN_ACTIVITY_FLUSH_SECONDS', 1))
+        self.max_buffered = int(os.getenv('LOGIN_ACTIVITY_BUFFER_MAX', 10000))
+        self._reset()
+
+    def _reset(self):
+        self._lock = threading.Lock()
+        self._flushing = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._documents = []
+        self.counters = {'buffered': 0, 'direct': 0, 'written': 0, 'batches': 0, 'failedBatches': 0, 'flushErrors': 0, 'rollupErrors': 0}
+
+    def add(self, document):
+        """Queue one document (with its _id set); writes it directly when disabled or the buffer is full"""
+        if self.enabled and not self._stopping.is_set():
+            with self._lock:
+                if len(self._documents) < self.max_buffered:
+                    self._documents.append(document)
+                    self.counters['buffered'] += 1
+                    full = len(self._documents) >= self.batch_size
+                    document = None
+            if document is None:
+                self.start()
+                if full:
+                    self._wake.set()
+                return
+
+        get_db()[COLLECTION].insert_one(document)
+        with self._lock:
+            self.counters['direct'] += 1
+        self._roll_up([document])
+
+    def _roll_up(self, documents):
+        from app.models.daily_rollup import DailyRollup
+        from app.models.login_rollup import LoginRollup
+        DailyRollup.record_logins(documents)
+        try:
+            LoginRollup.record(documents)
+        except Exception as e:
+            # The raw events are stored; rebuild_login_rollups.py can recompute the rollups
+            with self._lock:
+                self.counters['rollupErrors'] += 1
+            print(f"⚠️  Login rollups not updated for {len(documents)} logins: {e}")
+
+    def start(self):
+        """Start the flush thread of this process once"""
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='login-activity-buffer', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while not self._stopping.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                # Keep flushing; the batch that raised is dropped, the rest of the buffer is kept
+                with self._lock:
+                    self.counters['flushErrors'] += 1
+                print(f"❌ Login activity flush thread error: {e}")
+
+    def flush(self):
+        """Write everything buffered so far; returns the number of documents written"""
+        written = 0
+        with self._flushing:
+            while True:
+                with self._lock:
+                    batch, self._documents = self._documents[:self.batch_size], self._documents[self.batch_size:]
+                if not batch:
+                    return written
+                lost = []
+                try:
+                    get_db()[COLLECTION].insert_many(batch, ordered=False)
+                except BulkWriteError as e:
+                    # Duplicate _ids were written by an earlier attempt; anything else is lost
+                    lost = [error for error in e.details.get('writeErrors', []) if error.get('code') != 11000]
+                    if lost:
+                        print(f"⚠️  {len(lost)} login activities not written: {lost[0].get('errmsg')}")
+                except (PyMongoError, DatabaseUnavailable) as e:
+                    with self._lock:
+                        self._documents[:0] = batch
+                        del self._documents[self.max_buffered:]
+                        self.counters['failedBatches'] += 1
+                    print(f"⚠️  Login activity flush failed, {len(batch)} kept for the next one: {e}")
+                    return written
+                lost_indexes = {error['index'] for error in lost}
+                self._roll_up([document for index, document in enumerate(batch) if index not in lost_indexes])
+                written += len(batch) - len(lost)
+                with self._lock:
+                    self.counters['written'] += len(batch) - len(lost)
+                    self.counters['batches'] += 1
+
+    def forget_buffer(self):
+        """Drop the thread and documents inherited from a parent process (called in the child after fork)"""
+        self._reset()
+
+    def shutdown(self, timeout=5.0):
+        """Stop the flush thread and write what is left"""
+        self._stopping.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        try:
+            self.flush()
+        except Exception as e:
+            print(f"⚠️  Login activities lost on shutdown: {e}")
+
+    def stats(self):
+        with self._lock:
+            return {'enabled': self.enabled, 'pending': len(self._documents), **self.counters}
+
+
+login_activity_buffer = LoginActivityBuffer()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=login_activity_buffer.forget_buffer)
+atexit.register(login_activity_buffer.shutdown)
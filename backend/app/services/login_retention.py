@@ -0,0 +1,139 @@
+"""
+Login Retention - fold, export and delete login_activities older than the retention
+
+Raw login events are kept LOGIN_ACTIVITY_RETENTION_DAYS days; the admin
+statistics only read login_rollups, so nothing is lost from them once an
+event is folded there. archive() (python archive_login_activities.py, daily
+from cron) does the deleting, for every whole UTC day past the retention:
+
+    1. folds the day into login_rollups if it is not there yet (history
+       written before the rollups existed),
+    2. with LOGIN_ACTIVITY_ARCHIVE_DIR, exports its events to
+       <dir>/login_activities-YYYY-MM-DD.ndjson.gz (one Extended JSON
+       document per line), written to a temporary file and renamed, so a
+       file that exists is complete,
+    3. deletes the day with one ranged delete_many,
+
+and then records the cutoff it reached as the fold watermark (the
+'retention' document of login_rollups).
+
+The TTL index on login_timestamp is only a backstop if the job stops
+running, LOGIN_ACTIVITY_RETENTION_GRACE_DAYS behind it. It is not declared
+with the index (ensure_indexes() would apply it at startup, before any
+history is folded); apply_ttl() sets it with collMod once the watermark has
+reached the retention cutoff, so it can only ever remove events older than
+days that were folded. Logins after that are folded as they are written.
+collection_sizes() reports document, data, storage and per-index sizes
+(collStats) to compare before and after.
+"""
+import gzip
+import os
+from datetime import datetime, timedelta
+from bson import json_util
+from bson.json_util import RELAXED_JSON_OPTIONS
+from pymongo import ASCENDING
+from app.models.login_activity import LoginActivity, RETENTION_DAYS, ARCHIVE_DIR, GRACE_DAYS
+from app.models.login_rollup import LoginRollup, WATERMARK_ID, day_start
+from app.utils.database import get_db
+
+TTL_INDEX = 'login_timestamp'
+
+
+def archive_path(directory, day):
+    return os.path.join(directory, f"{LoginActivity.COLLECTION}-{day.strftime('%Y-%m-%d')}.ndjson.gz")
+
+
+def export_day(collection, day, directory):
+    """Write the events of one day to a gzip NDJSON file; returns (path, count)"""
+    os.makedirs(directory, exist_ok=True)
+    path = archive_path(directory, day)
+    temporary = f"{path}.tmp"
+    count = 0
+    cursor = collection.find({'login_timestamp': {'$gte': day, '$lt': day + timedelta(days=1)}}, batch_size=5000)
+    with gzip.open(temporary, 'wt', encoding='utf-8', compresslevel=6) as archive:
+        for document in cursor.sort('login_timestamp', ASCENDING):
+            archive.write(json_util.dumps(document, json_options=RELAXED_JSON_OPTIONS))
+            archive.write('\n')
+            count += 1
+    os.replace(temporary, path)
+    return path, count
+
+
+def archive(directory=ARCHIVE_DIR, retention_days=RETENTION_DAYS, dry_run=False):
+    """Fold, export (with a directory) and delete every whole day older than retention_days; returns per-day results"""
+    if not retention_days:
+        return []
+    db = get_db()
+    collection = db[LoginActivity.COLLECTION]
+    cutoff = day_start(datetime.utcnow()) - timedelta(days=retention_days)
+    oldest = collection.find_one({'login_timestamp': {'$lt': cutoff}}, {'login_timestamp': 1}, sort=[('login_timestamp', ASCENDING)])
+
+    results = []
+    day = day_start(oldest['login_timestamp']) if oldest else cutoff
+    while day < cutoff:
+        window = {'login_timestamp': {'$gte': day, '$lt': day + timedelta(days=1)}}
+        result = {'day': day.strftime('%Y-%m-%d'), 'events': collection.count_documents(window), 'folded': False}
+        if result['events']:
+            if not dry_run and db[LoginRollup.COLLECTION].count_documents({'_id': LoginRollup.key('day', day)}, limit=1) == 0:
+                LoginRollup.record(collection.find(window, {'_id': 0, 'user_id': 1, 'login_timestamp': 1}, batch_size=5000))
+                result['folded'] = True
+            if directory and not dry_run:
+                result['file'], exported = export_day(collection, day, directory)
+                if exported != result['events']:
+                    raise RuntimeError(f"{result['day']}: exported {exported} of {result['events']} events; not deleting")
+            if not dry_run:
+                result['deleted'] = collection.delete_many(window).deleted_count
+            results.append(result)
+        day += timedelta(days=1)
+
+    if not dry_run:
+        db[LoginRollup.COLLECTION].update_one(
+            {'_id': WATERMARK_ID}, {'$max': {'foldedUntil': cutoff}, '$set': {'updatedAt': datetime.utcnow()}}, upsert=True
+        )
+        apply_ttl(retention_days)
+    return results
+
+
+def folded_until():
+    """Day before which every login has been folded into login_rollups, None before the first archive()"""
+    return LoginRollup.folded_until()
+
+
+def apply_ttl(retention_days=RETENTION_DAYS, grace_days=GRACE_DAYS):
+    """
+    Set the backstop TTL of retention_days + grace_days on login_timestamp once
+    the fold watermark has reached the retention cutoff; returns the
+    expireAfterSeconds in effect (None without a TTL)
+    """
+    collection = get_db()[LoginActivity.COLLECTION]
+    current = collection.index_information().get(TTL_INDEX, {}).get('expireAfterSeconds')
+    if not retention_days:
+        if current is not None:
+            print(f"⚠️  {TTL_INDEX} still expires events after {current}s; retention is off, change it by hand")
+        return current
+    watermark = folded_until()
+    cutoff = day_start(datetime.utcnow()) - timedelta(days=retention_days)
+    if watermark is None or watermark < cutoff:
+        # Older events may not be folded yet; only archive() deletes them
+        return current
+    expire_after = (retention_days + grace_days) * 86400
+    if current != expire_after:
+        collection.database.command('collMod', collection.name, index={'name': TTL_INDEX, 'expireAfterSeconds': expire_after})
+        print(f"🗑️  {TTL_INDEX} TTL set to {retention_days + grace_days} days (logins folded until {watermark:%Y-%m-%d})")
+    return expire_after
+
+
+def collection_sizes(names=(LoginActivity.COLLECTION, LoginRollup.COLLECTION)):
+    """collStats summary per collection: documents, data, storage and index bytes"""
+    db = get_db()
+    sizes = {}
+    for name in names:
+        stats = db.command('collStats', name)
+        sizes[name] = {
+            'documents': stats.get('count', 0),
+            'dataBytes': stats.get('size', 0),
+            'storageBytes': stats.get('storageSize', 0),
+            'indexBytes': stats.get('totalIndexSize', 0),
+            'indexes': dict(stats.get('indexSizes', {}))
+        }
+    return sizes
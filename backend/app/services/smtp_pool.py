@@ -0,0 +1,283 @@
+"""
+SMTP Pool - reusable, authenticated SMTP connections for sending email
+
+Opening a connection costs a TCP handshake, EHLO, STARTTLS, a second EHLO and
+AUTH before the first message. The pool keeps up to SMTP_POOL_SIZE logged-in
+connections and hands them to senders one at a time, so only the first
+message on a connection pays that cost.
+
+    pool.send(message)            # email.message.EmailMessage
+    pool.send_many(messages)      # one connection for the whole batch
+
+When the server advertises PIPELINING (RFC 2920), MAIL FROM, every RCPT TO
+and DATA are written in one go and their replies read together: one round
+trip per message for the envelope instead of two plus one per recipient.
+
+A connection idle for longer than SMTP_MAX_IDLE_SECONDS is checked with NOOP
+before use, and one that has sent SMTP_MAX_MESSAGES_PER_CONNECTION messages is
+closed. If the server dropped a connection before the message was handed
+over, the send is retried once on a fresh connection.
+"""
+import copy
+import os
+import queue
+import re
+import smtplib
+import ssl
+import threading
+import time
+from email import policy
+
+# Build messages with this policy: CRLF line endings and 7-bit safe bodies, so
+# they can be sent to any server whether it supports 8BITMIME or not
+MESSAGE_POLICY = policy.SMTP.clone(cte_type='7bit')
+
+_LEADING_PERIOD = re.compile(br'(?m)^\.')
+
+
+class PooledConnection:
+    """One logged-in SMTP connection and its usage counters"""
+
+    def __init__(self, smtp):
+        self.smtp = smtp
+        self.messages = 0
+        self.last_used = time.monotonic()
+        self.handed_over = False
+
+    @property
+    def pipelining(self):
+        return self.smtp.has_extn('pipelining')
+
+
+class SmtpPool:
+    """Bounded pool of SMTP connections with keep-alive and reconnect on failure"""
+
+    def __init__(self, host=None, port=None, username=None, password=None, use_tls=None, size=None):
+        self.host = host or os.getenv('SMTP_SERVER')
+        self.port = int(port or os.getenv('SMTP_PORT', 587))
+        self.username = username if username is not None else os.getenv('SMTP_USERNAME')
+        self.password = password if password is not None else os.getenv('SMTP_PASSWORD')
+        self.use_tls = use_tls if use_tls is not None else os.getenv('SMTP_USE_TLS', 'true').lower() == 'true'
+        self.size = size or int(os.getenv('SMTP_POOL_SIZE', 4))
+        self.timeout = float(os.getenv('SMTP_TIMEOUT_SECONDS', 10))
+        self.max_idle = float(os.getenv('SMTP_MAX_IDLE_SECONDS', 30))
+        self.max_messages = int(os.getenv('SMTP_MAX_MESSAGES_PER_CONNECTION', 500))
+        self.pipelining = os.getenv('SMTP_PIPELINING', 'true').lower() == 'true'
+        self._reset()
+
+    def _reset(self):
+        self._lock = threading.Lock()
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.size)
+        self.counters = {'connections': 0, 'reconnects': 0, 'messages': 0, 'pipelined': 0}
+
+    def _count(self, counter, amount=1):
+        with self._lock:
+            self.counters[counter] += amount
+
+    # Connections
+
+    def _connect(self):
+        smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            smtp.ehlo()
+            if self.use_tls:
+                smtp.starttls(context=ssl.create_default_context())
+                smtp.ehlo()
+            if self.username:
+                smtp.login(self.username, self.password)
+        except Exception:
+            smtp.close()
+            raise
+        self._count('connections')
+        return PooledConnection(smtp)
+
+    def _usable(self, connection):
+        if connection.messages >= self.max_messages:
+            return False
+        if time.monotonic() - connection.last_used < self.max_idle:
+            return True
+        # Servers drop idle connections; find out now rather than in the middle of a send
+        try:
+            return connection.smtp.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+
+    def _checkout(self):
+        if not self._slots.acquire(timeout=self.timeout):
+            raise smtplib.SMTPException('No SMTP connection available from the pool')
+        try:
+            while True:
+                try:
+                    connection = self._idle.get_nowait()
+                except queue.Empty:
+                    return self._connect()
+                if self._usable(connection):
+                    return connection
+                self._discard(connection)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def _checkin(self, connection):
+        connection.last_used = time.monotonic()
+        self._idle.put(connection)
+        self._slots.release()
+
+    def _discard(self, connection, release=False):
+        try:
+            connection.smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            connection.smtp.close()
+        if release:
+            self._slots.release()
+
+    # Sending
+
+    def send(self, message):
+        """Send one EmailMessage; returns the refused recipients ({} when all were accepted)"""
+        result = self.send_many([message])[0]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def send_many(self, messages):
+        """Send messages over one pooled connection; returns per message the refused recipients or the exception"""
+        results = []
+        connection = self._checkout()
+        connect_error = None
+        try:
+            for message in messages:
+                if connect_error is not None:
+                    results.append(connect_error)
+                    continue
+                try:
+                    if connection is None:
+                        connection = self._connect()
+                        self._count('reconnects')
+                    try:
+                        results.append(self._send_on(connection, message))
+                    except smtplib.SMTPServerDisconnected:
+                        if connection.handed_over:
+                            raise
+                        # Dropped before the message was handed over: retry once on a new connection
+                        connection.smtp.close()
+                        connection = None
+                        connection = self._connect()
+                        self._count('reconnects')
+                        results.append(self._send_on(connection, message))
+                except (smtplib.SMTPResponseException, smtplib.SMTPRecipientsRefused) as e:
+                    # The server answered; the connection stays usable for the next message
+                    self._reset_transaction(connection)
+                    results.append(e)
+                except (smtplib.SMTPException, OSError) as e:
+                    if connection is None:
+                        connect_error = e
+                    else:
+                        connection.smtp.close()
+                        connection = None
+                    results.append(e)
+        except Exception:
+            if connection is not None:
+                connection.smtp.close()
+            self._slots.release()
+            raise
+
+        if connection is None:
+            self._slots.release()
+        else:
+            self._checkin(connection)
+        return results
+
+    def _reset_transaction(self, connection):
+        try:
+            connection.smtp.rset()
+        except (smtplib.SMTPException, OSError):
+            pass
+
+    def _send_on(self, connection, message):
+        sender = (message['Sender'] or message['From']).addresses[0].addr_spec
+        recipients = [address.addr_spec for header in ('To', 'Cc', 'Bcc') if message[header] for address in message[header].addresses]
+        if message['Bcc']:
+            message = copy.copy(message)
+            del message['Bcc']
+        data = _LEADING_PERIOD.sub(b'..', message.as_bytes(policy=MESSAGE_POLICY))
+        if not data.endswith(b'\r\n'):
+            data += b'\r\n'
+
+        connection.handed_over = False
+        if self.pipelining and connection.pipelining:
+            refused = self._pipelined_envelope(connection.smtp, sender, recipients)
+            self._count('pipelined')
+        else:
+            refused = self._envelope(connection.smtp, sender, recipients)
+            connection.smtp.putcmd('data')
+            code, response = connection.smtp.getreply()
+            if code != 354:
+                raise smtplib.SMTPDataError(code, response)
+
+        connection.handed_over = True
+        connection.smtp.send(data + b'.\r\n')
+        code, response = connection.smtp.getreply()
+        if code != 250:
+            raise smtplib.SMTPDataError(code, response)
+        connection.messages += 1
+        self._count('messages')
+        return refused
+
+    @staticmethod
+    def _envelope(smtp, sender, recipients):
+        """MAIL FROM and RCPT TO one command at a time"""
+        code, response = smtp.mail(sender)
+        if code != 250:
+            raise smtplib.SMTPSenderRefused(code, response, sender)
+        refused = {}
+        for recipient in recipients:
+            code, response = smtp.rcpt(recipient)
+            if code not in (250, 251):
+                refused[recipient] = (code, response)
+        if len(refused) == len(recipients):
+            raise smtplib.SMTPRecipientsRefused(refused)
+        return refused
+
+    @staticmethod
+    def _pipelined_envelope(smtp, sender, recipients):
+        """MAIL FROM, every RCPT TO and DATA in one write (RFC 2920), replies read together"""
+        commands = [f"MAIL FROM:{smtplib.quoteaddr(sender)}"]
+        commands += [f"RCPT TO:{smtplib.quoteaddr(recipient)}" for recipient in recipients]
+        commands.append('DATA')
+        smtp.send(''.join(f"{command}\r\n" for command in commands))
+
+        mail_reply = smtp.getreply()
+        rcpt_replies = [smtp.getreply() for _ in recipients]
+        data_reply = smtp.getreply()
+        refused = {recipient: reply for recipient, reply in zip(recipients, rcpt_replies) if reply[0] not in (250, 251)}
+
+        if data_reply[0] == 354 and (mail_reply[0] != 250 or len(refused) == len(recipients)):
+            # DATA was accepted although the envelope was not; end it empty
+            smtp.send(b'.\r\n')
+            smtp.getreply()
+        if mail_reply[0] != 250:
+            raise smtplib.SMTPSenderRefused(mail_reply[0], mail_reply[1], sender)
+        if len(refused) == len(recipients):
+            raise smtplib.SMTPRecipientsRefused(refused)
+        if data_reply[0] != 354:
+            raise smtplib.SMTPDataError(*data_reply)
+        return refused
+
+    # Lifecycle
+
+    def forget_connections(self):
+        """Drop connections inherited from a parent process without closing its sockets"""
+        self._reset()
+
+    def close(self):
+        while True:
+            try:
+                self._discard(self._idle.get_nowait())
+            except queue.Empty:
+                return
+
+    def stats(self):
+        with self._lock:
+            return {'size': self.size, 'idle': self._idle.qsize(), **self.counters}
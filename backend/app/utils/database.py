@@ -1,94 +1,408 @@
 import pymongo
-from pymongo import MongoClient
-from flask import current_app
+from pymongo import MongoClient, monitoring
+from pymongo.errors import PyMongoError
+from flask import current_app, has_app_context
 import os
+import threading
+import time
+from app.utils.query_profiler import command_profiler
+from app.utils.slow_query_log import slow_query_listener
 
-# Global database connection
-db = None
-client = None
+FALLBACK_URI = 'mongodb://localhost:27017/tripook'
 
-def init_db(app):
-    """Initialize MongoDB connection"""
-    global db, client
-    
-    # Get database name from environment
-    database_name = os.getenv('MONGO_DATABASE', 'tripook')
-    
-    # Priority: Use MONGO_URI from environment (Docker/Production) or fall back to local
-    mongo_uri = app.config.get('MONGO_URI') or os.getenv('MONGO_URI')
-    
-    # If no MONGO_URI, use local MongoDB as fallback
-    if not mongo_uri:
-        mongo_uri = os.getenv('MONGO_LOCAL_URI', 'mongodb://localhost:27017/tripook')
-    
-    connected = False
-    
-    # Try connecting to MongoDB
-    try:
-        print(f"🔗 Connecting to MongoDB...")
-        # Optimized settings for development
-        client = MongoClient(
-            mongo_uri, 
-            serverSelectionTimeoutMS=5000,
-            connectTimeoutMS=5000,
-            maxPoolSize=10,  # Connection pool for better performance
-            retryWrites=True
+
+class DatabaseUnavailable(RuntimeError):
+    """Raised when MongoDB cannot be reached or the circuit breaker is open"""
+
+
+class CircuitBreaker:
+    """
+    Fail fast while MongoDB is down
+
+    closed    -> requests go through; `failure_threshold` failures in a row open it
+    open      -> requests fail immediately until `cooldown` seconds have passed
+    half_open -> one trial request goes through; success closes, failure re-opens
+    """
+
+    def __init__(self, failure_threshold=3, cooldown=30):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._state = 'closed'
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_progress = False
+        self.last_error = None
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._state == 'open' and time.monotonic() - self._opened_at >= self.cooldown:
+                return 'half_open'
+            return self._state
+
+    def allow_request(self):
+        """True if a request may try to reach MongoDB"""
+        with self._lock:
+            if self._state == 'closed':
+                return True
+            if time.monotonic() - self._opened_at < self.cooldown or self._trial_in_progress:
+                return False
+            self._trial_in_progress = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._state = 'closed'
+            self._failures = 0
+            self._trial_in_progress = False
+            self.last_error = None
+
+    def record_failure(self, error=None, trip=False):
+        """Count a failure; trip opens the breaker at once (no server could be selected at all)"""
+        with self._lock:
+            self._failures += 1
+            self._trial_in_progress = False
+            self.last_error = str(error) if error else None
+            if trip or self._state != 'closed' or self._failures >= self.failure_threshold:
+                self._state = 'open'
+                self._opened_at = time.monotonic()
+
+    def snapshot(self):
+        state = self.state
+        with self._lock:
+            return {
+                'state': state,
+                'failures': self._failures,
+                'failureThreshold': self.failure_threshold,
+                'cooldownSeconds': self.cooldown,
+                'lastError': self.last_error
+            }
+
+
+class PoolMonitor(monitoring.ConnectionPoolListener):
+    """Connection pool metrics: checkout wait times, connections in use and saturation"""
+
+    # Keep this many recent wait samples for percentiles
+    SAMPLE_SIZE = 1024
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.max_pool_size = 0
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.open_connections = 0
+            self.in_use = 0
+            self.max_in_use = 0
+            self.checkouts = 0
+            self.checkout_failures = {}
+            self.total_wait_ms = 0.0
+            self.max_wait_ms = 0.0
+            self._samples = []
+
+    def connection_check_out_started(self, event):
+        self._local.started = time.perf_counter()
+
+    def connection_checked_out(self, event):
+        started = getattr(self._local, 'started', None)
+        wait_ms = (time.perf_counter() - started) * 1000 if started else 0.0
+        with self._lock:
+            self.checkouts += 1
+            self.in_use += 1
+            self.max_in_use = max(self.max_in_use, self.in_use)
+            self.total_wait_ms += wait_ms
+            self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+            if len(self._samples) >= self.SAMPLE_SIZE:
+                self._samples.pop(0)
+            self._samples.append(wait_ms)
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            reason = str(event.reason)
+            self.checkout_failures[reason] = self.checkout_failures.get(reason, 0) + 1
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.in_use = max(0, self.in_use - 1)
+
+    def connection_created(self, event):
+        with self._lock:
+            self.open_connections += 1
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.open_connections = max(0, self.open_connections - 1)
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def snapshot(self):
+        with self._lock:
+            samples = sorted(self._samples)
+
+            def percentile(p):
+                if not samples:
+                    return 0.0
+                return round(samples[min(len(samples) - 1, int(len(samples) * p))], 3)
+
+            return {
+                'maxPoolSize': self.max_pool_size,
+                'openConnections': self.open_connections,
+                'inUse': self.in_use,
+                'maxInUse': self.max_in_use,
+                'saturation': round(self.in_use / self.max_pool_size, 3) if self.max_pool_size else 0.0,
+                'peakSaturation': round(self.max_in_use / self.max_pool_size, 3) if self.max_pool_size else 0.0,
+                'checkouts': self.checkouts,
+                'checkoutFailures': dict(self.checkout_failures),
+                'waitMs': {
+                    'avg': round(self.total_wait_ms / self.checkouts, 3) if self.checkouts else 0.0,
+                    'p50': percentile(0.50),
+                    'p95': percentile(0.95),
+                    'p99': percentile(0.99),
+                    'max': round(self.max_wait_ms, 3)
+                }
+            }
+
+
+class HeartbeatMonitor(monitoring.ServerHeartbeatListener, monitoring.ServerListener):
+    """
+    Open the circuit breaker when no server can take writes
+
+    Every replica set member's heartbeats arrive here. Each one records
+    whether that member is writable (primary, standalone or mongos); a failed
+    heartbeat counts against the breaker only while no member is writable,
+    and only a writable member's heartbeat closes it. One failing secondary
+    does not open it, and a healthy secondary does not close it while there
+    is no primary.
+    """
+
+    def __init__(self, breaker):
+        self.breaker = breaker
+        self._lock = threading.Lock()
+        self._writable = {}
+
+    def _record(self, address, writable):
+        """Store one member's state; True while any member is writable"""
+        with self._lock:
+            self._writable[address] = writable
+            return any(self._writable.values())
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self._record(event.connection_id, event.reply.is_writable)
+        if event.reply.is_writable:
+            self.breaker.record_success()
+
+    def failed(self, event):
+        if not self._record(event.connection_id, False):
+            self.breaker.record_failure(event.reply)
+
+    def opened(self, event):
+        pass
+
+    def description_changed(self, event):
+        pass
+
+    def closed(self, event):
+        # A member removed from the topology
+        with self._lock:
+            self._writable.pop(event.server_address, None)
+
+
+def pool_size_from_workers():
+    """
+    maxPoolSize per worker process
+
+    Each request thread holds at most one connection at a time, plus a few
+    background threads (slow query recorder, index builder, ...). When
+    MONGO_MAX_TOTAL_CONNECTIONS is set, the budget is split across workers.
+    """
+    if os.getenv('MONGO_MAX_POOL_SIZE'):
+        return int(os.getenv('MONGO_MAX_POOL_SIZE'))
+
+    workers = max(1, int(os.getenv('WEB_CONCURRENCY', 1)))
+    threads = max(1, int(os.getenv('WEB_THREADS', 8)))
+    headroom = int(os.getenv('MONGO_POOL_HEADROOM', 4))
+    pool_size = threads + headroom
+
+    total_budget = os.getenv('MONGO_MAX_TOTAL_CONNECTIONS')
+    if total_budget:
+        pool_size = min(pool_size, max(1, int(total_budget) // workers))
+    return pool_size
+
+
+class MongoClientManager:
+    """
+    Owns the MongoClient of this process
+
+    The client is created lazily on first use, so with a pre-forking server
+    every worker opens its own client after fork. A client inherited from the
+    parent process is discarded (never used or closed) in the child.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._client = None
+        self._db = None
+        self._pid = None
+        self.mongo_uri = None
+        self.database_name = None
+        self.breaker = CircuitBreaker(
+            failure_threshold=int(os.getenv('MONGO_BREAKER_FAILURE_THRESHOLD', 3)),
+            cooldown=int(os.getenv('MONGO_BREAKER_COOLDOWN_SECONDS', 30))
+        )
+        self.pool_monitor = PoolMonitor()
+        self.heartbeat_monitor = HeartbeatMonitor(self.breaker)
+
+    @property
+    def client(self):
+        return self._client if self._pid == os.getpid() else None
+
+    def configure(self, app=None):
+        """Read connection settings; does not connect"""
+        # Priority: Use MONGO_URI from app config / environment (Docker/Production) or fall back to local
+        mongo_uri = (app.config.get('MONGO_URI') if app else None) or os.getenv('MONGO_URI')
+        if not mongo_uri:
+            mongo_uri = os.getenv('MONGO_LOCAL_URI', FALLBACK_URI)
+        self.mongo_uri = mongo_uri
+        self.database_name = os.getenv('MONGO_DATABASE', 'tripook')
+
+    def forget_client(self):
+        """Drop the client inherited from a parent process (called in the child after fork)"""
+        self._client = None
+        self._db = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self.pool_monitor = PoolMonitor()
+        self.breaker = CircuitBreaker(failure_threshold=self.breaker.failure_threshold, cooldown=self.breaker.cooldown)
+        self.heartbeat_monitor = HeartbeatMonitor(self.breaker)
+
+    def get_db(self):
+        if self._pid == os.getpid() and self._db is not None:
+            if self.breaker.state == 'open':
+                raise DatabaseUnavailable(f"MongoDB unavailable: {self.breaker.last_error}")
+            return self._db
+
+        if not self.breaker.allow_request():
+            raise DatabaseUnavailable(f"MongoDB unavailable: {self.breaker.last_error}")
+
+        with self._lock:
+            if self._pid == os.getpid() and self._db is not None:
+                self.breaker.record_success()
+                return self._db
+            return self._connect()
+
+    def _new_client(self, mongo_uri, pool_size):
+        return MongoClient(
+            mongo_uri,
+            serverSelectionTimeoutMS=int(os.getenv('MONGO_SERVER_SELECTION_TIMEOUT_MS', 5000)),
+            connectTimeoutMS=int(os.getenv('MONGO_CONNECT_TIMEOUT_MS', 5000)),
+            waitQueueTimeoutMS=int(os.getenv('MONGO_WAIT_QUEUE_TIMEOUT_MS', 2000)),
+            maxPoolSize=pool_size,
+            minPoolSize=min(2, pool_size),
+            retryWrites=True,
+            connect=False,
+            event_listeners=[command_profiler, slow_query_listener, self.pool_monitor, self.heartbeat_monitor]
         )
-        db = client[database_name]
-        db.command('ping')
-        
-        # Determine connection type for logging
-        if 'mongodb.net' in mongo_uri or 'atlas' in mongo_uri.lower():
-            print(f"✅ Connected to MongoDB Atlas: {database_name}")
-        else:
-            print(f"✅ Connected to MongoDB: {database_name}")
-        connected = True
-    except Exception as error:
-        print(f"❌ MongoDB connection failed: {error}")
-    
-    # If still not connected, try one more fallback
-    if not connected:
-        try:
-            print("🔄 Trying fallback connection...")
-            fallback_uri = 'mongodb://localhost:27017/tripook'
-            client = MongoClient(fallback_uri, serverSelectionTimeoutMS=2000)
-            db = client[database_name]
-            db.command('ping')
-            print(f"✅ Connected to fallback MongoDB: {database_name}")
-            connected = True
-        except Exception as fallback_error:
-            print(f"❌ Fallback connection failed: {fallback_error}")
-    
-    # If both failed, create a mock db instance but don't crash
-    if not connected:
-        print("⚠️  No MongoDB connection available. Server will start but database operations will fail.")
-        try:
-            # Create a basic client that will fail gracefully
-            client = MongoClient("mongodb://localhost:27017", serverSelectionTimeoutMS=1000)
-            db = client[database_name]
-        except Exception as final_error:
-            print(f"Could not create MongoDB client: {final_error}")
-            raise RuntimeError("No MongoDB connection could be established")
+
+    def _connect(self):
+        if self.mongo_uri is None:
+            self.configure(current_app if has_app_context() else None)
+
+        pool_size = pool_size_from_workers()
+        candidates = [self.mongo_uri]
+        if self.mongo_uri != FALLBACK_URI:
+            candidates.append(FALLBACK_URI)
+
+        last_error = None
+        for mongo_uri in candidates:
+            client = None
+            try:
+                print(f"🔗 Connecting to MongoDB (pid {os.getpid()}, maxPoolSize={pool_size})...")
+                client = self._new_client(mongo_uri, pool_size)
+                db = client[self.database_name]
+                db.command('ping')
+            except PyMongoError as error:
+                print(f"❌ MongoDB connection failed: {error}")
+                last_error = error
+                if client is not None:
+                    client.close()
+                continue
+
+            # Determine connection type for logging
+            if 'mongodb.net' in mongo_uri or 'atlas' in mongo_uri.lower():
+                print(f"✅ Connected to MongoDB Atlas: {self.database_name}")
+            else:
+                print(f"✅ Connected to MongoDB: {self.database_name}")
+
+            self._client = client
+            self._db = db
+            self._pid = os.getpid()
+            self.pool_monitor.max_pool_size = pool_size
+            self.breaker.record_success()
+
+            # Create declared model indexes that are missing and report drift
+            from app.utils.indexes import ensure_indexes_in_background
+            ensure_indexes_in_background(db)
+            # Fill the business rollups on first deployment
+            from app.models.daily_rollup import DailyRollup
+            DailyRollup.backfill_in_background()
+            return db
+
+        # Server selection already timed out on every candidate
+        self.breaker.record_failure(last_error, trip=True)
+        print(f"⚠️  No MongoDB connection available. Failing fast for {self.breaker.cooldown}s.")
+        raise DatabaseUnavailable(f"MongoDB unavailable: {last_error}")
+
+    def close(self):
+        if self.client:
+            self._client.close()
+            print("MongoDB connection closed")
+        self._client = None
+        self._db = None
+        self._pid = None
+
+    def metrics(self):
+        return {
+            'pid': os.getpid(),
+            'connected': self._pid == os.getpid() and self._db is not None,
+            'circuitBreaker': self.breaker.snapshot(),
+            'pool': self.pool_monitor.snapshot()
+        }
+
+
+client_manager = MongoClientManager()
+
+# A client must never be shared with a forked child: forget it there
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=client_manager.forget_client)
+
+
+def init_db(app):
+    """Configure the MongoDB connection; the client is created on first use in each process"""
+    client_manager.configure(app)
 
 def get_db():
-    """Get database instance"""
-    global db, client
-    if db is None:
-        # Try to reconnect if database connection was lost
-        try:
-            from flask import current_app
-            if current_app:
-                init_db(current_app)
-                if db is not None:
-                    return db
-        except RuntimeError:
-            pass
-        raise RuntimeError("Database not initialized. Call init_db() first.")
-    return db
+    """Get database instance (connects lazily, fails fast while MongoDB is down)"""
+    return client_manager.get_db()
 
 def close_db():
     """Close database connection"""
-    global client
-    if client:
-        client.close()
-        print("MongoDB connection closed")
\ No newline at end of file
+    client_manager.close()
@@ -0,0 +1,224 @@
+"""
+Registered Emails - process-local Bloom filter of registered email addresses
+
+/api/registration/check-email is called on every pause in typing. Most of the
+emails checked are not registered, and a Bloom filter answers that without a
+database round trip: an email that is not in the filter is certainly free.
+An email that is in the filter is confirmed with an indexed, projected _id
+lookup (User.find_login_document), so a false positive (EMAIL_BLOOM_ERROR_RATE
+of the free emails) only costs the query every check used to make.
+
+The filter is built in a background thread from a streaming projection of
+users.email / users.email_normalized, when a worker starts or on first use;
+until it is ready every check goes to MongoDB. Registrations and email
+changes in this process are added as they happen. Those of other workers are
+picked up every EMAIL_BLOOM_REFRESH_SECONDS by reading the users inserted
+(an _id range scan) or whose email changed (emailChangedAt, set by User.save
+and the admin user update) since the last refresh, and the whole filter is
+rebuilt every
+EMAIL_BLOOM_REBUILD_SECONDS, or sooner once it holds more emails than it was
+sized for. Deleted users stay in the filter until the next rebuild; they are
+only false positives.
+"""
+import hashlib
+import math
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from bson import ObjectId
+from app.utils.database import get_db
+
+# Users whose ObjectId or emailChangedAt is this much older than the previous refresh
+# are read again, so a clock difference between app servers cannot hide a change
+REFRESH_OVERLAP = timedelta(seconds=60)
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings using double hashing of one BLAKE2b digest"""
+
+    def __init__(self, capacity, error_rate):
+        capacity = max(capacity, 1)
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def _positions(self, value):
+        digest = hashlib.blake2b(value.encode('utf-8'), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little') | 1
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+    def add(self, value):
+        """Set the bits of value; values already present are not counted again"""
+        positions = self._positions(value)
+        with self._lock:
+            added = False
+            for position in positions:
+                mask = 1 << (position & 7)
+                if not self.bits[position >> 3] & mask:
+                    self.bits[position >> 3] |= mask
+                    added = True
+            self.count += added
+
+    def __contains__(self, value):
+        bits = self.bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(value))
+
+
+class RegisteredEmails:
+    """Bloom filter of normalized registered emails with a MongoDB-confirmed lookup"""
+
+    def __init__(self):
+        self.enabled = os.getenv('EMAIL_BLOOM_ENABLED', 'true').lower() == 'true'
+        self.error_rate = float(os.getenv('EMAIL_BLOOM_ERROR_RATE', 0.01))
+        self.min_capacity = int(os.getenv('EMAIL_BLOOM_MIN_CAPACITY', 100000))
+        self.refresh_interval = float(os.getenv('EMAIL_BLOOM_REFRESH_SECONDS', 5))
+        self.rebuild_interval = float(os.getenv('EMAIL_BLOOM_REBUILD_SECONDS', 3600))
+        self._reset()
+
+    def _reset(self):
+        self._lock = threading.Lock()
+        self._refreshing = threading.Lock()
+        self._filter = None
+        self._builder = None
+        self._build_started_at = None
+        self._built_at = 0.0
+        self._refreshed_at = 0.0
+        self._watermark = None
+        self.counters = {'skipped': 0, 'confirmed': 0, 'falsePositives': 0, 'unbuilt': 0, 'builds': 0}
+
+    def _count(self, counter):
+        with self._lock:
+            self.counters[counter] += 1
+
+    @staticmethod
+    def normalize(email):
+        from app.models.user import User
+        return User.normalize_identifier(email)
+
+    # Building
+
+    def start(self):
+        """Build the filter in a background thread unless it is being built or a build just failed"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            if self._builder is not None and self._builder.is_alive():
+                return self._builder
+            if self._build_started_at is not None and time.monotonic() - self._build_started_at < self.refresh_interval:
+                return None
+            self._build_started_at = time.monotonic()
+            self._builder = threading.Thread(target=self._build_quietly, name='email-bloom', daemon=True)
+            self._builder.start()
+            return self._builder
+
+    def _build_quietly(self):
+        try:
+            self.build()
+        except Exception as e:
+            print(f"⚠️  Registered email filter not built: {e}")
+
+    def build(self):
+        """Stream every registered email into a new filter and swap it in; returns the email count"""
+        started = time.monotonic()
+        watermark = datetime.utcnow()
+        users = get_db().users
+        capacity = max(self.min_capacity, users.estimated_document_count() * 2)
+        bloom = BloomFilter(capacity, self.error_rate)
+        for document in users.find({}, {'_id': 0, 'email': 1, 'email_normalized': 1}, batch_size=5000):
+            email = self.normalize(document.get('email_normalized') or document.get('email'))
+            if email:
+                bloom.add(email)
+
+        with self._lock:
+            self._filter = bloom
+            self._built_at = self._refreshed_at = time.monotonic()
+            self._watermark = watermark
+            self.counters['builds'] += 1
+        print(f"🌸 Registered email filter built: {bloom.count} emails, {len(bloom.bits) // 1024} KiB, "
+              f"{bloom.hashes} hashes in {(time.monotonic() - started) * 1000:.0f} ms")
+        return bloom.count
+
+    def _refresh(self):
+        """Add users inserted or whose email changed since the last refresh; rebuild when the filter is old or full"""
+        bloom = self._filter
+        if time.monotonic() - self._built_at > self.rebuild_interval or bloom.count > bloom.capacity:
+            # Keep answering from the current filter while the new one is built
+            self.start()
+            return
+        watermark = datetime.utcnow()
+        since = self._watermark - REFRESH_OVERLAP
+        changed = {'$or': [{'_id': {'$gt': ObjectId.from_datetime(since)}}, {'emailChangedAt': {'$gt': since}}]}
+        for document in get_db().users.find(changed, {'_id': 0, 'email': 1, 'email_normalized': 1}):
+            email = self.normalize(document.get('email_normalized') or document.get('email'))
+            if email:
+                bloom.add(email)
+        self._watermark = watermark
+        self._refreshed_at = time.monotonic()
+
+    # Lookups
+
+    def add(self, email):
+        """Record a registration or email change made by this process"""
+        bloom = self._filter
+        email = self.normalize(email)
+        if bloom is not None and email:
+            bloom.add(email)
+
+    def is_registered(self, email):
+        """True if a user with this email (any case) exists"""
+        from app.models.user import User
+
+        email = self.normalize(email)
+        bloom = self._filter if self.enabled else None
+        if bloom is None:
+            if self.enabled:
+                self.start()
+                self._count('unbuilt')
+            return User.find_login_document(email, projection={'_id': 1}) is not None
+
+        # One request at a time catches up; the others use the filter as it is
+        if time.monotonic() - self._refreshed_at > self.refresh_interval and self._refreshing.acquire(blocking=False):
+            try:
+                self._refresh()
+            finally:
+                self._refreshing.release()
+
+        if email not in bloom:
+            self._count('skipped')
+            return False
+        registered = User.find_login_document(email, projection={'_id': 1}) is not None
+        self._count('confirmed' if registered else 'falsePositives')
+        return registered
+
+    def forget_filter(self):
+        """Drop a build running in the parent process (called in the child after fork)"""
+        bloom, watermark, built_at = self._filter, self._watermark, self._built_at
+        self._reset()
+        # A filter that was complete before the fork is still valid in the child
+        self._filter, self._watermark, self._built_at, self._refreshed_at = bloom, watermark, built_at, built_at
+
+    def stats(self):
+        bloom = self._filter
+        with self._lock:
+            stats = {'enabled': self.enabled, 'built': bloom is not None, **self.counters}
+        if bloom is not None:
+            stats.update({
+                'emails': bloom.count,
+                'capacity': bloom.capacity,
+                'bytes': len(bloom.bits),
+                'hashes': bloom.hashes,
+                'errorRate': bloom.error_rate,
+                'ageSeconds': round(time.monotonic() - self._built_at)
+            })
+        return stats
+
+
+registered_emails = RegisteredEmails()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=registered_emails.forget_filter)
@@ -0,0 +1,181 @@
+"""
+Index Registry - reconcile the indexes declared on each model with MongoDB
+
+Every model declares COLLECTION and INDEXES (a list of pymongo IndexModel).
+ensure_indexes() creates the declared indexes that are missing and reports
+drift: declared indexes whose definition differs from the one in MongoDB and
+indexes that exist in MongoDB but are not declared anywhere. Nothing is
+ever dropped automatically; a changed TTL (expireAfterSeconds) on an
+existing index is applied in place with collMod. Indexes in JOB_MANAGED_TTL
+get their TTL from a maintenance job instead, so it is neither set nor
+reported as drift here.
+"""
+import os
+import threading
+from pymongo import ASCENDING, IndexModel
+from pymongo.errors import PyMongoError
+
+# Collections without a model class
+STANDALONE_INDEXES = {
+    'email_verifications': [
+        # verify-email consumes a code with one equality match on all three fields
+        IndexModel([('email', ASCENDING), ('code', ASCENDING), ('isUsed', ASCENDING)], name='email_code_is_used'),
+        IndexModel([('email', ASCENDING), ('createdAt', ASCENDING)], name='email_created_at'),
+        # Expired codes are purged a day after expiry; until then verify-email can still say "expired"
+        IndexModel([('expiresAt', ASCENDING)], name='expires_at_ttl', expireAfterSeconds=86400)
+    ],
+    'email_outbox': [
+        IndexModel([('status', ASCENDING), ('nextAttemptAt', ASCENDING)], name='status_next_attempt'),
+        IndexModel([('idempotencyKey', ASCENDING)], name='idempotency_key_unique', unique=True),
+        IndexModel([('expiresAt', ASCENDING)], name='expires_at_ttl', expireAfterSeconds=0)
+    ],
+    'rate_limits': [
+        IndexModel([('expiresAt', ASCENDING)], name='expires_at_ttl', expireAfterSeconds=0)
+    ],
+    'response_cache': [
+        IndexModel([('expiresAt', ASCENDING)], name='expires_at_ttl', expireAfterSeconds=0)
+    ]
+}
+
+# (collection, index name) whose expireAfterSeconds is applied by a job once it is
+# safe to delete: login_timestamp by app/services/login_retention.py after folding
+JOB_MANAGED_TTL = {('login_activities', 'login_timestamp')}
+
+# Index options that must match for an existing index to count as the declared one
+COMPARED_OPTIONS = ('unique', 'sparse', 'partialFilterExpression', 'expireAfterSeconds')
+
+
+def declared_indexes():
+    """Map of collection name -> declared IndexModel list"""
+    from app.models import User, Trip, Activity, Booking, Favorite, Payment, Review, Service
+    from app.models.login_activity import LoginActivity
+    from app.models.login_rollup import LoginRollup
+    from app.models.daily_rollup import DailyRollup
+
+    registry = {}
+    for model in (User, Trip, Activity, Booking, Favorite, Payment, Review, Service, LoginActivity, LoginRollup, DailyRollup):
+        registry.setdefault(model.COLLECTION, []).extend(model.INDEXES)
+    for collection_name, indexes in STANDALONE_INDEXES.items():
+        registry.setdefault(collection_name, []).extend(indexes)
+    return registry
+
+
+def _key_of(definition):
+    key = definition['key'].items() if hasattr(definition['key'], 'items') else definition['key']
+    return [(field, direction if isinstance(direction, str) else int(direction)) for field, direction in key]
+
+
+def _options_of(definition, compared=COMPARED_OPTIONS):
+    return {option: definition.get(option) for option in compared if definition.get(option) is not None}
+
+
+def _ttl_changed_only(current, document):
+    """True when an existing index differs from its declaration only in a (new or changed) expireAfterSeconds"""
+    if 'expireAfterSeconds' not in document or _key_of(current) != _key_of(document):
+        return False
+    current_options = {option: value for option, value in _options_of(current).items() if option != 'expireAfterSeconds'}
+    declared_options = {option: value for option, value in _options_of(document).items() if option != 'expireAfterSeconds'}
+    return current_options == declared_options and current.get('expireAfterSeconds') != document['expireAfterSeconds']
+
+
+def reconcile_collection(collection, indexes):
+    """Create missing declared indexes on one collection and return its drift report"""
+    report = {'created': [], 'modified': [], 'changed': [], 'renamed': [], 'undeclared': [], 'errors': []}
+    existing = collection.index_information()
+    existing_by_key = {tuple(_key_of(info)): name for name, info in existing.items()}
+
+    declared_names = set()
+    to_create = []
+    to_modify = []
+    for index in indexes:
+        document = index.document
+        name = document['name']
+        key = _key_of(document)
+        declared_names.add(name)
+
+        if name in existing:
+            current = existing[name]
+            compared = COMPARED_OPTIONS
+            if (collection.name, name) in JOB_MANAGED_TTL:
+                compared = tuple(option for option in COMPARED_OPTIONS if option != 'expireAfterSeconds')
+            if _ttl_changed_only(current, document):
+                to_modify.append((name, document['expireAfterSeconds']))
+            elif _key_of(current) != key or _options_of(current, compared) != _options_of(document, compared):
+                report['changed'].append({
+                    'name': name,
+                    'declared': {'key': key, **_options_of(document)},
+                    'existing': {'key': _key_of(current), **_options_of(current)}
+                })
+        elif tuple(key) in existing_by_key:
+            report['renamed'].append({'name': name, 'existing_name': existing_by_key[tuple(key)]})
+            declared_names.add(existing_by_key[tuple(key)])
+        else:
+            to_create.append(index)
+
+    for index in to_create:
+        try:
+            options = {option: value for option, value in index.document.items() if option != 'key'}
+            collection.create_index(list(index.document['key'].items()), background=True, **options)
+            report['created'].append(index.document['name'])
+        except PyMongoError as e:
+            report['errors'].append({'name': index.document['name'], 'error': str(e)})
+
+    for name, expire_after in to_modify:
+        try:
+            collection.database.command('collMod', collection.name, index={'name': name, 'expireAfterSeconds': expire_after})
+            report['modified'].append(name)
+        except PyMongoError as e:
+            report['errors'].append({'name': name, 'error': str(e)})
+
+    report['undeclared'] = [name for name in existing if name != '_id_' and name not in declared_names]
+    return report
+
+
+def ensure_indexes(db, registry=None):
+    """Reconcile all declared indexes; returns {collection: report} for collections with changes or drift"""
+    registry = registry or declared_indexes()
+    reports = {}
+    for collection_name, indexes in registry.items():
+        try:
+            report = reconcile_collection(db[collection_name], indexes)
+        except PyMongoError as e:
+            report = {'created': [], 'modified': [], 'changed': [], 'renamed': [], 'undeclared': [], 'errors': [{'name': None, 'error': str(e)}]}
+        if any(report.values()):
+            reports[collection_name] = report
+    _print_report(reports)
+    return reports
+
+
+def ensure_indexes_in_background(db):
+    """Run ensure_indexes() in a daemon thread so startup is not blocked by index builds"""
+    if os.getenv('MONGO_ENSURE_INDEXES', 'true').lower() != 'true':
+        return None
+
+    def run():
+        try:
+            ensure_indexes(db)
+        except Exception as e:
+            print(f"❌ Index reconciliation failed: {e}")
+
+    thread = threading.Thread(target=run, name='ensure-indexes', daemon=True)
+    thread.start()
+    return thread
+
+
+def _print_report(reports):
+    if not reports:
+        print("✅ MongoDB indexes are in sync with model declarations")
+        return
+    for collection_name, report in reports.items():
+        for name in report['created']:
+            print(f"🔧 Created index {collection_name}.{name}")
+        for name in report['modified']:
+            print(f"🔧 Changed TTL of index {collection_name}.{name}")
+        for item in report['changed']:
+            print(f"⚠️  Index drift {collection_name}.{item['name']}: declared {item['declared']}, found {item['existing']}")
+        for item in report['renamed']:
+            print(f"⚠️  Index drift {collection_name}.{item['name']}: same key exists as '{item['existing_name']}'")
+        for name in report['undeclared']:
+            print(f"⚠️  Undeclared index {collection_name}.{name}")
+        for item in report['errors']:
+            print(f"❌ Could not create index {collection_name}.{item['name']}: {item['error']}")
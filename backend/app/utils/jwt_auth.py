@@ -1,41 +1,132 @@
 import jwt
+import os
 from datetime import datetime, timedelta
+from bson import ObjectId
+from bson.errors import InvalidId
 from flask import current_app
 from functools import wraps
-from flask import request, jsonify
+from flask import request, jsonify, g
 from app.models.user import User
+from app.utils.database import get_db
+from app.utils.principal_cache import principal_cache
 
-def generate_token(user_id, remember_me=False):
-    """Generate JWT token for user"""
-    # Set token expiration based on remember_me
-    expiration_time = timedelta(days=30) if remember_me else timedelta(days=1)
-    
-    payload = {
-        'user_id': str(user_id),
-        'exp': datetime.utcnow() + expiration_time,
-        'iat': datetime.utcnow(),
-        'remember_me': remember_me
+def refresh_tokens_enabled():
+    """Short-lived access token + refresh token mode (JWT_REFRESH_TOKENS=true)"""
+    return os.getenv('JWT_REFRESH_TOKENS', 'false').lower() == 'true'
+
+def _access_token_lifetime():
+    return timedelta(minutes=int(os.getenv('JWT_ACCESS_TOKEN_MINUTES', 15)))
+
+def _user_value(user, key, attribute=None, default=None):
+    """Read a field from a user document or a User object"""
+    if isinstance(user, dict):
+        return user.get(key, default)
+    return getattr(user, attribute or key, default)
+
+def user_claims(user):
+    """Role, status and token version claims for a user document or User object"""
+    return {
+        'role': _user_value(user, 'role', default='user'),
+        'status': _user_value(user, 'status', default='active'),
+        'account_status': _user_value(user, 'accountStatus', 'account_status', 'active'),
+        'tv': _user_value(user, 'tokenVersion', 'token_version', 0)
     }
-    
+
+def _encode(payload):
     return jwt.encode(
         payload,
         current_app.config['SECRET_KEY'],
         algorithm='HS256'
     )
 
-def decode_token(token):
-    """Decode JWT token and return user_id"""
+def generate_token(user_id, remember_me=False, user=None):
+    """Generate JWT token for user (a short-lived access token in refresh token mode)"""
+    now = datetime.utcnow()
+    payload = {
+        'user_id': str(user_id),
+        'iat': now,
+        'remember_me': remember_me
+    }
+    if user is not None:
+        payload.update(user_claims(user))
+    
+    if refresh_tokens_enabled():
+        payload['type'] = 'access'
+        payload['exp'] = now + _access_token_lifetime()
+    else:
+        # Set token expiration based on remember_me
+        expiration_time = timedelta(days=30) if remember_me else timedelta(days=1)
+        payload['exp'] = now + expiration_time
+    
+    return _encode(payload)
+
+def generate_refresh_token(user_id, token_version=0, remember_me=False):
+    """Generate long-lived refresh token; revoked by bumping the user's tokenVersion"""
+    expiration_time = timedelta(days=30) if remember_me else timedelta(days=1)
+    return _encode({
+        'user_id': str(user_id),
+        'type': 'refresh',
+        'tv': token_version,
+        'exp': datetime.utcnow() + expiration_time,
+        'iat': datetime.utcnow(),
+        'remember_me': remember_me
+    })
+
+def issue_tokens(user, remember_me=False):
+    """Token fields for a login response: token (+ refresh_token and expires_in in refresh token mode)"""
+    user_id = _user_value(user, '_id')
+    tokens = {'token': generate_token(user_id, remember_me, user=user)}
+    if refresh_tokens_enabled():
+        tokens['refresh_token'] = generate_refresh_token(user_id, user_claims(user)['tv'], remember_me)
+        tokens['expires_in'] = int(_access_token_lifetime().total_seconds())
+    return tokens
+
+def decode_claims(token, token_type='access'):
+    """Decode JWT token and return its payload; tokens without a type are access tokens"""
     try:
         payload = jwt.decode(
             token,
             current_app.config['SECRET_KEY'],
             algorithms=['HS256']
         )
-        return payload['user_id']
     except jwt.ExpiredSignatureError:
         return None
     except jwt.InvalidTokenError:
         return None
+    if payload.get('type', 'access') != token_type:
+        return None
+    return payload
+
+def decode_token(token):
+    """Decode JWT token and return user_id"""
+    payload = decode_claims(token)
+    return payload['user_id'] if payload else None
+
+def principal_from_claims(payload):
+    """
+    Principal built from a short-lived access token, or None
+
+    Only access tokens issued in refresh token mode are trusted for role and
+    status: they expire within minutes, so a role change or block reaches them
+    on the next refresh. Long-lived tokens always go through the principal cache.
+    """
+    if payload.get('type') != 'access' or 'role' not in payload:
+        return None
+    try:
+        user_id = ObjectId(payload['user_id'])
+    except (InvalidId, TypeError):
+        return None
+    return {
+        '_id': user_id,
+        'role': payload['role'],
+        'status': payload.get('status', 'active'),
+        'accountStatus': payload.get('account_status', 'active')
+    }
+
+def revoke_user_tokens(user_id):
+    """Bump the user's token version so existing refresh tokens stop working"""
+    get_db().users.update_one({'_id': ObjectId(user_id)}, {'$inc': {'tokenVersion': 1}})
+    principal_cache.invalidate(user_id)
 
 def token_required(f):
     """Decorator to require JWT authentication"""
@@ -55,18 +146,27 @@ def token_required(f):
             return jsonify({'message': 'Token is missing'}), 401
         
         # Decode token and get user
-        user_id = decode_token(token)
-        if not user_id:
+        payload = decode_claims(token)
+        if not payload:
             return jsonify({'message': 'Token is invalid or expired'}), 401
+        user_id = payload['user_id']
         
-        # Find user in database
-        current_user = User.find_by_id(user_id)
-        if not current_user:
+        # Role/status from a short-lived access token, else the cached projection
+        principal = principal_from_claims(payload) or principal_cache.get(user_id)
+        if not principal:
             return jsonify({'message': 'User not found'}), 401
         
-        # Add current user to request context
-        request.current_user = current_user
+        # Add current user to request context; the full document is loaded by get_current_user()
+        request.current_user_id = user_id
+        request.principal = principal
         
         return f(*args, **kwargs)
     
-    return decorated
\ No newline at end of file
+    return decorated
+
+def get_current_user():
+    """Full User of the authenticated request, loaded at most once per request"""
+    if 'current_user' not in g:
+        user_id = getattr(request, 'current_user_id', None)
+        g.current_user = User.find_by_id(user_id) if user_id else None
+    return g.current_user
\ No newline at end of file
@@ -0,0 +1,149 @@
+"""
+Pagination - keyset (cursor) and page-number modes for the admin listings
+
+    documents, pagination = paginate(db.users, query, 'createdAt')
+
+Listings are sorted newest first on (sort_field, _id), both descending, and
+served by an index on those two keys.
+
+Page-number mode (?page=3&limit=20, the default) is kept for existing
+clients: skip/limit plus an exact count_documents on every request.
+
+Cursor mode starts with ?cursor= (empty) and continues with the nextCursor
+of the previous response. The cursor is an opaque token holding the sort
+key of the last document returned; the next page is the documents strictly
+after it, read straight from the index, so deep pages cost the same as the
+first one and rows do not shift when new documents are inserted. The total
+is optional in this mode:
+
+    total=exact   count_documents, as in page mode
+    total=none    no count at all
+    (default)     estimated_document_count for an unfiltered listing, else
+                  count_documents cached for PAGINATION_COUNT_TTL_SECONDS
+
+and pagination.totalSource says which one was used.
+"""
+import base64
+import os
+import threading
+import time
+from collections import OrderedDict
+import bson
+from bson import json_util
+from flask import request
+
+DEFAULT_LIMIT = 20
+MAX_CURSOR_LIMIT = int(os.getenv('PAGINATION_MAX_LIMIT', 100))
+
+
+class InvalidCursor(ValueError):
+    """A cursor that was not issued for this listing"""
+
+
+def encode_cursor(sort_field, value, document_id):
+    payload = bson.encode({'f': sort_field, 'v': value, 'id': document_id})
+    return base64.urlsafe_b64encode(payload).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token, sort_field):
+    """(value, _id) of the last document of the previous page"""
+    try:
+        payload = bson.decode(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+    except Exception:
+        raise InvalidCursor('Malformed cursor')
+    if payload.get('f') != sort_field or 'id' not in payload:
+        raise InvalidCursor('Cursor of another listing')
+    return payload.get('v'), payload['id']
+
+
+def after(sort_field, value, document_id):
+    """Filter for the documents after (value, document_id) in descending (sort_field, _id) order"""
+    if value is None:
+        # Documents without the field sort last; only the _id is left to page on
+        return {sort_field: None, '_id': {'$lt': document_id}}
+    return {'$or': [
+        {sort_field: {'$lt': value}},
+        {sort_field: value, '_id': {'$lt': document_id}},
+        {sort_field: None}
+    ]}
+
+
+class CountCache:
+    """Process-local TTL cache of count_documents results per collection and filter"""
+
+    def __init__(self, ttl=None, max_size=1000):
+        self.ttl = ttl if ttl is not None else float(os.getenv('PAGINATION_COUNT_TTL_SECONDS', 60))
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def count(self, collection, query):
+        key = f"{collection.name}:{json_util.dumps(query)}"
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and now - entry[0] < self.ttl:
+                return entry[1]
+        total = collection.count_documents(query)
+        with self._lock:
+            self._entries[key] = (now, total)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return total
+
+
+count_cache = CountCache()
+
+
+def _limit(default=DEFAULT_LIMIT):
+    return max(1, int(request.args.get('limit', default)))
+
+
+def paginate(collection, query, sort_field, pages_key='pages'):
+    """
+    One page of collection matching query, newest sort_field first, in the
+    mode chosen by the request (see module docstring); returns (documents,
+    pagination dict for the response)
+    """
+    sort = [(sort_field, -1), ('_id', -1)]
+    if 'cursor' not in request.args:
+        page = int(request.args.get('page', 1))
+        limit = _limit()
+        total = collection.count_documents(query)
+        documents = list(collection.find(query).sort(sort).skip((page - 1) * limit).limit(limit))
+        return documents, {
+            'page': page,
+            'limit': limit,
+            'total': total,
+            pages_key: (total + limit - 1) // limit
+        }
+
+    limit = min(_limit(), MAX_CURSOR_LIMIT)
+    page_query = query
+    token = request.args.get('cursor')
+    if token:
+        position = after(sort_field, *decode_cursor(token, sort_field))
+        page_query = {'$and': [query, position]} if query else position
+    documents = list(collection.find(page_query).sort(sort).limit(limit + 1))
+    has_more = len(documents) > limit
+    documents = documents[:limit]
+
+    mode = request.args.get('total', '')
+    if mode == 'exact':
+        total, source = collection.count_documents(query), 'exact'
+    elif mode == 'none':
+        total, source = None, None
+    elif not query:
+        total, source = collection.estimated_document_count(), 'estimated'
+    else:
+        total, source = count_cache.count(collection, query), 'cached'
+
+    last = documents[-1] if documents else None
+    return documents, {
+        'limit': limit,
+        'hasMore': has_more,
+        'nextCursor': encode_cursor(sort_field, last.get(sort_field), last['_id']) if has_more else None,
+        'total': total,
+        'totalSource': source
+    }
@@ -0,0 +1,180 @@
+"""
+Password Hashing - run password hashing in a bounded process pool
+
+Hashing and verifying passwords is deliberately slow. Doing it on request
+threads lets a burst of logins tie up every worker, so the work is sent to
+a small pool of processes instead. Routes that hash are decorated with
+@hashing_admission: when all hashing slots are taken the request gets a 429
+right away and cheap endpoints keep their latency.
+
+verify_password() also reports whether a hash uses a legacy scheme (bcrypt
+or older werkzeug parameters) so callers can rehash it after a successful
+login.
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import wraps
+from flask import request, jsonify
+
+# Scheme for new hashes; hashes with any other method prefix are upgraded on login
+CURRENT_METHOD = os.getenv('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+
+
+def _hash(password, method):
+    from werkzeug.security import generate_password_hash
+    return generate_password_hash(password, method=method)
+
+
+def _verify(password_hash, password):
+    """(valid, needs_rehash) for a werkzeug or legacy bcrypt hash"""
+    if password_hash.startswith('$2'):
+        import bcrypt
+        try:
+            return bcrypt.checkpw(password.encode('utf-8'), password_hash.encode('utf-8')), True
+        except ValueError:
+            return False, False
+
+    from werkzeug.security import check_password_hash
+    try:
+        valid = check_password_hash(password_hash, password)
+    except (ValueError, TypeError):
+        return False, False
+    return valid, password_hash.split('$', 1)[0] != CURRENT_METHOD
+
+
+def workers_per_process():
+    """
+    Hashing processes per web worker process
+
+    Every gunicorn worker has its own pool, so the host-wide budget
+    (PASSWORD_HASH_TOTAL_WORKERS, default half the CPU cores) is split across
+    the WEB_CONCURRENCY workers, as pool_size_from_workers() splits the Mongo
+    connection budget, with at least one each. PASSWORD_HASH_WORKERS sets the
+    per-process count directly.
+    """
+    if os.getenv('PASSWORD_HASH_WORKERS'):
+        return int(os.getenv('PASSWORD_HASH_WORKERS'))
+
+    workers = max(1, int(os.getenv('WEB_CONCURRENCY', 1)))
+    total_budget = int(os.getenv('PASSWORD_HASH_TOTAL_WORKERS', max(1, multiprocessing.cpu_count() // 2)))
+    return max(1, total_budget // workers)
+
+
+class PasswordHasher:
+    """Process pool for password hashing with a fixed number of admission slots"""
+
+    def __init__(self):
+        self.workers = workers_per_process()
+        self.max_pending = int(os.getenv('PASSWORD_HASH_MAX_PENDING', max(1, self.workers) * 4))
+        self.timeout = float(os.getenv('PASSWORD_HASH_TIMEOUT_SECONDS', 10))
+        self._reset()
+
+    def _reset(self):
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._executor = None
+        self.in_flight = 0
+        self.rejected = 0
+
+    def _pool(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    # spawn: never fork a process that is running request threads
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context('spawn')
+                    )
+        return self._executor
+
+    def _run(self, fn, *args):
+        if self.workers <= 0:
+            return fn(*args)
+        try:
+            return self._pool().submit(fn, *args).result(timeout=self.timeout)
+        except BrokenProcessPool:
+            # A pool process died; start a fresh pool for the next call
+            with self._lock:
+                self._executor = None
+            raise
+
+    def try_admit(self):
+        """Take a hashing slot without waiting; False when all slots are busy"""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            return False
+        with self._lock:
+            self.in_flight += 1
+        return True
+
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
+        self._slots.release()
+
+    def hash(self, password):
+        return self._run(_hash, password, CURRENT_METHOD)
+
+    def verify(self, password_hash, password):
+        if not password_hash or not password:
+            return False, False
+        return self._run(_verify, password_hash, password)
+
+    def forget_pool(self):
+        """Drop the pool inherited from a parent process (called in the child after fork)"""
+        self._reset()
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self):
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'maxPending': self.max_pending,
+                'inFlight': self.in_flight,
+                'rejected': self.rejected,
+                'method': CURRENT_METHOD
+            }
+
+
+password_hasher = PasswordHasher()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=password_hasher.forget_pool)
+
+
+def hash_password(password):
+    """Hash a password with the current scheme"""
+    return password_hasher.hash(password)
+
+
+def verify_password(password_hash, password):
+    """Check a password; returns (valid, needs_rehash)"""
+    return password_hasher.verify(password_hash, password)
+
+
+def hashing_admission(f):
+    """Reserve a hashing slot for the request or answer 429 when hashing is saturated"""
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        if request.method == 'OPTIONS':
+            return f(*args, **kwargs)
+
+        if not password_hasher.try_admit():
+            return jsonify({
+                'success': False,
+                'message': 'Hệ thống đang bận, vui lòng thử lại sau giây lát'
+            }), 429, {'Retry-After': '1'}
+        try:
+            return f(*args, **kwargs)
+        finally:
+            password_hasher.release()
+
+    return decorated
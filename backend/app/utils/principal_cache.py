@@ -0,0 +1,85 @@
+"""
+Principal Cache - process-local TTL/LRU cache of authenticated users
+
+token_required and admin_required only need to know who the caller is and
+whether they are allowed in, so they read a trimmed projection of the user
+(PRINCIPAL_FIELDS) through this cache instead of the full document.
+
+Routes that change one of the cached fields call invalidate(user_id). Each
+worker process has its own cache, so a change made in another worker is
+seen at the latest after PRINCIPAL_CACHE_TTL_SECONDS.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from bson import ObjectId
+from bson.errors import InvalidId
+from app.utils.database import get_db
+
+# Fields kept for an authenticated user
+PRINCIPAL_FIELDS = ('email', 'name', 'role', 'status', 'accountStatus')
+
+
+class PrincipalCache:
+    """Thread-safe LRU of user id -> (loaded_at, principal) with a time to live"""
+
+    def __init__(self, ttl=None, max_size=None):
+        self.ttl = ttl if ttl is not None else float(os.getenv('PRINCIPAL_CACHE_TTL_SECONDS', 30))
+        self.max_size = max_size if max_size is not None else int(os.getenv('PRINCIPAL_CACHE_SIZE', 10000))
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id):
+        """Principal dict for user_id, loaded from MongoDB on a miss; None if the user does not exist"""
+        key = str(user_id)
+        if self.ttl > 0:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry and time.monotonic() - entry[0] < self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                self.misses += 1
+
+        principal = self._load(key)
+        if principal is not None and self.ttl > 0:
+            with self._lock:
+                self._entries[key] = (time.monotonic(), principal)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+        return principal
+
+    def _load(self, user_id):
+        try:
+            object_id = ObjectId(user_id)
+        except (InvalidId, TypeError):
+            return None
+        return get_db().users.find_one({'_id': object_id}, {field: 1 for field in PRINCIPAL_FIELDS})
+
+    def invalidate(self, user_id):
+        """Forget a user after a change to role, status or identity fields"""
+        with self._lock:
+            self._entries.pop(str(user_id), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxSize': self.max_size,
+                'ttlSeconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hitRate': round(self.hits / lookups, 3) if lookups else 0.0
+            }
+
+
+principal_cache = PrincipalCache()
@@ -0,0 +1,219 @@
+"""
+MongoDB Command Profiler - record every command issued during a Flask request
+
+The listener is attached to the MongoClient in init_db(). For each request it
+collects collection, operation, duration and document count of every command,
+flags repeated find_one shapes (N+1 loops), emits a Server-Timing header and
+keeps per-endpoint aggregates that admins can read at /api/admin/query-profile.
+"""
+import os
+import threading
+from collections import defaultdict
+from pymongo import monitoring
+from flask import g, has_request_context, request
+
+# Commands that are driver housekeeping, not application queries
+IGNORED_COMMANDS = {'ping', 'hello', 'ismaster', 'isMaster', 'endSessions', 'killCursors', 'saslStart', 'saslContinue'}
+
+# Keep at most this many detailed command records per request
+MAX_COMMANDS_PER_REQUEST = 500
+
+
+def _is_enabled():
+    return os.getenv('MONGO_PROFILING', 'true').lower() == 'true'
+
+
+def _n_plus_one_threshold():
+    return int(os.getenv('MONGO_N_PLUS_ONE_THRESHOLD', 5))
+
+
+def query_shape(value):
+    """Replace literal values in a filter with '?' so equal query shapes compare equal"""
+    if isinstance(value, dict):
+        return {key: query_shape(item) for key, item in sorted(value.items())}
+    if isinstance(value, (list, tuple)):
+        return [query_shape(item) for item in value[:1]]
+    return '?'
+
+
+def _document_count(command_name, reply):
+    """Number of documents returned or affected by a command"""
+    if not isinstance(reply, dict):
+        return 0
+    cursor = reply.get('cursor')
+    if isinstance(cursor, dict):
+        return len(cursor.get('firstBatch', cursor.get('nextBatch', [])))
+    if command_name == 'findAndModify':
+        return 1 if reply.get('value') else 0
+    return reply.get('n', 0)
+
+
+class RequestProfile:
+    """Commands recorded for a single Flask request"""
+
+    def __init__(self):
+        self.commands = []
+        self.command_count = 0
+        self.total_ms = 0.0
+        self.shape_counts = defaultdict(int)
+        self._pending = {}
+
+    def started(self, event):
+        collection = event.command.get(event.command_name)
+        if not isinstance(collection, str):
+            collection = None
+        shape = None
+        if event.command_name == 'find' and event.command.get('limit') == 1:
+            # find_one() is sent as a find with limit 1
+            shape = (collection, 'find_one', repr(query_shape(event.command.get('filter', {}))))
+        self._pending[event.request_id] = (collection, shape)
+
+    def finished(self, event, reply=None, failed=False):
+        collection, shape = self._pending.pop(event.request_id, (None, None))
+        duration_ms = event.duration_micros / 1000.0
+        self.command_count += 1
+        self.total_ms += duration_ms
+        if shape:
+            self.shape_counts[shape] += 1
+        if len(self.commands) < MAX_COMMANDS_PER_REQUEST:
+            self.commands.append({
+                'collection': collection,
+                'operation': event.command_name,
+                'duration_ms': round(duration_ms, 3),
+                'documents': 0 if failed else _document_count(event.command_name, reply),
+                'failed': failed
+            })
+
+    def repeated_shapes(self, threshold=None):
+        """find_one shapes sent at least `threshold` times in this request"""
+        threshold = threshold or _n_plus_one_threshold()
+        return [
+            {'collection': collection, 'operation': operation, 'filter': shape, 'count': count}
+            for (collection, operation, shape), count in self.shape_counts.items()
+            if count >= threshold
+        ]
+
+    def server_timing(self):
+        """Server-Timing header value for this request"""
+        parts = [f'mongo;dur={self.total_ms:.2f};desc="{self.command_count} commands"']
+        for index, repeated in enumerate(self.repeated_shapes()):
+            parts.append(
+                f'mongo-n1-{index};desc="{repeated["collection"]}.find_one x{repeated["count"]}"'
+            )
+        return ', '.join(parts)
+
+
+class ProfileAggregates:
+    """Process-local per-endpoint aggregates of request profiles"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+
+    def record(self, endpoint, profile):
+        repeated = profile.repeated_shapes()
+        with self._lock:
+            stats = self._endpoints.setdefault(endpoint, {
+                'endpoint': endpoint,
+                'requests': 0,
+                'total_commands': 0,
+                'max_commands': 0,
+                'total_mongo_ms': 0.0,
+                'max_mongo_ms': 0.0,
+                'operations': defaultdict(int),
+                'n_plus_one_requests': 0,
+                'n_plus_one_shapes': {}
+            })
+            stats['requests'] += 1
+            stats['total_commands'] += profile.command_count
+            stats['max_commands'] = max(stats['max_commands'], profile.command_count)
+            stats['total_mongo_ms'] += profile.total_ms
+            stats['max_mongo_ms'] = max(stats['max_mongo_ms'], profile.total_ms)
+            for command in profile.commands:
+                stats['operations'][f"{command['collection']}.{command['operation']}"] += 1
+            if repeated:
+                stats['n_plus_one_requests'] += 1
+                for item in repeated:
+                    key = f"{item['collection']} {item['filter']}"
+                    stats['n_plus_one_shapes'][key] = max(stats['n_plus_one_shapes'].get(key, 0), item['count'])
+
+    def snapshot(self):
+        """Aggregates sorted by average commands per request, chattiest first"""
+        with self._lock:
+            result = []
+            for stats in self._endpoints.values():
+                requests = stats['requests'] or 1
+                result.append({
+                    'endpoint': stats['endpoint'],
+                    'requests': stats['requests'],
+                    'avgCommands': round(stats['total_commands'] / requests, 2),
+                    'maxCommands': stats['max_commands'],
+                    'avgMongoMs': round(stats['total_mongo_ms'] / requests, 3),
+                    'maxMongoMs': round(stats['max_mongo_ms'], 3),
+                    'operations': dict(stats['operations']),
+                    'nPlusOneRequests': stats['n_plus_one_requests'],
+                    'nPlusOneShapes': [
+                        {'shape': shape, 'maxRepeats': count}
+                        for shape, count in stats['n_plus_one_shapes'].items()
+                    ]
+                })
+        return sorted(result, key=lambda item: item['avgCommands'], reverse=True)
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+
+
+profile_aggregates = ProfileAggregates()
+
+
+class CommandProfiler(monitoring.CommandListener):
+    """pymongo listener that feeds the profile of the current Flask request"""
+
+    def _profile(self, event):
+        if event.command_name in IGNORED_COMMANDS or not has_request_context():
+            return None
+        return g.get('mongo_profile')
+
+    def started(self, event):
+        profile = self._profile(event)
+        if profile is not None:
+            profile.started(event)
+
+    def succeeded(self, event):
+        profile = self._profile(event)
+        if profile is not None:
+            profile.finished(event, reply=event.reply)
+
+    def failed(self, event):
+        profile = self._profile(event)
+        if profile is not None:
+            profile.finished(event, failed=True)
+
+
+command_profiler = CommandProfiler()
+
+
+def init_query_profiler(app):
+    """Register request hooks that start, summarize and aggregate request profiles"""
+    if not _is_enabled():
+        return
+
+    @app.before_request
+    def start_query_profile():
+        g.mongo_profile = RequestProfile()
+
+    @app.after_request
+    def finish_query_profile(response):
+        profile = g.pop('mongo_profile', None)
+        if profile is None:
+            return response
+        if profile.command_count:
+            response.headers.add('Server-Timing', profile.server_timing())
+        endpoint = f"{request.method} {request.url_rule.rule}" if request.url_rule else f"{request.method} {request.path}"
+        profile_aggregates.record(endpoint, profile)
+        repeated = profile.repeated_shapes()
+        if repeated:
+            shapes = ', '.join(f"{item['collection']}.find_one x{item['count']}" for item in repeated)
+            print(f"⚠️ N+1 query pattern in {endpoint}: {shapes}")
+        return response
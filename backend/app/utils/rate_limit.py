@@ -0,0 +1,252 @@
+"""
+Rate Limiting - token buckets for the auth, registration and verification endpoints
+
+Each policy is a list of buckets, each keyed by the client IP, the account
+named in the request (login/email) or the authenticated user:
+
+    @rate_limited('login')      # ip:20/60,account:10/300
+
+A bucket of "capacity/period" holds up to capacity tokens and refills at
+capacity per period seconds; every request takes one token. A request that
+finds any of its buckets empty gets a 429 with Retry-After before the route
+runs, so put @rate_limited above @hashing_admission.
+
+Buckets live in process memory by default (RATE_LIMIT_STORAGE=memory), so
+with several workers each worker enforces the limit on its own share of the
+traffic. RATE_LIMIT_STORAGE=mongo keeps them in the rate_limits collection,
+updated atomically and expired by a TTL index, so all workers share them.
+Policies can be overridden per name, e.g. RATE_LIMIT_LOGIN="ip:50/60".
+"""
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from functools import wraps
+from flask import request, jsonify
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError, PyMongoError
+from app.utils.database import get_db, DatabaseUnavailable
+
+DEFAULT_POLICIES = {
+    'login': 'ip:20/60,account:10/300',
+    'register': 'ip:5/600',
+    'check_email': 'ip:30/60',
+    'verification': 'account:1/60,account:3/3600,ip:10/3600',
+    'send_verification': 'user:1/60,user:3/3600',
+    'password_reset': 'account:3/3600,ip:10/3600'
+}
+
+MESSAGES = {
+    'login': 'Bạn đã đăng nhập quá nhiều lần. Vui lòng thử lại sau {wait}.',
+    'verification': 'Bạn đã yêu cầu gửi email quá nhiều lần. Vui lòng thử lại sau {wait}.',
+    'send_verification': 'Bạn đã yêu cầu gửi email quá nhiều lần. Vui lòng thử lại sau {wait}.'
+}
+DEFAULT_MESSAGE = 'Bạn đã gửi quá nhiều yêu cầu. Vui lòng thử lại sau {wait}.'
+
+# Expired buckets are removed by the expires_at_ttl index declared in app/utils/indexes.py
+COLLECTION = 'rate_limits'
+
+
+class Bucket:
+    """One token bucket of a policy: capacity tokens, refilled over period seconds"""
+
+    def __init__(self, key_type, capacity, period):
+        if key_type not in KEY_FUNCTIONS:
+            raise ValueError(f"Unknown rate limit key '{key_type}'")
+        self.key_type = key_type
+        self.capacity = capacity
+        self.period = period
+        self.rate = capacity / period
+
+    def __repr__(self):
+        return f"{self.key_type}:{self.capacity}/{self.period:g}"
+
+
+def parse_policy(spec):
+    """'ip:20/60,account:10/300' -> [Bucket, ...]"""
+    buckets = []
+    for part in spec.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        key_type, limit = part.split(':', 1)
+        capacity, period = limit.split('/', 1)
+        buckets.append(Bucket(key_type.strip(), int(capacity), float(period)))
+    return buckets
+
+
+class MemoryBucketStore:
+    """Buckets in a per-process LRU; the least recently used keys are dropped past max_keys"""
+
+    def __init__(self, max_keys=None):
+        self.max_keys = max_keys if max_keys is not None else int(os.getenv('RATE_LIMIT_MEMORY_KEYS', 100000))
+        self._lock = threading.Lock()
+        self._buckets = OrderedDict()
+
+    def take(self, key, bucket):
+        """Take one token; returns (allowed, seconds until a token is available)"""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (bucket.capacity, now))
+            tokens = min(bucket.capacity, tokens + (now - updated) * bucket.rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return allowed, 0.0 if allowed else (1 - tokens) / bucket.rate
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class MongoBucketStore:
+    """Buckets shared by all workers, one document per key updated with a single pipeline update"""
+
+    def take(self, key, bucket):
+        now = datetime.utcnow()
+        elapsed = {'$divide': [{'$subtract': [now, {'$ifNull': ['$updatedAt', now]}]}, 1000]}
+        refilled = {'$min': [bucket.capacity, {'$add': [{'$ifNull': ['$tokens', bucket.capacity]}, {'$multiply': [elapsed, bucket.rate]}]}]}
+        pipeline = [
+            {'$set': {'tokens': refilled, 'updatedAt': now}},
+            {'$set': {
+                'allowed': {'$gte': ['$tokens', 1]},
+                'tokens': {'$cond': [{'$gte': ['$tokens', 1]}, {'$subtract': ['$tokens', 1]}, '$tokens']},
+                # An untouched bucket is full again after one period; let the TTL index remove it
+                'expiresAt': now + timedelta(seconds=bucket.period)
+            }}
+        ]
+        collection = get_db()[COLLECTION]
+        try:
+            document = collection.find_one_and_update(
+                {'_id': key}, pipeline, upsert=True,
+                projection={'tokens': 1, 'allowed': 1}, return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            # Two workers created the same bucket at once; the second one updates it
+            document = collection.find_one_and_update(
+                {'_id': key}, pipeline,
+                projection={'tokens': 1, 'allowed': 1}, return_document=ReturnDocument.AFTER
+            )
+        if document['allowed']:
+            return True, 0.0
+        return False, (1 - document['tokens']) / bucket.rate
+
+
+def client_ip():
+    """Client address; the first X-Forwarded-For hop when behind a trusted proxy"""
+    if os.getenv('RATE_LIMIT_TRUST_PROXY', 'false').lower() == 'true':
+        forwarded = request.headers.get('X-Forwarded-For', '')
+        if forwarded:
+            return forwarded.split(',')[0].strip()
+    return request.remote_addr or 'unknown'
+
+
+def account_key():
+    """Login identifier or email named in the request body or query string"""
+    data = request.get_json(silent=True) or {}
+    identifier = data.get('login') or data.get('email') or request.args.get('email')
+    if not isinstance(identifier, str) or not identifier.strip():
+        return None
+    return identifier.strip().lower()
+
+
+def user_key():
+    """Id of the user in the bearer token, without touching MongoDB"""
+    from app.utils.jwt_auth import decode_token
+    token = request.headers.get('Authorization', '').replace('Bearer ', '')
+    return decode_token(token) if token else None
+
+
+KEY_FUNCTIONS = {
+    'ip': client_ip,
+    'account': account_key,
+    'user': user_key
+}
+
+
+class RateLimiter:
+    """Named policies applied against the configured bucket store"""
+
+    def __init__(self):
+        self.enabled = os.getenv('RATE_LIMIT_ENABLED', 'true').lower() == 'true'
+        self.storage = os.getenv('RATE_LIMIT_STORAGE', 'memory').lower()
+        self.store = MongoBucketStore() if self.storage == 'mongo' else MemoryBucketStore()
+        self._policies = {}
+        self._lock = threading.Lock()
+        self._counters = {}
+
+    def policy(self, name):
+        if name not in self._policies:
+            spec = os.getenv(f'RATE_LIMIT_{name.upper()}', DEFAULT_POLICIES.get(name, ''))
+            self._policies[name] = parse_policy(spec)
+        return self._policies[name]
+
+    def check(self, name):
+        """Take a token from every bucket of the policy; returns seconds to wait, 0 when allowed"""
+        retry_after = 0.0
+        for bucket in self.policy(name):
+            key = KEY_FUNCTIONS[bucket.key_type]()
+            if key is None:
+                continue
+            try:
+                allowed, wait = self.store.take(f"{name}:{bucket!r}:{key}", bucket)
+            except (PyMongoError, DatabaseUnavailable) as e:
+                # Never lock everyone out because the shared store is down
+                print(f"⚠️  Rate limit store unavailable, allowing request: {e}")
+                self._count(name, 'storeErrors')
+                continue
+            if not allowed:
+                retry_after = max(retry_after, wait)
+        self._count(name, 'rejected' if retry_after else 'allowed')
+        return retry_after
+
+    def _count(self, name, counter):
+        with self._lock:
+            counters = self._counters.setdefault(name, {'allowed': 0, 'rejected': 0, 'storeErrors': 0})
+            counters[counter] += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'storage': self.storage,
+                'policies': {name: [repr(bucket) for bucket in buckets] for name, buckets in self._policies.items()},
+                'counters': {name: dict(counters) for name, counters in self._counters.items()}
+            }
+
+
+rate_limiter = RateLimiter()
+
+
+def _format_wait(seconds):
+    if seconds < 60:
+        return f"{seconds} giây"
+    return f"{math.ceil(seconds / 60)} phút"
+
+
+def rate_limited(name):
+    """Answer 429 when the request exhausts any bucket of the named policy"""
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            if request.method == 'OPTIONS' or not rate_limiter.enabled:
+                return f(*args, **kwargs)
+
+            retry_after = rate_limiter.check(name)
+            if retry_after:
+                seconds = max(1, math.ceil(retry_after))
+                return jsonify({
+                    'success': False,
+                    'message': MESSAGES.get(name, DEFAULT_MESSAGE).format(wait=_format_wait(seconds)),
+                    'retryAfter': seconds
+                }), 429, {'Retry-After': str(seconds)}
+            return f(*args, **kwargs)
+
+        return decorated
+    return decorator
@@ -1,12 +1,85 @@
 import requests
+import hashlib
 import os
+import threading
+import time
 from flask import current_app
+from requests.adapters import HTTPAdapter
+
+
+class VerifiedTokenCache:
+    """Tokens Google already accepted, so a client retry with the same token is not re-verified"""
+    
+    def __init__(self, ttl=120, max_size=10000):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._entries = {}
+    
+    @staticmethod
+    def _key(token, user_ip):
+        return hashlib.sha256(f"{token}|{user_ip or ''}".encode('utf-8')).hexdigest()
+    
+    def contains(self, token, user_ip=None):
+        key = self._key(token, user_ip)
+        with self._lock:
+            expires_at = self._entries.get(key)
+            if expires_at is None:
+                return False
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return False
+            return True
+    
+    def add(self, token, user_ip=None):
+        now = time.monotonic()
+        with self._lock:
+            if len(self._entries) >= self.max_size:
+                self._entries = {key: expires_at for key, expires_at in self._entries.items() if expires_at >= now}
+                if len(self._entries) >= self.max_size:
+                    self._entries.pop(next(iter(self._entries)))
+            self._entries[self._key(token, user_ip)] = now + self.ttl
+
 
 class RecaptchaVerifier:
     """Google reCAPTCHA v2 verification utility"""
     
+    # RECAPTCHA_VERIFY_URL overrides this, e.g. to point at fake_recaptcha_server.py
     RECAPTCHA_VERIFY_URL = 'https://www.google.com/recaptcha/api/siteverify'
     
+    verified_tokens = VerifiedTokenCache(ttl=int(os.getenv('RECAPTCHA_CACHE_SECONDS', 120)))
+    
+    _session = None
+    _session_pid = None
+    _session_lock = threading.Lock()
+    
+    @staticmethod
+    def _verify_url():
+        return os.getenv('RECAPTCHA_VERIFY_URL', RecaptchaVerifier.RECAPTCHA_VERIFY_URL)
+    
+    @staticmethod
+    def _timeouts():
+        """(connect, read) timeouts in seconds"""
+        return (
+            float(os.getenv('RECAPTCHA_CONNECT_TIMEOUT', 1.0)),
+            float(os.getenv('RECAPTCHA_READ_TIMEOUT', 2.0))
+        )
+    
+    @classmethod
+    def get_session(cls):
+        """Keep-alive session shared by the threads of this process (recreated after fork)"""
+        if cls._session is None or cls._session_pid != os.getpid():
+            with cls._session_lock:
+                if cls._session is None or cls._session_pid != os.getpid():
+                    session = requests.Session()
+                    pool_size = int(os.getenv('RECAPTCHA_POOL_SIZE', 16))
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+                    session.mount('https://', adapter)
+                    session.mount('http://', adapter)
+                    cls._session = session
+                    cls._session_pid = os.getpid()
+        return cls._session
+    
     @staticmethod
     def verify_recaptcha(recaptcha_response, user_ip=None):
         """
@@ -44,15 +117,22 @@ class RecaptchaVerifier:
                 'response': recaptcha_response
             }
             
+            # A retry with a token Google already accepted
+            if RecaptchaVerifier.verified_tokens.contains(recaptcha_response, user_ip):
+                return {
+                    'success': True,
+                    'message': 'reCAPTCHA verification successful'
+                }
+            
             # Add IP if provided
             if user_ip:
                 data['remoteip'] = user_ip
             
-            # Make verification request to Google
-            response = requests.post(
-                RecaptchaVerifier.RECAPTCHA_VERIFY_URL,
+            # Make verification request to Google over the pooled keep-alive session
+            response = RecaptchaVerifier.get_session().post(
+                RecaptchaVerifier._verify_url(),
                 data=data,
-                timeout=10
+                timeout=RecaptchaVerifier._timeouts()
             )
             
             if response.status_code != 200:
@@ -69,6 +149,7 @@ class RecaptchaVerifier:
             current_app.logger.info(f"reCAPTCHA verification result: {result}")
             
             if result.get('success'):
+                RecaptchaVerifier.verified_tokens.add(recaptcha_response, user_ip)
                 return {
                     'success': True,
                     'message': 'reCAPTCHA verification successful'
@@ -0,0 +1,416 @@
+"""
+Response Cache - TTL cache with single-flight for the read-only admin statistics
+
+    @admin_bp.route('/transaction-stats', methods=['GET', 'OPTIONS'])
+    @admin_required
+    @cached_response('transaction_stats', defaults={'period': 'month'})
+    def get_transaction_stats(): ...
+
+A response is cached per route name and normalized query string (sorted
+parameters, empty values dropped, defaults filled in, so "?period=month" and
+no parameters share one entry) for RESPONSE_CACHE_TTL_<NAME> seconds; only
+200 responses are cached. Statistics are the same for every admin, so the
+cache sits below admin_required and entries are not per user.
+
+Concurrent requests for an entry that is missing are coalesced: the first one
+computes the response and the others wait for it (single-flight), up to
+RESPONSE_CACHE_WAIT_SECONDS. With RESPONSE_CACHE_STALE_<NAME> (or
+RESPONSE_CACHE_STALE_SECONDS) set, an entry past its TTL is still served for
+that many seconds while one background thread recomputes it
+(stale-while-revalidate).
+
+Entries live in process memory by default (RESPONSE_CACHE_STORAGE=memory).
+RESPONSE_CACHE_STORAGE=mongo keeps them in the response_cache collection,
+expired by a TTL index, so all workers share them; the single-flight then
+also spans workers through a short lease on the entry document. Responses
+carry X-Cache: HIT, MISS or STALE.
+
+clear() empties the shared collection in mongo mode. In memory mode it clears
+the calling worker and bumps a generation counter in the response_cache
+collection; the other workers check it at most every
+RESPONSE_CACHE_SYNC_SECONDS and drop the routes whose generation moved.
+"""
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from functools import wraps
+from urllib.parse import urlencode
+from flask import Response, copy_current_request_context, make_response, request
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError, PyMongoError
+from app.utils.database import get_db, DatabaseUnavailable
+
+DEFAULT_TTLS = {
+    'provider_stats': 60,
+    'login_stats': 300,
+    'registration_stats': 300,
+    'transaction_stats': 120
+}
+DEFAULT_TTL = 60
+
+# Expired entries are removed by the expires_at_ttl index declared in app/utils/indexes.py
+COLLECTION = 'response_cache'
+
+# Clear counters of memory mode: {'all': n, 'routes': {name: n}}; no expiresAt, so never expired
+GENERATION_ID = '__generation__'
+
+STORE_ERRORS = (PyMongoError, DatabaseUnavailable)
+
+
+class MemoryResponseStore:
+    """Entries in a per-process LRU; the least recently used are dropped past max_entries"""
+
+    def __init__(self, max_entries=None):
+        self.max_entries = max_entries if max_entries is not None else int(os.getenv('RESPONSE_CACHE_MEMORY_ENTRIES', 1000))
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        """(body, stored_at epoch seconds) or None"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            body, stored_at, expires_at = entry
+            if expires_at <= now:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return body, stored_at
+
+    def set(self, key, body, keep_seconds):
+        now = time.time()
+        with self._lock:
+            self._entries[key] = (body, now, now + keep_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def acquire(self, key, seconds):
+        """Single-flight within the process is enough for a process-local store"""
+        return True
+
+    def release(self, key):
+        pass
+
+    def clear(self, prefix=''):
+        with self._lock:
+            for key in [key for key in self._entries if key.startswith(prefix)]:
+                del self._entries[key]
+
+
+class MongoResponseStore:
+    """Entries shared by all workers, one document per key"""
+
+    def get(self, key):
+        document = get_db()[COLLECTION].find_one({'_id': key, 'body': {'$exists': True}}, {'body': 1, 'storedAt': 1, 'expiresAt': 1})
+        if document is None or document['expiresAt'] <= datetime.utcnow():
+            return None
+        return document['body'], document['storedAt'].replace(tzinfo=timezone.utc).timestamp()
+
+    def set(self, key, body, keep_seconds):
+        now = datetime.utcnow()
+        get_db()[COLLECTION].update_one(
+            {'_id': key},
+            {'$set': {'body': body, 'storedAt': now, 'expiresAt': now + timedelta(seconds=keep_seconds)}, '$unset': {'leaseUntil': ''}},
+            upsert=True
+        )
+
+    def acquire(self, key, seconds):
+        """Take the computation lease of key for seconds; False while another worker holds it"""
+        now = datetime.utcnow()
+        try:
+            get_db()[COLLECTION].update_one(
+                {'_id': key, '$or': [{'leaseUntil': {'$exists': False}}, {'leaseUntil': {'$lte': now}}]},
+                {'$set': {'leaseUntil': now + timedelta(seconds=seconds)},
+                 '$setOnInsert': {'expiresAt': now + timedelta(seconds=seconds)}},
+                upsert=True
+            )
+            return True
+        except DuplicateKeyError:
+            return False
+
+    def release(self, key):
+        get_db()[COLLECTION].update_one({'_id': key}, {'$unset': {'leaseUntil': ''}})
+
+    def clear(self, prefix=''):
+        query = {'_id': {'$regex': f"^{re.escape(prefix)}"}} if prefix else {}
+        get_db()[COLLECTION].delete_many(query)
+
+
+class ResponseCache:
+    """Named route caches with per-route TTLs against the configured store"""
+
+    def __init__(self):
+        self.enabled = os.getenv('RESPONSE_CACHE_ENABLED', 'true').lower() == 'true'
+        self.storage = os.getenv('RESPONSE_CACHE_STORAGE', 'memory').lower()
+        self.store = MongoResponseStore() if self.storage == 'mongo' else MemoryResponseStore()
+        self.wait_seconds = float(os.getenv('RESPONSE_CACHE_WAIT_SECONDS', 30))
+        self.sync_seconds = float(os.getenv('RESPONSE_CACHE_SYNC_SECONDS', 5))
+        self._settings = {}
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._generations = None
+        self._synced_at = 0.0
+        self._inflight = {}
+        self._counters = {}
+
+    def forget_inflight(self):
+        """In a forked child: the parent's computations and locks do not exist here"""
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._inflight = {}
+
+    def settings(self, name):
+        """(ttl, stale) seconds of a route"""
+        if name not in self._settings:
+            ttl = float(os.getenv(f'RESPONSE_CACHE_TTL_{name.upper()}', DEFAULT_TTLS.get(name, DEFAULT_TTL)))
+            stale = float(os.getenv(f'RESPONSE_CACHE_STALE_{name.upper()}', os.getenv('RESPONSE_CACHE_STALE_SECONDS', 0)))
+            self._settings[name] = (ttl, stale)
+        return self._settings[name]
+
+    @staticmethod
+    def key(name, args, defaults=None):
+        """Route name and query parameters in a canonical order"""
+        params = dict(defaults or {})
+        params.update({field: values for field, values in args.lists() if any(values)})
+        pairs = sorted((field, value) for field, values in params.items()
+                       for value in (values if isinstance(values, list) else [values]) if value != '')
+        return f"{name}?{urlencode(pairs)}"
+
+    def fetch(self, name, key, compute, refresh=None):
+        """
+        (body, state) for key: a cached body ('HIT'), a stale body while refresh
+        runs in the background ('STALE'), or the body of compute() - a Response -
+        run once for all concurrent callers ('MISS'); a response that is not
+        cacheable (not 200) is returned itself in place of the body
+        """
+        ttl, stale = self.settings(name)
+        self._sync(name)
+        entry = self._get(name, key)
+        if entry is not None:
+            age = time.time() - entry[1]
+            if age < ttl:
+                self._count(name, 'hits')
+                return entry[0], 'HIT'
+            if age < ttl + stale and refresh is not None:
+                self._count(name, 'stale')
+                self._start_refresh(name, key, refresh)
+                return entry[0], 'STALE'
+
+        with self._lock:
+            done = self._inflight.get(key)
+            if done is None:
+                self._inflight[key] = threading.Event()
+        if done is not None:
+            # Another request of this worker is computing it
+            done.wait(self.wait_seconds)
+            entry = self._get(name, key)
+            if entry is not None and time.time() - entry[1] < ttl + stale:
+                self._count(name, 'coalesced')
+                return entry[0], 'HIT'
+            self._count(name, 'misses')
+            return self._compute(name, key, compute), 'MISS'
+
+        try:
+            if not self._acquire(name, key):
+                # Another worker is computing it
+                entry = self._wait_for(name, key, ttl + stale)
+                if entry is not None:
+                    self._count(name, 'coalesced')
+                    return entry[0], 'HIT'
+            self._count(name, 'misses')
+            return self._compute(name, key, compute), 'MISS'
+        finally:
+            with self._lock:
+                self._inflight.pop(key).set()
+
+    def _compute(self, name, key, compute):
+        try:
+            response = compute()
+        except Exception:
+            self._release(name, key)
+            raise
+        if response.status_code != 200:
+            self._release(name, key)
+            return response
+        body = response.get_data(as_text=True)
+        ttl, stale = self.settings(name)
+        try:
+            self.store.set(key, body, ttl + stale)
+        except STORE_ERRORS as e:
+            print(f"⚠️  Response cache store unavailable, not caching {name}: {e}")
+            self._count(name, 'storeErrors')
+        return body
+
+    def _start_refresh(self, name, key, refresh):
+        with self._lock:
+            if key in self._inflight:
+                return
+            self._inflight[key] = threading.Event()
+
+        def run():
+            try:
+                if self._acquire(name, key):
+                    self._count(name, 'refreshes')
+                    self._compute(name, key, refresh)
+            except Exception as e:
+                print(f"⚠️  Response cache refresh of {name} failed: {e}")
+                self._count(name, 'errors')
+            finally:
+                with self._lock:
+                    self._inflight.pop(key).set()
+
+        threading.Thread(target=run, name=f'response-cache-{name}', daemon=True).start()
+
+    def _wait_for(self, name, key, max_age):
+        """
+        The entry another worker is computing, or None once its lease is free
+        (that computation failed or was not cacheable) or after wait_seconds;
+        with None the caller computes and holds the lease
+        """
+        deadline = time.monotonic() + self.wait_seconds
+        while time.monotonic() < deadline:
+            time.sleep(0.05)
+            entry = self._get(name, key)
+            if entry is not None and time.time() - entry[1] < max_age:
+                return entry
+            if self._acquire(name, key):
+                # The entry may have been written just before the lease was released
+                entry = self._get(name, key)
+                if entry is not None and time.time() - entry[1] < max_age:
+                    self._release(name, key)
+                    return entry
+                return None
+        return None
+
+    def _get(self, name, key):
+        try:
+            return self.store.get(key)
+        except STORE_ERRORS as e:
+            # Never fail a request because the shared store is down
+            print(f"⚠️  Response cache store unavailable, computing {name}: {e}")
+            self._count(name, 'storeErrors')
+            return None
+
+    def _acquire(self, name, key):
+        try:
+            return self.store.acquire(key, self.wait_seconds)
+        except STORE_ERRORS as e:
+            print(f"⚠️  Response cache store unavailable, computing {name}: {e}")
+            self._count(name, 'storeErrors')
+            return True
+
+    def _release(self, name, key):
+        try:
+            self.store.release(key)
+        except STORE_ERRORS:
+            self._count(name, 'storeErrors')
+
+    def clear(self, name=None):
+        """
+        Drop the entries of one route, or all of them; True when every worker
+        drops them, False when only this one did (memory mode with the
+        generation counter unreachable)
+        """
+        self.store.clear(f"{name}?" if name else '')
+        if self.storage == 'mongo':
+            return True
+        try:
+            document = get_db()[COLLECTION].find_one_and_update(
+                {'_id': GENERATION_ID},
+                {'$inc': {f'routes.{name}' if name else 'all': 1}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+        except STORE_ERRORS as e:
+            print(f"⚠️  Response cache generation unavailable, cleared this worker only: {e}")
+            return False
+        with self._sync_lock:
+            # This worker is already clear up to the generation it bumped
+            if self._generations is not None:
+                clear_all, routes = self._generations
+                if name:
+                    routes[name] = document['routes'][name]
+                else:
+                    clear_all = document['all']
+                self._generations = clear_all, routes
+        return True
+
+    @staticmethod
+    def _generation_of(document):
+        document = document or {}
+        return document.get('all', 0), dict(document.get('routes', {}))
+
+    def _sync(self, name):
+        """In memory mode: drop what other workers cleared since the last check"""
+        if self.storage == 'mongo' or time.monotonic() - self._synced_at < self.sync_seconds:
+            return
+        if not self._sync_lock.acquire(blocking=False):
+            return
+        try:
+            self._synced_at = time.monotonic()
+            generations = self._generation_of(get_db()[COLLECTION].find_one({'_id': GENERATION_ID}))
+            if self._generations is not None:
+                clear_all, routes = self._generations
+                if generations[0] != clear_all:
+                    self.store.clear('')
+                else:
+                    for route, generation in generations[1].items():
+                        if routes.get(route) != generation:
+                            self.store.clear(f"{route}?")
+            self._generations = generations
+        except STORE_ERRORS as e:
+            print(f"⚠️  Response cache generation unavailable: {e}")
+            self._count(name, 'storeErrors')
+        finally:
+            self._sync_lock.release()
+
+    def _count(self, name, counter):
+        with self._lock:
+            counters = self._counters.setdefault(name, {
+                'hits': 0, 'misses': 0, 'stale': 0, 'coalesced': 0, 'refreshes': 0, 'errors': 0, 'storeErrors': 0
+            })
+            counters[counter] += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'storage': self.storage,
+                'syncSeconds': self.sync_seconds if self.storage != 'mongo' else None,
+                'routes': {name: {'ttlSeconds': ttl, 'staleSeconds': stale} for name, (ttl, stale) in self._settings.items()},
+                'counters': {name: dict(counters) for name, counters in self._counters.items()}
+            }
+
+
+response_cache = ResponseCache()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=response_cache.forget_inflight)
+
+
+def cached_response(name, defaults=None):
+    """Serve a GET route's 200 JSON responses from the response cache"""
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            if request.method != 'GET' or not response_cache.enabled:
+                return f(*args, **kwargs)
+
+            def compute():
+                return make_response(f(*args, **kwargs))
+
+            # The refresh runs after this request has been answered, in a copy of its context
+            refresh = copy_current_request_context(compute)
+            body, state = response_cache.fetch(name, response_cache.key(name, request.args, defaults), compute, refresh)
+            if isinstance(body, Response):
+                return body
+            return Response(body, status=200, mimetype='application/json', headers={'X-Cache': state})
+
+        return decorated
+    return decorator
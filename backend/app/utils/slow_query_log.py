@@ -0,0 +1,244 @@
+"""
+Slow Query Log - capture slow MongoDB queries together with their winning plan
+
+Queries slower than SLOW_QUERY_MS are explained in a background thread and
+stored in the capped `slow_queries` collection along with the route that
+issued them. Plans that contain a COLLSCAN or an in-memory SORT stage are
+flagged so collection scans show up before they show up on the bill.
+"""
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from pymongo import monitoring
+from pymongo.errors import CollectionInvalid, PyMongoError
+from flask import has_request_context, request
+from app.utils.query_profiler import query_shape
+
+# Commands that can be passed to the explain command
+EXPLAINABLE_COMMANDS = {'find', 'aggregate', 'count', 'distinct', 'update', 'delete', 'findAndModify'}
+
+# Fields added by the driver that explain does not accept
+DRIVER_FIELDS = {'$db', 'lsid', '$clusterTime', 'txnNumber', '$readPreference', 'readConcern', 'writeConcern', 'apiVersion', 'apiStrict', 'apiDeprecationErrors'}
+
+# Re-use an explain result for the same query shape for this many seconds
+EXPLAIN_CACHE_SECONDS = 300
+
+SLOW_QUERIES_COLLECTION = 'slow_queries'
+
+
+def _is_enabled():
+    return os.getenv('SLOW_QUERY_LOG', 'true').lower() == 'true'
+
+
+def _threshold_ms():
+    return float(os.getenv('SLOW_QUERY_MS', 100))
+
+
+def _capped_size_bytes():
+    return int(os.getenv('SLOW_QUERY_LOG_BYTES', 16 * 1024 * 1024))
+
+
+def plan_stages(explain_output):
+    """Collect every stage name that appears in a winning plan of an explain output"""
+    stages = []
+
+    def walk(node, in_winning_plan):
+        if isinstance(node, dict):
+            if in_winning_plan and isinstance(node.get('stage'), str):
+                stages.append(node['stage'])
+            for key, value in node.items():
+                walk(value, in_winning_plan or key == 'winningPlan')
+        elif isinstance(node, list):
+            for item in node:
+                walk(item, in_winning_plan)
+
+    walk(explain_output, False)
+    return stages
+
+
+def plan_flags(stages):
+    """Flags for plan stages that deserve an alert"""
+    return {
+        'collscan': 'COLLSCAN' in stages,
+        'in_memory_sort': 'SORT' in stages
+    }
+
+
+def _winning_plan(explain_output):
+    """First winningPlan document found in an explain output"""
+    if isinstance(explain_output, dict):
+        if 'winningPlan' in explain_output:
+            return explain_output['winningPlan']
+        values = explain_output.values()
+    elif isinstance(explain_output, list):
+        values = explain_output
+    else:
+        return None
+    for value in values:
+        plan = _winning_plan(value)
+        if plan is not None:
+            return plan
+    return None
+
+
+class SlowQueryRecorder:
+    """Background thread that explains slow queries and writes them to `slow_queries`"""
+
+    def __init__(self, max_pending=1000):
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._thread = None
+        self._lock = threading.Lock()
+        self._explain_cache = {}
+        self._collection_ready = False
+
+    def submit(self, entry):
+        """Queue a slow query for explain + storage; drop it if the queue is full"""
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            pass
+
+    def _ensure_started(self):
+        if self._thread and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='slow-query-recorder', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            entry = self._queue.get()
+            try:
+                self._record(entry)
+            except Exception as e:
+                print(f"Slow query log error: {e}")
+
+    def _database(self, database_name):
+        from app.utils.database import client_manager
+        client = client_manager.client
+        if client is None:
+            return None
+        return client[database_name]
+
+    def _ensure_collection(self, db):
+        if self._collection_ready:
+            return
+        try:
+            db.create_collection(SLOW_QUERIES_COLLECTION, capped=True, size=_capped_size_bytes())
+        except CollectionInvalid:
+            pass  # Already exists
+        self._collection_ready = True
+
+    def _explain(self, db, entry):
+        cache_key = (entry['database'], entry['collection'], entry['command_name'], repr(entry['shape']))
+        cached = self._explain_cache.get(cache_key)
+        if cached and time.time() - cached[0] < EXPLAIN_CACHE_SECONDS:
+            return cached[1]
+
+        try:
+            explain_output = db.command('explain', entry['command'], verbosity='queryPlanner')
+            stages = plan_stages(explain_output)
+            result = {
+                'stages': stages,
+                'winning_plan': _winning_plan(explain_output),
+                'flags': plan_flags(stages),
+                'error': None
+            }
+        except PyMongoError as e:
+            result = {
+                'stages': [],
+                'winning_plan': None,
+                'flags': {'collscan': False, 'in_memory_sort': False},
+                'error': str(e)
+            }
+
+        self._explain_cache[cache_key] = (time.time(), result)
+        return result
+
+    def _record(self, entry):
+        db = self._database(entry['database'])
+        if db is None:
+            return
+
+        plan = self._explain(db, entry)
+        self._ensure_collection(db)
+
+        db[SLOW_QUERIES_COLLECTION].insert_one({
+            'created_at': datetime.utcnow(),
+            'route': entry['route'],
+            'path': entry['path'],
+            'database': entry['database'],
+            'collection': entry['collection'],
+            'command_name': entry['command_name'],
+            'duration_ms': entry['duration_ms'],
+            'threshold_ms': entry['threshold_ms'],
+            'shape': repr(entry['shape']),
+            'plan_stages': plan['stages'],
+            'winning_plan': plan['winning_plan'],
+            'collscan': plan['flags']['collscan'],
+            'in_memory_sort': plan['flags']['in_memory_sort'],
+            'explain_error': plan['error']
+        })
+
+        if plan['flags']['collscan'] or plan['flags']['in_memory_sort']:
+            issues = [name for name, flagged in (('COLLSCAN', plan['flags']['collscan']), ('in-memory SORT', plan['flags']['in_memory_sort'])) if flagged]
+            print(f"🐢 Slow query ({entry['duration_ms']:.1f} ms) on {entry['collection']} "
+                  f"from {entry['route']}: {', '.join(issues)}")
+
+
+slow_query_recorder = SlowQueryRecorder()
+
+
+class SlowQueryListener(monitoring.CommandListener):
+    """pymongo listener that hands queries slower than SLOW_QUERY_MS to the recorder"""
+
+    def __init__(self):
+        self._pending = {}
+
+    def started(self, event):
+        if event.command_name not in EXPLAINABLE_COMMANDS or not _is_enabled():
+            return
+        route, path = None, None
+        if has_request_context():
+            route = f"{request.method} {request.url_rule.rule}" if request.url_rule else f"{request.method} {request.path}"
+            path = request.full_path
+        command = {key: value for key, value in event.command.items() if key not in DRIVER_FIELDS}
+        self._pending[(event.connection_id, event.request_id)] = (command, event.database_name, route, path)
+
+    def succeeded(self, event):
+        self._finish(event)
+
+    def failed(self, event):
+        self._finish(event)
+
+    def _finish(self, event):
+        pending = self._pending.pop((event.connection_id, event.request_id), None)
+        if pending is None:
+            return
+        duration_ms = event.duration_micros / 1000.0
+        threshold = _threshold_ms()
+        if duration_ms < threshold:
+            return
+
+        command, database_name, route, path = pending
+        collection = command.get(event.command_name)
+        query = command.get('filter', command.get('query', command.get('pipeline', {})))
+        slow_query_recorder.submit({
+            'database': database_name,
+            'collection': collection if isinstance(collection, str) else None,
+            'command_name': event.command_name,
+            'command': command,
+            'shape': query_shape(query),
+            'duration_ms': round(duration_ms, 3),
+            'threshold_ms': threshold,
+            'route': route,
+            'path': path
+        })
+
+
+slow_query_listener = SlowQueryListener()
@@ -0,0 +1,63 @@
+"""
+Fold, export and delete login_activities older than LOGIN_ACTIVITY_RETENTION_DAYS
+Uses MONGO_URI / MONGO_DATABASE from the environment, same as the API
+
+Run daily (cron). Once every day past the retention is folded into
+login_rollups, it also sets the backstop TTL on login_timestamp
+(retention + LOGIN_ACTIVITY_RETENTION_GRACE_DAYS); until the first run
+nothing is deleted.
+
+Prints collection and index sizes (collStats) before and after. Deleted
+documents leave free space that WiredTiger reuses for new inserts;
+--compact returns it to the operating system (run it off-peak).
+
+Usage:
+    python archive_login_activities.py --dry-run
+    python archive_login_activities.py [--dir /var/backups/tripook/logins] [--retention-days 90] [--compact]
+    python archive_login_activities.py --sizes
+"""
+import argparse
+import json
+from dotenv import load_dotenv
+from app.models.login_activity import LoginActivity, RETENTION_DAYS, ARCHIVE_DIR
+from app.services.login_retention import archive, collection_sizes
+from app.utils.database import client_manager, get_db
+
+load_dotenv()
+
+def print_sizes(title):
+    print(f"\n📏 {title}")
+    print(f"{'collection':<18} {'documents':>10} {'data MiB':>9} {'storage MiB':>12} {'index MiB':>10}")
+    sizes = collection_sizes()
+    for name, size in sizes.items():
+        print(f"{name:<18} {size['documents']:>10} {size['dataBytes'] / 2**20:>9.2f} "
+              f"{size['storageBytes'] / 2**20:>12.2f} {size['indexBytes'] / 2**20:>10.2f}")
+        for index, index_bytes in size['indexes'].items():
+            print(f"{'':<18}   {index:<28} {index_bytes / 2**20:>9.2f} MiB")
+    return sizes
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Archive old login activities')
+    parser.add_argument('--dir', default=ARCHIVE_DIR, help='export directory (default: LOGIN_ACTIVITY_ARCHIVE_DIR, none to skip export)')
+    parser.add_argument('--retention-days', type=int, default=RETENTION_DAYS)
+    parser.add_argument('--dry-run', action='store_true', help='only report what would be archived')
+    parser.add_argument('--compact', action='store_true', help='run compact on login_activities afterwards')
+    parser.add_argument('--sizes', action='store_true', help='only print sizes')
+    args = parser.parse_args()
+
+    before = print_sizes('Before')
+    if not args.sizes:
+        results = archive(args.dir, args.retention_days, args.dry_run)
+        for result in results:
+            print(json.dumps(result))
+        events = sum(result['events'] for result in results)
+        print(f"\n{'Would archive' if args.dry_run else 'Archived'} {events} events from {len(results)} days "
+              f"older than {args.retention_days} days")
+
+        if args.compact and not args.dry_run:
+            print(get_db().command('compact', LoginActivity.COLLECTION))
+        after = print_sizes('After')
+        for name in before:
+            saved = (before[name]['storageBytes'] + before[name]['indexBytes']) - (after[name]['storageBytes'] + after[name]['indexBytes'])
+            print(f"{name}: {saved / 2**20:+.2f} MiB freed (storage + indexes)")
+    client_manager.close()
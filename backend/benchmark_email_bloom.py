@@ -0,0 +1,42 @@
+"""
+Registered email filter benchmark - size, build time, lookup cost and false positives
+
+Fills a BloomFilter with N synthetic registered emails and checks M emails
+that are not registered, reporting the filter size, build time, lookup time
+and the measured false-positive rate (the share of free emails that still
+need the MongoDB confirmation /check-email used to make for every call).
+
+Usage (from backend/):
+    python benchmark_email_bloom.py
+    python benchmark_email_bloom.py --emails 1000000,5000000 --error-rate 0.001
+"""
+import argparse
+import time
+from app.utils.email_bloom import BloomFilter
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--emails', default='100000,1000000', help='registered email counts to measure')
+    parser.add_argument('--checks', type=int, default=200000, help='free emails checked per run')
+    parser.add_argument('--error-rate', type=float, default=0.01)
+    args = parser.parse_args()
+
+    print(f"{'emails':>10} {'KiB':>8} {'hashes':>7} {'build s':>8} {'µs/check':>9} {'false pos':>10} {'target':>8}")
+    for count in [int(value) for value in args.emails.split(',')]:
+        bloom = BloomFilter(count, args.error_rate)
+        started = time.perf_counter()
+        for i in range(count):
+            bloom.add(f"user{i}@example.com")
+        build_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        false_positives = sum(f"free{i}@example.org" in bloom for i in range(args.checks))
+        check_us = (time.perf_counter() - started) / args.checks * 1e6
+
+        print(f"{count:>10} {len(bloom.bits) // 1024:>8} {bloom.hashes:>7} {build_seconds:>8.2f} {check_us:>9.2f} "
+              f"{false_positives / args.checks:>10.4%} {args.error_rate:>8.2%}")
+
+
+if __name__ == '__main__':
+    main()
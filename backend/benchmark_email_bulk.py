@@ -0,0 +1,74 @@
+"""
+Bulk email benchmark - one Brevo request per recipient vs message versions
+
+Runs fake_brevo_server.py in-process and sends provider_approval emails to
+N recipients (one in --bounce-every refused by the server):
+  single  EmailService.deliver() per recipient, the pre-bulk path
+  bulk    EmailService.deliver_many() with BREVO_BATCH_SIZE versions per request
+
+and reports wall time, API requests and per-recipient outcomes.
+
+Usage (from backend/):
+    python benchmark_email_bulk.py
+    python benchmark_email_bulk.py --recipients 5000 --delay-ms 150 --batch-size 500
+"""
+import argparse
+import os
+import time
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=8099)
+    parser.add_argument('--recipients', type=int, default=1000)
+    parser.add_argument('--delay-ms', type=float, default=100.0, help='simulated Brevo latency')
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--bounce-every', type=int, default=0, help='every Nth recipient is refused, 0 for none')
+    args = parser.parse_args()
+
+    os.environ['BREVO_API_KEY'] = 'test'
+    os.environ['BREVO_API_URL'] = f"http://127.0.0.1:{args.port}/v3"
+    os.environ['BREVO_BATCH_SIZE'] = str(args.batch_size)
+
+    from fake_brevo_server import start_server, BrevoHandler
+    from app.services.email_service import email_service, EmailDeliveryError
+
+    server = start_server(args.port, args.delay_ms)
+
+    def recipient(path, i):
+        bounced = args.bounce_every and i % args.bounce_every == args.bounce_every - 1
+        return {
+            'email': f"{'bounce' if bounced else 'provider'}{i}@example.com",
+            'params': {'user_name': f"Nhà cung cấp {i}", 'company_name': f"Công ty {i} & Co"},
+            'idempotency_key': f"bench:{path}:{i}"
+        }
+
+    def single(recipients):
+        results = []
+        for item in recipients:
+            try:
+                results.append(email_service.deliver('provider_approval', item['email'], item['params'], item['idempotency_key']))
+            except EmailDeliveryError as e:
+                results.append(e)
+        return results
+
+    def bulk(recipients):
+        return email_service.deliver_many('provider_approval', recipients)
+
+    print(f"🏁 {args.recipients} recipients, {args.delay_ms} ms Brevo latency, batches of {args.batch_size}\n")
+    print(f"{'path':<8} {'seconds':>8} {'emails/s':>9} {'requests':>9} {'sent':>6} {'failed':>7}")
+    for path, send in (('single', single), ('bulk', bulk)):
+        recipients = [recipient(path, i) for i in range(args.recipients)]
+        before = dict(BrevoHandler.stats)
+        started = time.perf_counter()
+        results = send(recipients)
+        elapsed = time.perf_counter() - started
+        failed = sum(isinstance(result, EmailDeliveryError) for result in results)
+        print(f"{path:<8} {elapsed:>8.2f} {args.recipients / elapsed:>9.0f} "
+              f"{BrevoHandler.stats['requests'] - before['requests']:>9} {len(results) - failed:>6} {failed:>7}")
+
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
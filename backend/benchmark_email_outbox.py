@@ -0,0 +1,120 @@
+"""
+Email delivery benchmark - sending inside the request vs the email outbox
+
+Runs fake_brevo_server.py in-process and compares:
+  inline   the request thread calls Brevo itself (what /register used to do)
+  enqueue  the request thread only inserts into email_outbox
+  drain    outbox delivery throughput with 1..N delivery threads, including
+           retries of the --fail-rate share of temporary errors
+
+Needs a local mongod; uses its own database (default: tripook_email_benchmark).
+
+Usage (from backend/):
+    python benchmark_email_outbox.py
+    python benchmark_email_outbox.py --emails 2000 --delay-ms 150 --fail-rate 0.05 --threads 1,4,16
+"""
+import argparse
+import json
+import os
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+
+def percentile(timings, share):
+    timings = sorted(timings)
+    return timings[min(len(timings) - 1, int(len(timings) * share))]
+
+
+def brevo_stats(port):
+    return json.load(urllib.request.urlopen(f"http://127.0.0.1:{port}/stats"))
+
+
+def timed_calls(call, count, concurrency):
+    def one(i):
+        started = time.perf_counter()
+        call(i)
+        return (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        timings = list(pool.map(one, range(count)))
+    return timings, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=8098)
+    parser.add_argument('--emails', type=int, default=1000)
+    parser.add_argument('--delay-ms', type=float, default=150.0, help='simulated Brevo latency')
+    parser.add_argument('--fail-rate', type=float, default=0.05, help='share of temporary Brevo errors')
+    parser.add_argument('--concurrency', type=int, default=8, help='concurrent request threads')
+    parser.add_argument('--threads', default='1,4,16', help='delivery thread counts to measure')
+    parser.add_argument('--database', default='tripook_email_benchmark')
+    args = parser.parse_args()
+
+    os.environ['BREVO_API_KEY'] = 'test'
+    os.environ['BREVO_API_URL'] = f"http://127.0.0.1:{args.port}/v3"
+    os.environ.setdefault('EMAIL_OUTBOX_BACKOFF_SECONDS', '0.05')
+
+    from fake_brevo_server import start_server
+    from app.services.email_service import email_service
+    from app.services.email_outbox import email_outbox, COLLECTION
+    from app.utils.database import client_manager, get_db
+    from app.utils.indexes import ensure_indexes, STANDALONE_INDEXES
+
+    server = start_server(args.port, args.delay_ms, args.fail_rate)
+    client_manager.mongo_uri = os.getenv('MONGO_LOCAL_URI', 'mongodb://localhost:27017')
+    client_manager.database_name = args.database
+    outbox = get_db()[COLLECTION]
+    outbox.drop()
+    ensure_indexes(get_db(), {COLLECTION: STANDALONE_INDEXES[COLLECTION]})
+
+    def params(i):
+        return {'verification_code': f"{i:06d}", 'user_name': f"User {i}"}
+
+    print(f"🏁 {args.emails} emails, {args.delay_ms} ms Brevo latency, {args.fail_rate:.0%} temporary failures, "
+          f"{args.concurrency} request threads\n")
+    print(f"{'path':<18} {'emails/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'delivered':>10} {'retries':>8} {'dead':>6}")
+
+    # Inline: every request waits for Brevo and a temporary error is a lost email
+    before = brevo_stats(args.port)
+    timings, elapsed = timed_calls(
+        lambda i: email_service._send_now('verification_code', f"inline{i}@example.com", params(i)),
+        args.emails, args.concurrency
+    )
+    after = brevo_stats(args.port)
+    print(f"{'inline':<18} {args.emails / elapsed:>9.0f} {percentile(timings, 0.5):>9.2f} {percentile(timings, 0.99):>9.2f} "
+          f"{after['delivered'] - before['delivered']:>10} {'-':>8} {'-':>6}")
+
+    for threads in [int(value) for value in args.threads.split(',')]:
+        outbox.delete_many({})
+        email_outbox.forget_workers()
+
+        # Enqueue with no delivery threads running, then drain with `threads` of them
+        email_outbox.workers = 0
+        timings, elapsed = timed_calls(
+            lambda i: email_outbox.enqueue('verification_code', f"user{i}@example.com", params(i), f"bench:{threads}:{i}"),
+            args.emails, args.concurrency
+        )
+        print(f"{'enqueue':<18} {args.emails / elapsed:>9.0f} {percentile(timings, 0.5):>9.2f} {percentile(timings, 0.99):>9.2f}")
+
+        before = brevo_stats(args.port)
+        started = time.perf_counter()
+        email_outbox.start(threads)
+        while outbox.count_documents({'status': {'$in': ['pending', 'sending']}}):
+            time.sleep(0.05)
+        elapsed = time.perf_counter() - started
+        email_outbox.shutdown()
+
+        after = brevo_stats(args.port)
+        counters = email_outbox.counters
+        print(f"{f'drain x{threads}':<18} {args.emails / elapsed:>9.0f} {'':>9} {'':>9} "
+              f"{after['delivered'] - before['delivered']:>10} {counters['retried']:>8} {counters['dead']:>6}")
+
+    server.shutdown()
+    client_manager.close()
+
+
+if __name__ == '__main__':
+    main()
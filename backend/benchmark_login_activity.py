@@ -0,0 +1,94 @@
+"""
+Login activity benchmark - insert_one per login vs the buffered batch writer
+
+Records N login events from --concurrency threads (the gunicorn request
+threads of a morning login peak) and compares:
+  direct    insert_one on the request thread (what record_login used to do)
+  buffered  LoginActivityBuffer.add on the request thread, insert_many in the
+            background; "drained" includes waiting for the last flush
+
+and reports logins/s, p50/p99 time spent on the request thread and the
+number of write commands sent.
+
+Needs a local mongod; uses its own database (default: tripook_login_benchmark).
+
+Usage (from backend/):
+    python benchmark_login_activity.py
+    python benchmark_login_activity.py --logins 50000 --concurrency 32 --batch-size 500
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from bson import ObjectId
+
+
+def percentile(timings, share):
+    timings = sorted(timings)
+    return timings[min(len(timings) - 1, int(len(timings) * share))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--logins', type=int, default=20000)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--database', default='tripook_login_benchmark')
+    args = parser.parse_args()
+
+    os.environ['LOGIN_ACTIVITY_BATCH_SIZE'] = str(args.batch_size)
+    os.environ.setdefault('LOGIN_ACTIVITY_BUFFER_MAX', str(args.logins))
+
+    from app.services.login_activity_buffer import login_activity_buffer, COLLECTION
+    from app.utils.database import client_manager, get_db
+
+    client_manager.mongo_uri = os.getenv('MONGO_LOCAL_URI', 'mongodb://localhost:27017')
+    client_manager.database_name = args.database
+    collection = get_db()[COLLECTION]
+    user_ids = [ObjectId() for _ in range(1000)]
+
+    def document(i):
+        return {
+            '_id': ObjectId(),
+            'user_id': user_ids[i % len(user_ids)],
+            'login_timestamp': datetime.utcnow(),
+            'ip_address': f"10.0.{i % 256}.{i // 256 % 256}",
+            'user_agent': 'Mozilla/5.0 (benchmark)'
+        }
+
+    def run(record):
+        def one(i):
+            started = time.perf_counter()
+            record(document(i))
+            return (time.perf_counter() - started) * 1000
+
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            return list(pool.map(one, range(args.logins)))
+
+    print(f"🏁 {args.logins} logins from {args.concurrency} threads, batches of {args.batch_size}\n")
+    print(f"{'path':<10} {'logins/s':>9} {'drained/s':>10} {'p50 ms':>8} {'p99 ms':>8} {'writes':>7} {'stored':>7}")
+
+    for path in ('direct', 'buffered'):
+        collection.drop()
+        login_activity_buffer.forget_buffer()
+        started = time.perf_counter()
+        if path == 'direct':
+            timings = run(collection.insert_one)
+            writes = args.logins
+        else:
+            timings = run(login_activity_buffer.add)
+        elapsed = time.perf_counter() - started
+        if path == 'buffered':
+            login_activity_buffer.shutdown()
+            writes = login_activity_buffer.counters['batches'] + login_activity_buffer.counters['direct']
+        drained = time.perf_counter() - started
+        print(f"{path:<10} {args.logins / elapsed:>9.0f} {args.logins / drained:>10.0f} {percentile(timings, 0.5):>8.3f} "
+              f"{percentile(timings, 0.99):>8.3f} {writes:>7} {collection.count_documents({}):>7}")
+
+    collection.drop()
+    client_manager.close()
+
+
+if __name__ == '__main__':
+    main()
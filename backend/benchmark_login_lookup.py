@@ -0,0 +1,128 @@
+"""
+Login lookup benchmark - legacy $regex fallback vs normalized indexed lookup
+
+Seeds a separate database (default: tripook_login_benchmark) with N users,
+builds the declared users indexes and times both lookup paths for exact,
+mixed-case, username and unknown identifiers against a local mongod.
+
+Usage (from backend/):
+    python benchmark_login_lookup.py
+    python benchmark_login_lookup.py --users 1000000 --lookups 200
+    python benchmark_login_lookup.py --reuse        # skip seeding if already present
+"""
+import argparse
+import os
+import random
+import re
+import statistics
+import time
+from pymongo import MongoClient
+from app.models.user import User
+from app.utils.database import client_manager
+from app.utils.indexes import ensure_indexes
+
+SEED_BATCH = 10000
+
+
+def legacy_find_by_login(collection, login_identifier):
+    """User.find_by_login before normalized identifiers: exact $or, then anchored case-insensitive $regex"""
+    user_data = collection.find_one({'$or': [{'email': login_identifier}, {'username': login_identifier}]})
+    if user_data:
+        return user_data
+    pattern = f'^{re.escape(login_identifier)}$'
+    return collection.find_one({'$or': [
+        {'email': {'$regex': pattern, '$options': 'i'}},
+        {'username': {'$regex': pattern, '$options': 'i'}}
+    ]})
+
+
+def seed(users, count):
+    users.drop()
+    print(f"🌱 Seeding {count:,} users...")
+    started = time.perf_counter()
+    for offset in range(0, count, SEED_BATCH):
+        batch = []
+        for i in range(offset, min(offset + SEED_BATCH, count)):
+            # A quarter of the emails are stored with upper case letters, as older sign-ups were
+            email = f"User{i}@Example.com" if i % 4 == 0 else f"user{i}@example.com"
+            username = f"traveller_{i}"
+            batch.append({
+                'email': email,
+                'username': username,
+                'name': f"User {i}",
+                'password_hash': 'x',
+                'role': 'user',
+                'status': 'active',
+                **User.normalized_fields(email, username)
+            })
+        users.insert_many(batch, ordered=False)
+    print(f"   done in {time.perf_counter() - started:.1f}s")
+
+
+def measure(label, lookup, identifiers):
+    timings = []
+    found = 0
+    for identifier in identifiers:
+        started = time.perf_counter()
+        if lookup(identifier):
+            found += 1
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+    print(f"  {label:<10} mean {statistics.mean(timings):>9.2f} ms   p50 {timings[len(timings) // 2]:>9.2f} ms   "
+          f"p99 {p99:>9.2f} ms   found {found}/{len(identifiers)}")
+
+
+def plan_stage(users, query):
+    explain = users.find(query).limit(1).explain()
+    plan = explain['queryPlanner']['winningPlan']
+    stages = []
+    while plan:
+        stages.append(plan['stage'])
+        plan = plan.get('inputStage') or (plan.get('inputStages') or [None])[0]
+    return ' <- '.join(stages)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=1000000)
+    parser.add_argument('--lookups', type=int, default=100, help='lookups per identifier kind and path')
+    parser.add_argument('--database', default='tripook_login_benchmark')
+    parser.add_argument('--reuse', action='store_true')
+    args = parser.parse_args()
+
+    mongo_uri = os.getenv('MONGO_LOCAL_URI', 'mongodb://localhost:27017')
+    client = MongoClient(mongo_uri, serverSelectionTimeoutMS=5000)
+    users = client[args.database].users
+
+    if not args.reuse or users.estimated_document_count() < args.users:
+        seed(users, args.users)
+    ensure_indexes(client[args.database], {'users': User.INDEXES})
+
+    # Point the API's client manager at the benchmark database so the shipped lookup is measured
+    client_manager.mongo_uri = mongo_uri
+    client_manager.database_name = args.database
+
+    sample = random.sample(range(args.users), args.lookups)
+    kinds = {
+        'exact email': [f"user{i}@example.com" if i % 4 else f"User{i}@Example.com" for i in sample],
+        'mixed-case email': [f"USER{i}@EXAMPLE.COM" for i in sample],
+        'username': [f"traveller_{i}" for i in sample],
+        'unknown': [f"nobody{i}@example.com" for i in sample]
+    }
+
+    print(f"\n⏱  {args.users:,} users, {args.lookups} lookups per case")
+    for kind, identifiers in kinds.items():
+        print(f"\n{kind}")
+        measure('legacy', lambda identifier: legacy_find_by_login(users, identifier), identifiers)
+        measure('normalized', User.find_login_document, identifiers)
+
+    regex = {'$regex': f"^{re.escape('nobody@example.com')}$", '$options': 'i'}
+    print("\nWinning plans")
+    print(f"  legacy regex : {plan_stage(users, {'$or': [{'email': regex}, {'username': regex}]})}")
+    print(f"  normalized   : {plan_stage(users, {'email_normalized': 'nobody@example.com'})}")
+    client.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""
+reCAPTCHA verification benchmark - per-call requests.post vs pooled, cached verifier
+
+Runs fake_recaptcha_server.py in-process and verifies tokens from several
+threads, the way concurrent logins do. Reports latency and how many TCP
+connections the fake server accepted.
+
+Usage (from backend/):
+    python benchmark_recaptcha.py
+    python benchmark_recaptcha.py --delay-ms 40 --connect-delay-ms 60 --threads 16 --requests 2000 --retry-rate 0.2
+"""
+import argparse
+import json
+import os
+import random
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from flask import Flask
+from fake_recaptcha_server import start_server
+from app.utils.recaptcha import RecaptchaVerifier
+
+
+def legacy_verify(url, token, user_ip):
+    """Verification as it was: a fresh connection per call, 10 second timeout"""
+    response = requests.post(url, data={'secret': 'test', 'response': token, 'remoteip': user_ip}, timeout=10)
+    return response.json().get('success', False)
+
+
+def pooled_verify(url, token, user_ip):
+    return RecaptchaVerifier.verify_recaptcha(token, user_ip)['success']
+
+
+def run(label, verify, url, args, port):
+    before = json.load(urllib.request.urlopen(f"http://127.0.0.1:{port}/stats"))
+    tokens = []
+    for i in range(args.requests):
+        # A share of requests are client retries that resend an earlier token
+        if tokens and random.random() < args.retry_rate:
+            tokens.append(random.choice(tokens[-50:]))
+        else:
+            tokens.append(f"token-{label}-{i}")
+
+    app = Flask(__name__)
+
+    def timed(token):
+        with app.app_context():
+            started = time.perf_counter()
+            ok = verify(url, token, '127.0.0.1')
+            return (time.perf_counter() - started) * 1000, ok
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        results = list(pool.map(timed, tokens))
+    elapsed = time.perf_counter() - started
+
+    after = json.load(urllib.request.urlopen(f"http://127.0.0.1:{port}/stats"))
+    latencies = sorted(latency for latency, _ in results)
+    failures = sum(1 for _, ok in results if not ok)
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(f"{label:<8} {len(results) / elapsed:>9.0f} {latencies[len(latencies) // 2]:>9.2f} {p99:>9.2f} "
+          f"{after['verifications'] - before['verifications']:>9} {after['connections'] - before['connections']:>12} {failures:>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=8099)
+    parser.add_argument('--delay-ms', type=float, default=20.0, help='simulated Google latency')
+    parser.add_argument('--connect-delay-ms', type=float, default=50.0, help='simulated TCP+TLS handshake to Google')
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--retry-rate', type=float, default=0.1)
+    args = parser.parse_args()
+
+    server = start_server(args.port, args.delay_ms, args.connect_delay_ms)
+    url = f"http://127.0.0.1:{args.port}/recaptcha/api/siteverify"
+    os.environ['RECAPTCHA_VERIFY_URL'] = url
+    os.environ.setdefault('RECAPTCHA_SECRET_KEY', 'test')
+
+    print(f"🏁 {args.requests} verifications, {args.threads} threads, {args.delay_ms} ms server latency, "
+          f"{args.connect_delay_ms} ms per new connection, {args.retry_rate:.0%} retries")
+    print(f"{'client':<8} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'verified':>9} {'connections':>12} {'failures':>9}")
+    run('legacy', legacy_verify, url, args, args.port)
+    run('pooled', pooled_verify, url, args, args.port)
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""
+SMTP delivery benchmark - a connection per message vs the SMTP pool
+
+Runs fake_smtp_server.py in-process and sends the same rendered emails over:
+  per-message  connect, EHLO, AUTH, send, QUIT for every message
+  pool         SmtpPool without pipelining, connections reused
+  pool+pipe    SmtpPool with PIPELINING (envelope in one round trip)
+  batch+pipe   SmtpPool.send_many, one checkout per batch of --batch messages
+
+and reports messages/s, p50/p99 latency per message, connections opened and
+SMTP round trips (reply batches written by the server).
+
+Usage (from backend/):
+    python benchmark_smtp_pool.py
+    python benchmark_smtp_pool.py --messages 2000 --rtt-ms 20 --handshake-ms 150 --concurrency 8
+"""
+import argparse
+import os
+import smtplib
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+def percentile(timings, share):
+    timings = sorted(timings)
+    return timings[min(len(timings) - 1, int(len(timings) * share))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=2525)
+    parser.add_argument('--messages', type=int, default=500)
+    parser.add_argument('--rtt-ms', type=float, default=10.0, help='simulated network round trip')
+    parser.add_argument('--handshake-ms', type=float, default=100.0, help='simulated TCP + TLS handshake')
+    parser.add_argument('--concurrency', type=int, default=4, help='sending threads (and pool size)')
+    parser.add_argument('--batch', type=int, default=25, help='messages per send_many call')
+    args = parser.parse_args()
+
+    os.environ.update({'SMTP_SERVER': '127.0.0.1', 'SMTP_PORT': str(args.port), 'SMTP_USE_TLS': 'false',
+                       'SMTP_USERNAME': 'bench', 'SMTP_PASSWORD': 'bench', 'EMAIL_TRANSPORT': 'smtp'})
+
+    from fake_smtp_server import start_server, Stats
+    from app.services.email_service import email_service
+    from app.services.smtp_pool import SmtpPool
+
+    server = start_server(args.port, args.rtt_ms, args.handshake_ms)
+
+    def message(i):
+        subject, html, text = email_service.templates.render(
+            'verification_code', {'verification_code': f"{i % 1000000:06d}", 'user_name': f"Người dùng {i}"}
+        )
+        return email_service.mime_message(f"user{i}@example.com", f"Người dùng {i}", subject, html, text, f"bench:{i}")
+
+    messages = [message(i) for i in range(args.messages)]
+
+    def per_message(i):
+        smtp = smtplib.SMTP('127.0.0.1', args.port, timeout=10)
+        smtp.ehlo()
+        smtp.login('bench', 'bench')
+        smtp.send_message(messages[i])
+        smtp.quit()
+
+    def run(send, count):
+        def one(i):
+            started = time.perf_counter()
+            send(i)
+            return (time.perf_counter() - started) * 1000
+
+        before = Stats.snapshot()
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            timings = list(pool.map(one, range(count)))
+        elapsed = time.perf_counter() - started
+        after = Stats.snapshot()
+        return timings, elapsed, {name: after[name] - before[name] for name in after}
+
+    print(f"🏁 {args.messages} messages, {args.rtt_ms} ms round trip, {args.handshake_ms} ms handshake, "
+          f"{args.concurrency} threads\n")
+    print(f"{'path':<14} {'msgs/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'delivered':>10} {'connections':>12} {'round trips':>12}")
+
+    def report(path, timings, elapsed, delta, per_call=1):
+        print(f"{path:<14} {args.messages / elapsed:>8.0f} {percentile(timings, 0.5) / per_call:>8.2f} "
+              f"{percentile(timings, 0.99) / per_call:>8.2f} {delta['messages']:>10} {delta['connections']:>12} "
+              f"{delta['roundTrips']:>12}")
+
+    report('per-message', *run(per_message, args.messages))
+
+    for path, pipelining in (('pool', False), ('pool+pipe', True)):
+        smtp_pool = SmtpPool(size=args.concurrency)
+        smtp_pool.pipelining = pipelining
+        report(path, *run(lambda i: smtp_pool.send(messages[i]), args.messages))
+        smtp_pool.close()
+
+    smtp_pool = SmtpPool(size=args.concurrency)
+    batches = [messages[start:start + args.batch] for start in range(0, args.messages, args.batch)]
+    report('batch+pipe', *run(lambda i: smtp_pool.send_many(batches[i]), len(batches)), per_call=args.batch)
+    smtp_pool.close()
+
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
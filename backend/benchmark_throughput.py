@@ -0,0 +1,157 @@
+"""
+Throughput benchmark - requests/second of the API for 1..N gunicorn workers
+
+Starts gunicorn (gunicorn.conf.py) with an increasing number of worker
+processes and drives it with keep-alive HTTP clients running in separate
+processes, so the load generator is not limited by a single GIL.
+
+Usage (from backend/, with a local mongod running):
+    python benchmark_throughput.py
+    python benchmark_throughput.py --workers 1 2 4 8 --threads 8 --clients 64 --duration 15
+    python benchmark_throughput.py --path /api/health --dev-server
+
+The default path reads from MongoDB (check-email), so the numbers include a
+round trip to the local mongod.
+"""
+import argparse
+import http.client
+import multiprocessing
+import os
+import signal
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_PATH = '/api/registration/check-email?email=benchmark%40example.com'
+
+
+def wait_until_ready(port, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=2)
+            connection.request('GET', '/api/health')
+            if connection.getresponse().status == 200:
+                return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+
+def client_loop(port, path, duration):
+    """Send requests over one keep-alive connection until `duration` has passed"""
+    latencies = []
+    errors = 0
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            connection.request('GET', path)
+            response = connection.getresponse()
+            response.read()
+            if response.status >= 500:
+                errors += 1
+        except (OSError, http.client.HTTPException):
+            errors += 1
+            connection.close()
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+            continue
+        latencies.append((time.perf_counter() - started) * 1000)
+    connection.close()
+    return latencies, errors
+
+
+def run_load(port, path, clients, duration):
+    with ProcessPoolExecutor(max_workers=clients) as pool:
+        futures = [pool.submit(client_loop, port, path, duration) for _ in range(clients)]
+        results = [future.result() for future in futures]
+
+    latencies = sorted(latency for result in results for latency in result[0])
+    errors = sum(result[1] for result in results)
+
+    def percentile(p):
+        if not latencies:
+            return 0.0
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))]
+
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'rps': len(latencies) / duration,
+        'p50': percentile(0.50),
+        'p99': percentile(0.99)
+    }
+
+
+def start_gunicorn(port, workers, threads):
+    env = dict(os.environ, PORT=str(port), WEB_CONCURRENCY=str(workers), WEB_THREADS=str(threads),
+               WEB_ACCESS_LOG='', WEB_MAX_REQUESTS='0')
+    return subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app'],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+
+def start_dev_server(port):
+    code = f"from wsgi import app; app.run(host='127.0.0.1', port={port}, threaded=True)"
+    return subprocess.Popen(
+        [sys.executable, '-c', code],
+        cwd=BACKEND_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+
+def stop(process):
+    process.send_signal(signal.SIGTERM)
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+def benchmark(label, process, args):
+    try:
+        if not wait_until_ready(args.port):
+            print(f"❌ {label}: server did not start")
+            return None
+        run_load(args.port, args.path, args.clients, min(3, args.duration))  # warm up
+        result = run_load(args.port, args.path, args.clients, args.duration)
+    finally:
+        stop(process)
+    print(f"{label:<22} {result['rps']:>10.0f} {result['p50']:>9.1f} {result['p99']:>9.1f} {result['errors']:>7}")
+    return result
+
+
+def main():
+    cores = multiprocessing.cpu_count()
+    default_workers = sorted({1, 2, 4, cores} & set(range(1, cores + 1)))
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, nargs='+', default=default_workers)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--clients', type=int, default=max(16, cores * 8))
+    parser.add_argument('--duration', type=int, default=10)
+    parser.add_argument('--port', type=int, default=5055)
+    parser.add_argument('--path', default=DEFAULT_PATH)
+    parser.add_argument('--dev-server', action='store_true', help='also measure the Werkzeug development server')
+    args = parser.parse_args()
+
+    print(f"🏁 {args.path} | {cores} cores | {args.clients} clients | {args.duration}s per run")
+    print(f"{'server':<22} {'req/s':>10} {'p50 ms':>9} {'p99 ms':>9} {'errors':>7}")
+
+    if args.dev_server:
+        benchmark('werkzeug (run.py)', start_dev_server(args.port), args)
+
+    baseline = None
+    for workers in args.workers:
+        result = benchmark(f"gunicorn {workers}w x {args.threads}t", start_gunicorn(args.port, workers, args.threads), args)
+        if result and baseline is None:
+            baseline = result['rps']
+        elif result and baseline:
+            print(f"{'':<22} {result['rps'] / baseline:>9.2f}x vs {args.workers[0]} worker(s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,218 @@
+"""
+Transaction stats benchmark - per-booking lookups vs daily rollups + top accounts
+
+Generates a bookings collection (default 1M bookings over 400 days, with
+users and services) and times the admin transaction statistics for the
+week, month and year windows:
+  legacy     every booking of the window loaded into Python, one services
+             and one users find_one per booking (what /transaction-stats
+             used to do); only run on windows up to --legacy-max bookings
+  route      what the route runs now: DailyRollup.transaction_summary over
+             the daily_rollups of the window plus Booking.top_accounts, one
+             $facet aggregation over its bookings
+
+Where both ran, the results are compared (totals, statuses, timeline and
+the transaction counts of the top providers and users) and the benchmark
+fails on any difference, so it doubles as a regression check.
+
+Needs a local mongod; uses its own database (default: tripook_transaction_benchmark).
+The dataset is kept between runs and regenerated only when its size changes;
+its daily rollups are rebuilt with it (DailyRollup.rebuild_all). Windows are
+whole UTC days, as the route uses them.
+
+Usage (from backend/):
+    python benchmark_transaction_stats.py
+    python benchmark_transaction_stats.py --bookings 200000 --legacy-max 50000 --repeat 5
+"""
+import argparse
+import os
+import random
+import time
+from datetime import datetime, timedelta
+from bson import ObjectId
+
+STATUSES = ('pending', 'confirmed', 'cancelled', 'completed')
+
+
+def generate(db, bookings, users, providers, services, days):
+    print(f"🛠️  Generating {bookings} bookings, {users} users, {providers} providers, {services} services...")
+    rng = random.Random(42)
+    for name in ('bookings', 'users', 'services'):
+        db[name].drop()
+
+    user_ids = [ObjectId() for _ in range(users)]
+    provider_ids = [ObjectId() for _ in range(providers)]
+    db.users.insert_many(
+        [{'_id': _id, 'fullName': f"User {i}", 'email': f"user{i}@example.com", 'role': 'user'}
+         for i, _id in enumerate(user_ids)] +
+        [{'_id': _id, 'fullName': f"Provider {i}", 'email': f"provider{i}@example.com",
+          'companyName': f"Company {i}", 'role': 'provider'} for i, _id in enumerate(provider_ids)]
+    )
+    # provider_id is stored as a string on some services, as older registrations did
+    service_ids = [ObjectId() for _ in range(services)]
+    db.services.insert_many([
+        {'_id': _id, 'name': f"Service {i}",
+         'provider_id': provider_ids[i % providers] if i % 5 else str(provider_ids[i % providers])}
+        for i, _id in enumerate(service_ids)
+    ])
+
+    end = datetime.utcnow()
+    batch = []
+    for i in range(bookings):
+        # Skewed popularity so the top 10 are well separated
+        user_id = user_ids[min(int(rng.paretovariate(1.2)) - 1, users - 1)]
+        batch.append({
+            'user_id': user_id if i % 7 else str(user_id),
+            'service_id': service_ids[min(int(rng.paretovariate(1.1)) - 1, services - 1)] if i % 10 else None,
+            'total_amount': round(rng.uniform(20, 2000), 2),
+            'status': rng.choice(STATUSES),
+            'booking_date': end - timedelta(seconds=rng.randrange(days * 86400)),
+            'created_at': end
+        })
+        if len(batch) == 10000:
+            db.bookings.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        db.bookings.insert_many(batch, ordered=False)
+
+
+def legacy_transaction_stats(db, start_date, end_date):
+    """The per-booking implementation /transaction-stats used before the aggregation"""
+    bookings = list(db.bookings.find({'booking_date': {'$gte': start_date, '$lt': end_date}}))
+    total_transactions = len(bookings)
+    total_revenue = sum(b.get('total_amount', 0) for b in bookings)
+
+    provider_stats = {}
+    for booking in bookings:
+        service_id = booking.get('service_id')
+        if service_id:
+            service = db.services.find_one({'_id': service_id})
+            if service:
+                provider_id = str(service.get('provider_id'))
+                if provider_id not in provider_stats:
+                    provider = db.users.find_one({'_id': ObjectId(provider_id)})
+                    if provider:
+                        provider_stats[provider_id] = {'transaction_count': 0, 'total_revenue': 0}
+                if provider_id in provider_stats:
+                    provider_stats[provider_id]['transaction_count'] += 1
+                    provider_stats[provider_id]['total_revenue'] += booking.get('total_amount', 0)
+
+    user_stats = {}
+    for booking in bookings:
+        user_id = str(booking.get('user_id'))
+        if user_id not in user_stats:
+            if db.users.find_one({'_id': ObjectId(user_id)}):
+                user_stats[user_id] = {'transaction_count': 0, 'total_spent': 0}
+        if user_id in user_stats:
+            user_stats[user_id]['transaction_count'] += 1
+            user_stats[user_id]['total_spent'] += booking.get('total_amount', 0)
+
+    timeline = {}
+    for booking in bookings:
+        date_str = booking.get('booking_date').strftime('%Y-%m-%d')
+        timeline.setdefault(date_str, {'date': date_str, 'count': 0, 'revenue': 0})
+        timeline[date_str]['count'] += 1
+        timeline[date_str]['revenue'] += booking.get('total_amount', 0)
+
+    return {
+        'totalTransactions': total_transactions,
+        'totalRevenue': total_revenue,
+        'statusDistribution': {status: sum(1 for b in bookings if b.get('status') == status) for status in STATUSES},
+        'topProviders': sorted(provider_stats.values(), key=lambda x: x['transaction_count'], reverse=True)[:10],
+        'topUsers': sorted(user_stats.values(), key=lambda x: x['transaction_count'], reverse=True)[:10],
+        'timeline': sorted(timeline.values(), key=lambda x: x['date'])
+    }
+
+
+def route_transaction_stats(start_date, end_date):
+    """The statistics of /transaction-stats for start_date <= booking_date < end_date"""
+    from app.models.booking import Booking
+    from app.models.daily_rollup import DailyRollup
+    stats = DailyRollup.transaction_summary(start_date, end_date)
+    stats.update(Booking.top_accounts(start_date, end_date))
+    return stats
+
+
+def differences(legacy, route):
+    found = []
+    for field in ('totalTransactions', 'statusDistribution'):
+        if legacy[field] != route[field]:
+            found.append(field)
+    if abs(legacy['totalRevenue'] - route['totalRevenue']) > 0.01:
+        found.append('totalRevenue')
+    for field in ('topProviders', 'topUsers'):
+        # Ties may be ordered differently; the counts must match
+        if [x['transaction_count'] for x in legacy[field]] != [x['transaction_count'] for x in route[field]]:
+            found.append(field)
+    if [(x['date'], x['count']) for x in legacy['timeline']] != [(x['date'], x['count']) for x in route['timeline']]:
+        found.append('timeline')
+    return found
+
+
+def best_of(repeat, run):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = run()
+        timings.append((time.perf_counter() - started) * 1000)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--bookings', type=int, default=1000000)
+    parser.add_argument('--users', type=int, default=50000)
+    parser.add_argument('--providers', type=int, default=500)
+    parser.add_argument('--services', type=int, default=5000)
+    parser.add_argument('--days', type=int, default=400)
+    parser.add_argument('--legacy-max', type=int, default=100000, help='skip the legacy path on windows with more bookings')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--database', default='tripook_transaction_benchmark')
+    args = parser.parse_args()
+
+    from app.models.booking import Booking
+    from app.models.daily_rollup import DailyRollup
+    from app.models.login_rollup import day_start
+    from app.utils.database import client_manager, get_db
+    from app.utils.indexes import ensure_indexes
+
+    client_manager.mongo_uri = os.getenv('MONGO_LOCAL_URI', 'mongodb://localhost:27017')
+    client_manager.database_name = args.database
+    db = get_db()
+    generated = db.bookings.estimated_document_count() != args.bookings
+    if generated:
+        started = time.perf_counter()
+        generate(db, args.bookings, args.users, args.providers, args.services, args.days)
+        print(f"   done in {time.perf_counter() - started:.0f}s")
+    if generated or db[DailyRollup.COLLECTION].estimated_document_count() == 0:
+        started = time.perf_counter()
+        db[DailyRollup.COLLECTION].drop()
+        written = DailyRollup.rebuild_all()
+        print(f"🛠️  Rebuilt {written} daily rollups in {time.perf_counter() - started:.0f}s")
+    ensure_indexes(db, {Booking.COLLECTION: Booking.INDEXES})
+
+    until = day_start(datetime.utcnow()) + timedelta(days=1)
+    print(f"\n🏁 {args.bookings} bookings, best of {args.repeat}\n")
+    print(f"{'window':<7} {'bookings':>9} {'legacy ms':>10} {'route ms':>9} {'speedup':>8}  result")
+
+    failed = False
+    for window, days in (('week', 7), ('month', 30), ('year', 365)):
+        start = until - timedelta(days=days + 1)
+        route_ms, route = best_of(args.repeat, lambda: route_transaction_stats(start, until))
+        count = route['totalTransactions']
+        if count <= args.legacy_max:
+            legacy_ms, legacy = best_of(1, lambda: legacy_transaction_stats(db, start, until))
+            found = differences(legacy, route)
+            failed = failed or bool(found)
+            print(f"{window:<7} {count:>9} {legacy_ms:>10.0f} {route_ms:>9.0f} {legacy_ms / route_ms:>7.1f}x  "
+                  f"{'❌ differs: ' + ', '.join(found) if found else '✅ same'}")
+        else:
+            print(f"{window:<7} {count:>9} {'skipped':>10} {route_ms:>9.0f} {'':>8}")
+
+    client_manager.close()
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
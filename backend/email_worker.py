@@ -0,0 +1,40 @@
+"""
+Dedicated email delivery process - drains the email_outbox collection
+
+Run it next to the API when the web workers should only enqueue
+(EMAIL_OUTBOX_WORKERS=0 for gunicorn):
+
+Usage: python email_worker.py [--threads 4]
+"""
+import argparse
+import os
+import signal
+import threading
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from app.services.email_outbox import email_outbox
+from app.utils.database import client_manager
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Deliver queued emails')
+    parser.add_argument('--threads', type=int, default=int(os.getenv('EMAIL_WORKER_THREADS', 4)))
+    args = parser.parse_args()
+
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+
+    email_outbox.start(args.threads)
+    print(f"📮 Email worker delivering with {args.threads} threads (pid {os.getpid()})")
+    stop.wait()
+
+    print("🛑 Stopping email worker...")
+    email_outbox.shutdown()
+    client_manager.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+"""
+Local stand-in for Brevo's transactional email API (POST /v3/smtp/email)
+
+Point the API at it for offline tests and benchmarks:
+    python fake_brevo_server.py --port 8098 --delay-ms 150 --fail-rate 0.05
+    BREVO_API_URL=http://127.0.0.1:8098/v3 BREVO_API_KEY=test python run.py
+
+Every message is accepted (201) except:
+    recipients starting with "bounce"   -> 400 invalid_parameter (permanent),
+                                           for the whole request like Brevo
+    --fail-rate share of requests       -> 503 (temporary)
+    --rate-limit requests per second    -> 429 beyond that rate
+A request with messageVersions is answered with one messageId per version
+and counts one delivery per version. A repeated idempotencyKey header is
+answered with the first response and not counted again, like Brevo does.
+GET /stats returns the counters.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class BrevoHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    delay_seconds = 0.0
+    fail_rate = 0.0
+    rate_limit = 0
+    stats = {'requests': 0, 'batches': 0, 'delivered': 0, 'duplicates': 0, 'failed': 0, 'bounced': 0, 'throttled': 0}
+    sent_keys = {}
+    _window = [0.0, 0]
+    _lock = threading.Lock()
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        body = json.loads(self.rfile.read(length) or b'{}')
+
+        if self.delay_seconds:
+            time.sleep(self.delay_seconds)
+
+        with BrevoHandler._lock:
+            BrevoHandler.stats['requests'] += 1
+            status, result = self._handle(body)
+        self._reply(status, result)
+
+    def _handle(self, body):
+        stats = BrevoHandler.stats
+        if not self.headers.get('api-key'):
+            stats['failed'] += 1
+            return 401, {'code': 'unauthorized', 'message': 'Key not found'}
+
+        if self.rate_limit:
+            now = time.monotonic()
+            if now - BrevoHandler._window[0] >= 1.0:
+                BrevoHandler._window[:] = [now, 0]
+            BrevoHandler._window[1] += 1
+            if BrevoHandler._window[1] > self.rate_limit:
+                stats['throttled'] += 1
+                return 429, {'code': 'too_many_requests', 'message': 'Rate limit exceeded'}
+
+        key = (body.get('headers') or {}).get('idempotencyKey')
+        if key and key in BrevoHandler.sent_keys:
+            stats['duplicates'] += 1
+            return 201, BrevoHandler.sent_keys[key]
+
+        versions = body.get('messageVersions') or [{'to': body.get('to', [])}]
+        if any(recipient.get('email', '').startswith('bounce') for version in versions for recipient in version.get('to', [])):
+            stats['bounced'] += 1
+            return 400, {'code': 'invalid_parameter', 'message': 'email is not valid in to'}
+
+        if random.random() < self.fail_rate:
+            stats['failed'] += 1
+            return 503, {'code': 'service_unavailable', 'message': 'Temporary failure'}
+
+        message_ids = [f"<{uuid.uuid4().hex}@smtp-relay.mailin.fr>" for _ in versions]
+        if 'messageVersions' in body:
+            stats['batches'] += 1
+            result = {'messageIds': message_ids}
+        else:
+            result = {'messageId': message_ids[0]}
+        if key:
+            BrevoHandler.sent_keys[key] = result
+        stats['delivered'] += len(versions)
+        return 201, result
+
+    def do_GET(self):
+        with BrevoHandler._lock:
+            self._reply(200, dict(BrevoHandler.stats))
+
+    def _reply(self, status, result):
+        body = json.dumps(result).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def configure(delay_ms=0.0, fail_rate=0.0, rate_limit=0):
+    BrevoHandler.delay_seconds = delay_ms / 1000.0
+    BrevoHandler.fail_rate = fail_rate
+    BrevoHandler.rate_limit = rate_limit
+
+
+def start_server(port=8098, delay_ms=0.0, fail_rate=0.0, rate_limit=0):
+    """Start the server in a daemon thread; returns the server (call shutdown() to stop)"""
+    configure(delay_ms, fail_rate, rate_limit)
+    server = ThreadingHTTPServer(('127.0.0.1', port), BrevoHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='fake-brevo', daemon=True).start()
+    return server
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Fake Brevo transactional email API')
+    parser.add_argument('--port', type=int, default=8098)
+    parser.add_argument('--delay-ms', type=float, default=0.0, help='simulated API latency')
+    parser.add_argument('--fail-rate', type=float, default=0.0, help='share of requests answered with 503')
+    parser.add_argument('--rate-limit', type=int, default=0, help='requests per second before 429, 0 for none')
+    args = parser.parse_args()
+
+    configure(args.delay_ms, args.fail_rate, args.rate_limit)
+    print(f"📨 Fake Brevo listening on http://127.0.0.1:{args.port}/v3/smtp/email")
+    ThreadingHTTPServer(('127.0.0.1', args.port), BrevoHandler).serve_forever()
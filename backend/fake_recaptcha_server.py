@@ -0,0 +1,97 @@
+"""
+Local stand-in for Google's reCAPTCHA siteverify endpoint
+
+Point the API at it for offline tests and benchmarks:
+    python fake_recaptcha_server.py --port 8099 --delay-ms 40 --connect-delay-ms 60
+    RECAPTCHA_VERIFY_URL=http://127.0.0.1:8099/recaptcha/api/siteverify RECAPTCHA_SECRET_KEY=test python run.py
+
+Every token is accepted except:
+    fail...     -> invalid-input-response
+    expired...  -> timeout-or-duplicate
+Connections are kept alive (HTTP/1.1), like Google's endpoint; --connect-delay-ms
+stands in for the TCP+TLS handshake a new connection to Google costs.
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+
+class SiteVerifyHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    delay_seconds = 0.0
+    connect_delay_seconds = 0.0
+    verifications = 0
+    connections = 0
+    _lock = threading.Lock()
+
+    def setup(self):
+        super().setup()
+        with SiteVerifyHandler._lock:
+            SiteVerifyHandler.connections += 1
+        if self.connect_delay_seconds:
+            time.sleep(self.connect_delay_seconds)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        form = parse_qs(self.rfile.read(length).decode('utf-8'))
+        token = form.get('response', [''])[0]
+
+        if self.delay_seconds:
+            time.sleep(self.delay_seconds)
+        with SiteVerifyHandler._lock:
+            SiteVerifyHandler.verifications += 1
+
+        if not form.get('secret'):
+            result = {'success': False, 'error-codes': ['missing-input-secret']}
+        elif token.startswith('fail'):
+            result = {'success': False, 'error-codes': ['invalid-input-response']}
+        elif token.startswith('expired'):
+            result = {'success': False, 'error-codes': ['timeout-or-duplicate']}
+        else:
+            result = {'success': True, 'challenge_ts': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()), 'hostname': 'localhost'}
+
+        body = json.dumps(result).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        # /stats: counters for benchmarks
+        body = json.dumps({'verifications': self.verifications, 'connections': self.connections}).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(port=8099, delay_ms=0.0, connect_delay_ms=0.0):
+    """Start the server in a daemon thread; returns the server (call shutdown() to stop)"""
+    SiteVerifyHandler.delay_seconds = delay_ms / 1000.0
+    SiteVerifyHandler.connect_delay_seconds = connect_delay_ms / 1000.0
+    server = ThreadingHTTPServer(('127.0.0.1', port), SiteVerifyHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='fake-recaptcha', daemon=True).start()
+    return server
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Fake reCAPTCHA siteverify server')
+    parser.add_argument('--port', type=int, default=8099)
+    parser.add_argument('--delay-ms', type=float, default=0.0, help='simulated verification latency')
+    parser.add_argument('--connect-delay-ms', type=float, default=0.0, help='simulated handshake cost per new connection')
+    args = parser.parse_args()
+
+    SiteVerifyHandler.delay_seconds = args.delay_ms / 1000.0
+    SiteVerifyHandler.connect_delay_seconds = args.connect_delay_ms / 1000.0
+    print(f"🤖 Fake reCAPTCHA listening on http://127.0.0.1:{args.port}/recaptcha/api/siteverify")
+    ThreadingHTTPServer(('127.0.0.1', args.port), SiteVerifyHandler).serve_forever()
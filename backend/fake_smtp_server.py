@@ -0,0 +1,193 @@
+"""
+Local SMTP sink for offline tests and benchmarks
+
+Speaks enough ESMTP for smtplib and the SMTP pool: EHLO (advertising
+PIPELINING, 8BITMIME and AUTH), AUTH PLAIN/LOGIN (any credentials), MAIL,
+RCPT, DATA, RSET, NOOP and QUIT. Messages are counted and dropped. There is
+no STARTTLS; run the API with SMTP_USE_TLS=false against it.
+
+    python fake_smtp_server.py --port 2525 --rtt-ms 20 --handshake-ms 150
+    SMTP_SERVER=127.0.0.1 SMTP_PORT=2525 SMTP_USE_TLS=false SMTP_USERNAME=test SMTP_PASSWORD=test python run.py
+
+--rtt-ms delays every batch of replies, like a network round trip: a
+client that pipelines its commands pays it once for the whole batch.
+--handshake-ms is added to the greeting of every new connection, standing in
+for the TCP + TLS handshake to a real relay. Recipients starting with
+"bounce" are refused with 550; --drop-after N closes each connection right
+after accepting its Nth message, as relays do with long-lived connections.
+"""
+import argparse
+import socketserver
+import threading
+import time
+
+
+class Stats:
+    lock = threading.Lock()
+    values = {'connections': 0, 'messages': 0, 'recipients': 0, 'refused': 0, 'roundTrips': 0}
+
+    @classmethod
+    def add(cls, name, amount=1):
+        with cls.lock:
+            cls.values[name] += amount
+
+    @classmethod
+    def snapshot(cls):
+        with cls.lock:
+            return dict(cls.values)
+
+
+class SmtpHandler(socketserver.BaseRequestHandler):
+    rtt_seconds = 0.0
+    handshake_seconds = 0.0
+    drop_after = 0
+
+    def setup(self):
+        Stats.add('connections')
+        self.buffer = b''
+        self.pending = []
+        self.messages = 0
+        self.reset()
+
+    def reset(self):
+        self.sender = None
+        self.recipients = []
+
+    def reply(self, line):
+        self.pending.append(f"{line}\r\n".encode('ascii'))
+
+    def flush(self):
+        if not self.pending:
+            return
+        if self.rtt_seconds:
+            time.sleep(self.rtt_seconds)
+        Stats.add('roundTrips')
+        self.request.sendall(b''.join(self.pending))
+        self.pending = []
+
+    def read_more(self):
+        data = self.request.recv(65536)
+        if not data:
+            raise ConnectionError('client closed the connection')
+        self.buffer += data
+
+    def handle(self):
+        if self.handshake_seconds:
+            time.sleep(self.handshake_seconds)
+        self.reply('220 fake-smtp ESMTP ready')
+        self.flush()
+        try:
+            while True:
+                # Answer every complete command received so far in one batch
+                self.read_more()
+                while b'\r\n' in self.buffer:
+                    line, self.buffer = self.buffer.split(b'\r\n', 1)
+                    if not self.command(line.decode('utf-8', 'replace')):
+                        self.flush()
+                        return
+                self.flush()
+        except (ConnectionError, OSError):
+            return
+
+    def command(self, line):
+        verb = line.split(' ', 1)[0].upper()
+        argument = line[len(verb):].strip()
+
+        if verb in ('EHLO', 'HELO'):
+            self.reply('250-fake-smtp')
+            self.reply('250-PIPELINING')
+            self.reply('250-8BITMIME')
+            self.reply('250-SIZE 35882577')
+            self.reply('250 AUTH PLAIN LOGIN')
+        elif verb == 'AUTH':
+            mechanism = argument.split(' ')[0].upper()
+            if mechanism == 'LOGIN' and ' ' not in argument:
+                for prompt in ('334 VXNlcm5hbWU6', '334 UGFzc3dvcmQ6'):
+                    self.reply(prompt)
+                    self.flush()
+                    while b'\r\n' not in self.buffer:
+                        self.read_more()
+                    _, self.buffer = self.buffer.split(b'\r\n', 1)
+            self.reply('235 2.7.0 Authentication successful')
+        elif verb == 'MAIL':
+            self.reset()
+            self.sender = argument
+            self.reply('250 2.1.0 Ok')
+        elif verb == 'RCPT':
+            address = argument.split(':', 1)[-1].strip('<> ')
+            if self.sender is None:
+                self.reply('503 5.5.1 Need MAIL command')
+            elif address.startswith('bounce'):
+                Stats.add('refused')
+                self.reply('550 5.1.1 Recipient address rejected: User unknown')
+            else:
+                self.recipients.append(address)
+                self.reply('250 2.1.5 Ok')
+        elif verb == 'DATA':
+            if not self.recipients:
+                self.reply('554 5.5.1 No valid recipients')
+                return True
+            self.reply('354 End data with <CR><LF>.<CR><LF>')
+            self.flush()
+            self.read_data()
+            Stats.add('messages')
+            Stats.add('recipients', len(self.recipients))
+            self.messages += 1
+            self.reset()
+            self.reply('250 2.0.0 Ok: queued')
+            if self.drop_after and self.messages >= self.drop_after:
+                return False
+        elif verb == 'RSET':
+            self.reset()
+            self.reply('250 2.0.0 Ok')
+        elif verb == 'NOOP':
+            self.reply('250 2.0.0 Ok')
+        elif verb == 'QUIT':
+            self.reply('221 2.0.0 Bye')
+            return False
+        else:
+            self.reply('502 5.5.2 Command not recognized')
+        return True
+
+    def read_data(self):
+        while b'\r\n.\r\n' not in self.buffer and not self.buffer.startswith(b'.\r\n'):
+            self.read_more()
+        if self.buffer.startswith(b'.\r\n'):
+            self.buffer = self.buffer[3:]
+        else:
+            self.buffer = self.buffer.split(b'\r\n.\r\n', 1)[1]
+
+
+class ThreadingSmtpServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+def configure(rtt_ms=0.0, handshake_ms=0.0, drop_after=0):
+    SmtpHandler.rtt_seconds = rtt_ms / 1000.0
+    SmtpHandler.handshake_seconds = handshake_ms / 1000.0
+    SmtpHandler.drop_after = drop_after
+
+
+def start_server(port=2525, rtt_ms=0.0, handshake_ms=0.0, drop_after=0):
+    """Start the server in a daemon thread; returns the server (call shutdown() to stop)"""
+    configure(rtt_ms, handshake_ms, drop_after)
+    server = ThreadingSmtpServer(('127.0.0.1', port), SmtpHandler)
+    threading.Thread(target=server.serve_forever, name='fake-smtp', daemon=True).start()
+    return server
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Fake SMTP sink')
+    parser.add_argument('--port', type=int, default=2525)
+    parser.add_argument('--rtt-ms', type=float, default=0.0, help='delay per batch of replies')
+    parser.add_argument('--handshake-ms', type=float, default=0.0, help='extra delay per new connection')
+    parser.add_argument('--drop-after', type=int, default=0, help='close connections after this many messages')
+    args = parser.parse_args()
+
+    configure(args.rtt_ms, args.handshake_ms, args.drop_after)
+    print(f"📪 Fake SMTP listening on 127.0.0.1:{args.port}")
+    try:
+        ThreadingSmtpServer(('127.0.0.1', args.port), SmtpHandler).serve_forever()
+    except KeyboardInterrupt:
+        print(f"\n{Stats.snapshot()}")
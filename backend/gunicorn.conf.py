@@ -0,0 +1,73 @@
+"""
+Gunicorn configuration for the Tripook API
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+All settings can be overridden from the environment:
+
+WEB_CONCURRENCY          worker processes (default: number of CPU cores)
+WEB_THREADS              threads per worker (default: 8)
+WEB_PRELOAD              import the app once in the master before forking (default: true)
+WEB_MAX_REQUESTS         recycle a worker after this many requests, 0 disables (default: 2000)
+WEB_MAX_REQUESTS_JITTER  random extra requests so workers do not restart together (default: 200)
+WEB_TIMEOUT              seconds before a silent worker is killed (default: 30)
+WEB_GRACEFUL_TIMEOUT     seconds a worker gets to finish in-flight requests on reload/stop (default: 30)
+PORT                     listen port (default: 5000)
+
+Graceful reload: `kill -HUP <master pid>` starts new workers with the new
+configuration and lets the old ones finish their requests. With preloading
+enabled the application code is imported by the master, so deploying new
+code needs a restart (or WEB_PRELOAD=false).
+"""
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', 5000)}"
+
+workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+threads = int(os.getenv('WEB_THREADS', 8))
+worker_class = 'gthread'
+
+preload_app = os.getenv('WEB_PRELOAD', 'true').lower() == 'true'
+
+max_requests = int(os.getenv('WEB_MAX_REQUESTS', 2000))
+max_requests_jitter = int(os.getenv('WEB_MAX_REQUESTS_JITTER', 200))
+
+timeout = int(os.getenv('WEB_TIMEOUT', 30))
+graceful_timeout = int(os.getenv('WEB_GRACEFUL_TIMEOUT', 30))
+keepalive = 5
+
+accesslog = os.getenv('WEB_ACCESS_LOG', '-') or None
+errorlog = '-'
+
+# The Mongo pool size is derived from these in app/utils/database.py
+os.environ.setdefault('WEB_CONCURRENCY', str(workers))
+os.environ.setdefault('WEB_THREADS', str(threads))
+
+
+def post_fork(server, worker):
+    # Each worker opens its own MongoClient on first use
+    from app.utils.database import client_manager
+    client_manager.forget_client()
+    # Build this worker's registered email filter while it starts taking requests
+    from app.utils.email_bloom import registered_emails
+    registered_emails.start()
+    # Deliver queued emails from every worker, including recycled ones that have not enqueued yet
+    from app.services.email_outbox import email_outbox
+    if email_outbox.enabled and email_outbox.workers > 0:
+        email_outbox.start()
+    server.log.info(f"Worker {worker.pid} ready ({threads} threads)")
+
+
+def worker_exit(server, worker):
+    from app.utils.database import client_manager
+    from app.utils.password_hashing import password_hasher
+    from app.services.email_outbox import email_outbox
+    from app.services.email_service import email_service
+    from app.services.login_activity_buffer import login_activity_buffer
+    login_activity_buffer.shutdown()
+    email_outbox.shutdown()
+    if email_service.smtp_pool is not None:
+        email_service.smtp_pool.close()
+    client_manager.close()
+    password_hasher.shutdown()
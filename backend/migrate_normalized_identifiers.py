@@ -0,0 +1,87 @@
+"""
+Backfill email_normalized / username_normalized on existing users
+Uses MONGO_URI / MONGO_DATABASE from the environment, same as the API
+
+Emails that collide once lowercased are reported and left without
+email_normalized, so the unique index can still be built; resolve them by
+hand and run the migration again.
+
+Usage: python migrate_normalized_identifiers.py [--dry-run] [--batch-size 1000]
+"""
+import argparse
+import os
+from dotenv import load_dotenv
+from pymongo import MongoClient, UpdateOne
+from app.models.user import User
+from app.utils.indexes import ensure_indexes
+
+load_dotenv()
+
+def find_email_collisions(users):
+    """Lowercased emails shared by more than one user"""
+    pipeline = [
+        {'$match': {'email': {'$type': 'string'}}},
+        {'$group': {
+            '_id': {'$toLower': {'$trim': {'input': '$email'}}},
+            'ids': {'$push': '$_id'},
+            'count': {'$sum': 1}
+        }},
+        {'$match': {'count': {'$gt': 1}}}
+    ]
+    return list(users.aggregate(pipeline, allowDiskUse=True))
+
+def backfill(db, batch_size=1000, dry_run=False):
+    users = db.users
+
+    collisions = find_email_collisions(users)
+    colliding_ids = {user_id for group in collisions for user_id in group['ids']}
+    for group in collisions:
+        print(f"⚠️  {group['count']} users share email '{group['_id']}': {', '.join(str(i) for i in group['ids'])}")
+
+    scanned = updated = 0
+    operations = []
+    cursor = users.find({}, {'email': 1, 'username': 1, 'email_normalized': 1, 'username_normalized': 1}, batch_size=batch_size)
+    for user in cursor:
+        scanned += 1
+        fields = User.normalized_fields(user.get('email'), user.get('username'))
+        if user['_id'] in colliding_ids:
+            fields.pop('email_normalized')
+        changes = {field: value for field, value in fields.items() if user.get(field) != value}
+        if not changes:
+            continue
+        operations.append(UpdateOne({'_id': user['_id']}, {'$set': changes}))
+        if len(operations) >= batch_size:
+            updated += _flush(users, operations, dry_run)
+            operations = []
+    if operations:
+        updated += _flush(users, operations, dry_run)
+
+    print(f"Scanned {scanned} users, {'would update' if dry_run else 'updated'} {updated}, {len(colliding_ids)} with colliding emails")
+    return updated
+
+def _flush(users, operations, dry_run):
+    if dry_run:
+        return len(operations)
+    return users.bulk_write(operations, ordered=False).modified_count
+
+def main():
+    parser = argparse.ArgumentParser(description='Backfill normalized login identifiers')
+    parser.add_argument('--dry-run', action='store_true')
+    parser.add_argument('--batch-size', type=int, default=1000)
+    args = parser.parse_args()
+
+    mongo_uri = os.getenv('MONGO_URI') or os.getenv('MONGO_LOCAL_URI', 'mongodb://localhost:27017/tripook')
+    database_name = os.getenv('MONGO_DATABASE', 'tripook')
+    client = MongoClient(mongo_uri, serverSelectionTimeoutMS=5000)
+    db = client[database_name]
+
+    print(f"🔗 Backfilling normalized identifiers on database: {database_name}")
+    backfill(db, args.batch_size, args.dry_run)
+
+    if not args.dry_run:
+        # Build the *_normalized indexes now that the fields exist
+        ensure_indexes(db, {'users': User.INDEXES})
+    client.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+"""
+Recompute the daily business rollups from users, bookings and login_rollups
+Uses MONGO_URI / MONGO_DATABASE from the environment, same as the API
+
+The API backfills an empty collection by itself (DAILY_ROLLUP_BACKFILL); run
+this after updates failed (see dailyRollups.errors in
+/api/admin/query-profile) or when that backfill did not complete. Logins are taken from
+the day login_rollups, so rebuild those first (rebuild_login_rollups.py) if
+they are incomplete. Days are replaced whole; events written while a day is
+being rebuilt may be counted twice or not at all, so rebuild today when
+traffic is quiet.
+
+Usage: python rebuild_daily_rollups.py [--since 2021-01-01] [--until 2026-10-18]
+"""
+import argparse
+import time
+from datetime import datetime
+from dotenv import load_dotenv
+from app.models.daily_rollup import DailyRollup
+from app.models.login_rollup import day_start
+from app.utils.database import client_manager
+
+load_dotenv()
+
+def rebuild(since=None, until=None):
+    since = since or DailyRollup.first_event()
+    if since is None:
+        print("ℹ️  Nothing to rebuild")
+        return 0
+    started = time.perf_counter()
+    written = DailyRollup.rebuild_all(since, until)
+    print(f"✅ Rebuilt {written} daily rollups from {day_start(since):%Y-%m-%d} in {time.perf_counter() - started:.1f}s")
+    return written
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Recompute daily rollups')
+    parser.add_argument('--since', type=datetime.fromisoformat, help='first day (default: the earliest event)')
+    parser.add_argument('--until', type=datetime.fromisoformat, help='end day, exclusive (default: tomorrow)')
+    args = parser.parse_args()
+
+    rebuild(args.since, args.until)
+    client_manager.close()
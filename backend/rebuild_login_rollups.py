@@ -0,0 +1,48 @@
+"""
+Recompute the daily and monthly login rollups from login_activities
+Uses MONGO_URI / MONGO_DATABASE from the environment, same as the API
+
+Run once after deploying the rollups so the admin login statistics include
+the history recorded before them, or after rollup updates failed (see
+rollupErrors in /api/admin/query-profile). Whole months are replaced; logins
+written while a month is being rebuilt may be counted twice or not at all,
+so rebuild the current month when logins are quiet.
+
+Months that start before the fold watermark of archive_login_activities.py
+are never replaced, whatever --since says: their raw events older than the
+retention are deleted, so a rebuild would drop those logins and users from
+the month and year statistics. The month straddling the watermark is kept
+as it is too (its day rollups included); rebuilding starts at the first
+whole month after it.
+
+Usage: python rebuild_login_rollups.py [--since 2021-01-01] [--until 2026-10-01]
+"""
+import argparse
+import time
+from datetime import datetime
+from dotenv import load_dotenv
+from app.models.login_rollup import LoginRollup
+from app.utils.database import client_manager, get_db
+from app.utils.indexes import ensure_indexes
+
+load_dotenv()
+
+def rebuild(since=None, until=None):
+    ensure_indexes(get_db(), {LoginRollup.COLLECTION: LoginRollup.INDEXES})
+    start = LoginRollup.rebuild_start(since)
+    folded = LoginRollup.folded_until()
+    if folded is not None:
+        print(f"ℹ️  Raw logins before {folded:%Y-%m-%d} are archived; rebuilding from {start:%Y-%m-%d}")
+    started = time.perf_counter()
+    written = LoginRollup.rebuild(since, until)
+    print(f"✅ Rebuilt {written} login rollups in {time.perf_counter() - started:.1f}s")
+    return written
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Recompute login rollups from login_activities')
+    parser.add_argument('--since', type=datetime.fromisoformat, help='first day (rounded down to its month)')
+    parser.add_argument('--until', type=datetime.fromisoformat, help='end, exclusive (default: now)')
+    args = parser.parse_args()
+
+    rebuild(args.since, args.until)
+    client_manager.close()
@@ -0,0 +1,30 @@
+"""
+Reconcile MongoDB indexes with the declarations on each model
+Uses MONGO_URI / MONGO_DATABASE from the environment, same as the API
+
+Usage: python sync_indexes.py
+"""
+import os
+from dotenv import load_dotenv
+from pymongo import MongoClient
+from app.utils.indexes import ensure_indexes
+
+load_dotenv()
+
+def sync_indexes():
+    mongo_uri = os.getenv('MONGO_URI') or os.getenv('MONGO_LOCAL_URI', 'mongodb://localhost:27017/tripook')
+    database_name = os.getenv('MONGO_DATABASE', 'tripook')
+    
+    client = MongoClient(mongo_uri, serverSelectionTimeoutMS=5000)
+    db = client[database_name]
+    
+    print(f"🔗 Reconciling indexes on database: {database_name}")
+    reports = ensure_indexes(db)
+    
+    drift = sum(len(r['changed']) + len(r['renamed']) + len(r['undeclared']) for r in reports.values())
+    errors = sum(len(r['errors']) for r in reports.values())
+    print(f"\nDone. Drift: {drift}, errors: {errors}")
+    client.close()
+
+if __name__ == '__main__':
+    sync_indexes()
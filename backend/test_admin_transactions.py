@@ -0,0 +1,177 @@
+"""
+Admin transaction list tests - the provider filter in the bookings query and
+batched enrichment of each page
+
+No server or database needed; bookings, services and users are in-memory
+stand-ins that record every query, and /api/admin/transactions runs in a
+Flask test client with an admin access token:
+    python test_admin_transactions.py
+    python -m pytest test_admin_transactions.py
+"""
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from unittest import mock
+from bson import ObjectId
+from flask import Flask
+from app.models import service as service_module
+from app.routes import admin
+from app.utils.jwt_auth import issue_tokens
+
+
+class FakeCollection:
+    """find/count_documents with equality and $in, $gte, $lte; records each query"""
+
+    def __init__(self, documents=()):
+        self.documents = list(documents)
+        self.queries = []
+
+    @staticmethod
+    def matches(document, query):
+        for field, condition in query.items():
+            value = document.get(field)
+            if not isinstance(condition, dict):
+                if value != condition:
+                    return False
+                continue
+            if '$in' in condition and value not in condition['$in']:
+                return False
+            if '$gte' in condition and not (value is not None and value >= condition['$gte']):
+                return False
+            if '$lte' in condition and not (value is not None and value <= condition['$lte']):
+                return False
+        return True
+
+    def find(self, query, projection=None):
+        self.queries.append(('find', query))
+        found = [dict(document) for document in self.documents if self.matches(document, query)]
+        if projection:
+            found = [{field: value for field, value in document.items() if field == '_id' or field in projection}
+                     for document in found]
+        return Cursor(found)
+
+    def find_one(self, query, projection=None):
+        raise AssertionError(f"find_one per row: {query}")
+
+    def count_documents(self, query):
+        self.queries.append(('count', query))
+        return sum(self.matches(document, query) for document in self.documents)
+
+
+class Cursor(list):
+    def sort(self, keys):
+        documents = list(self)
+        for field, direction in reversed(keys):
+            documents.sort(key=lambda document: document[field], reverse=direction < 0)
+        return Cursor(documents)
+
+    def skip(self, count):
+        return Cursor(self[count:])
+
+    def limit(self, count):
+        return Cursor(self[:count])
+
+
+class Data:
+    def __init__(self):
+        self.admin = {'_id': ObjectId(), 'role': 'admin', 'status': 'active', 'accountStatus': 'active', 'tokenVersion': 0}
+        self.provider_a = {'_id': ObjectId(), 'fullName': 'Trần Bình', 'companyName': 'Bình Travel', 'email': 'binh@example.com'}
+        self.provider_b = {'_id': ObjectId(), 'fullName': 'Lê Chi', 'companyName': 'Chi Tours', 'email': 'chi@example.com'}
+        self.customer = {'_id': ObjectId(), 'fullName': 'Nguyễn An', 'email': 'an@example.com'}
+        # provider_id is stored as an ObjectId on some services and as a string on others
+        self.tour = {'_id': ObjectId(), 'name': 'Hạ Long 2N1Đ', 'type': 'tour', 'provider_id': self.provider_a['_id']}
+        self.hotel = {'_id': ObjectId(), 'name': 'Khách sạn Sapa', 'type': 'hotel', 'provider_id': str(self.provider_a['_id'])}
+        self.cruise = {'_id': ObjectId(), 'name': 'Mekong', 'type': 'tour', 'provider_id': self.provider_b['_id']}
+        start = datetime(2026, 9, 1)
+        self.bookings = [
+            {'_id': ObjectId(), 'user_id': self.customer['_id'], 'service_id': service['_id'], 'total_amount': 100 + index,
+             'status': 'confirmed', 'booking_date': start + timedelta(hours=index)}
+            for index, service in enumerate([self.tour, self.hotel, self.cruise] * 10)
+        ]
+
+
+@contextmanager
+def transactions():
+    data = Data()
+    db = mock.Mock(
+        bookings=FakeCollection(data.bookings),
+        services=FakeCollection([data.tour, data.hotel, data.cruise]),
+        users=FakeCollection([data.admin, data.provider_a, data.provider_b, data.customer])
+    )
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = 'test-secret'
+    app.register_blueprint(admin.admin_bp)
+    with mock.patch.dict('os.environ', {'JWT_REFRESH_TOKENS': 'true'}), \
+            mock.patch.object(admin, 'get_db', lambda: db), \
+            mock.patch.object(service_module, 'get_db', lambda: db), \
+            app.app_context():
+        token = issue_tokens(data.admin)['token']
+        client = app.test_client()
+
+        def get(headers=None, **args):
+            headers = {'Authorization': f'Bearer {token}'} if headers is None else headers
+            return client.get('/api/admin/transactions', query_string=args, headers=headers)
+
+        yield get, db, data
+
+
+def test_provider_filter_gives_full_pages_and_the_right_total():
+    with transactions() as (get, db, data):
+        response = get(provider_id=str(data.provider_a['_id']), limit=15)
+        body = response.get_json()
+        assert response.status_code == 200 and body['success']
+        # 20 of the 30 bookings are of provider A's tour or hotel
+        assert body['pagination'] == {'page': 1, 'limit': 15, 'total': 20, 'totalPages': 2}
+        assert len(body['transactions']) == 15
+        assert {row['provider']['company_name'] for row in body['transactions']} == {'Bình Travel'}
+        assert len(get(provider_id=str(data.provider_a['_id']), limit=15, page=2).get_json()['transactions']) == 5
+        # The filter is part of the bookings query, not applied to the page afterwards
+        assert db.bookings.queries[0] == ('count', {'service_id': {'$in': [data.tour['_id'], data.hotel['_id']]}})
+
+
+def test_each_page_is_enriched_with_three_queries():
+    with transactions() as (get, db, data):
+        body = get(limit=10).get_json()
+        assert len(body['transactions']) == 10
+        assert len(db.users.queries) == 2 and len(db.services.queries) == 1
+        row = next(row for row in body['transactions'] if row['service']['name'] == 'Mekong')
+        assert row['user'] == {'user_id': str(data.customer['_id']), 'name': 'Nguyễn An', 'email': 'an@example.com'}
+        assert row['provider'] == {'provider_id': str(data.provider_b['_id']), 'name': 'Lê Chi', 'company_name': 'Chi Tours'}
+        assert row['service']['type'] == 'tour' and row['transaction_id'] == f"TXN-{row['booking_id'][-8:]}"
+
+
+def test_newest_bookings_first():
+    with transactions() as (get, _, data):
+        dates = [row['booking_date'] for row in get(limit=30).get_json()['transactions']]
+        assert dates == sorted(dates, reverse=True) and len(dates) == 30
+
+
+def test_missing_parties_are_left_blank():
+    with transactions() as (get, db, data):
+        db.users.documents.remove(data.customer)
+        db.services.documents.remove(data.cruise)
+        rows = get(limit=30).get_json()['transactions']
+        cruise_row = next(row for row in rows if row['service']['service_id'] == '')
+        assert cruise_row['provider'] == {'provider_id': '', 'name': '', 'company_name': ''}
+        assert all(row['user']['name'] == 'Unknown' for row in rows)
+
+
+def test_provider_without_services_matches_nothing():
+    with transactions() as (get, db, _):
+        body = get(provider_id=str(ObjectId())).get_json()
+        assert body['transactions'] == [] and body['pagination']['total'] == 0
+        assert db.users.queries == [], 'nothing to enrich'
+
+
+def test_requires_an_admin():
+    with transactions() as (get, db, data):
+        assert get(headers={}).status_code == 401
+        customer = {**data.customer, 'role': 'user', 'status': 'active', 'accountStatus': 'active', 'tokenVersion': 0}
+        assert get(headers={'Authorization': f"Bearer {issue_tokens(customer)['token']}"}).status_code == 403
+        assert db.bookings.queries == []
+
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f"✅ {name}")
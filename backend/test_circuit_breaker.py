@@ -0,0 +1,126 @@
+"""
+Circuit breaker tests - state machine and replica set heartbeats
+
+No server or database needed; heartbeats are pymongo monitoring events built
+from hello replies:
+    python test_circuit_breaker.py
+    python -m pytest test_circuit_breaker.py
+"""
+import time
+from pymongo.errors import AutoReconnect
+from pymongo.hello import Hello
+from pymongo.monitoring import ServerClosedEvent, ServerHeartbeatFailedEvent, ServerHeartbeatSucceededEvent
+from app.utils.database import CircuitBreaker, HeartbeatMonitor
+
+PRIMARY = ('db-0', 27017)
+SECONDARY = ('db-1', 27017)
+OTHER_SECONDARY = ('db-2', 27017)
+
+
+def beat(monitor, address, role):
+    """One heartbeat from address: 'primary', 'secondary' or 'down'"""
+    if role == 'down':
+        monitor.failed(ServerHeartbeatFailedEvent(0.01, AutoReconnect(f"{address[0]} unreachable"), address))
+        return
+    reply = {'ok': 1, 'setName': 'rs0', 'hosts': ['db-0:27017', 'db-1:27017', 'db-2:27017'], 'maxWireVersion': 17}
+    reply.update({'isWritablePrimary': True} if role == 'primary' else {'secondary': True})
+    monitor.succeeded(ServerHeartbeatSucceededEvent(0.01, Hello(reply), address))
+
+
+def test_opens_after_threshold_failures_in_a_row():
+    breaker = CircuitBreaker(failure_threshold=3, cooldown=60)
+    breaker.record_failure('down')
+    breaker.record_failure('down')
+    assert breaker.state == 'closed' and breaker.allow_request()
+    breaker.record_success()
+    breaker.record_failure('down')
+    breaker.record_failure('down')
+    assert breaker.state == 'closed', 'a success in between must reset the count'
+    breaker.record_failure('down')
+    assert breaker.state == 'open' and not breaker.allow_request()
+    assert breaker.snapshot()['lastError'] == 'down'
+
+
+def test_trip_opens_at_once():
+    breaker = CircuitBreaker(failure_threshold=3, cooldown=60)
+    breaker.record_failure('server selection timed out', trip=True)
+    assert breaker.state == 'open'
+
+
+def test_half_open_allows_one_trial():
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=0.05)
+    breaker.record_failure('down')
+    assert not breaker.allow_request()
+    time.sleep(0.06)
+    assert breaker.state == 'half_open'
+    assert breaker.allow_request()
+    assert not breaker.allow_request(), 'only one trial at a time'
+    breaker.record_failure('still down')
+    assert breaker.state == 'open'
+    time.sleep(0.06)
+    assert breaker.allow_request()
+    breaker.record_success()
+    assert breaker.state == 'closed' and breaker.allow_request()
+
+
+def test_failed_trial_reopens_below_threshold():
+    breaker = CircuitBreaker(failure_threshold=3, cooldown=0.05)
+    breaker.record_failure('down', trip=True)
+    time.sleep(0.06)
+    assert breaker.allow_request()
+    breaker.record_failure('still down')
+    assert breaker.state == 'open'
+
+
+def test_failing_secondary_does_not_open():
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=60)
+    monitor = HeartbeatMonitor(breaker)
+    beat(monitor, PRIMARY, 'primary')
+    beat(monitor, SECONDARY, 'secondary')
+    for _ in range(10):
+        beat(monitor, SECONDARY, 'down')
+        beat(monitor, OTHER_SECONDARY, 'secondary')
+    assert breaker.state == 'closed'
+
+
+def test_no_primary_opens_and_secondaries_do_not_close():
+    breaker = CircuitBreaker(failure_threshold=3, cooldown=60)
+    monitor = HeartbeatMonitor(breaker)
+    beat(monitor, PRIMARY, 'primary')
+    beat(monitor, SECONDARY, 'secondary')
+    for _ in range(3):
+        beat(monitor, PRIMARY, 'down')
+        beat(monitor, SECONDARY, 'secondary')
+    assert breaker.state == 'open'
+    beat(monitor, SECONDARY, 'secondary')
+    assert breaker.state == 'open', 'a secondary cannot take writes'
+    # A new primary is elected
+    beat(monitor, SECONDARY, 'primary')
+    assert breaker.state == 'closed'
+
+
+def test_removed_member_is_forgotten():
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=60)
+    monitor = HeartbeatMonitor(breaker)
+    beat(monitor, PRIMARY, 'primary')
+    beat(monitor, SECONDARY, 'secondary')
+    monitor.closed(ServerClosedEvent(PRIMARY, 1))
+    beat(monitor, SECONDARY, 'down')
+    assert breaker.state == 'open'
+
+
+def test_standalone_down():
+    breaker = CircuitBreaker(failure_threshold=2, cooldown=60)
+    monitor = HeartbeatMonitor(breaker)
+    monitor.succeeded(ServerHeartbeatSucceededEvent(0.01, Hello({'ok': 1, 'isWritablePrimary': True, 'maxWireVersion': 17}), PRIMARY))
+    beat(monitor, PRIMARY, 'down')
+    assert breaker.state == 'closed'
+    beat(monitor, PRIMARY, 'down')
+    assert breaker.state == 'open'
+
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f"✅ {name}")
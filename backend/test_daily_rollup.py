@@ -0,0 +1,166 @@
+"""
+Daily rollup tests - write-time increments, role changes, the dashboard
+readers and the first-deployment backfill gate
+
+No server or database needed; the rollup collection is an in-memory stand-in
+that applies $inc upserts:
+    python test_daily_rollup.py
+    python -m pytest test_daily_rollup.py
+"""
+from contextlib import contextmanager
+from datetime import datetime
+from unittest import mock
+from pymongo.errors import DuplicateKeyError, PyMongoError
+from app.models import daily_rollup
+from app.models.daily_rollup import BACKFILL_ID, DailyRollup
+
+
+class FakeCollection:
+    def __init__(self):
+        self.documents = {}
+        self.fail = False
+
+    def update_one(self, query, update, upsert=False):
+        if self.fail:
+            raise PyMongoError('not primary')
+        document = self.documents.get(query['_id'])
+        if document is None:
+            document = self.documents[query['_id']] = {'_id': query['_id'], **update.get('$setOnInsert', {})}
+        for path, amount in update.get('$inc', {}).items():
+            *parents, last = path.split('.')
+            target = document
+            for parent in parents:
+                target = target.setdefault(parent, {})
+            target[last] = target.get(last, 0) + amount
+        document.update(update.get('$set', {}))
+
+    def insert_one(self, document):
+        if document['_id'] in self.documents:
+            raise DuplicateKeyError('duplicate key')
+        self.documents[document['_id']] = dict(document)
+
+    def find_one(self, query, projection=None):
+        excluded = query['_id']['$ne']
+        return next((document for key, document in sorted(self.documents.items()) if key != excluded), None)
+
+    def find(self, query):
+        bounds = query['_id']
+        return FakeCursor([document for key, document in self.documents.items() if bounds['$gte'] <= key < bounds['$lt']])
+
+
+class FakeCursor(list):
+    def sort(self, field, direction):
+        return FakeCursor(sorted(self, key=lambda document: document[field], reverse=direction < 0))
+
+
+@contextmanager
+def rollups():
+    collection = FakeCollection()
+    with mock.patch.object(daily_rollup, 'get_db', lambda: {DailyRollup.COLLECTION: collection}):
+        yield collection
+
+
+def test_registration_counts_the_role_on_its_day():
+    with rollups() as collection:
+        DailyRollup.record_registration({'createdAt': datetime(2026, 10, 17, 9), 'role': 'user'})
+        DailyRollup.record_registration({'createdAt': datetime(2026, 10, 17, 23), 'role': 'provider'})
+        DailyRollup.record_registration({'createdAt': datetime(2026, 10, 18, 1), 'role': 'user'})
+        # Without createdAt rebuild() does not count it either
+        DailyRollup.record_registration({'role': 'user'})
+        assert collection.documents['2026-10-17']['registrations'] == {'user': 1, 'provider': 1}
+        assert collection.documents['2026-10-17']['day'] == datetime(2026, 10, 17)
+        assert collection.documents['2026-10-18']['registrations'] == {'user': 1}
+        assert len(collection.documents) == 2
+
+
+def test_role_change_moves_the_registration():
+    with rollups() as collection:
+        created = datetime(2026, 3, 5, 12)
+        DailyRollup.record_registration({'createdAt': created, 'role': 'user'})
+        DailyRollup.record_role_change(created, 'user', 'provider')
+        assert collection.documents['2026-03-05']['registrations'] == {'user': 0, 'provider': 1}
+        updates = DailyRollup.stats()['updates']
+        DailyRollup.record_role_change(created, 'provider', 'provider')
+        DailyRollup.record_role_change(None, 'provider', 'admin')
+        assert DailyRollup.stats()['updates'] == updates
+        assert collection.documents['2026-03-05']['registrations'] == {'user': 0, 'provider': 1}
+
+
+def test_booking_and_status_change():
+    with rollups() as collection:
+        booked = datetime(2026, 10, 17, 15)
+        DailyRollup.record_booking({'booking_date': booked, 'status': 'pending', 'currency': 'VND', 'total_amount': 1500000})
+        DailyRollup.record_booking({'booking_date': booked, 'status': 'pending', 'total_amount': 120.5})
+        DailyRollup.record_status_change(booked, 'pending', 'confirmed')
+        document = collection.documents['2026-10-17']
+        assert document['bookings'] == {'pending': 1, 'confirmed': 1}
+        assert document['revenue'] == {'VND': 1500000, 'USD': 120.5}
+
+
+def test_logins_are_grouped_by_day():
+    with rollups() as collection:
+        DailyRollup.record_logins([
+            {'login_timestamp': datetime(2026, 10, 16, 23, 59)},
+            {'login_timestamp': datetime(2026, 10, 17, 0, 1)},
+            {'login_timestamp': datetime(2026, 10, 17, 8)}
+        ])
+        assert collection.documents['2026-10-16']['logins'] == 1
+        assert collection.documents['2026-10-17']['logins'] == 2
+
+
+def test_failed_update_is_counted_not_raised():
+    with rollups() as collection:
+        collection.fail = True
+        errors = DailyRollup.stats()['errors']
+        DailyRollup.record_registration({'createdAt': datetime(2026, 10, 17), 'role': 'user'})
+        assert DailyRollup.stats()['errors'] == errors + 1
+
+
+def test_field_names_are_safe():
+    with rollups() as collection:
+        DailyRollup.record_booking({'booking_date': datetime(2026, 10, 17), 'status': None, 'currency': 'U.S$', 'total_amount': 1})
+        assert collection.documents['2026-10-17']['bookings'] == {'unknown': 1}
+        assert collection.documents['2026-10-17']['revenue'] == {'U_S_': 1}
+
+
+def test_dashboard_readers():
+    with rollups() as collection:
+        for day, role in ((datetime(2026, 9, 30), 'user'), (datetime(2026, 10, 1), 'user'), (datetime(2026, 10, 1), 'provider'), (datetime(2026, 10, 2), 'user')):
+            DailyRollup.record_registration({'createdAt': day, 'role': role})
+        DailyRollup.record_booking({'booking_date': datetime(2026, 10, 1), 'status': 'confirmed', 'currency': 'USD', 'total_amount': 100})
+        DailyRollup.record_booking({'booking_date': datetime(2026, 10, 2), 'status': 'cancelled', 'currency': 'USD', 'total_amount': 50})
+
+        buckets, totals = DailyRollup.registration_stats(datetime(2026, 10, 1), datetime(2026, 10, 3), 7)
+        assert buckets == [{'_id': '2026-10', 'count': 3, 'users': 2, 'providers': 1}]
+        assert totals == {'users': 2, 'providers': 1, 'total': 3}
+        buckets, _ = DailyRollup.registration_stats(datetime(2026, 9, 1), datetime(2026, 10, 3), 10, role='provider')
+        assert buckets == [{'_id': '2026-10-01', 'count': 1, 'users': 0, 'providers': 1}]
+
+        summary = DailyRollup.transaction_summary(datetime(2026, 10, 1), datetime(2026, 10, 3))
+        assert summary['totalTransactions'] == 2 and summary['totalRevenue'] == 150
+        assert summary['successRate'] == 50 and summary['averageTransactionValue'] == 75
+        assert summary['statusDistribution'] == {'pending': 0, 'confirmed': 1, 'cancelled': 1, 'completed': 0}
+        assert [point['date'] for point in summary['timeline']] == ['2026-10-01', '2026-10-02']
+
+
+def test_backfill_runs_once_on_an_empty_collection():
+    with rollups() as collection, mock.patch.object(DailyRollup, 'rebuild_all', return_value=42) as rebuild_all:
+        assert DailyRollup.backfill_if_empty() == 42
+        assert collection.documents[BACKFILL_ID]['days'] == 42
+        # Another process, or a reconnect: the marker is there
+        assert DailyRollup.backfill_if_empty() is None
+        assert rebuild_all.call_count == 1
+
+
+def test_no_backfill_when_days_exist():
+    with rollups(), mock.patch.object(DailyRollup, 'rebuild_all') as rebuild_all:
+        DailyRollup.record_registration({'createdAt': datetime(2026, 10, 17), 'role': 'user'})
+        assert DailyRollup.backfill_if_empty() is None
+        rebuild_all.assert_not_called()
+
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f"✅ {name}")
@@ -0,0 +1,142 @@
+"""
+Bulk email tests - Brevo message versions, grouping by template shape,
+batch size and finding the recipients a rejected request was down to
+
+No server or network needed; the Brevo API client is replaced by a stand-in
+that records each request and answers with one message id per version:
+    python test_email_batching.py
+    python -m pytest test_email_batching.py
+"""
+import hashlib
+from unittest import mock
+from sib_api_v3_sdk.rest import ApiException
+from app.services.email_service import EmailService, EmailDeliveryError
+from app.services.email_templates import fill_placeholders
+
+
+class FakeBrevo:
+    """send_transac_email(); rejects any request addressed to a bad address with a 400, or every request with status"""
+
+    def __init__(self, bad_addresses=(), status=None):
+        self.bad_addresses = set(bad_addresses)
+        self.status = status
+        self.requests = []
+
+    def send_transac_email(self, email):
+        self.requests.append(email)
+        if self.status:
+            raise ApiException(status=self.status, reason='Service Unavailable')
+        addresses = [version.to[0]['email'] for version in email.message_versions or []] or [email.to[0]['email']]
+        if self.bad_addresses.intersection(addresses):
+            raise ApiException(status=400, reason='Bad Request')
+        if email.message_versions:
+            return mock.Mock(message_ids=[f"<id-{address}>" for address in addresses])
+        return mock.Mock(message_id=f"<id-{addresses[0]}>")
+
+
+def service(brevo, batch_size=500):
+    environment = {'BREVO_API_KEY': 'key', 'EMAIL_TRANSPORT': 'brevo', 'BREVO_BATCH_SIZE': str(batch_size)}
+    with mock.patch.dict('os.environ', environment):
+        email = EmailService()
+    email.api_instance = brevo
+    return email
+
+
+def recipients(*addresses, kind_params=None, keys=True):
+    return [
+        {
+            'email': address,
+            'params': dict(kind_params or {'user_name': address.split('@')[0], 'verification_code': f'{index:06d}'}),
+            'idempotency_key': f'code:{address}' if keys else None
+        }
+        for index, address in enumerate(addresses)
+    ]
+
+
+def test_one_request_for_many_recipients():
+    brevo = FakeBrevo()
+    batch = recipients('an@example.com', 'binh@example.com', 'chi@example.com')
+    results = service(brevo).deliver_many('verification_code', batch)
+    assert results == ['<id-an@example.com>', '<id-binh@example.com>', '<id-chi@example.com>']
+    assert len(brevo.requests) == 1
+    request = brevo.requests[0]
+    assert [version.to[0] for version in request.message_versions] == [
+        {'email': 'an@example.com', 'name': 'an'}, {'email': 'binh@example.com', 'name': 'binh'}, {'email': 'chi@example.com', 'name': 'chi'}
+    ]
+    keys = '\n'.join(recipient['idempotency_key'] for recipient in batch)
+    assert request.headers == {'idempotencyKey': hashlib.sha256(keys.encode('utf-8')).hexdigest()}
+
+
+def test_each_version_renders_as_the_single_email_would():
+    email = service(FakeBrevo())
+    batch = recipients('an@example.com', 'binh@example.com', kind_params={'user_name': '<An & Bình>', 'verification_code': '123456'})
+    email.deliver_many('verification_code', batch)
+    request = email.api_instance.requests[0]
+    subject, html_content, text_content = email.render('verification_code', batch[0]['params'])
+    version = request.message_versions[0]
+    assert fill_placeholders(request.html_content, version.params) == html_content
+    assert fill_placeholders(request.text_content, version.params) == text_content
+    assert version.subject == subject
+    assert '&lt;An &amp; Bình&gt;' in html_content, 'HTML values stay escaped'
+
+
+def test_recipients_of_a_different_shape_get_their_own_request():
+    brevo = FakeBrevo()
+    batch = [
+        {'email': f'{name}@example.com', 'params': {'user_name': name, 'company_name': 'Co', 'reason': reason}}
+        for name, reason in (('an', 'Thiếu giấy phép'), ('binh', ''), ('chi', 'Sai địa chỉ'), ('dung', ''))
+    ]
+    results = service(brevo).deliver_many('provider_rejection', batch)
+    assert all(result.startswith('<id-') for result in results)
+    assert sorted(len(request.message_versions) for request in brevo.requests) == [2, 2]
+    # Without every idempotency key there is no key for the request
+    assert all(request.headers is None for request in brevo.requests)
+
+
+def test_batches_stay_within_the_batch_size():
+    brevo = FakeBrevo()
+    batch = recipients(*(f'user{index}@example.com' for index in range(5)))
+    results = service(brevo, batch_size=2).deliver_many('verification_code', batch)
+    assert results == [f'<id-user{index}@example.com>' for index in range(5)]
+    # 2 + 2 versions, and the last recipient alone as a plain send
+    assert [len(request.message_versions or []) for request in brevo.requests] == [2, 2, 0]
+    assert brevo.requests[2].to == [{'email': 'user4@example.com', 'name': 'user4'}]
+
+
+def test_rejected_request_is_split_to_find_the_bad_recipient():
+    brevo = FakeBrevo(bad_addresses={'bad@example'})
+    batch = recipients('an@example.com', 'binh@example.com', 'bad@example', 'chi@example.com')
+    results = service(brevo).deliver_many('verification_code', batch)
+    assert results[0] == '<id-an@example.com>' and results[1] == '<id-binh@example.com>' and results[3] == '<id-chi@example.com>'
+    assert isinstance(results[2], EmailDeliveryError) and results[2].permanent and results[2].status == 400
+    # 4 rejected, 2 sent, 2 rejected, 1 rejected, 1 sent
+    assert len(brevo.requests) == 5
+
+
+def test_other_errors_apply_to_every_recipient():
+    brevo = FakeBrevo(status=503)
+    results = service(brevo).deliver_many('verification_code', recipients('an@example.com', 'binh@example.com', 'chi@example.com'))
+    assert all(isinstance(result, EmailDeliveryError) and not result.permanent and result.status == 503 for result in results)
+    assert len(brevo.requests) == 1, 'not split: retrying the halves would not help'
+
+
+def test_render_errors_fail_only_their_recipient():
+    brevo = FakeBrevo()
+    batch = recipients('an@example.com', 'binh@example.com', 'chi@example.com')
+    del batch[1]['params']['verification_code']
+    results = service(brevo).deliver_many('verification_code', batch)
+    assert isinstance(results[1], EmailDeliveryError) and results[1].permanent
+    assert results[0] == '<id-an@example.com>' and results[2] == '<id-chi@example.com>'
+    assert len(brevo.requests[0].message_versions) == 2
+
+
+def test_mock_mode_sends_nothing():
+    email = service(None)
+    assert email.deliver_many('verification_code', recipients('an@example.com', 'binh@example.com')) == [None, None]
+
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f"✅ {name}")
@@ -0,0 +1,180 @@
+"""
+Registered email filter tests - the Bloom filter itself, skipping the
+database for free emails, confirming hits (false positives included) and
+picking up other workers' registrations
+
+No server or database needed; users is an in-memory stand-in that counts its
+lookups, and time.monotonic is a fake clock:
+    python test_email_bloom.py
+    python -m pytest test_email_bloom.py
+"""
+from contextlib import contextmanager
+from datetime import datetime
+from unittest import mock
+from bson import ObjectId
+from app.models import user as user_module
+from app.utils import email_bloom
+from app.utils.email_bloom import BloomFilter, RegisteredEmails
+
+
+class FakeUsers:
+    def __init__(self):
+        self.documents = []
+        self.lookups = 0
+        self.scans = []
+
+    def add(self, email, **fields):
+        self.documents.append({'_id': ObjectId(), 'email': email, 'email_normalized': email.strip().lower(), **fields})
+
+    def estimated_document_count(self):
+        return len(self.documents)
+
+    def find(self, query, projection, batch_size=None):
+        self.scans.append(query)
+        if not query:
+            return list(self.documents)
+        since_id, since = query['$or'][0]['_id']['$gt'], query['$or'][1]['emailChangedAt']['$gt']
+        return [document for document in self.documents
+                if document['_id'] > since_id or document.get('emailChangedAt', datetime.min) > since]
+
+    def find_one(self, query, projection=None):
+        self.lookups += 1
+        for document in self.documents:
+            if all(document.get(field) == value for field, value in query.items() if not isinstance(value, dict)):
+                return {'_id': document['_id']}
+        return None
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@contextmanager
+def registered(**environment):
+    users = FakeUsers()
+    clock = Clock()
+    db = mock.Mock(users=users)
+    environment = {'EMAIL_BLOOM_ENABLED': 'true', 'EMAIL_BLOOM_MIN_CAPACITY': '1000', **environment}
+    with mock.patch.dict('os.environ', environment), \
+            mock.patch.object(email_bloom, 'get_db', lambda: db), \
+            mock.patch.object(user_module, 'get_db', lambda: db), \
+            mock.patch.object(email_bloom, 'time', clock):
+        emails = RegisteredEmails()
+        # Builds run on the calling thread here
+        with mock.patch.object(emails, 'start', side_effect=emails.build):
+            yield emails, users, clock
+
+
+def test_bloom_filter_has_no_false_negatives_and_few_false_positives():
+    bloom = BloomFilter(capacity=5000, error_rate=0.01)
+    added = [f'user{index}@example.com' for index in range(5000)]
+    for email in added:
+        bloom.add(email)
+    assert all(email in bloom for email in added)
+    false_positives = sum(f'free{index}@example.com' in bloom for index in range(20000))
+    assert false_positives / 20000 < 0.02, false_positives
+    count = bloom.count
+    bloom.add(added[0])
+    assert bloom.count == count, 'adding an email again does not count it twice'
+
+
+def test_free_emails_skip_the_database():
+    with registered() as (emails, users, _):
+        users.add('an@example.com')
+        emails.build()
+        users.lookups = 0
+        assert not emails.is_registered('binh@example.com')
+        assert users.lookups == 0 and emails.counters['skipped'] == 1
+
+
+def test_filter_hits_are_confirmed_in_any_case():
+    with registered() as (emails, users, _):
+        users.add('An.Nguyen@Example.com')
+        emails.build()
+        assert emails.is_registered('  AN.NGUYEN@example.com ')
+        assert users.lookups == 1 and emails.counters['confirmed'] == 1
+
+
+def test_false_positive_falls_back_to_the_database():
+    with registered(EMAIL_BLOOM_MIN_CAPACITY='10', EMAIL_BLOOM_ERROR_RATE='0.1') as (emails, users, _):
+        for index in range(10):
+            users.add(f'user{index}@example.com')
+        emails.build()
+        # A free email the filter happens to contain
+        free = next(email for email in (f'free{index}@example.com' for index in range(10000)) if email in emails._filter)
+        users.lookups = 0
+        assert not emails.is_registered(free)
+        assert users.lookups > 0 and emails.counters['falsePositives'] == 1
+
+
+def test_deleted_users_are_only_false_positives():
+    with registered() as (emails, users, _):
+        users.add('an@example.com')
+        emails.build()
+        users.documents.clear()
+        assert not emails.is_registered('an@example.com')
+        assert emails.counters['falsePositives'] == 1
+
+
+def test_unbuilt_filter_asks_the_database_and_starts_a_build():
+    with registered() as (emails, users, _):
+        users.add('an@example.com')
+        assert emails.is_registered('an@example.com')
+        assert emails.counters['unbuilt'] == 1 and emails.stats()['built']
+    with registered(EMAIL_BLOOM_ENABLED='false') as (emails, users, _):
+        users.add('an@example.com')
+        assert emails.is_registered('an@example.com') and not emails.is_registered('binh@example.com')
+        assert users.lookups > 0 and not emails.stats()['built']
+
+
+def test_registrations_of_this_and_other_workers_are_picked_up():
+    with registered(EMAIL_BLOOM_REFRESH_SECONDS='5') as (emails, users, clock):
+        emails.build()
+        # This process: added as it happens
+        users.add('an@example.com')
+        emails.add('An@Example.com')
+        assert emails.is_registered('an@example.com')
+        # Another worker: found by the next refresh
+        users.add('binh@example.com')
+        assert not emails.is_registered('binh@example.com'), 'not refreshed yet'
+        clock.now += 6
+        assert emails.is_registered('binh@example.com')
+        assert users.scans[-1].keys() == {'$or'}
+        # An email changed by another worker
+        users.documents[0].update(email='chi@example.com', email_normalized='chi@example.com', emailChangedAt=datetime.utcnow())
+        clock.now += 6
+        assert emails.is_registered('chi@example.com')
+
+
+def test_full_or_old_filter_is_rebuilt():
+    with registered(EMAIL_BLOOM_MIN_CAPACITY='2', EMAIL_BLOOM_REBUILD_SECONDS='3600') as (emails, users, clock):
+        emails.build()
+        for index in range(5):
+            emails.add(f'user{index}@example.com')
+        clock.now += 6
+        emails.is_registered('an@example.com')
+        assert emails.counters['builds'] == 2 and emails.stats()['capacity'] >= 2
+        clock.now += 3601
+        emails.is_registered('an@example.com')
+        assert emails.counters['builds'] == 3
+
+
+def test_forked_child_keeps_a_complete_filter():
+    with registered() as (emails, users, _):
+        users.add('an@example.com')
+        emails.build()
+        emails.forget_filter()
+        assert emails.stats()['built'] and emails.counters['builds'] == 0
+        users.lookups = 0
+        assert not emails.is_registered('binh@example.com') and users.lookups == 0
+
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f"✅ {name}")
@@ -0,0 +1,249 @@
+"""
+Email outbox tests - deduplicated enqueue, batched leases, backoff,
+dead-lettering and requeue
+
+No server, database or email provider needed; email_outbox is an in-memory
+collection answering the filters the outbox sends, and the email service's
+deliver()/deliver_many() are replaced by stand-ins:
+    python test_email_outbox.py
+    python -m pytest test_email_outbox.py
+"""
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from unittest import mock
+from pymongo.errors import DuplicateKeyError
+from app.services import email_outbox as email_outbox_module
+from app.services.email_outbox import EmailOutbox
+from app.services.email_service import email_service, EmailDeliveryError
+
+
+class FakeOutbox:
+    """email_outbox collection: equality, $in, $lt, $lte and $gte filters; $set, $inc and $unset updates"""
+
+    def __init__(self):
+        self.documents = []
+
+    def insert_one(self, document):
+        if any(existing['idempotencyKey'] == document['idempotencyKey'] for existing in self.documents):
+            raise DuplicateKeyError('E11000 duplicate key error')
+        self.documents.append(dict(document))
+
+    def find_one(self, query, projection=None, sort=None):
+        found = self.find(query)
+        if sort:
+            found = found.sort(*sort[0])
+        return next(iter(found), None)
+
+    def find(self, query, projection=None):
+        return Cursor([dict(document) for document in self.documents if self.matches(document, query)])
+
+    def update_one(self, query, update):
+        return self._update(query, update, limit=1)
+
+    def update_many(self, query, update):
+        return self._update(query, update)
+
+    def _update(self, query, update, limit=None):
+        modified = 0
+        for document in self.documents:
+            if limit is not None and modified >= limit:
+                break
+            if not self.matches(document, query):
+                continue
+            document.update(update.get('$set', {}))
+            for field, amount in update.get('$inc', {}).items():
+                document[field] = document.get(field, 0) + amount
+            for field in update.get('$unset', {}):
+                document.pop(field, None)
+            modified += 1
+        return mock.Mock(modified_count=modified)
+
+    @staticmethod
+    def matches(document, query):
+        for field, condition in query.items():
+            value = document.get(field)
+            if not isinstance(condition, dict):
+                if value != condition:
+                    return False
+                continue
+            for operator, operand in condition.items():
+                if operator == '$in' and value not in operand:
+                    return False
+                if operator == '$lt' and not value < operand:
+                    return False
+                if operator == '$lte' and not value <= operand:
+                    return False
+                if operator == '$gte' and not value >= operand:
+                    return False
+        return True
+
+    def by_to(self, to_email):
+        return next(document for document in self.documents if document['to'] == to_email)
+
+
+class Cursor(list):
+    def sort(self, field, direction=1):
+        return Cursor(sorted(self, key=lambda document: document[field], reverse=direction < 0))
+
+    def limit(self, count):
+        return Cursor(self[:count])
+
+
+@contextmanager
+def outbox(deliver=None, deliver_many=None, **environment):
+    collection = FakeOutbox()
+    environment = {'EMAIL_OUTBOX_WORKERS': '0', 'EMAIL_OUTBOX_MAX_ATTEMPTS': '3', 'EMAIL_OUTBOX_BATCH_SIZE': '10',
+                   **environment}
+    with mock.patch.dict('os.environ', environment), \
+            mock.patch.object(email_outbox_module, 'get_db', lambda: {'email_outbox': collection}), \
+            mock.patch.object(email_service, 'deliver', deliver or mock.Mock(return_value='message-id')), \
+            mock.patch.object(email_service, 'deliver_many', deliver_many or mock.Mock()):
+        yield EmailOutbox(), collection
+
+
+def make_due(collection):
+    # The retry time has come
+    for document in collection.documents:
+        document['nextAttemptAt'] = datetime.utcnow() - timedelta(seconds=1)
+
+
+def test_same_idempotency_key_is_queued_once():
+    with outbox() as (queue, collection):
+        assert queue.enqueue('verification', 'an@example.com', {'user_name': 'An'}, idempotency_key='verify:an')
+        assert queue.enqueue('verification', 'an@example.com', {'user_name': 'An'}, idempotency_key='verify:an')
+        assert len(collection.documents) == 1
+        assert queue.counters['enqueued'] == 1 and queue.counters['duplicates'] == 1
+        # Without a key every enqueue is its own message
+        queue.enqueue('verification', 'an@example.com', {'user_name': 'An'})
+        queue.enqueue('verification', 'an@example.com', {'user_name': 'An'})
+        assert len(collection.documents) == 3
+
+
+def test_claim_batch_leases_one_kind_and_locale():
+    with outbox(EMAIL_OUTBOX_BATCH_SIZE='2') as (queue, collection):
+        queue.enqueue('verification', 'a@example.com', {}, locale='vi')
+        queue.enqueue('password_reset', 'b@example.com', {}, locale='vi')
+        queue.enqueue('verification', 'c@example.com', {}, locale='en')
+        queue.enqueue('verification', 'd@example.com', {}, locale='vi')
+        queue.enqueue('verification', 'e@example.com', {}, locale='vi')
+
+        batch = queue.claim_batch('worker-1')
+        assert [message['to'] for message in batch] == ['a@example.com', 'd@example.com']
+        assert {message['lease'] for message in batch} == {batch[0]['lease']}, 'one lease token per batch'
+        assert all(message['status'] == 'sending' and message['attempts'] == 1 and message['worker'] == 'worker-1'
+                   for message in batch)
+        assert batch[0]['nextAttemptAt'] > datetime.utcnow() + timedelta(seconds=50), 'leased for 60 seconds'
+
+        # Leased messages are not due; the next batch is the next oldest message's kind and locale
+        assert [message['to'] for message in queue.claim_batch('worker-2')] == ['b@example.com']
+        assert [message['to'] for message in queue.claim_batch('worker-2')] == ['c@example.com']
+        assert [message['to'] for message in queue.claim_batch('worker-2')] == ['e@example.com']
+        assert queue.claim_batch('worker-2') == []
+
+
+def test_expired_lease_is_claimed_again():
+    with outbox() as (queue, collection):
+        queue.enqueue('verification', 'an@example.com', {})
+        first = queue.claim_batch('worker-1')[0]
+        # worker-1 died while sending
+        make_due(collection)
+        second = queue.claim_batch('worker-2')[0]
+        assert second['attempts'] == 2 and second['lease'] != first['lease']
+        # worker-1's late outcome no longer owns the message
+        queue._record(first, 'late-id')
+        assert collection.by_to('an@example.com')['status'] == 'sending'
+
+
+def test_temporary_error_is_retried_with_backoff():
+    failing = mock.Mock(side_effect=EmailDeliveryError('Brevo API error 503: Service Unavailable', status=503))
+    with outbox(deliver=failing) as (queue, collection):
+        queue.enqueue('verification', 'an@example.com', {})
+        before = datetime.utcnow()
+        assert queue.deliver_batch(queue.claim_batch('worker-1')) == [False]
+        document = collection.by_to('an@example.com')
+        assert document['status'] == 'pending' and document['lastError'].startswith('Brevo API error 503')
+        # First retry: 2.5 to 5 seconds with jitter
+        assert before + timedelta(seconds=2.5) <= document['nextAttemptAt'] <= datetime.utcnow() + timedelta(seconds=5)
+        assert queue.claim_batch('worker-1') == [], 'not due before the backoff'
+        assert queue.counters['retried'] == 1
+
+
+def test_backoff_doubles_and_is_capped():
+    with outbox(EMAIL_OUTBOX_BACKOFF_SECONDS='5', EMAIL_OUTBOX_MAX_BACKOFF_SECONDS='60') as (queue, _), \
+            mock.patch.object(email_outbox_module.random, 'uniform', return_value=1.0):
+        assert [queue.backoff(attempts) for attempts in (1, 2, 3, 4, 5, 10)] == [5, 10, 20, 40, 60, 60]
+    with outbox() as (queue, _):
+        assert all(2.5 <= queue.backoff(1) <= 5 for _ in range(50))
+
+
+def test_permanent_error_is_dead_lettered_at_once():
+    failing = mock.Mock(side_effect=EmailDeliveryError('Brevo API error 400: Bad Request', permanent=True, status=400))
+    with outbox(deliver=failing) as (queue, collection):
+        queue.enqueue('verification', 'bad-address', {})
+        queue.deliver_batch(queue.claim_batch('worker-1'))
+        document = collection.by_to('bad-address')
+        assert document['status'] == 'dead' and document['attempts'] == 1 and 'deadAt' in document
+        assert queue.counters['dead'] == 1
+
+
+def test_last_attempt_is_dead_lettered():
+    failing = mock.Mock(side_effect=EmailDeliveryError('SMTP error: timed out'))
+    with outbox(deliver=failing) as (queue, collection):
+        queue.enqueue('verification', 'an@example.com', {})
+        for _ in range(3):
+            make_due(collection)
+            queue.deliver_batch(queue.claim_batch('worker-1'))
+        document = collection.by_to('an@example.com')
+        assert document['status'] == 'dead' and document['attempts'] == 3
+        assert queue.counters['retried'] == 2 and queue.counters['dead'] == 1
+        make_due(collection)
+        assert queue.claim_batch('worker-1') == []
+
+
+def test_abandoned_last_attempt_is_dead_lettered():
+    with outbox() as (queue, collection):
+        queue.enqueue('verification', 'an@example.com', {})
+        for _ in range(3):
+            make_due(collection)
+            queue.claim_batch('worker-1')
+        # The worker holding attempt 3 died; its lease ran out
+        make_due(collection)
+        assert queue.claim_batch('worker-2') == []
+        document = collection.by_to('an@example.com')
+        assert document['status'] == 'dead' and document['lastError'] == 'Lease expired on the last attempt'
+
+
+def test_batch_records_each_outcome():
+    results = ['id-a', EmailDeliveryError('rejected', permanent=True), EmailDeliveryError('timed out')]
+    deliver_many = mock.Mock(return_value=results)
+    with outbox(deliver_many=deliver_many) as (queue, collection):
+        for to_email in ('a@example.com', 'b@example.com', 'c@example.com'):
+            queue.enqueue('booking_confirmation', to_email, {'user_name': to_email[0]}, idempotency_key=f'booking:{to_email}')
+        assert queue.deliver_batch(queue.claim_batch('worker-1')) == [True, False, False]
+        kind, recipients, locale = deliver_many.call_args[0]
+        assert kind == 'booking_confirmation' and locale is None
+        assert recipients[0] == {'email': 'a@example.com', 'params': {'user_name': 'a'}, 'idempotency_key': 'booking:a@example.com'}
+        sent = collection.by_to('a@example.com')
+        assert sent['status'] == 'sent' and sent['providerMessageId'] == 'id-a' and sent['expiresAt'] > datetime.utcnow()
+        assert collection.by_to('b@example.com')['status'] == 'dead'
+        assert collection.by_to('c@example.com')['status'] == 'pending'
+
+
+def test_requeue_only_dead_messages():
+    failing = mock.Mock(side_effect=EmailDeliveryError('rejected', permanent=True))
+    with outbox(deliver=failing) as (queue, collection):
+        queue.enqueue('verification', 'an@example.com', {})
+        queue.enqueue('verification', 'binh@example.com', {})
+        queue.deliver_batch(queue.claim_batch('worker-1')[:1])
+        dead, pending = collection.by_to('an@example.com'), collection.by_to('binh@example.com')
+        assert queue.requeue(str(dead['_id']))
+        document = collection.by_to('an@example.com')
+        assert document['status'] == 'pending' and document['attempts'] == 0 and 'deadAt' not in document
+        assert not queue.requeue(str(pending['_id']))
+
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f"✅ {name}")
@@ -0,0 +1,149 @@
+"""
+Email template tests - compiling once, the derived plain-text alternative,
+escaping, locale fallback and Brevo placeholders
+
+No server needed; templates are written to a temporary directory (the last
+test renders the shipped templates):
+    python test_email_templates.py
+    python -m pytest test_email_templates.py
+"""
+import json
+import os
+import tempfile
+from contextlib import contextmanager
+from jinja2 import TemplateNotFound, UndefinedError
+from app.services.email_templates import EmailTemplates, fill_placeholders, placeholder_values
+
+WELCOME = """{% set profile_link = frontend_url ~ "/profile" %}
+<html>
+    <head><style>h2 { color: red; }</style></head>
+    <body>
+        <!-- Header -->
+        <h2>Xin chào {{ user_name }}!</h2>
+        <p>Cảm ơn bạn &amp; chúc mừng.</p>
+        {% if note %}<p>Ghi chú: {{ note }}</p>{% endif %}
+        <a href="{{ profile_link }}" style="color: blue;">Xem hồ sơ</a>
+        <a href="mailto:support@tripook.com">support@tripook.com</a>
+    </body>
+</html>
+"""
+
+
+@contextmanager
+def template_dir(locales=None):
+    locales = locales or {'vi': {'welcome': ('Chào mừng {{ user_name }}', WELCOME)}}
+    with tempfile.TemporaryDirectory() as directory:
+        for locale, kinds in locales.items():
+            os.makedirs(os.path.join(directory, locale))
+            with open(os.path.join(directory, locale, 'subjects.json'), 'w', encoding='utf-8') as f:
+                json.dump({kind: subject for kind, (subject, _) in kinds.items()}, f)
+            for kind, (_, source) in kinds.items():
+                with open(os.path.join(directory, locale, f'{kind}.html'), 'w', encoding='utf-8') as f:
+                    f.write(source)
+        yield directory
+
+
+def templates(directory):
+    return EmailTemplates(directory, default_locale='vi', template_globals={'frontend_url': 'https://tripook.com'})
+
+
+def test_render_subject_html_and_text():
+    with template_dir() as directory:
+        subject, html_content, text_content = templates(directory).render('welcome', {'user_name': 'An', 'note': ''})
+        assert subject == 'Chào mừng An'
+        assert '<h2>Xin chào An!</h2>' in html_content and '\n    ' not in html_content, 'indentation stripped'
+        assert [line for line in text_content.splitlines() if line] == [
+            'Xin chào An!', 'Cảm ơn bạn & chúc mừng.', 'Xem hồ sơ: https://tripook.com/profile', 'support@tripook.com'
+        ]
+
+
+def test_values_are_escaped_in_html_only():
+    with template_dir() as directory:
+        _, html_content, text_content = templates(directory).render('welcome', {'user_name': '<An & Bình>', 'note': 'x'})
+        assert 'Xin chào &lt;An &amp; Bình&gt;!' in html_content
+        assert 'Xin chào <An & Bình>!' in text_content and 'Ghi chú: x' in text_content
+
+
+def test_templates_are_compiled_once():
+    with template_dir() as directory:
+        email_templates = templates(directory)
+        assert email_templates.preload() == 1
+        compiled = email_templates.get('welcome')
+        # Rendering no longer reads the files
+        os.remove(os.path.join(directory, 'vi', 'welcome.html'))
+        assert email_templates.render('welcome', {'user_name': 'An', 'note': ''})[0] == 'Chào mừng An'
+        assert email_templates.get('welcome') is compiled
+
+
+def test_missing_locale_falls_back_to_the_default():
+    locales = {
+        'vi': {'welcome': ('Chào mừng {{ user_name }}', WELCOME), 'goodbye': ('Tạm biệt', '<p>Tạm biệt</p>')},
+        'en': {'welcome': ('Welcome {{ user_name }}', WELCOME.replace('Xin chào', 'Hello'))}
+    }
+    with template_dir(locales) as directory:
+        email_templates = templates(directory)
+        assert email_templates.render('welcome', {'user_name': 'An', 'note': ''}, 'en')[0] == 'Welcome An'
+        assert email_templates.render('goodbye', {}, 'en')[0] == 'Tạm biệt'
+        assert email_templates.get('goodbye', 'fr') is email_templates.get('goodbye', 'vi')
+
+
+def test_unknown_kinds_and_missing_parameters_raise():
+    with template_dir() as directory:
+        email_templates = templates(directory)
+        try:
+            email_templates.render('unknown', {})
+            assert False, 'rendered an unknown kind'
+        except TemplateNotFound:
+            pass
+        try:
+            email_templates.render('welcome', {'note': ''})
+            assert False, 'rendered without user_name'
+        except UndefinedError:
+            pass
+
+
+def test_placeholders_fill_to_the_rendered_email():
+    with template_dir() as directory:
+        email_templates = templates(directory)
+        params = {'user_name': '<An & Bình>', 'note': 'Đặt lúc 10:00'}
+        placeholder_html, placeholder_text = email_templates.render_placeholders('welcome', params)
+        assert '{{ params.html.user_name }}' in placeholder_html and '{{ params.text.note }}' in placeholder_text
+        _, html_content, text_content = email_templates.render('welcome', params)
+        values = placeholder_values(params)
+        assert fill_placeholders(placeholder_html, values) == html_content
+        assert fill_placeholders(placeholder_text, values) == text_content
+        # Falsy values keep their value: the {% if %} block is left out as it would be
+        assert 'Ghi chú' not in email_templates.render_placeholders('welcome', {'user_name': 'An', 'note': ''})[0]
+
+
+def test_stats_per_kind():
+    with template_dir() as directory:
+        email_templates = templates(directory)
+        for name in ('An', 'Bình'):
+            email_templates.render('welcome', {'user_name': name, 'note': ''})
+        stats = email_templates.stats()
+        assert stats['compiled'] == ['vi/welcome']
+        assert stats['kinds']['welcome']['renders'] == 2 and stats['kinds']['welcome']['meanHtmlBytes'] > 0
+
+
+def test_shipped_templates_render():
+    email_templates = EmailTemplates(template_globals={'frontend_url': 'https://tripook.com'})
+    assert email_templates.preload() >= 5
+    params = {
+        'verification': {'user_name': 'An', 'verification_token': 'abc'},
+        'password_reset': {'user_name': 'An', 'reset_token': 'abc'},
+        'verification_code': {'user_name': 'An', 'verification_code': '123456'},
+        'provider_approval': {'user_name': 'An', 'company_name': 'Tripook Travel'},
+        'provider_rejection': {'user_name': 'An', 'company_name': 'Tripook Travel', 'reason': 'Thiếu giấy phép'}
+    }
+    for kind, values in params.items():
+        subject, html_content, text_content = email_templates.render(kind, values)
+        assert subject and 'An' in html_content and 'An' in text_content and '<' not in text_content, kind
+    assert 'https://tripook.com/verify-email?token=abc' in email_templates.render('verification', params['verification'])[2]
+
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f"✅ {name}")
@@ -0,0 +1,96 @@
+"""
+Gunicorn configuration tests - settings from the environment, the Mongo pool
+size each worker derives from them, and the worker fork/exit hooks
+
+No server or database needed; gunicorn.conf.py is executed as gunicorn does
+and its hooks are called with stand-ins for the server and worker:
+    python test_gunicorn_config.py
+    python -m pytest test_gunicorn_config.py
+"""
+import os
+import runpy
+from unittest import mock
+from app.services.email_outbox import email_outbox
+from app.services.email_service import email_service
+from app.services.login_activity_buffer import login_activity_buffer
+from app.utils.database import client_manager, pool_size_from_workers
+from app.utils.email_bloom import registered_emails
+from app.utils.password_hashing import password_hasher
+
+CONFIG = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'gunicorn.conf.py')
+SETTINGS = ('WEB_CONCURRENCY', 'WEB_THREADS', 'WEB_PRELOAD', 'WEB_MAX_REQUESTS', 'PORT', 'MONGO_MAX_POOL_SIZE',
+            'MONGO_MAX_TOTAL_CONNECTIONS', 'MONGO_POOL_HEADROOM')
+
+
+def load(**environment):
+    """gunicorn.conf.py's settings and the environment it leaves for the workers"""
+    with mock.patch.dict('os.environ', environment):
+        for name in SETTINGS:
+            if name not in environment:
+                os.environ.pop(name, None)
+        config = runpy.run_path(CONFIG)
+        return config, dict(os.environ)
+
+
+def test_defaults():
+    config, _ = load()
+    assert config['worker_class'] == 'gthread' and config['threads'] == 8
+    assert config['workers'] == os.cpu_count() and config['preload_app'] is True
+    assert config['bind'] == '0.0.0.0:5000'
+    assert config['max_requests'] == 2000 and config['max_requests_jitter'] == 200
+
+
+def test_settings_from_the_environment():
+    config, _ = load(WEB_CONCURRENCY='3', WEB_THREADS='16', WEB_PRELOAD='false', WEB_MAX_REQUESTS='0', PORT='8080')
+    assert (config['workers'], config['threads'], config['preload_app']) == (3, 16, False)
+    assert config['max_requests'] == 0 and config['bind'] == '0.0.0.0:8080'
+
+
+def test_workers_size_their_mongo_pool_from_the_config():
+    _, environment = load(WEB_THREADS='12')
+    assert environment['WEB_CONCURRENCY'] == str(os.cpu_count()) and environment['WEB_THREADS'] == '12'
+    with mock.patch.dict('os.environ', environment):
+        assert pool_size_from_workers() == 12 + 4
+    _, environment = load(WEB_CONCURRENCY='4', WEB_THREADS='8', MONGO_MAX_TOTAL_CONNECTIONS='40')
+    with mock.patch.dict('os.environ', environment):
+        # 4 workers share 40 connections
+        assert pool_size_from_workers() == 10
+
+
+def test_post_fork_resets_the_client_and_starts_the_worker():
+    config, _ = load()
+    server, worker = mock.Mock(), mock.Mock(pid=4242)
+    with mock.patch.object(client_manager, 'forget_client') as forget_client, \
+            mock.patch.object(registered_emails, 'start') as start_filter, \
+            mock.patch.object(email_outbox, 'start') as start_outbox, \
+            mock.patch.object(email_outbox, 'enabled', True), \
+            mock.patch.object(email_outbox, 'workers', 2):
+        config['post_fork'](server, worker)
+        assert forget_client.called and start_filter.called and start_outbox.called
+        assert '4242' in server.log.info.call_args[0][0]
+    with mock.patch.object(client_manager, 'forget_client'), \
+            mock.patch.object(registered_emails, 'start'), \
+            mock.patch.object(email_outbox, 'start') as start_outbox, \
+            mock.patch.object(email_outbox, 'workers', 0):
+        # EMAIL_OUTBOX_WORKERS=0: a dedicated email_worker.py delivers
+        config['post_fork'](server, worker)
+        assert not start_outbox.called
+
+
+def test_worker_exit_flushes_and_closes_everything():
+    config, _ = load()
+    with mock.patch.object(login_activity_buffer, 'shutdown') as flush_logins, \
+            mock.patch.object(email_outbox, 'shutdown') as stop_outbox, \
+            mock.patch.object(email_service, 'smtp_pool', mock.Mock()) as smtp_pool, \
+            mock.patch.object(client_manager, 'close') as close_client, \
+            mock.patch.object(password_hasher, 'shutdown') as stop_hasher:
+        config['worker_exit'](mock.Mock(), mock.Mock())
+        assert flush_logins.called and stop_outbox.called and smtp_pool.close.called
+        assert close_client.called and stop_hasher.called
+
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f"✅ {name}")
@@ -0,0 +1,82 @@
+"""
+HyperLogLog sketch tests - count error, merge and the stored form
+
+No server or database needed:
+    python test_hyperloglog.py
+    python -m pytest test_hyperloglog.py
+"""
+from bson import ObjectId
+from app.utils.hyperloglog import HyperLogLog
+
+# 3 standard errors at precision 12 (1.04 / sqrt(4096) = 1.6%)
+MAX_ERROR = 0.05
+
+
+def sketch_of(values):
+    sketch = HyperLogLog()
+    for value in values:
+        sketch.add(value)
+    return sketch
+
+
+def relative_error(estimate, actual):
+    return abs(estimate - actual) / actual
+
+
+def test_count_error():
+    for actual in (100, 1000, 10000, 100000):
+        estimate = sketch_of(f"user-{i}" for i in range(actual)).count()
+        assert relative_error(estimate, actual) < MAX_ERROR, f"{actual} values counted as {estimate}"
+
+
+def test_duplicates_do_not_count():
+    sketch = sketch_of(f"user-{i % 500}" for i in range(20000))
+    assert relative_error(sketch.count(), 500) < MAX_ERROR
+    assert not sketch.add('user-1')
+
+
+def test_merge_is_union():
+    # Two days with 20000 users in common, as in a month rollup
+    first = sketch_of(f"user-{i}" for i in range(0, 60000))
+    second = sketch_of(f"user-{i}" for i in range(40000, 100000))
+    assert first.merge(second)
+    assert first.registers == sketch_of(f"user-{i}" for i in range(100000)).registers
+    assert relative_error(first.count(), 100000) < MAX_ERROR
+    # Merging the same sketch again changes nothing
+    assert not first.merge(second)
+
+
+def test_object_ids_and_strings_are_distinct_values():
+    user_ids = [ObjectId() for _ in range(2000)]
+    sketch = sketch_of(user_ids)
+    assert relative_error(sketch.count(), 2000) < MAX_ERROR
+    assert relative_error(sketch_of(user_ids + [str(user_id) for user_id in user_ids]).count(), 4000) < MAX_ERROR
+
+
+def test_bytes_round_trip():
+    sketch = sketch_of(f"user-{i}" for i in range(300))
+    data = sketch.to_bytes()
+    assert len(data) < 1024, f"{len(data)} bytes for 300 users"
+    restored = HyperLogLog.from_bytes(data)
+    assert restored.registers == sketch.registers
+    assert restored.count() == sketch.count()
+
+
+def test_rejects_other_precision_and_format():
+    try:
+        HyperLogLog(precision=10).merge(HyperLogLog())
+        assert False, 'merged sketches of different precision'
+    except ValueError:
+        pass
+    try:
+        HyperLogLog.from_bytes(b'\x09' + HyperLogLog().to_bytes()[1:])
+        assert False, 'read an unknown format'
+    except ValueError:
+        pass
+
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f"✅ {name}")
@@ -0,0 +1,132 @@
+"""
+Index registry tests - creating missing indexes, drift reports and TTL changes
+
+No server or database needed; reconcile_collection() runs against an
+in-memory collection that answers index_information() the way MongoDB does:
+    python test_indexes.py
+    python -m pytest test_indexes.py
+"""
+from bson import SON
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+from app.utils.indexes import declared_indexes, ensure_indexes, reconcile_collection
+
+
+class FakeDatabase:
+    def __init__(self):
+        self.commands = []
+        self.collections = {}
+
+    def __getitem__(self, name):
+        return self.collections.setdefault(name, FakeCollection(self, name))
+
+    def command(self, name, collection, index):
+        self.commands.append((name, collection, index))
+        self[collection].indexes[index['name']]['expireAfterSeconds'] = index['expireAfterSeconds']
+
+
+class FakeCollection:
+    def __init__(self, database, name):
+        self.database = database
+        self.name = name
+        self.indexes = {'_id_': {'v': 2, 'key': [('_id', 1)]}}
+        self.fail_create = None
+
+    def index_information(self):
+        return {name: dict(info) for name, info in self.indexes.items()}
+
+    def create_index(self, keys, background, name, **options):
+        if self.fail_create:
+            raise self.fail_create
+        self.indexes[name] = {'v': 2, 'key': keys, **options}
+
+
+def indexes_of(collection, *definitions):
+    for name, key, options in definitions:
+        collection.indexes[name] = {'v': 2, 'key': key, **options}
+
+
+def test_missing_indexes_are_created():
+    db = FakeDatabase()
+    declared = [
+        IndexModel([('email', ASCENDING)], name='email_unique', unique=True),
+        IndexModel([('createdAt', DESCENDING), ('_id', DESCENDING)], name='created_at_id_desc')
+    ]
+    report = reconcile_collection(db['users'], declared)
+    assert report['created'] == ['email_unique', 'created_at_id_desc']
+    assert db['users'].indexes['email_unique']['unique'] is True
+    # Second run: nothing to do
+    assert not any(reconcile_collection(db['users'], declared).values())
+
+
+def test_drift_is_reported_never_dropped():
+    db = FakeDatabase()
+    collection = db['bookings']
+    indexes_of(
+        collection,
+        ('status_1', [('status', 1.0)], {}),
+        ('user_bookings', [('user_id', 1), ('created_at', 1)], {}),
+        ('legacy_idx', [('old_field', 1)], {})
+    )
+    declared = [
+        IndexModel([('status', ASCENDING)], name='status_index'),
+        IndexModel([('user_id', ASCENDING), ('created_at', DESCENDING)], name='user_bookings')
+    ]
+    report = reconcile_collection(collection, declared)
+    assert report['renamed'] == [{'name': 'status_index', 'existing_name': 'status_1'}]
+    assert report['changed'][0]['name'] == 'user_bookings'
+    assert report['changed'][0]['declared']['key'] == [('user_id', 1), ('created_at', -1)]
+    assert report['undeclared'] == ['legacy_idx']
+    assert report['created'] == [] and set(collection.indexes) == {'_id_', 'status_1', 'user_bookings', 'legacy_idx'}
+
+
+def test_changed_ttl_is_applied_in_place():
+    db = FakeDatabase()
+    collection = db['email_verifications']
+    indexes_of(collection, ('expires_at_ttl', SON([('expiresAt', 1)]), {'expireAfterSeconds': 3600}))
+    report = reconcile_collection(collection, [IndexModel([('expiresAt', ASCENDING)], name='expires_at_ttl', expireAfterSeconds=86400)])
+    assert report['modified'] == ['expires_at_ttl'] and report['changed'] == []
+    assert db.commands == [('collMod', 'email_verifications', {'name': 'expires_at_ttl', 'expireAfterSeconds': 86400})]
+
+
+def test_job_managed_ttl_is_not_drift():
+    db = FakeDatabase()
+    collection = db['login_activities']
+    # login_retention set this TTL; the model declares the index without one
+    indexes_of(collection, ('login_timestamp', [('login_timestamp', 1)], {'expireAfterSeconds': 97 * 86400}))
+    report = reconcile_collection(collection, [IndexModel([('login_timestamp', ASCENDING)], name='login_timestamp')])
+    assert not any(report.values())
+    assert db.commands == []
+
+
+def test_create_errors_are_reported():
+    db = FakeDatabase()
+    db['users'].fail_create = OperationFailure('E11000 duplicate key error')
+    report = reconcile_collection(db['users'], [IndexModel([('email', ASCENDING)], name='email_unique', unique=True)])
+    assert report['created'] == [] and report['errors'] == [{'name': 'email_unique', 'error': 'E11000 duplicate key error'}]
+
+
+def test_ensure_indexes_reports_only_collections_with_changes():
+    db = FakeDatabase()
+    registry = {
+        'users': [IndexModel([('email', ASCENDING)], name='email_unique', unique=True)],
+        'trips': []
+    }
+    reports = ensure_indexes(db, registry)
+    assert list(reports) == ['users'] and reports['users']['created'] == ['email_unique']
+    assert ensure_indexes(db, registry) == {}
+
+
+def test_declared_names_are_unique_per_collection():
+    for collection_name, indexes in declared_indexes().items():
+        names = [index.document['name'] for index in indexes]
+        assert len(names) == len(set(names)), f"{collection_name}: {names}"
+        keys = [tuple(index.document['key'].items()) for index in indexes]
+        assert len(keys) == len(set(keys)), f"{collection_name} declares one key twice"
+
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f"✅ {name}")
@@ -0,0 +1,144 @@
+"""
+JWT claim tests - role/status claims, token types, refresh and revocation
+
+No server or database needed; the users collection is an in-memory stand-in
+and the refresh route runs in a Flask test client:
+    python test_jwt_claims.py
+    python -m pytest test_jwt_claims.py
+"""
+from contextlib import contextmanager
+from datetime import datetime
+from unittest import mock
+import jwt
+from bson import ObjectId
+from flask import Flask, jsonify, request
+from app.routes import auth_blueprint
+from app.utils import jwt_auth
+from app.utils.jwt_auth import (
+    decode_claims, decode_token, generate_token, issue_tokens, principal_from_claims, revoke_user_tokens, token_required
+)
+
+SECRET = 'test-secret'
+
+
+class FakeUsers:
+    def __init__(self, *documents):
+        self.documents = {document['_id']: dict(document) for document in documents}
+
+    def find_one(self, query, projection=None):
+        document = self.documents.get(query['_id'])
+        return dict(document) if document else None
+
+    def update_one(self, query, update):
+        document = self.documents[query['_id']]
+        for field, amount in update.get('$inc', {}).items():
+            document[field] = document.get(field, 0) + amount
+        document.update(update.get('$set', {}))
+
+
+@contextmanager
+def application(*users, refresh_tokens=True):
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = SECRET
+    app.register_blueprint(auth_blueprint.auth_bp, url_prefix='/api/auth')
+
+    @app.route('/me')
+    @token_required
+    def me():
+        return jsonify({'role': request.principal['role']})
+
+    db = mock.Mock(users=FakeUsers(*users))
+    with mock.patch.dict('os.environ', {'JWT_REFRESH_TOKENS': 'true' if refresh_tokens else 'false'}), \
+            mock.patch.object(jwt_auth, 'get_db', lambda: db), \
+            mock.patch.object(auth_blueprint, 'get_db', lambda: db), \
+            app.app_context():
+        yield app, db.users
+
+
+def user(role='user', status='active', token_version=0):
+    return {'_id': ObjectId(), 'email': 'an@example.com', 'role': role, 'status': status, 'accountStatus': 'active', 'tokenVersion': token_version}
+
+
+def test_access_and_refresh_tokens_carry_their_claims():
+    provider = user(role='provider', token_version=4)
+    with application(provider):
+        tokens = issue_tokens(provider, remember_me=True)
+        assert tokens['expires_in'] == 15 * 60
+        access = jwt.decode(tokens['token'], SECRET, algorithms=['HS256'])
+        assert (access['type'], access['role'], access['status'], access['tv']) == ('access', 'provider', 'active', 4)
+        assert access['exp'] - access['iat'] == 15 * 60
+        refresh = jwt.decode(tokens['refresh_token'], SECRET, algorithms=['HS256'])
+        assert (refresh['type'], refresh['tv'], refresh['remember_me']) == ('refresh', 4, True)
+        assert 'role' not in refresh
+
+
+def test_token_types_are_not_interchangeable():
+    account = user()
+    with application(account):
+        tokens = issue_tokens(account)
+        assert decode_claims(tokens['refresh_token']) is None
+        assert decode_claims(tokens['token'], token_type='refresh') is None
+        assert decode_token(tokens['token']) == str(account['_id'])
+        # Tokens issued before refresh tokens existed have no type: access tokens
+        legacy = jwt.encode({'user_id': str(account['_id']), 'exp': datetime(2100, 1, 1)}, SECRET, algorithm='HS256')
+        assert decode_token(legacy) == str(account['_id'])
+        assert decode_claims(jwt.encode({'user_id': 'x'}, 'other secret', algorithm='HS256')) is None
+
+
+def test_only_short_lived_access_tokens_are_trusted_for_role():
+    admin = user(role='admin')
+    with application(admin):
+        claims = decode_claims(issue_tokens(admin)['token'])
+        assert principal_from_claims(claims) == {'_id': admin['_id'], 'role': 'admin', 'status': 'active', 'accountStatus': 'active'}
+    with application(admin, refresh_tokens=False):
+        # A 1 or 30 day token: role and status come from the principal cache
+        assert principal_from_claims(decode_claims(generate_token(admin['_id'], user=admin))) is None
+
+
+def test_token_required_reads_claims_without_the_database():
+    admin = user(role='admin')
+    with application(admin) as (app, _), mock.patch.object(jwt_auth.principal_cache, 'get', side_effect=AssertionError('database read')):
+        token = issue_tokens(admin)['token']
+        response = app.test_client().get('/me', headers={'Authorization': f'Bearer {token}'})
+        assert response.status_code == 200 and response.get_json() == {'role': 'admin'}
+        assert app.test_client().get('/me').status_code == 401
+
+
+def test_refresh_issues_current_claims():
+    account = user(role='user')
+    with application(account) as (app, users):
+        refresh_token = issue_tokens(account)['refresh_token']
+        # Upgraded to provider after the login
+        users.documents[account['_id']]['role'] = 'provider'
+        response = app.test_client().post('/api/auth/refresh', json={'refresh_token': refresh_token})
+        assert response.status_code == 200
+        access = decode_claims(response.get_json()['data']['token'])
+        assert access['role'] == 'provider'
+
+
+def test_revoked_or_blocked_users_cannot_refresh():
+    account = user()
+    with application(account) as (app, users):
+        client = app.test_client()
+        refresh_token = issue_tokens(account)['refresh_token']
+        revoke_user_tokens(str(account['_id']))
+        assert users.documents[account['_id']]['tokenVersion'] == 1
+        response = client.post('/api/auth/refresh', json={'refresh_token': refresh_token})
+        assert response.status_code == 401 and response.get_json()['success'] is False
+
+        # A token of the current version, but the account is blocked
+        refresh_token = issue_tokens(users.documents[account['_id']])['refresh_token']
+        assert client.post('/api/auth/refresh', json={'refresh_token': refresh_token}).status_code == 200
+        users.documents[account['_id']]['status'] = 'blocked'
+        assert client.post('/api/auth/refresh', json={'refresh_token': refresh_token}).status_code == 401
+
+        # An access token is not a refresh token
+        access = issue_tokens(account)['token']
+        assert client.post('/api/auth/refresh', json={'refresh_token': access}).status_code == 401
+
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f"✅ {name}")
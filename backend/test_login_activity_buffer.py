@@ -0,0 +1,158 @@
+"""
+Login activity buffer tests - batching, requeue on errors, partial bulk
+failures and the direct-write fallback
+
+No server or database needed; login_activities is an in-memory stand-in that
+fails on demand, and the flush thread is not started (flush() is called
+directly):
+    python test_login_activity_buffer.py
+    python -m pytest test_login_activity_buffer.py
+"""
+from contextlib import contextmanager
+from unittest import mock
+from bson import ObjectId
+from pymongo.errors import AutoReconnect, BulkWriteError
+from app.services import login_activity_buffer as buffer_module
+from app.services.login_activity_buffer import LoginActivityBuffer
+from app.utils.database import DatabaseUnavailable
+
+
+class FakeCollection:
+    def __init__(self):
+        self.documents = {}
+        self.batches = []
+        # Raised by the next insert_many calls, in order
+        self.failures = []
+
+    def insert_many(self, documents, ordered=True):
+        self.batches.append([document['_id'] for document in documents])
+        if self.failures:
+            failure = self.failures.pop(0)
+            if isinstance(failure, BulkWriteError):
+                failed = {error['index'] for error in failure.details['writeErrors']}
+                for index, document in enumerate(documents):
+                    if index not in failed:
+                        self.documents[document['_id']] = document
+            raise failure
+        for document in documents:
+            self.documents[document['_id']] = document
+
+    def insert_one(self, document):
+        self.documents[document['_id']] = document
+
+
+@contextmanager
+def login_buffer(batch_size=3, max_buffered=10, enabled=True):
+    collection = FakeCollection()
+    buffer = LoginActivityBuffer()
+    buffer.enabled = enabled
+    buffer.batch_size = batch_size
+    buffer.max_buffered = max_buffered
+    rolled_up = []
+    with mock.patch.object(buffer_module, 'get_db', lambda: {'login_activities': collection}), \
+            mock.patch.object(buffer, 'start'), \
+            mock.patch.object(buffer, '_roll_up', lambda documents: rolled_up.extend(d['_id'] for d in documents)):
+        yield buffer, collection, rolled_up
+
+
+def logins(count):
+    return [{'_id': ObjectId(), 'user_id': 'u'} for _ in range(count)]
+
+
+def test_flush_writes_in_batches():
+    with login_buffer(batch_size=3) as (buffer, collection, rolled_up):
+        documents = logins(7)
+        for document in documents:
+            buffer.add(document)
+        assert buffer.flush() == 7
+        assert [len(batch) for batch in collection.batches] == [3, 3, 1]
+        assert rolled_up == [document['_id'] for document in documents]
+        stats = buffer.stats()
+        assert stats['pending'] == 0 and stats['written'] == 7 and stats['batches'] == 3 and stats['buffered'] == 7
+
+
+def test_failed_batch_is_requeued_in_front():
+    for error in (AutoReconnect('primary stepped down'), DatabaseUnavailable('MongoDB unavailable')):
+        with login_buffer(batch_size=3) as (buffer, collection, rolled_up):
+            documents = logins(5)
+            for document in documents:
+                buffer.add(document)
+            collection.failures.append(error)
+            assert buffer.flush() == 0
+            assert buffer.stats()['pending'] == 5 and buffer.stats()['failedBatches'] == 1
+            assert rolled_up == []
+            # Logins that arrive meanwhile queue behind the failed batch
+            later = logins(1)
+            buffer.add(later[0])
+            assert buffer.flush() == 6
+            assert list(collection.documents) == [document['_id'] for document in documents + later]
+            assert rolled_up == list(collection.documents)
+
+
+def test_requeue_is_capped_at_max_buffered():
+    with login_buffer(batch_size=4, max_buffered=10) as (buffer, collection, _):
+        documents = logins(6)
+        for document in documents:
+            buffer.add(document)
+        buffer.max_buffered = 5
+        collection.failures.append(AutoReconnect('down'))
+        buffer.flush()
+        # The oldest logins are kept, the newest past the cap dropped
+        assert [document['_id'] for document in buffer._documents] == [document['_id'] for document in documents[:5]]
+
+
+def test_rewritten_duplicates_count_as_written():
+    with login_buffer(batch_size=3) as (buffer, collection, rolled_up):
+        documents = logins(3)
+        for document in documents:
+            buffer.add(document)
+        # Written by an earlier attempt whose acknowledgement was lost
+        collection.failures.append(BulkWriteError({'writeErrors': [{'index': 1, 'code': 11000, 'errmsg': 'E11000 duplicate key'}]}))
+        assert buffer.flush() == 3
+        assert rolled_up == [document['_id'] for document in documents]
+
+
+def test_other_write_errors_are_not_rolled_up():
+    with login_buffer(batch_size=3) as (buffer, collection, rolled_up):
+        documents = logins(3)
+        for document in documents:
+            buffer.add(document)
+        collection.failures.append(BulkWriteError({'writeErrors': [{'index': 2, 'code': 121, 'errmsg': 'Document failed validation'}]}))
+        assert buffer.flush() == 2
+        assert rolled_up == [documents[0]['_id'], documents[1]['_id']]
+        assert buffer.stats()['pending'] == 0
+
+
+def test_full_buffer_writes_directly():
+    with login_buffer(batch_size=10, max_buffered=2) as (buffer, collection, rolled_up):
+        documents = logins(3)
+        for document in documents:
+            buffer.add(document)
+        assert list(collection.documents) == [documents[2]['_id']]
+        assert rolled_up == [documents[2]['_id']]
+        assert buffer.stats()['direct'] == 1 and buffer.stats()['pending'] == 2
+
+
+def test_disabled_buffer_writes_directly():
+    with login_buffer(enabled=False) as (buffer, collection, _):
+        document = logins(1)[0]
+        buffer.add(document)
+        assert document['_id'] in collection.documents and buffer.stats()['pending'] == 0
+
+
+def test_shutdown_flushes_and_later_logins_write_directly():
+    with login_buffer(batch_size=10) as (buffer, collection, _):
+        documents = logins(2)
+        for document in documents:
+            buffer.add(document)
+        buffer.shutdown()
+        assert len(collection.documents) == 2
+        buffer.add(logins(1)[0])
+        assert len(collection.documents) == 3 and buffer.stats()['direct'] == 1
+
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f"✅ {name}")
@@ -0,0 +1,99 @@
+"""
+Login lookup tests - normalized identifiers, the fallback for documents not
+yet migrated, and the queries each lookup sends
+
+No server or database needed; users is an in-memory stand-in that answers
+equality and $exists filters and records every filter it receives:
+    python test_login_lookup.py
+    python -m pytest test_login_lookup.py
+"""
+from contextlib import contextmanager
+from unittest import mock
+from bson import ObjectId
+from app.models import user as user_module
+from app.models.user import User
+
+
+class FakeUsers:
+    def __init__(self, *documents):
+        self.documents = [{'_id': ObjectId(), **document} for document in documents]
+        self.filters = []
+
+    def find_one(self, query, projection=None):
+        self.filters.append(query)
+        for document in self.documents:
+            if all(self._matches(document, field, condition) for field, condition in query.items()):
+                return document
+        return None
+
+    @staticmethod
+    def _matches(document, field, condition):
+        if isinstance(condition, dict):
+            return (field in document) == condition['$exists']
+        return document.get(field) == condition
+
+
+@contextmanager
+def users(*documents):
+    collection = FakeUsers(*documents)
+    with mock.patch.object(user_module, 'get_db', lambda: mock.Mock(users=collection)):
+        yield collection
+
+
+def migrated(email, username):
+    return {'email': email, 'username': username, **User.normalized_fields(email, username)}
+
+
+def test_normalized_fields():
+    assert User.normalized_fields('  An.Nguyen@Example.COM ', 'AnNguyen') == {
+        'email_normalized': 'an.nguyen@example.com', 'username_normalized': 'annguyen'
+    }
+    # No username: null, so the partial index skips the document
+    assert User.normalized_fields('an@example.com', None)['username_normalized'] is None
+
+
+def test_email_login_in_any_case_is_one_indexed_equality():
+    with users(migrated('An.Nguyen@Example.com', 'annguyen')) as collection:
+        found = User.find_login_document('  AN.NGUYEN@example.COM ')
+        assert found['username'] == 'annguyen'
+        assert collection.filters == [{'email_normalized': 'an.nguyen@example.com'}]
+
+
+def test_username_login_in_any_case():
+    with users(migrated('an@example.com', 'AnNguyen')) as collection:
+        assert User.find_login_document('annguyen')['email'] == 'an@example.com'
+        assert collection.filters == [{'username_normalized': 'annguyen'}]
+
+
+def test_documents_not_yet_migrated_are_found_by_exact_match():
+    with users({'email': 'binh@example.com', 'username': 'binh'}) as collection:
+        assert User.find_login_document('Binh@Example.com')['username'] == 'binh'
+        assert collection.filters[-1] == {'email': 'binh@example.com', 'email_normalized': {'$exists': False}}
+        assert User.find_login_document('binh')['email'] == 'binh@example.com'
+
+
+def test_fallback_never_matches_migrated_documents():
+    # The exact-match fallback must not find a migrated document whose normalized value differs
+    with users({'email': 'chi@example.com', 'email_normalized': 'other@example.com'}):
+        assert User.find_login_document('chi@example.com') is None
+
+
+def test_empty_identifier_sends_no_query():
+    with users(migrated('an@example.com', 'an')) as collection:
+        assert User.find_login_document('   ') is None
+        assert User.find_login_document(None) is None
+        assert collection.filters == []
+
+
+def test_find_by_login_builds_a_user():
+    with users({**migrated('an@example.com', 'an'), 'name': 'An', 'role': 'provider'}):
+        found = User.find_by_login('AN@example.com')
+        assert isinstance(found, User) and found.role == 'provider' and found.email == 'an@example.com'
+        assert User.find_by_login('nobody@example.com') is None
+
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f"✅ {name}")
@@ -0,0 +1,115 @@
+"""
+Login retention tests - TTL gating on the fold watermark and the rebuild clamp
+
+No server or database needed; the few collection calls involved are answered
+by an in-memory stand-in:
+    python test_login_retention.py
+    python -m pytest test_login_retention.py
+"""
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from app.models import login_rollup
+from app.models.login_rollup import LoginRollup, WATERMARK_ID, day_start
+from app.services import login_retention
+from app.services.login_retention import apply_ttl
+
+DAY = 86400
+
+
+class FakeCollection:
+    def __init__(self, database, name):
+        self.database = database
+        self.name = name
+        self.documents = {}
+        self.indexes = {'_id_': {'key': [('_id', 1)]}, 'login_timestamp': {'key': [('login_timestamp', 1)]}}
+
+    def find_one(self, query, projection=None):
+        return self.documents.get(query['_id'])
+
+    def index_information(self):
+        return self.indexes
+
+
+class FakeDatabase:
+    def __init__(self):
+        self.collections = {}
+        self.commands = []
+
+    def __getitem__(self, name):
+        return self.collections.setdefault(name, FakeCollection(self, name))
+
+    def command(self, name, collection, index):
+        self.commands.append((name, collection, index))
+        self[collection].indexes[index['name']]['expireAfterSeconds'] = index['expireAfterSeconds']
+
+
+@contextmanager
+def database(folded_until=None):
+    db = FakeDatabase()
+    if folded_until is not None:
+        db[LoginRollup.COLLECTION].documents[WATERMARK_ID] = {'_id': WATERMARK_ID, 'foldedUntil': folded_until}
+    saved = login_retention.get_db, login_rollup.get_db
+    login_retention.get_db = login_rollup.get_db = lambda: db
+    try:
+        yield db
+    finally:
+        login_retention.get_db, login_rollup.get_db = saved
+
+
+def cutoff(retention_days):
+    return day_start(datetime.utcnow()) - timedelta(days=retention_days)
+
+
+def test_no_ttl_before_the_first_archive():
+    with database() as db:
+        assert apply_ttl(90, 7) is None
+        assert db.commands == []
+
+
+def test_no_ttl_while_the_watermark_is_behind_the_cutoff():
+    with database(folded_until=cutoff(90) - timedelta(days=1)) as db:
+        assert apply_ttl(90, 7) is None
+        assert db.commands == []
+
+
+def test_ttl_once_folded_to_the_cutoff():
+    with database(folded_until=cutoff(90)) as db:
+        assert apply_ttl(90, 7) == 97 * DAY
+        assert db.commands == [('collMod', 'login_activities', {'name': 'login_timestamp', 'expireAfterSeconds': 97 * DAY})]
+        # Already in effect: nothing to change
+        assert apply_ttl(90, 7) == 97 * DAY
+        assert len(db.commands) == 1
+
+
+def test_changed_retention_updates_the_ttl():
+    with database(folded_until=cutoff(30)) as db:
+        apply_ttl(90, 7)
+        assert apply_ttl(30, 7) == 37 * DAY
+        assert db.commands[-1][2]['expireAfterSeconds'] == 37 * DAY
+
+
+def test_retention_off_leaves_the_index_alone():
+    with database(folded_until=cutoff(0)) as db:
+        db['login_activities'].indexes['login_timestamp']['expireAfterSeconds'] = 97 * DAY
+        assert apply_ttl(0, 7) == 97 * DAY
+        assert db.commands == []
+
+
+def test_rebuild_starts_after_the_watermark():
+    with database():
+        assert LoginRollup.rebuild_start(None) is None
+        assert LoginRollup.rebuild_start(datetime(2026, 3, 5)) == datetime(2026, 3, 1)
+    with database(folded_until=datetime(2026, 7, 19)):
+        # The month straddling the watermark lost raw events: first whole month after it
+        assert LoginRollup.rebuild_start(None) == datetime(2026, 8, 1)
+        assert LoginRollup.rebuild_start(datetime(2026, 3, 5)) == datetime(2026, 8, 1)
+        assert LoginRollup.rebuild_start(datetime(2026, 9, 5)) == datetime(2026, 9, 1)
+    with database(folded_until=datetime(2026, 8, 1)):
+        assert LoginRollup.rebuild_start(None) == datetime(2026, 8, 1)
+
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f"✅ {name}")
@@ -0,0 +1,141 @@
+"""
+Keyset pagination tests - cursor encoding, cursor errors and the after() filter
+
+No server or database needed; after() filters are evaluated by a small
+matcher with MongoDB semantics for the operators they use:
+    python test_pagination.py
+    python -m pytest test_pagination.py
+"""
+import base64
+from datetime import datetime, timedelta
+import bson
+from bson import ObjectId
+from app.utils.pagination import InvalidCursor, after, decode_cursor, encode_cursor
+
+
+def matches(document, query):
+    """MongoDB match of $or, $and, $lt and equality (None also matches a missing field)"""
+    for field, condition in query.items():
+        if field == '$or':
+            if not any(matches(document, clause) for clause in condition):
+                return False
+        elif field == '$and':
+            if not all(matches(document, clause) for clause in condition):
+                return False
+        elif isinstance(condition, dict):
+            value = document.get(field)
+            if value is None or not value < condition['$lt']:
+                return False
+        elif document.get(field) != condition:
+            return False
+    return True
+
+
+def newest_first(documents, field):
+    """Descending (field, _id) order as MongoDB sorts it: missing/null values last"""
+    dated = sorted([d for d in documents if d.get(field) is not None], key=lambda d: (d[field], d['_id']), reverse=True)
+    undated = sorted([d for d in documents if d.get(field) is None], key=lambda d: d['_id'], reverse=True)
+    return dated + undated
+
+
+def pages(documents, field, limit):
+    """Walk every page the way paginate() does, through encoded cursors"""
+    ordered = newest_first(documents, field)
+    seen = []
+    token = None
+    while True:
+        candidates = ordered
+        if token is not None:
+            candidates = [d for d in ordered if matches(d, after(field, *decode_cursor(token, field)))]
+        page = candidates[:limit]
+        seen.append(page)
+        if len(candidates) <= limit:
+            return seen
+        token = encode_cursor(field, page[-1].get(field), page[-1]['_id'])
+
+
+def sample_documents():
+    start = datetime(2026, 10, 1)
+    documents = []
+    for i in range(23):
+        # Every value three times, so pages split inside runs of equal values
+        documents.append({'_id': ObjectId(), 'createdAt': start + timedelta(hours=i // 3)})
+    documents += [{'_id': ObjectId(), 'createdAt': None} for _ in range(4)]
+    documents += [{'_id': ObjectId()} for _ in range(3)]
+    return documents
+
+
+def test_cursor_round_trip():
+    document_id = ObjectId()
+    moment = datetime(2026, 10, 17, 8, 30, 15, 123000)
+    for value in (moment, None, 42, 'Đà Nẵng'):
+        token = encode_cursor('createdAt', value, document_id)
+        assert '=' not in token and '+' not in token and '/' not in token
+        assert decode_cursor(token, 'createdAt') == (value, document_id)
+
+
+def test_invalid_cursors():
+    valid = encode_cursor('createdAt', datetime(2026, 10, 17), ObjectId())
+    unpadded = base64.urlsafe_b64encode(bson.encode({'f': 'createdAt', 'v': 1})).decode().rstrip('=')
+    for token, reason in (
+        ('not a cursor!', 'Malformed cursor'),
+        (valid[:-6], 'Malformed cursor'),
+        ('', 'Malformed cursor'),
+        (unpadded, 'Cursor of another listing'),
+        (encode_cursor('booking_date', datetime(2026, 10, 17), ObjectId()), 'Cursor of another listing')
+    ):
+        try:
+            decode_cursor(token, 'createdAt')
+            assert False, f"accepted {token!r}"
+        except InvalidCursor as e:
+            assert str(e) == reason, f"{token!r}: {e}"
+
+
+def test_after_value():
+    document_id = ObjectId()
+    moment = datetime(2026, 10, 17)
+    query = after('createdAt', moment, document_id)
+    assert matches({'_id': ObjectId(), 'createdAt': moment - timedelta(seconds=1)}, query)
+    assert not matches({'_id': ObjectId(), 'createdAt': moment + timedelta(seconds=1)}, query)
+    # Same value: only smaller _ids come after
+    assert matches({'_id': ObjectId('0' * 24), 'createdAt': moment}, query)
+    assert not matches({'_id': document_id, 'createdAt': moment}, query)
+    # Documents without the value sort last, so they come after any dated one
+    assert matches({'_id': ObjectId(), 'createdAt': None}, query)
+    assert matches({'_id': ObjectId()}, query)
+
+
+def test_after_null():
+    document_id = ObjectId()
+    query = after('createdAt', None, document_id)
+    assert query == {'createdAt': None, '_id': {'$lt': document_id}}
+    assert matches({'_id': ObjectId('0' * 24)}, query)
+    assert matches({'_id': ObjectId('0' * 24), 'createdAt': None}, query)
+    assert not matches({'_id': ObjectId('f' * 24)}, query)
+    assert not matches({'_id': ObjectId('0' * 24), 'createdAt': datetime(2000, 1, 1)}, query)
+
+
+def test_pages_cover_every_document_once():
+    documents = sample_documents()
+    for limit in (1, 2, 3, 5, 7, 30, 100):
+        walked = pages(documents, 'createdAt', limit)
+        ids = [d['_id'] for page in walked for d in page]
+        assert ids == [d['_id'] for d in newest_first(documents, 'createdAt')], f"limit {limit}"
+        assert all(len(page) == limit for page in walked[:-1])
+
+
+def test_new_documents_do_not_shift_pages():
+    documents = sample_documents()
+    ordered = newest_first(documents, 'createdAt')
+    token = encode_cursor('createdAt', ordered[4]['createdAt'], ordered[4]['_id'])
+    # Inserted after the first page was served
+    documents.append({'_id': ObjectId(), 'createdAt': datetime(2026, 12, 1)})
+    rest = [d for d in newest_first(documents, 'createdAt') if matches(d, after('createdAt', *decode_cursor(token, 'createdAt')))]
+    assert [d['_id'] for d in rest] == [d['_id'] for d in ordered[5:]]
+
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f"✅ {name}")
@@ -0,0 +1,125 @@
+"""
+Password hashing tests - pool sizing per worker, admission (429) and legacy hashes
+
+No server or database needed; hashing runs on the calling thread
+(PASSWORD_HASH_WORKERS=0):
+    python test_password_hashing.py
+    python -m pytest test_password_hashing.py
+"""
+import os
+import threading
+from contextlib import contextmanager
+from unittest import mock
+import bcrypt
+from flask import Flask, jsonify
+from app.utils import password_hashing
+from app.utils.password_hashing import CURRENT_METHOD, PasswordHasher, hashing_admission, workers_per_process
+
+
+@contextmanager
+def environment(**values):
+    names = ('PASSWORD_HASH_WORKERS', 'PASSWORD_HASH_TOTAL_WORKERS', 'WEB_CONCURRENCY')
+    with mock.patch.dict(os.environ, {}):
+        for name in names:
+            os.environ.pop(name, None)
+        os.environ.update({name: str(value) for name, value in values.items()})
+        yield
+
+
+def inline_hasher(max_pending=2):
+    with environment(PASSWORD_HASH_WORKERS=0):
+        hasher = PasswordHasher()
+    hasher.max_pending = max_pending
+    hasher._reset()
+    return hasher
+
+
+def test_budget_is_split_across_web_workers():
+    with environment(PASSWORD_HASH_TOTAL_WORKERS=8, WEB_CONCURRENCY=4):
+        assert workers_per_process() == 2
+    with environment(PASSWORD_HASH_TOTAL_WORKERS=8, WEB_CONCURRENCY=3):
+        assert workers_per_process() == 2
+    # At least one per worker process
+    with environment(PASSWORD_HASH_TOTAL_WORKERS=2, WEB_CONCURRENCY=8):
+        assert workers_per_process() == 1
+    with environment(PASSWORD_HASH_TOTAL_WORKERS=8):
+        assert workers_per_process() == 8
+
+
+def test_default_budget_is_half_the_cores_per_host():
+    with environment(WEB_CONCURRENCY=4), mock.patch('multiprocessing.cpu_count', return_value=16):
+        assert workers_per_process() == 2
+    with environment(WEB_CONCURRENCY=16), mock.patch('multiprocessing.cpu_count', return_value=16):
+        assert workers_per_process() == 1
+
+
+def test_explicit_per_process_count_wins():
+    with environment(PASSWORD_HASH_WORKERS=3, PASSWORD_HASH_TOTAL_WORKERS=8, WEB_CONCURRENCY=8):
+        assert workers_per_process() == 3
+    with environment(PASSWORD_HASH_WORKERS=0, WEB_CONCURRENCY=8):
+        assert workers_per_process() == 0
+
+
+def test_admission_slots():
+    hasher = inline_hasher(max_pending=2)
+    assert hasher.try_admit() and hasher.try_admit()
+    assert not hasher.try_admit()
+    hasher.release()
+    assert hasher.try_admit()
+    stats = hasher.stats()
+    assert stats['inFlight'] == 2 and stats['rejected'] == 1 and stats['maxPending'] == 2
+
+
+def test_saturated_hashing_answers_429():
+    app = Flask(__name__)
+    entered, proceed = threading.Event(), threading.Event()
+
+    @app.route('/login', methods=['POST'])
+    @hashing_admission
+    def login():
+        entered.set()
+        proceed.wait(5)
+        return jsonify({'success': True})
+
+    hasher = inline_hasher(max_pending=1)
+    with mock.patch.object(password_hashing, 'password_hasher', hasher):
+        client = app.test_client()
+        first = []
+        thread = threading.Thread(target=lambda: first.append(app.test_client().post('/login')))
+        thread.start()
+        assert entered.wait(5)
+        response = client.post('/login')
+        assert response.status_code == 429 and response.headers['Retry-After'] == '1'
+        assert response.get_json()['success'] is False
+        proceed.set()
+        thread.join()
+        assert first[0].status_code == 200
+        # The slot is given back after the request
+        assert client.post('/login').status_code == 200
+        assert hasher.in_flight == 0
+
+
+def test_hash_and_verify_inline():
+    hasher = inline_hasher()
+    password_hash = hasher.hash('mật khẩu')
+    assert password_hash.startswith(CURRENT_METHOD + '$')
+    assert hasher.verify(password_hash, 'mật khẩu') == (True, False)
+    assert hasher.verify(password_hash, 'wrong') == (False, False)
+    assert hasher.verify('', 'mật khẩu') == (False, False)
+    assert hasher.verify('not a hash', 'mật khẩu')[0] is False
+
+
+def test_legacy_hashes_need_rehash():
+    hasher = inline_hasher()
+    legacy = bcrypt.hashpw(b'secret', bcrypt.gensalt(rounds=4)).decode()
+    assert hasher.verify(legacy, 'secret') == (True, True)
+    assert hasher.verify(legacy, 'other')[0] is False
+    from werkzeug.security import generate_password_hash
+    assert hasher.verify(generate_password_hash('secret', method='pbkdf2:sha256:1000'), 'secret') == (True, True)
+
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f"✅ {name}")
@@ -0,0 +1,129 @@
+"""
+Principal cache tests - TTL, LRU eviction, invalidation and the trimmed
+projection
+
+No server or database needed; users is an in-memory stand-in that counts
+its reads, and time.monotonic is a fake clock:
+    python test_principal_cache.py
+    python -m pytest test_principal_cache.py
+"""
+from contextlib import contextmanager
+from unittest import mock
+from bson import ObjectId
+from app.utils import principal_cache as principal_cache_module
+from app.utils.principal_cache import PRINCIPAL_FIELDS, PrincipalCache
+
+
+class FakeUsers:
+    def __init__(self):
+        self.documents = {}
+        self.reads = 0
+        self.projections = []
+
+    def add(self, **fields):
+        user_id = ObjectId()
+        self.documents[user_id] = {'_id': user_id, 'password_hash': 'secret', **fields}
+        return user_id
+
+    def find_one(self, query, projection):
+        self.reads += 1
+        self.projections.append(projection)
+        document = self.documents.get(query['_id'])
+        if document is None:
+            return None
+        return {field: value for field, value in document.items() if field == '_id' or field in projection}
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self):
+        return self.now
+
+
+@contextmanager
+def users():
+    collection = FakeUsers()
+    clock = Clock()
+    with mock.patch.object(principal_cache_module, 'get_db', lambda: mock.Mock(users=collection)), \
+            mock.patch.object(principal_cache_module, 'time', clock):
+        yield collection, clock
+
+
+def test_hit_within_ttl_and_reload_after():
+    with users() as (collection, clock):
+        cache = PrincipalCache(ttl=30, max_size=10)
+        user_id = collection.add(email='an@example.com', role='admin', status='active')
+        assert cache.get(user_id)['role'] == 'admin'
+        assert cache.get(str(user_id))['role'] == 'admin'
+        assert collection.reads == 1
+        clock.now += 30
+        collection.documents[user_id]['role'] = 'user'
+        assert cache.get(user_id)['role'] == 'user'
+        assert collection.reads == 2
+        assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 2 and cache.stats()['hitRate'] == 0.333
+
+
+def test_only_principal_fields_are_loaded():
+    with users() as (collection, _):
+        user_id = collection.add(email='an@example.com', role='user', status='active', accountStatus='active')
+        principal = PrincipalCache(ttl=30).get(user_id)
+        assert 'password_hash' not in principal
+        assert collection.projections == [{field: 1 for field in PRINCIPAL_FIELDS}]
+
+
+def test_invalidate_forgets_one_user():
+    with users() as (collection, _):
+        cache = PrincipalCache(ttl=30)
+        first, second = collection.add(role='user'), collection.add(role='user')
+        cache.get(first)
+        cache.get(second)
+        collection.documents[first]['role'] = 'provider'
+        cache.invalidate(first)
+        assert cache.get(first)['role'] == 'provider'
+        cache.get(second)
+        assert collection.reads == 3
+
+
+def test_least_recently_used_is_evicted():
+    with users() as (collection, _):
+        cache = PrincipalCache(ttl=30, max_size=2)
+        a, b, c = (collection.add(role='user') for _ in range(3))
+        cache.get(a)
+        cache.get(b)
+        cache.get(a)
+        cache.get(c)
+        assert cache.stats()['size'] == 2
+        reads = collection.reads
+        cache.get(a)
+        assert collection.reads == reads, 'a was used more recently than b'
+        cache.get(b)
+        assert collection.reads == reads + 1
+
+
+def test_unknown_and_malformed_ids_are_not_cached():
+    with users() as (collection, _):
+        cache = PrincipalCache(ttl=30)
+        missing = ObjectId()
+        assert cache.get(missing) is None
+        assert cache.get(missing) is None
+        assert collection.reads == 2
+        assert cache.get('not-an-id') is None and cache.get(None) is None
+        assert collection.reads == 2
+
+
+def test_zero_ttl_disables_caching():
+    with users() as (collection, _):
+        cache = PrincipalCache(ttl=0)
+        user_id = collection.add(role='user')
+        cache.get(user_id)
+        cache.get(user_id)
+        assert collection.reads == 2 and cache.stats()['size'] == 0
+
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f"✅ {name}")
@@ -0,0 +1,124 @@
+"""
+Query profiler tests - per-request command capture, N+1 detection,
+Server-Timing and per-endpoint aggregates
+
+No server or database needed; commands are fed to the listener as the
+started/succeeded/failed events pymongo would send:
+    python test_query_profiler.py
+    python -m pytest test_query_profiler.py
+"""
+import itertools
+from types import SimpleNamespace
+from flask import Flask, g, jsonify
+from app.utils.query_profiler import (
+    RequestProfile, command_profiler, init_query_profiler, profile_aggregates, query_shape
+)
+
+request_ids = itertools.count(1)
+
+
+def command(name, collection, duration_ms=1.0, reply=None, failed=False, **fields):
+    """Send one command through the listener, as pymongo does"""
+    request_id = next(request_ids)
+    command_profiler.started(SimpleNamespace(command_name=name, command={name: collection, **fields}, request_id=request_id))
+    finished = SimpleNamespace(command_name=name, request_id=request_id, duration_micros=int(duration_ms * 1000), reply=reply)
+    if failed:
+        command_profiler.failed(finished)
+    else:
+        command_profiler.succeeded(finished)
+
+
+def find_one(collection, query, duration_ms=1.0):
+    command('find', collection, duration_ms, reply={'cursor': {'firstBatch': [{}]}}, filter=query, limit=1)
+
+
+def profiled_app():
+    app = Flask(__name__)
+    init_query_profiler(app)
+
+    @app.route('/bookings/<booking_id>')
+    def booking(booking_id):
+        command('find', 'bookings', 2.5, reply={'cursor': {'firstBatch': [{}, {}, {}]}}, filter={'user_id': booking_id})
+        for service_id in range(6):
+            find_one('services', {'_id': service_id})
+        return jsonify({'success': True})
+
+    @app.route('/quiet')
+    def quiet():
+        command('ping', 'admin')
+        return jsonify({'success': True})
+
+    return app
+
+
+def test_query_shape_hides_values():
+    assert query_shape({'b': 1, 'a': {'$in': [1, 2, 3]}}) == {'a': {'$in': ['?']}, 'b': '?'}
+    assert repr(query_shape({'_id': 1})) == repr(query_shape({'_id': 2}))
+
+
+def test_request_profile_counts_and_documents():
+    app = profiled_app()
+    with app.test_request_context('/'):
+        g.mongo_profile = profile = RequestProfile()
+        command('find', 'bookings', 2.0, reply={'cursor': {'firstBatch': [{}, {}]}}, filter={})
+        command('update', 'users', 1.0, reply={'n': 1, 'nModified': 1})
+        command('findAndModify', 'email_outbox', 0.5, reply={'value': None})
+        command('insert', 'users', 3.0, failed=True)
+        command('hello', 'admin')
+    assert profile.command_count == 4 and abs(profile.total_ms - 6.5) < 1e-9
+    assert [(c['collection'], c['operation'], c['documents'], c['failed']) for c in profile.commands] == [
+        ('bookings', 'find', 2, False), ('users', 'update', 1, False),
+        ('email_outbox', 'findAndModify', 0, False), ('users', 'insert', 0, True)
+    ]
+
+
+def test_repeated_find_one_is_flagged():
+    profile = RequestProfile()
+    app = profiled_app()
+    with app.test_request_context('/'):
+        g.mongo_profile = profile
+        for user_id in range(5):
+            find_one('users', {'_id': user_id})
+        for service_id in range(4):
+            find_one('services', {'_id': service_id})
+        # Different shapes are not one loop
+        find_one('trips', {'_id': 1})
+        find_one('trips', {'slug': 'x'})
+    repeated = profile.repeated_shapes(threshold=5)
+    assert [(item['collection'], item['count']) for item in repeated] == [('users', 5)]
+    assert 'mongo-n1-0;desc="users.find_one x5"' in profile.server_timing()
+
+
+def test_server_timing_header_and_aggregates():
+    profile_aggregates.reset()
+    client = profiled_app().test_client()
+    for booking_id in ('a', 'b'):
+        response = client.get(f'/bookings/{booking_id}')
+        timing = response.headers['Server-Timing']
+        assert timing.startswith('mongo;dur=8.50;desc="7 commands"') and 'services.find_one x6' in timing
+    # Driver housekeeping only: no header
+    assert 'Server-Timing' not in client.get('/quiet').headers
+
+    endpoints = {item['endpoint']: item for item in profile_aggregates.snapshot()}
+    bookings = endpoints['GET /bookings/<booking_id>']
+    assert bookings['requests'] == 2 and bookings['avgCommands'] == 7 and bookings['maxCommands'] == 7
+    assert bookings['operations'] == {'bookings.find': 2, 'services.find': 12}
+    assert bookings['nPlusOneRequests'] == 2 and bookings['nPlusOneShapes'][0]['maxRepeats'] == 6
+    assert endpoints['GET /quiet']['avgCommands'] == 0
+    assert list(endpoints) == ['GET /bookings/<booking_id>', 'GET /quiet'], 'chattiest endpoint first'
+
+
+def test_commands_without_a_request_profile_are_ignored():
+    # Background threads (outbox, flushes) have no request context
+    command('find', 'email_outbox')
+    # MONGO_PROFILING=false: requests carry no profile
+    with Flask(__name__).test_request_context('/'):
+        command('find', 'users')
+        assert g.get('mongo_profile') is None
+
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f"✅ {name}")
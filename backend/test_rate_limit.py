@@ -0,0 +1,152 @@
+"""
+Rate limit tests - policy parsing, token bucket refill, per-key buckets and
+the 429 answer
+
+No server or database needed; buckets use the in-memory store and a fake
+clock:
+    python test_rate_limit.py
+    python -m pytest test_rate_limit.py
+"""
+from contextlib import contextmanager
+from unittest import mock
+from flask import Flask, jsonify
+from pymongo.errors import AutoReconnect
+from app.utils import rate_limit
+from app.utils.rate_limit import Bucket, MemoryBucketStore, RateLimiter, parse_policy, rate_limited
+
+
+class Clock:
+    """Stands in for the time module: monotonic() returns now, advanced by the test"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@contextmanager
+def limiter(**policies):
+    """A fresh in-memory RateLimiter with RATE_LIMIT_<NAME> policies, installed for rate_limited()"""
+    clock = Clock()
+    environment = {f'RATE_LIMIT_{name.upper()}': spec for name, spec in policies.items()}
+    environment.update(RATE_LIMIT_ENABLED='true', RATE_LIMIT_STORAGE='memory')
+    # Policies are read from the environment on first use
+    with mock.patch.dict('os.environ', environment):
+        instance = RateLimiter()
+        with mock.patch.object(rate_limit, 'time', clock), mock.patch.object(rate_limit, 'rate_limiter', instance):
+            yield instance, clock
+
+
+def app_with(name):
+    app = Flask(__name__)
+
+    @app.route('/limited', methods=['POST', 'OPTIONS'])
+    @rate_limited(name)
+    def limited():
+        return jsonify({'success': True})
+
+    return app
+
+
+def test_parse_policy():
+    buckets = parse_policy(' ip:20/60, account:10/300 ,')
+    assert [repr(bucket) for bucket in buckets] == ['ip:20/60', 'account:10/300']
+    assert buckets[1].rate == 10 / 300
+    assert parse_policy('') == []
+    try:
+        parse_policy('country:1/60')
+        assert False, 'accepted an unknown key'
+    except ValueError:
+        pass
+
+
+def test_bucket_refills_over_its_period():
+    clock = Clock()
+    store = MemoryBucketStore()
+    bucket = Bucket('ip', 3, 60)
+    with mock.patch.object(rate_limit, 'time', clock):
+        assert [store.take('k', bucket)[0] for _ in range(3)] == [True] * 3
+        allowed, wait = store.take('k', bucket)
+        assert not allowed and abs(wait - 20) < 1e-9
+        clock.now += 20
+        assert store.take('k', bucket) == (True, 0.0)
+        assert not store.take('k', bucket)[0]
+        # Never more than capacity, however long it was idle
+        clock.now += 3600
+        assert [store.take('k', bucket)[0] for _ in range(4)] == [True, True, True, False]
+
+
+def test_least_recently_used_keys_are_dropped():
+    store = MemoryBucketStore(max_keys=2)
+    bucket = Bucket('ip', 1, 60)
+    with mock.patch.object(rate_limit, 'time', Clock()):
+        store.take('a', bucket)
+        store.take('b', bucket)
+        store.take('c', bucket)
+        # 'a' was dropped, so it starts with a full bucket again
+        assert store.take('a', bucket)[0]
+        assert not store.take('c', bucket)[0]
+
+
+def test_rejected_request_gets_429_with_retry_after():
+    with limiter(login='ip:2/60') as (instance, _):
+        client = app_with('login').test_client()
+        assert client.post('/limited').status_code == 200
+        assert client.post('/limited').status_code == 200
+        response = client.post('/limited')
+        assert response.status_code == 429
+        assert response.headers['Retry-After'] == '30'
+        assert response.get_json()['retryAfter'] == 30
+        assert '30 giây' in response.get_json()['message']
+        # Preflight requests are never limited
+        assert client.options('/limited').status_code == 200
+        assert instance.stats()['counters']['login'] == {'allowed': 2, 'rejected': 1, 'storeErrors': 0}
+
+
+def test_account_buckets_are_per_account_and_skipped_without_one():
+    with limiter(verification='account:1/120') as (_, clock):
+        client = app_with('verification').test_client()
+        assert client.post('/limited', json={'email': 'An@Example.com'}).status_code == 200
+        response = client.post('/limited', json={'email': ' an@example.com '})
+        assert response.status_code == 429 and response.headers['Retry-After'] == '120'
+        assert '2 phút' in response.get_json()['message']
+        assert client.post('/limited', json={'email': 'binh@example.com'}).status_code == 200
+        # No account named: the account bucket does not apply
+        assert client.post('/limited', json={}).status_code == 200
+        clock.now += 120
+        assert client.post('/limited', json={'email': 'an@example.com'}).status_code == 200
+
+
+def test_every_bucket_of_the_policy_must_have_a_token():
+    with limiter(login='ip:10/60,account:1/300') as (instance, _):
+        client = app_with('login').test_client()
+        assert client.post('/limited', json={'login': 'an'}).status_code == 200
+        response = client.post('/limited', json={'login': 'an'})
+        assert response.status_code == 429 and response.headers['Retry-After'] == '300'
+        # The ip bucket still has tokens for other accounts
+        assert client.post('/limited', json={'login': 'binh'}).status_code == 200
+
+
+def test_store_errors_allow_the_request():
+    with limiter(login='ip:1/60') as (instance, _):
+        instance.store = mock.Mock()
+        instance.store.take.side_effect = AutoReconnect('primary stepped down')
+        client = app_with('login').test_client()
+        assert client.post('/limited').status_code == 200
+        assert client.post('/limited').status_code == 200
+        assert instance.stats()['counters']['login']['storeErrors'] == 2
+
+
+def test_disabled_limiter_lets_everything_through():
+    with limiter(login='ip:1/60') as (instance, _):
+        instance.enabled = False
+        client = app_with('login').test_client()
+        assert all(client.post('/limited').status_code == 200 for _ in range(5))
+
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f"✅ {name}")
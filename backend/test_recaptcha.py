@@ -0,0 +1,120 @@
+"""
+reCAPTCHA tests - the pooled session, verified token cache, timeouts and
+error answers
+
+No server or network needed; the pooled session's post() is replaced by a
+stand-in that answers like siteverify:
+    python test_recaptcha.py
+    python -m pytest test_recaptcha.py
+"""
+from contextlib import contextmanager
+from unittest import mock
+import requests
+from flask import Flask
+from app.utils import recaptcha
+from app.utils.recaptcha import RecaptchaVerifier, VerifiedTokenCache
+
+
+class FakeSession:
+    """post() answers with the next (status, json) reply, or raises it"""
+
+    def __init__(self, *replies):
+        self.replies = list(replies)
+        self.posts = []
+
+    def post(self, url, data, timeout):
+        self.posts.append({'url': url, 'data': data, 'timeout': timeout})
+        reply = self.replies.pop(0)
+        if isinstance(reply, Exception):
+            raise reply
+        status, body = reply
+        return mock.Mock(status_code=status, json=lambda: body)
+
+
+@contextmanager
+def siteverify(*replies, **environment):
+    session = FakeSession(*replies)
+    environment = {'RECAPTCHA_SECRET_KEY': 'secret', **environment}
+    with Flask(__name__).app_context(), \
+            mock.patch.dict('os.environ', environment), \
+            mock.patch.object(RecaptchaVerifier, 'get_session', lambda: session), \
+            mock.patch.object(RecaptchaVerifier, 'verified_tokens', VerifiedTokenCache(ttl=120)):
+        yield session
+
+
+def test_accepted_token_is_not_verified_twice():
+    with siteverify((200, {'success': True})) as session:
+        assert RecaptchaVerifier.verify_recaptcha('token-1', '10.0.0.1')['success']
+        # The client retried the form with the same token
+        assert RecaptchaVerifier.verify_recaptcha('token-1', '10.0.0.1')['success']
+        assert len(session.posts) == 1
+        assert session.posts[0]['data'] == {'secret': 'secret', 'response': 'token-1', 'remoteip': '10.0.0.1'}
+
+
+def test_cache_is_per_token_and_ip():
+    with siteverify((200, {'success': True}), (200, {'success': False, 'error-codes': ['timeout-or-duplicate']})) as session:
+        assert RecaptchaVerifier.verify_recaptcha('token-1', '10.0.0.1')['success']
+        result = RecaptchaVerifier.verify_recaptcha('token-1', '10.0.0.2')
+        assert not result['success'] and result['message'] == 'reCAPTCHA đã hết hạn, vui lòng thử lại'
+        assert len(session.posts) == 2
+
+
+def test_rejected_tokens_are_not_cached():
+    with siteverify((200, {'success': False, 'error-codes': ['invalid-input-response']}), (200, {'success': True})) as session:
+        result = RecaptchaVerifier.verify_recaptcha('token-1')
+        assert result == {'success': False, 'error_codes': ['invalid-input-response'], 'message': 'Bạn là Robot'}
+        assert RecaptchaVerifier.verify_recaptcha('token-1')['success']
+        assert len(session.posts) == 2
+
+
+def test_timeouts_and_url_come_from_the_environment():
+    with siteverify((200, {'success': True}), RECAPTCHA_CONNECT_TIMEOUT='0.5', RECAPTCHA_READ_TIMEOUT='1.5',
+                    RECAPTCHA_VERIFY_URL='http://127.0.0.1:5055/siteverify') as session:
+        RecaptchaVerifier.verify_recaptcha('token-1')
+        assert session.posts[0]['timeout'] == (0.5, 1.5)
+        assert session.posts[0]['url'] == 'http://127.0.0.1:5055/siteverify'
+
+
+def test_network_and_api_errors_fail_closed():
+    with siteverify(requests.ConnectTimeout('connect timed out'), (503, {})):
+        assert RecaptchaVerifier.verify_recaptcha('token-1')['error_codes'] == ['network-error']
+        assert RecaptchaVerifier.verify_recaptcha('token-1')['error_codes'] == ['api-error']
+
+
+def test_missing_secret_or_response_sends_nothing():
+    with siteverify(RECAPTCHA_SECRET_KEY='') as session:
+        assert RecaptchaVerifier.verify_recaptcha('token-1')['error_codes'] == ['missing-secret-key']
+    with siteverify() as session:
+        assert RecaptchaVerifier.verify_recaptcha('')['error_codes'] == ['missing-input-response']
+        assert session.posts == []
+
+
+def test_verified_token_cache_expires_and_stays_bounded():
+    clock = mock.Mock(monotonic=mock.Mock(return_value=0.0))
+    with mock.patch.object(recaptcha, 'time', clock):
+        cache = VerifiedTokenCache(ttl=120, max_size=2)
+        cache.add('a')
+        clock.monotonic.return_value = 100.0
+        assert cache.contains('a')
+        cache.add('b')
+        cache.add('c')
+        assert len(cache._entries) == 2 and not cache.contains('a'), 'oldest dropped when full'
+        clock.monotonic.return_value = 221.0
+        assert not cache.contains('b') and not cache.contains('c')
+
+
+def test_one_session_per_process():
+    with mock.patch.object(RecaptchaVerifier, '_session', None):
+        session = RecaptchaVerifier.get_session()
+        assert RecaptchaVerifier.get_session() is session
+        assert session.get_adapter('https://www.google.com').max_retries.total == 0
+        # In a forked child the pid differs: a new session, never the parent's sockets
+        with mock.patch.object(recaptcha.os, 'getpid', return_value=-1):
+            assert RecaptchaVerifier.get_session() is not session
+
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f"✅ {name}")
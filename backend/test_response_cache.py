@@ -0,0 +1,289 @@
+"""
+Response cache tests - single-flight, stale-while-revalidate, cache keys and
+clearing every worker
+
+Uses the in-memory store, no server or database needed; the generation counter
+document lives in an in-memory stand-in:
+    python test_response_cache.py
+    python -m pytest test_response_cache.py
+"""
+import os
+import threading
+import time
+from flask import Response
+from werkzeug.datastructures import MultiDict
+from app.utils import response_cache
+from app.utils.response_cache import GENERATION_ID, MemoryResponseStore, ResponseCache
+
+
+class FakeCollection:
+    """find_one and find_one_and_update with $inc on (dotted) fields, by _id"""
+
+    def __init__(self):
+        self.documents = {}
+
+    def find_one(self, query):
+        return self.documents.get(query['_id'])
+
+    def find_one_and_update(self, query, update, upsert, return_document):
+        document = self.documents.setdefault(query['_id'], {'_id': query['_id']})
+        for field, amount in update['$inc'].items():
+            *parents, last = field.split('.')
+            target = document
+            for parent in parents:
+                target = target.setdefault(parent, {})
+            target[last] = target.get(last, 0) + amount
+        return document
+
+
+class FakeDatabase:
+    def __init__(self):
+        self.collections = {}
+
+    def __getitem__(self, name):
+        return self.collections.setdefault(name, FakeCollection())
+
+
+database = FakeDatabase()
+response_cache.get_db = lambda: database
+
+
+def configure(name, ttl, stale=0):
+    os.environ[f'RESPONSE_CACHE_TTL_{name.upper()}'] = str(ttl)
+    os.environ[f'RESPONSE_CACHE_STALE_{name.upper()}'] = str(stale)
+
+
+class Computation:
+    """A route body that counts its runs and takes delay seconds"""
+
+    def __init__(self, delay=0.0, status=200, label='run'):
+        self.label = label
+        self.delay = delay
+        self.status = status
+        self.runs = 0
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        with self._lock:
+            self.runs += 1
+            run = self.runs
+        time.sleep(self.delay)
+        return Response(f'{{"{self.label}": {run}}}', status=self.status, mimetype='application/json')
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_hit_within_ttl():
+    configure('hit_stats', ttl=60)
+    cache = ResponseCache()
+    compute = Computation()
+    assert cache.fetch('hit_stats', 'hit_stats?', compute) == ('{"run": 1}', 'MISS')
+    assert cache.fetch('hit_stats', 'hit_stats?', compute) == ('{"run": 1}', 'HIT')
+    assert compute.runs == 1
+
+
+def test_single_flight_coalesces_concurrent_misses():
+    configure('flight_stats', ttl=60)
+    cache = ResponseCache()
+    compute = Computation(delay=0.3)
+    start = threading.Barrier(8)
+    results = []
+
+    def request():
+        start.wait()
+        results.append(cache.fetch('flight_stats', 'flight_stats?period=month', compute))
+
+    threads = [threading.Thread(target=request) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert compute.runs == 1, f"computed {compute.runs} times"
+    assert {body for body, _ in results} == {'{"run": 1}'}
+    assert sorted(state for _, state in results) == ['HIT'] * 7 + ['MISS']
+    counters = cache.stats()['counters']['flight_stats']
+    assert counters['misses'] == 1 and counters['coalesced'] == 7
+
+
+def test_stale_while_revalidate():
+    configure('stale_stats', ttl=0.2, stale=30)
+    cache = ResponseCache()
+    compute = Computation()
+    refresh = Computation(delay=0.2, label='refresh')
+    key = 'stale_stats?'
+    assert cache.fetch('stale_stats', key, compute, refresh) == ('{"run": 1}', 'MISS')
+    time.sleep(0.3)
+
+    # Past the TTL: the old body is served at once while one refresh runs in the background
+    started = time.monotonic()
+    states = [cache.fetch('stale_stats', key, compute, refresh) for _ in range(5)]
+    assert time.monotonic() - started < 0.2, 'stale responses waited for the refresh'
+    assert states == [('{"run": 1}', 'STALE')] * 5
+
+    assert wait_until(lambda: cache.fetch('stale_stats', key, compute, refresh)[1] == 'HIT')
+    assert cache.fetch('stale_stats', key, compute, refresh) == ('{"refresh": 1}', 'HIT')
+    assert refresh.runs == 1 and compute.runs == 1
+    assert cache.stats()['counters']['stale_stats']['refreshes'] == 1
+
+
+def test_past_stale_window_recomputes():
+    configure('expired_stats', ttl=0.1, stale=0.1)
+    cache = ResponseCache()
+    compute = Computation()
+    cache.fetch('expired_stats', 'expired_stats?', compute, compute)
+    time.sleep(0.3)
+    assert cache.fetch('expired_stats', 'expired_stats?', compute, compute) == ('{"run": 2}', 'MISS')
+
+
+def test_errors_are_not_cached():
+    configure('error_stats', ttl=60)
+    cache = ResponseCache()
+    compute = Computation(status=500)
+    body, state = cache.fetch('error_stats', 'error_stats?', compute)
+    assert isinstance(body, Response) and body.status_code == 500 and state == 'MISS'
+    cache.fetch('error_stats', 'error_stats?', compute)
+    assert compute.runs == 2
+
+
+def test_key_is_canonical():
+    defaults = {'period': 'month'}
+    assert ResponseCache.key('transaction_stats', MultiDict(), defaults) == \
+        ResponseCache.key('transaction_stats', MultiDict([('period', 'month')]), defaults)
+    assert ResponseCache.key('registration_stats', MultiDict([('role', 'user'), ('period', 'day'), ('empty', '')])) == \
+        ResponseCache.key('registration_stats', MultiDict([('period', 'day'), ('role', 'user')]))
+    assert ResponseCache.key('transaction_stats', MultiDict([('period', 'year')]), defaults) != \
+        ResponseCache.key('transaction_stats', MultiDict(), defaults)
+
+
+def test_clear_one_route():
+    configure('clear_a', ttl=60)
+    configure('clear_b', ttl=60)
+    cache = ResponseCache()
+    compute = Computation()
+    cache.fetch('clear_a', 'clear_a?', compute)
+    cache.fetch('clear_b', 'clear_b?', compute)
+    cache.clear('clear_a')
+    assert cache.fetch('clear_a', 'clear_a?', compute)[1] == 'MISS'
+    assert cache.fetch('clear_b', 'clear_b?', compute)[1] == 'HIT'
+
+
+class SharedStore(MemoryResponseStore):
+    """MongoResponseStore semantics in memory: entries and computation leases shared by several workers"""
+
+    def __init__(self):
+        super().__init__()
+        self._leases = {}
+
+    def acquire(self, key, seconds):
+        with self._lock:
+            if self._leases.get(key, 0) > time.time():
+                return False
+            self._leases[key] = time.time() + seconds
+            return True
+
+    def release(self, key):
+        with self._lock:
+            self._leases.pop(key, None)
+
+    def set(self, key, body, keep_seconds):
+        super().set(key, body, keep_seconds)
+        self.release(key)
+
+
+def workers(count, store):
+    caches = []
+    for _ in range(count):
+        cache = ResponseCache()
+        cache.store = store
+        caches.append(cache)
+    return caches
+
+
+def test_other_worker_waits_for_the_leader():
+    configure('shared_stats', ttl=60)
+    leader, follower = workers(2, SharedStore())
+    compute = Computation(delay=0.3)
+    results = {}
+    thread = threading.Thread(target=lambda: results.setdefault('leader', leader.fetch('shared_stats', 'shared_stats?', compute)))
+    thread.start()
+    time.sleep(0.05)
+    results['follower'] = follower.fetch('shared_stats', 'shared_stats?', compute)
+    thread.join()
+    assert results == {'leader': ('{"run": 1}', 'MISS'), 'follower': ('{"run": 1}', 'HIT')}
+    assert compute.runs == 1
+
+
+def test_other_worker_computes_as_soon_as_the_leader_fails():
+    configure('failing_stats', ttl=60)
+    os.environ['RESPONSE_CACHE_WAIT_SECONDS'] = '30'
+    try:
+        leader, follower = workers(2, SharedStore())
+    finally:
+        del os.environ['RESPONSE_CACHE_WAIT_SECONDS']
+    failing = Computation(delay=0.3, status=500)
+    thread = threading.Thread(target=lambda: leader.fetch('failing_stats', 'failing_stats?', failing))
+    thread.start()
+    time.sleep(0.05)
+    started = time.monotonic()
+    body, state = follower.fetch('failing_stats', 'failing_stats?', Computation(label='follower'))
+    thread.join()
+    assert (body, state) == ('{"follower": 1}', 'MISS')
+    assert time.monotonic() - started < 2, 'the follower waited out RESPONSE_CACHE_WAIT_SECONDS'
+
+
+def memory_workers(count):
+    caches = workers(count, None)
+    for cache in caches:
+        cache.store = MemoryResponseStore()
+        cache.sync_seconds = 0
+    return caches
+
+
+def test_clear_reaches_other_workers():
+    configure('broadcast_a', ttl=60)
+    configure('broadcast_b', ttl=60)
+    first, second = memory_workers(2)
+    compute = Computation()
+    for cache in (first, second):
+        cache.fetch('broadcast_a', 'broadcast_a?', compute)
+        cache.fetch('broadcast_b', 'broadcast_b?', compute)
+
+    assert first.clear('broadcast_a') is True
+    assert second.fetch('broadcast_a', 'broadcast_a?', compute)[1] == 'MISS'
+    assert second.fetch('broadcast_b', 'broadcast_b?', compute)[1] == 'HIT'
+    # The worker that cleared does not clear again on its next check
+    assert first.fetch('broadcast_a', 'broadcast_a?', compute)[1] == 'MISS'
+    assert first.fetch('broadcast_a', 'broadcast_a?', compute)[1] == 'HIT'
+
+    first.clear()
+    assert second.fetch('broadcast_b', 'broadcast_b?', compute)[1] == 'MISS'
+    assert second.fetch('broadcast_a', 'broadcast_a?', compute)[1] == 'MISS'
+    assert database[response_cache.COLLECTION].documents[GENERATION_ID]['routes']['broadcast_a'] == 1
+
+
+def test_other_workers_clear_within_the_sync_interval():
+    configure('interval_stats', ttl=60)
+    first, second = memory_workers(2)
+    second.sync_seconds = 60
+    compute = Computation()
+    second.fetch('interval_stats', 'interval_stats?', compute)
+    first.clear('interval_stats')
+    # Checked less than sync_seconds ago: still served from this worker's memory
+    assert second.fetch('interval_stats', 'interval_stats?', compute)[1] == 'HIT'
+    second._synced_at -= 60
+    assert second.fetch('interval_stats', 'interval_stats?', compute)[1] == 'MISS'
+
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f"✅ {name}")
@@ -0,0 +1,144 @@
+"""
+Slow query log tests - plan stage flags, the SLOW_QUERY_MS threshold and the
+explain cache
+
+No server or database needed; commands are fed to the listener as pymongo
+events and explain/insert go to an in-memory stand-in database:
+    python test_slow_query_log.py
+    python -m pytest test_slow_query_log.py
+"""
+import itertools
+from types import SimpleNamespace
+from unittest import mock
+from flask import Flask
+from pymongo.errors import CollectionInvalid, OperationFailure
+from app.utils import slow_query_log
+from app.utils.slow_query_log import SlowQueryListener, SlowQueryRecorder, plan_flags, plan_stages
+
+request_ids = itertools.count(1)
+
+COLLSCAN_EXPLAIN = {
+    'queryPlanner': {
+        'winningPlan': {'stage': 'SORT', 'inputStage': {'stage': 'COLLSCAN', 'filter': {'status': {'$eq': 'pending'}}}},
+        'rejectedPlans': [{'stage': 'FETCH', 'inputStage': {'stage': 'IXSCAN'}}]
+    }
+}
+INDEXED_EXPLAIN = {'queryPlanner': {'winningPlan': {'stage': 'FETCH', 'inputStage': {'stage': 'IXSCAN', 'indexName': 'status_1'}}}}
+
+
+class FakeDatabase:
+    def __init__(self, explain=None, error=None):
+        self.explain = explain
+        self.error = error
+        self.explained = []
+        self.created = []
+        self.inserted = []
+
+    def command(self, name, command, verbosity):
+        self.explained.append(command)
+        if self.error:
+            raise self.error
+        return self.explain
+
+    def create_collection(self, name, capped, size):
+        if self.created:
+            raise CollectionInvalid(f"collection {name} already exists")
+        self.created.append((name, capped, size))
+
+    def __getitem__(self, name):
+        return SimpleNamespace(insert_one=self.inserted.append)
+
+
+def run(listener, name, collection, duration_ms, **fields):
+    """One command through the listener, as pymongo sends it"""
+    request_id = next(request_ids)
+    command = {name: collection, '$db': 'tripook', 'lsid': {'id': 'session'}, **fields}
+    listener.started(SimpleNamespace(command_name=name, command=command, database_name='tripook', connection_id=('db', 27017), request_id=request_id))
+    listener.succeeded(SimpleNamespace(command_name=name, connection_id=('db', 27017), request_id=request_id, duration_micros=int(duration_ms * 1000)))
+
+
+def entry(collection='bookings', query=None):
+    query = query or {'status': 'pending'}
+    return {
+        'database': 'tripook', 'collection': collection, 'command_name': 'find',
+        'command': {'find': collection, 'filter': query}, 'shape': slow_query_log.query_shape(query),
+        'duration_ms': 250.0, 'threshold_ms': 100.0, 'route': 'GET /api/admin/transactions', 'path': '/api/admin/transactions?'
+    }
+
+
+def test_only_winning_plan_stages():
+    stages = plan_stages(COLLSCAN_EXPLAIN)
+    assert stages == ['SORT', 'COLLSCAN']
+    assert plan_flags(stages) == {'collscan': True, 'in_memory_sort': True}
+    assert plan_flags(plan_stages(INDEXED_EXPLAIN)) == {'collscan': False, 'in_memory_sort': False}
+    # Sharded explain: winning plans per shard
+    sharded = {'queryPlanner': {'winningPlan': {'stage': 'SHARD_MERGE', 'shards': [{'winningPlan': {'stage': 'COLLSCAN'}}]}}}
+    assert 'COLLSCAN' in plan_stages(sharded)
+
+
+def test_listener_submits_only_slow_explainable_commands():
+    listener = SlowQueryListener()
+    app = Flask(__name__)
+    app.add_url_rule('/api/admin/transactions', 'transactions', lambda: '')
+    with mock.patch.dict('os.environ', {'SLOW_QUERY_MS': '100', 'SLOW_QUERY_LOG': 'true'}), \
+            mock.patch.object(slow_query_log.slow_query_recorder, 'submit') as submit, \
+            app.test_request_context('/api/admin/transactions?page=2'):
+        run(listener, 'find', 'bookings', 99.9, filter={'status': 'pending'})
+        run(listener, 'insert', 'bookings', 500, documents=[{}])
+        run(listener, 'find', 'bookings', 150, filter={'status': 'pending', 'user_id': 'u1'})
+        run(listener, 'aggregate', 'bookings', 300, pipeline=[{'$match': {'status': 'x'}}])
+    submitted = [call.args[0] for call in submit.call_args_list]
+    assert [item['command_name'] for item in submitted] == ['find', 'aggregate']
+    first = submitted[0]
+    assert first['command'] == {'find': 'bookings', 'filter': {'status': 'pending', 'user_id': 'u1'}}, 'driver fields are stripped'
+    assert first['shape'] == {'status': '?', 'user_id': '?'}
+    assert first['route'] == 'GET /api/admin/transactions' and first['path'] == '/api/admin/transactions?page=2'
+    assert listener._pending == {}
+
+
+def test_disabled_log_submits_nothing():
+    listener = SlowQueryListener()
+    with mock.patch.dict('os.environ', {'SLOW_QUERY_LOG': 'false'}), \
+            mock.patch.object(slow_query_log.slow_query_recorder, 'submit') as submit:
+        run(listener, 'find', 'bookings', 5000, filter={})
+    submit.assert_not_called()
+
+
+def test_recorder_stores_the_plan_and_flags():
+    recorder = SlowQueryRecorder()
+    db = FakeDatabase(explain=COLLSCAN_EXPLAIN)
+    with mock.patch.object(recorder, '_database', lambda name: db):
+        recorder._record(entry())
+        recorder._record(entry())
+    assert db.created == [('slow_queries', True, slow_query_log._capped_size_bytes())]
+    assert len(db.inserted) == 2
+    stored = db.inserted[0]
+    assert stored['collscan'] and stored['in_memory_sort'] and stored['plan_stages'] == ['SORT', 'COLLSCAN']
+    assert stored['winning_plan'] == COLLSCAN_EXPLAIN['queryPlanner']['winningPlan']
+    assert stored['shape'] == "{'status': '?'}" and stored['explain_error'] is None
+    # Same shape within EXPLAIN_CACHE_SECONDS: explained once
+    assert len(db.explained) == 1
+
+
+def test_explain_errors_are_stored_not_raised():
+    recorder = SlowQueryRecorder()
+    db = FakeDatabase(error=OperationFailure('explain not allowed'))
+    with mock.patch.object(recorder, '_database', lambda name: db):
+        recorder._record(entry())
+    stored = db.inserted[0]
+    assert stored['explain_error'] == 'explain not allowed' and not stored['collscan'] and stored['plan_stages'] == []
+
+
+def test_queue_drops_when_full():
+    recorder = SlowQueryRecorder(max_pending=2)
+    with mock.patch.object(recorder, '_ensure_started'):
+        for _ in range(5):
+            recorder.submit(entry())
+    assert recorder._queue.qsize() == 2
+
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f"✅ {name}")
@@ -0,0 +1,237 @@
+"""
+SMTP pool tests - connection reuse, pipelined envelopes, refused recipients
+and reconnecting when the server dropped a connection
+
+No server or network needed; smtplib.SMTP is replaced by an in-memory
+connection that answers like an SMTP server and records what is written:
+    python test_smtp_pool.py
+    python -m pytest test_smtp_pool.py
+"""
+import smtplib
+from collections import deque
+from contextlib import contextmanager
+from email.message import EmailMessage
+from unittest import mock
+from app.services import smtp_pool as smtp_pool_module
+from app.services.smtp_pool import MESSAGE_POLICY, SmtpPool
+
+
+class FakeServer:
+    def __init__(self, pipelining=True, refused=()):
+        self.pipelining = pipelining
+        self.refused = set(refused)
+        self.connections = []
+        self.delivered = []
+
+
+class FakeSMTP:
+    """One connection: writes are recorded, replies queued until getreply()"""
+
+    def __init__(self, server, host, port, timeout):
+        self.server = server
+        self.writes = []
+        self.replies = deque()
+        self.accepted = 0
+        self.dropped = False
+        self.closed = False
+        self.drop_on_data = False
+        server.connections.append(self)
+
+    def _command(self, name):
+        if self.dropped or self.closed:
+            raise smtplib.SMTPServerDisconnected('Connection unexpectedly closed')
+        self.writes.append(name)
+
+    def ehlo(self):
+        self._command('EHLO')
+
+    def starttls(self, context):
+        self._command('STARTTLS')
+
+    def login(self, username, password):
+        self._command('AUTH')
+
+    def has_extn(self, name):
+        return name == 'pipelining' and self.server.pipelining
+
+    def noop(self):
+        self._command('NOOP')
+        return 250, b'OK'
+
+    def rset(self):
+        self._command('RSET')
+        return 250, b'OK'
+
+    def mail(self, sender):
+        self._command('MAIL')
+        self.accepted = 0
+        return 250, b'OK'
+
+    def rcpt(self, recipient):
+        self._command('RCPT')
+        return self._rcpt_reply(recipient)
+
+    def _rcpt_reply(self, recipient):
+        if recipient in self.server.refused:
+            return 550, b'No such user'
+        self.accepted += 1
+        return 250, b'OK'
+
+    def putcmd(self, command):
+        self._command(command.upper())
+        self.replies.append((354, b'Go ahead') if self.accepted else (554, b'No valid recipients'))
+
+    def send(self, data):
+        if isinstance(data, str):
+            # A pipelined envelope: one write, one reply per command
+            self._command('PIPELINE')
+            for line in data.split('\r\n')[:-1]:
+                if line.startswith('MAIL FROM:'):
+                    self.accepted = 0
+                    self.replies.append((250, b'OK'))
+                elif line.startswith('RCPT TO:'):
+                    self.replies.append(self._rcpt_reply(line[len('RCPT TO:<'):-1]))
+                else:
+                    self.replies.append((354, b'Go ahead') if self.accepted else (554, b'No valid recipients'))
+            return
+        if self.drop_on_data:
+            self.dropped = True
+        self._command('MESSAGE')
+        if data != b'.\r\n':
+            self.server.delivered.append((self, data))
+        self.replies.append((250, b'Queued'))
+
+    def getreply(self):
+        if self.dropped:
+            raise smtplib.SMTPServerDisconnected('Connection unexpectedly closed')
+        return self.replies.popleft()
+
+    def quit(self):
+        self._command('QUIT')
+        self.closed = True
+
+    def close(self):
+        self.closed = True
+
+
+@contextmanager
+def smtp_server(pipelining=True, refused=(), **environment):
+    server = FakeServer(pipelining, refused)
+    environment = {'SMTP_MAX_IDLE_SECONDS': '30', **environment}
+    with mock.patch.dict('os.environ', environment), \
+            mock.patch.object(smtp_pool_module.smtplib, 'SMTP', lambda *args, **kwargs: FakeSMTP(server, *args, **kwargs)):
+        yield SmtpPool(host='smtp.example.com', port=587, username='user', password='secret', use_tls=True, size=2), server
+
+
+def message(*to, bcc=None):
+    email = EmailMessage(policy=MESSAGE_POLICY)
+    email['From'] = 'noreply@tripook.com'
+    email['To'] = ', '.join(to)
+    if bcc:
+        email['Bcc'] = bcc
+    email['Subject'] = 'Xin chào'
+    email.set_content('.leading period\nbody\n')
+    return email
+
+
+def test_one_login_for_many_messages():
+    with smtp_server() as (pool, server):
+        pool.send(message('an@example.com'))
+        pool.send(message('binh@example.com'))
+        assert pool.send_many([message('chi@example.com'), message('dung@example.com')]) == [{}, {}]
+        assert len(server.connections) == 1 and len(server.delivered) == 4
+        assert server.connections[0].writes[:4] == ['EHLO', 'STARTTLS', 'EHLO', 'AUTH']
+        assert pool.stats()['connections'] == 1 and pool.stats()['messages'] == 4 and pool.stats()['idle'] == 1
+
+
+def test_pipelined_envelope_is_one_write():
+    with smtp_server() as (pool, server):
+        pool.send(message('an@example.com', 'binh@example.com'))
+        assert server.connections[0].writes[4:] == ['PIPELINE', 'MESSAGE']
+        assert pool.stats()['pipelined'] == 1
+    with smtp_server(pipelining=False) as (pool, server):
+        pool.send(message('an@example.com', 'binh@example.com'))
+        assert server.connections[0].writes[4:] == ['MAIL', 'RCPT', 'RCPT', 'DATA', 'MESSAGE']
+        assert pool.stats()['pipelined'] == 0
+    with smtp_server(SMTP_PIPELINING='false') as (pool, server):
+        pool.send(message('an@example.com'))
+        assert server.connections[0].writes[4:] == ['MAIL', 'RCPT', 'DATA', 'MESSAGE']
+
+
+def test_message_data_is_dot_stuffed_and_bcc_stripped():
+    with smtp_server() as (pool, server):
+        pool.send(message('an@example.com', bcc='audit@tripook.com'))
+        _, data = server.delivered[0]
+        assert b'\r\n..leading period\r\n' in data and data.endswith(b'\r\n.\r\n')
+        assert b'Bcc' not in data
+
+
+def test_refused_recipients():
+    for pipelining in (True, False):
+        with smtp_server(pipelining=pipelining, refused={'ghost@example.com'}) as (pool, server):
+            refused = pool.send(message('an@example.com', 'ghost@example.com'))
+            assert refused == {'ghost@example.com': (550, b'No such user')}
+            # Every recipient refused: an error for that message, the connection stays in use
+            outcomes = pool.send_many([message('ghost@example.com'), message('binh@example.com')])
+            assert isinstance(outcomes[0], smtplib.SMTPRecipientsRefused) and outcomes[1] == {}
+            assert len(server.connections) == 1 and 'RSET' in server.connections[0].writes
+            assert len(server.delivered) == 2
+
+
+def test_dropped_connection_is_retried_once_on_a_new_one():
+    with smtp_server() as (pool, server):
+        pool.send(message('an@example.com'))
+        # The server closed the pooled connection while it was idle
+        server.connections[0].dropped = True
+        assert pool.send_many([message('binh@example.com'), message('chi@example.com')]) == [{}, {}]
+        assert len(server.connections) == 2 and pool.stats()['reconnects'] == 1
+        assert [connection for connection, _ in server.delivered[1:]] == [server.connections[1]] * 2
+
+
+def test_drop_after_hand_over_is_not_retried():
+    with smtp_server() as (pool, server):
+        pool.send(message('an@example.com'))
+        server.connections[0].drop_on_data = True
+        outcomes = pool.send_many([message('binh@example.com'), message('chi@example.com')])
+        # The server may have the first message already: sending it again could deliver it twice
+        assert isinstance(outcomes[0], smtplib.SMTPServerDisconnected) and outcomes[1] == {}
+        assert len(server.connections) == 2 and pool.stats()['reconnects'] == 1
+        assert server.delivered[-1][0] is server.connections[1]
+
+
+def test_idle_connection_is_checked_before_use():
+    with smtp_server(SMTP_MAX_IDLE_SECONDS='0') as (pool, server):
+        pool.send(message('an@example.com'))
+        pool.send(message('binh@example.com'))
+        assert 'NOOP' in server.connections[0].writes and len(server.connections) == 1
+        server.connections[0].dropped = True
+        pool.send(message('chi@example.com'))
+        # NOOP found the drop: discarded at checkout, not a reconnect in the middle of a send
+        assert len(server.connections) == 2 and pool.stats()['reconnects'] == 0
+
+
+def test_connection_is_replaced_after_max_messages():
+    with smtp_server(SMTP_MAX_MESSAGES_PER_CONNECTION='2') as (pool, server):
+        for address in ('an@example.com', 'binh@example.com', 'chi@example.com'):
+            pool.send(message(address))
+        assert len(server.connections) == 2 and server.connections[0].closed
+
+
+def test_failed_connect_fails_the_whole_batch_and_frees_the_slot():
+    with smtp_server() as (pool, server), \
+            mock.patch.object(smtp_pool_module.smtplib, 'SMTP', side_effect=ConnectionRefusedError('refused')):
+        for _ in range(3):
+            try:
+                pool.send(message('an@example.com'))
+                assert False, 'send should fail'
+            except ConnectionRefusedError:
+                pass
+        # Three failures with a pool of two: no slot was leaked
+        assert pool._slots.acquire(blocking=False) and pool._slots.acquire(blocking=False)
+
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f"✅ {name}")
@@ -0,0 +1,239 @@
+"""
+Transaction stats tests - the top providers/users aggregation and the
+whole-day window /api/admin/transaction-stats reads
+
+No server or database needed; bookings.aggregate() is evaluated by a small
+interpreter with MongoDB semantics for the stages and expressions
+Booking.top_accounts uses ($match, $facet, $group, $lookup, $unwind, $sort,
+$limit, $project, $convert, $ifNull):
+    python test_transaction_stats.py
+    python -m pytest test_transaction_stats.py
+"""
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from unittest import mock
+from bson import ObjectId
+from bson.errors import InvalidId
+from flask import Flask
+from app.models import booking as booking_module
+from app.models.booking import Booking
+from app.models.login_rollup import day_start
+from app.routes import admin
+from app.utils.jwt_auth import issue_tokens
+from app.utils.response_cache import response_cache
+
+
+def field(document, path):
+    for part in path.split('.'):
+        document = document.get(part) if isinstance(document, dict) else None
+    return document
+
+
+def evaluate(document, expression):
+    if isinstance(expression, str) and expression.startswith('$'):
+        return field(document, expression[1:])
+    if isinstance(expression, dict) and '$ifNull' in expression:
+        value, default = (evaluate(document, item) for item in expression['$ifNull'])
+        return default if value is None else value
+    if isinstance(expression, dict) and '$convert' in expression:
+        options = expression['$convert']
+        value = evaluate(document, options['input'])
+        if value is None:
+            return options['onNull']
+        try:
+            return ObjectId(value)
+        except (InvalidId, TypeError):
+            return evaluate(document, options['onError'])
+    return expression
+
+
+def matches(document, query):
+    for name, condition in query.items():
+        value = field(document, name)
+        if '$gte' in condition and not (value is not None and value >= condition['$gte']):
+            return False
+        if '$lt' in condition and not (value is not None and value < condition['$lt']):
+            return False
+        if '$nin' in condition and value in condition['$nin']:
+            return False
+    return True
+
+
+def run(db, documents, pipeline):
+    for stage in pipeline:
+        (operator, spec), = stage.items()
+        if operator == '$match':
+            documents = [document for document in documents if matches(document, spec)]
+        elif operator == '$facet':
+            documents = [{name: run(db, documents, branch) for name, branch in spec.items()}]
+        elif operator == '$group':
+            groups = {}
+            for document in documents:
+                key = evaluate(document, spec['_id'])
+                group = groups.setdefault(key, {'_id': key, **{name: 0 for name in spec if name != '_id'}})
+                for name, accumulator in spec.items():
+                    if name != '_id':
+                        group[name] += evaluate(document, accumulator['$sum'])
+            documents = list(groups.values())
+        elif operator == '$lookup':
+            foreign = run(db, db[spec['from']], spec['pipeline'])
+            documents = [{**document, spec['as']: [other for other in foreign
+                                                   if other.get(spec['foreignField']) == document.get(spec['localField'])]}
+                         for document in documents]
+        elif operator == '$unwind':
+            name = spec[1:]
+            documents = [{**document, name: item} for document in documents for item in document[name]]
+        elif operator == '$sort':
+            for name, direction in reversed(list(spec.items())):
+                documents = sorted(documents, key=lambda document: field(document, name), reverse=direction < 0)
+        elif operator == '$limit':
+            documents = documents[:spec]
+        elif operator == '$project':
+            projected = []
+            for document in documents:
+                result = {} if spec.get('_id') == 0 else {'_id': document['_id']}
+                for name, value in spec.items():
+                    if name != '_id':
+                        result[name] = document.get(name) if value == 1 else evaluate(document, value)
+                projected.append(result)
+            documents = projected
+        else:
+            raise AssertionError(f"stage not supported here: {operator}")
+    return documents
+
+
+class FakeBookings(list):
+    def __init__(self, db):
+        super().__init__()
+        self.db = db
+        self.pipelines = []
+
+    def aggregate(self, pipeline, allowDiskUse=False):
+        self.pipelines.append(pipeline)
+        return iter(run(self.db, list(self), pipeline))
+
+
+class FakeDatabase(dict):
+    def __init__(self):
+        super().__init__(users=[], services=[])
+        self['bookings'] = FakeBookings(self)
+
+    def __getattr__(self, name):
+        return self[name]
+
+    def user(self, name, **fields):
+        user = {'_id': ObjectId(), 'fullName': name, 'email': f'{name.lower()}@example.com', **fields}
+        self['users'].append(user)
+        return user
+
+    def service(self, provider_id):
+        service = {'_id': ObjectId(), 'provider_id': provider_id, 'name': 'Tour'}
+        self['services'].append(service)
+        return service
+
+    def book(self, user, service, amount, when=datetime(2026, 9, 15), **fields):
+        self['bookings'].append({'_id': ObjectId(), 'user_id': user['_id'], 'service_id': service['_id'] if service else None,
+                                 'total_amount': amount, 'booking_date': when, **fields})
+
+
+@contextmanager
+def database():
+    db = FakeDatabase()
+    with mock.patch.object(booking_module, 'get_db', lambda: db):
+        yield db
+
+
+SEPTEMBER = (datetime(2026, 9, 1), datetime(2026, 10, 1))
+
+
+def test_providers_are_ranked_across_their_services():
+    with database() as db:
+        an = db.user('An')
+        binh = db.user('Binh', companyName='Bình Travel')
+        chi = db.user('Chi', companyName='Chi Tours')
+        # Bình's services store provider_id as an ObjectId and as a string: one provider
+        tour, hotel, cruise = db.service(binh['_id']), db.service(str(binh['_id'])), db.service(chi['_id'])
+        for service, amount in ((tour, 100), (hotel, 200), (cruise, 50), (cruise, 70), (None, 10)):
+            db.book(an, service, amount)
+        providers = Booking.top_accounts(*SEPTEMBER)['topProviders']
+        assert providers == [
+            {'transaction_count': 2, 'total_revenue': 300, 'provider_id': str(binh['_id']), 'provider_name': 'Binh', 'company_name': 'Bình Travel'},
+            {'transaction_count': 2, 'total_revenue': 120, 'provider_id': str(chi['_id']), 'provider_name': 'Chi', 'company_name': 'Chi Tours'}
+        ], 'ties are ranked by id'
+
+
+def test_users_are_ranked_by_bookings_then_id():
+    with database() as db:
+        tour = db.service(db.user('Provider')['_id'])
+        an, binh = db.user('An'), db.user('Binh')
+        for _ in range(3):
+            db.book(binh, tour, 100)
+        db.book(an, tour, None)
+        db.book(an, tour, 40)
+        users = Booking.top_accounts(*SEPTEMBER)['topUsers']
+        assert [(user['user_name'], user['transaction_count'], user['total_spent']) for user in users] == [('Binh', 3, 300), ('An', 2, 40)]
+        assert users[0]['user_id'] == str(binh['_id']) and users[0]['email'] == 'binh@example.com'
+
+
+def test_window_is_half_open():
+    with database() as db:
+        an = db.user('An')
+        tour = db.service(db.user('Provider')['_id'])
+        db.book(an, tour, 1, when=datetime(2026, 9, 1))
+        db.book(an, tour, 2, when=datetime(2026, 9, 30, 23, 59, 59))
+        db.book(an, tour, 4, when=datetime(2026, 10, 1))
+        db.book(an, tour, 8, when=datetime(2026, 8, 31, 23, 59, 59))
+        assert Booking.top_accounts(*SEPTEMBER)['topUsers'][0]['total_spent'] == 3
+
+
+def test_deleted_accounts_do_not_shorten_the_top_ten():
+    with database() as db:
+        tour = db.service(db.user('Provider')['_id'])
+        customers = [db.user(f'User{index}') for index in range(12)]
+        for index, customer in enumerate(customers):
+            for _ in range(20 - index):
+                db.book(customer, tour, 10)
+        # The busiest customer's account was deleted
+        db['users'].remove(customers[0])
+        users = Booking.top_accounts(*SEPTEMBER)['topUsers']
+        assert [user['user_name'] for user in users] == [f'User{index}' for index in range(1, 11)]
+
+
+def test_one_aggregation_for_both_rankings():
+    with database() as db:
+        Booking.top_accounts(*SEPTEMBER)
+        (pipeline,) = db['bookings'].pipelines
+        assert pipeline[0] == {'$match': {'booking_date': {'$gte': SEPTEMBER[0], '$lt': SEPTEMBER[1]}}}
+        assert set(pipeline[1]['$facet']) == {'topProviders', 'topUsers'}
+
+
+def test_route_reads_whole_days():
+    admin_user = {'_id': ObjectId(), 'role': 'admin', 'status': 'active', 'accountStatus': 'active', 'tokenVersion': 0}
+    summary = {'totalTransactions': 3, 'totalRevenue': 100.456, 'averageTransactionValue': 33.485, 'successRate': 66.666,
+               'statusDistribution': {'confirmed': 2, 'pending': 1}, 'revenueByCurrency': {'USD': 100.456}, 'timeline': []}
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = 'test-secret'
+    app.register_blueprint(admin.admin_bp)
+    with mock.patch.dict('os.environ', {'JWT_REFRESH_TOKENS': 'true'}), \
+            mock.patch.object(response_cache, 'enabled', False), \
+            mock.patch.object(admin.DailyRollup, 'transaction_summary', return_value=summary) as transaction_summary, \
+            mock.patch.object(admin.Booking, 'top_accounts', return_value={'topProviders': [], 'topUsers': []}) as top_accounts, \
+            app.app_context():
+        headers = {'Authorization': f"Bearer {issue_tokens(admin_user)['token']}"}
+        client = app.test_client()
+
+        body = client.get('/api/admin/transaction-stats?startDate=2026-09-01&endDate=2026-09-30', headers=headers).get_json()
+        assert body['stats']['totalRevenue'] == 100.46 and body['stats']['successRate'] == 66.67
+        window = (datetime(2026, 9, 1), datetime(2026, 10, 1))
+        assert transaction_summary.call_args[0] == window and top_accounts.call_args[0] == window
+
+        client.get('/api/admin/transaction-stats?period=week', headers=headers)
+        since, until = top_accounts.call_args[0]
+        assert until == day_start(datetime.utcnow()) + timedelta(days=1) and since == day_start(datetime.utcnow() - timedelta(days=7))
+
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f"✅ {name}")
@@ -0,0 +1,138 @@
+"""
+Verification code tests - consuming a code in one atomic update, expired and
+wrong codes, and concurrent requests with the same code
+
+No server or database needed; email_verifications and users are in-memory
+stand-ins whose find_one_and_update is atomic like MongoDB's, and
+/api/registration/verify-email runs in a Flask test client:
+    python test_verify_email_code.py
+    python -m pytest test_verify_email_code.py
+"""
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from unittest import mock
+from bson import ObjectId
+from flask import Flask
+from app.routes import registration
+from app.utils.indexes import STANDALONE_INDEXES
+
+
+class FakeCollection:
+    def __init__(self, *documents):
+        self.documents = [{'_id': ObjectId(), **document} for document in documents]
+        self.operations = []
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def matches(document, query):
+        for field, condition in query.items():
+            value = document.get(field)
+            if isinstance(condition, dict):
+                if value is None or not value > condition['$gt']:
+                    return False
+            elif value != condition:
+                return False
+        return True
+
+    def find_one(self, query, projection=None):
+        self.operations.append('find_one')
+        return next((dict(document) for document in self.documents if self.matches(document, query)), None)
+
+    def find_one_and_update(self, query, update, projection=None, return_document=False):
+        self.operations.append('find_one_and_update')
+        with self._lock:
+            for document in self.documents:
+                if self.matches(document, query):
+                    before = dict(document)
+                    document.update(update.get('$set', {}))
+                    for field, amount in update.get('$inc', {}).items():
+                        document[field] = document.get(field, 0) + amount
+                    return dict(document) if return_document else before
+        return None
+
+
+@contextmanager
+def verify_email(*codes, user=True):
+    now = datetime.utcnow()
+    verifications = FakeCollection(*(
+        {'email': 'an@example.com', 'code': code, 'isUsed': False, 'attempts': 0, 'expiresAt': now + expires_in}
+        for code, expires_in in codes
+    ))
+    users = FakeCollection(*([{
+        'email': 'an@example.com', 'fullName': 'Nguyễn An', 'role': 'user', 'accountStatus': 'active',
+        'status': 'active', 'is_verified': False
+    }] if user else []))
+    db = mock.Mock(email_verifications=verifications, users=users)
+
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = 'test-secret'
+    app.register_blueprint(registration.registration_bp)
+    with mock.patch.object(registration, 'get_db', lambda: db):
+        client = app.test_client()
+        yield lambda code, email='an@example.com': client.post('/api/registration/verify-email', json={'email': email, 'code': code}), db
+
+
+def test_code_is_consumed_and_user_verified_in_two_writes():
+    with verify_email(('123456', timedelta(minutes=10))) as (post, db):
+        response = post(' 123456 ', email=' An@Example.com ')
+        assert response.status_code == 200 and response.get_json()['success']
+        assert response.get_json()['token'] and response.get_json()['user']['fullName'] == 'Nguyễn An'
+        verification = db.email_verifications.documents[0]
+        assert verification['isUsed'] and verification['attempts'] == 1 and 'usedAt' in verification
+        assert db.users.documents[0]['is_verified']
+        assert db.email_verifications.operations == ['find_one_and_update'] and db.users.operations == ['find_one_and_update']
+
+
+def test_used_code_is_rejected():
+    with verify_email(('123456', timedelta(minutes=10))) as (post, _):
+        assert post('123456').status_code == 200
+        response = post('123456')
+        assert response.status_code == 400 and response.get_json()['message'] == 'Mã xác thực không đúng'
+
+
+def test_concurrent_requests_verify_once():
+    with verify_email(('123456', timedelta(minutes=10))) as (post, db):
+        start = threading.Barrier(8)
+        statuses = []
+
+        def request():
+            start.wait()
+            statuses.append(post('123456').status_code)
+
+        threads = [threading.Thread(target=request) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert sorted(statuses) == [200] + [400] * 7
+        assert db.email_verifications.documents[0]['attempts'] == 1
+
+
+def test_expired_and_wrong_codes():
+    with verify_email(('123456', timedelta(minutes=-1))) as (post, db):
+        response = post('123456')
+        assert response.status_code == 400 and 'hết hạn' in response.get_json()['message']
+        assert not db.email_verifications.documents[0]['isUsed']
+        response = post('654321')
+        assert response.status_code == 400 and response.get_json()['message'] == 'Mã xác thực không đúng'
+        assert db.users.operations == []
+
+
+def test_missing_fields_and_unknown_user():
+    with verify_email(('123456', timedelta(minutes=10)), user=False) as (post, _):
+        assert post('').status_code == 400
+        assert post('123456').status_code == 404
+
+
+def test_indexes_cover_the_consuming_update():
+    indexes = {index.document['name']: index.document for index in STANDALONE_INDEXES['email_verifications']}
+    assert list(indexes['email_code_is_used']['key']) == ['email', 'code', 'isUsed']
+    assert indexes['expires_at_ttl']['expireAfterSeconds'] == 86400
+
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f"✅ {name}")
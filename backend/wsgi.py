@@ -0,0 +1,10 @@
+"""
+WSGI entry point for production servers
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+run.py keeps starting the Werkzeug development server for local work.
+"""
+from app import create_app
+
+app = create_app()